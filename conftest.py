@@ -22,6 +22,27 @@ def event_loop():
     loop.close()
 
 
+@pytest.fixture(autouse=True)
+def reset_circuit_breakers():
+    """熔断器为进程级状态，每个测试前清空，避免失败用例互相影响"""
+    from ai_tutor.services.llm.circuit_breaker import circuit_breakers
+
+    circuit_breakers.reset()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def isolated_ocr_cache():
+    """OCR结果缓存默认会落盘，测试中替换为仅内存的实例"""
+    from ai_tutor.services.ocr import cache as ocr_cache
+    from ai_tutor.services.ocr.cache import MemoryLRUTier, OCRResultCache, PerceptualIndex
+
+    previous = ocr_cache._ocr_result_cache
+    ocr_cache._ocr_result_cache = OCRResultCache(MemoryLRUTier(64), None, PerceptualIndex(256))
+    yield
+    ocr_cache._ocr_result_cache = previous
+
+
 @pytest_asyncio.fixture
 async def async_client() -> AsyncGenerator[AsyncClient, None]:
     """异步HTTP客户端fixture"""
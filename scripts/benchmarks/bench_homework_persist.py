@@ -0,0 +1,128 @@
+"""
+批改结果落库基准
+
+对比每次作业（1个会话 + N道题）的写入耗时：
+- orm_per_row：逐题 db.add 后 flush（ORM逐行INSERT，每题一次往返）；
+- bulk：write_homework，会话 flush 取ID后一条批量INSERT写入全部题目，一次提交。
+
+默认使用SQLite内存库；传入 --url 可在真实PostgreSQL上测试（会在该库中建表并写入测试数据）。
+
+运行：
+    PYTHONPATH=src python scripts/benchmarks/bench_homework_persist.py [--questions 50] [--repeat 200]
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime
+from typing import Callable, List
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from ai_tutor.db.database import Base
+from ai_tutor.models import homework, student  # noqa: F401  注册表结构
+from ai_tutor.models.homework import HomeworkSession, Question, SubjectEnum
+from ai_tutor.services.student.persistence import (
+    HomeworkRecord,
+    apply_result,
+    question_rows,
+    write_homework,
+)
+
+
+def make_record(questions: int) -> HomeworkRecord:
+    return HomeworkRecord(
+        student_id=1,
+        subject="math",
+        provider="qwen",
+        result={
+            "ocr_text": "作业OCR文本" * 50,
+            "processing_time": 20.0,
+            "correction": {
+                "overall_score": 80,
+                "questions": [
+                    {
+                        "question_number": i + 1,
+                        "question_text": f"解方程：{i}x + 3 = {i + 7}",
+                        "student_answer": "x = 2",
+                        "correct_answer": "x = 2",
+                        "is_correct": i % 3 != 0,
+                        "score": 2,
+                        "max_score": 2,
+                        "error_analysis": "移项时没有变号" if i % 3 == 0 else "",
+                        "solution_steps": ["移项", "合并同类项", "系数化为1"],
+                        "knowledge_points": ["一元一次方程", "移项"],
+                        "difficulty_level": 2,
+                    }
+                    for i in range(questions)
+                ],
+            },
+        },
+    )
+
+
+def orm_per_row(db: Session, record: HomeworkRecord) -> int:
+    """对照组：ORM逐行插入"""
+    session = HomeworkSession(
+        student_id=record.student_id,
+        subject=SubjectEnum(record.subject.upper()),
+        ai_provider=record.provider,
+        completed_at=datetime.now(),
+    )
+    apply_result(session, record.result)
+    db.add(session)
+    db.flush()
+    for row in question_rows(session.id, record.result["correction"]):
+        db.add(Question(**row))
+        db.flush()
+    db.commit()
+    return session.id
+
+
+def run(factory: sessionmaker, writer: Callable[[Session, HomeworkRecord], int], record, repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        db = factory()
+        start = time.perf_counter()
+        writer(db, record)
+        samples.append(time.perf_counter() - start)
+        db.close()
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="sqlite://")
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.url.startswith("sqlite"):
+        engine = create_engine(args.url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    else:
+        engine = create_engine(args.url)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False)
+    record = make_record(args.questions)
+
+    # 预热连接与语句缓存
+    run(factory, orm_per_row, record, 5)
+    run(factory, write_homework, record, 5)
+
+    header = f"{'method':<14}{'questions':>10}{'p50 ms':>10}{'p95 ms':>10}{'per question us':>18}"
+    print(f"database: {engine.dialect.name}")
+    print(header)
+    print("-" * len(header))
+    for name, writer in (("orm_per_row", orm_per_row), ("bulk", write_homework)):
+        samples = sorted(run(factory, writer, record, args.repeat))
+        p50 = statistics.median(samples)
+        p95 = samples[int(len(samples) * 0.95) - 1]
+        print(
+            f"{name:<14}{args.questions:>10}{p50 * 1000:>10.2f}{p95 * 1000:>10.2f}"
+            f"{p50 / args.questions * 1e6:>18.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
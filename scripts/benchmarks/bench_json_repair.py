@@ -0,0 +1,173 @@
+"""
+LLM批改输出JSON解析基准
+
+对比旧版 safe_json_parse（多次 json.loads + 正则改写）与单遍容错解码器，
+语料为批改接口常见的不规范输出：代码块包裹、前后说明文字、尾随逗号、
+Python字面量、单引号、注释、max_tokens截断，以及50题的大响应。
+
+运行：
+    PYTHONPATH=src python scripts/benchmarks/bench_json_repair.py [--repeat 200]
+"""
+import argparse
+import json
+import re
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ai_tutor.services.llm.json_repair import JSONRepairError, tolerant_json_decode
+
+
+def make_question(number: int) -> Dict[str, Any]:
+    return {
+        "question_number": number,
+        "question_text": f"计算：{number} + {number * 2} = ?",
+        "student_answer": str(number * 3),
+        "is_correct": number % 4 != 0,
+        "score": 5 if number % 4 else 2,
+        "max_score": 5,
+        "correct_answer": str(number * 3),
+        "error_analysis": "" if number % 4 else "进位错误",
+        "solution_steps": ["列式", "计算"],
+        "knowledge_points": ["整数加法"],
+        "difficulty_level": 2,
+        "mastery_level": 0.8,
+    }
+
+
+def grading_json(questions: int) -> str:
+    return json.dumps(
+        {
+            "questions": [make_question(i) for i in range(1, questions + 1)],
+            "overall_score": 85.0,
+            "total_score": 100.0,
+            "accuracy_rate": 0.85,
+            "overall_suggestions": "整体掌握较好，注意进位",
+            "weak_knowledge_points": ["进位加法"],
+            "study_recommendations": ["多练习进位加法"],
+        },
+        ensure_ascii=False,
+        indent=2,
+    )
+
+
+def build_corpus() -> Dict[str, str]:
+    small = grading_json(3)
+    large = grading_json(50)
+    return {
+        "well_formed_3q": small,
+        "well_formed_50q": large,
+        "fenced": f"```json\n{small}\n```",
+        "prose_wrapped": f"好的，以下是批改结果：\n{small}\n如有疑问请继续提问。",
+        "trailing_commas": small.replace("]\n", "],\n").replace("}\n", "},\n")[:-2] + "\n}",
+        "python_literals": small.replace("true", "True").replace("false", "False"),
+        "single_quotes": small.replace('"', "'"),
+        "commented": small.replace('"overall_score"', '// 总分\n  "overall_score"'),
+        "truncated_3q": small[: int(len(small) * 0.7)],
+        "fenced_truncated_50q": f"```json\n{large[: int(len(large) * 0.9)]}",
+        "fenced_trailing_50q": f"```json\n{large[:-2]},\n}}\n```",
+    }
+
+
+# ---- 旧实现（替换前 LLMService.safe_json_parse 的逻辑，去掉日志） ----
+
+def _legacy_clean(text: str) -> str:
+    text = re.sub(r'^```(?:json)?\s*', '', text, flags=re.MULTILINE)
+    text = re.sub(r'```\s*$', '', text, flags=re.MULTILINE)
+    text = text.strip().strip('`"\'')
+    text = re.sub(r',\s*([}\]])', r'\1', text)
+    text = re.sub(r'(["\'])([^"\']*)(["\'])', r'"\2"', text)
+    return text
+
+
+def _legacy_extract(text: str) -> Optional[str]:
+    matches = re.findall(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', text, re.DOTALL)
+    if matches:
+        return max(matches, key=len)
+    matches = re.findall(r'\[[^\[\]]*(?:\[[^\[\]]*\][^\[\]]*)*\]', text, re.DOTALL)
+    if matches:
+        return max(matches, key=len)
+    return None
+
+
+def _legacy_fix(text: str) -> str:
+    text = re.sub(r'(\w+):', r'"\1":', text)
+    text = re.sub(r'\bTrue\b', 'true', text)
+    text = re.sub(r'\bFalse\b', 'false', text)
+    text = re.sub(r'\bNone\b', 'null', text)
+    text = re.sub(r"\'([^\']*)\'", '"\1"', text)
+    text = re.sub(r',\s*([}\]])', r'\1', text)
+    return text
+
+
+def legacy_parse(text: str) -> Optional[Any]:
+    cleaned = text.strip()
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        pass
+    try:
+        cleaned = _legacy_clean(cleaned)
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        pass
+    try:
+        extracted = _legacy_extract(cleaned)
+        if extracted:
+            return json.loads(extracted)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(_legacy_fix(cleaned))
+    except json.JSONDecodeError:
+        return None
+
+
+def tolerant_parse(text: str) -> Optional[Any]:
+    try:
+        return tolerant_json_decode(text).value
+    except JSONRepairError:
+        return None
+
+
+# ---- 计时与结果质量 ----
+
+def question_count(value: Any) -> int:
+    """解析结果中保留下来的完整题目数（衡量恢复质量）"""
+    if not isinstance(value, dict):
+        return 0
+    questions = value.get("questions")
+    if not isinstance(questions, list):
+        return 0
+    return sum(1 for q in questions if isinstance(q, dict) and "question_number" in q)
+
+
+def bench(fn: Callable[[str], Any], text: str, repeat: int) -> Tuple[float, Any]:
+    timings: List[float] = []
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn(text)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    header = f"{'case':<24}{'bytes':>8}{'legacy µs':>12}{'legacy q':>10}{'tolerant µs':>13}{'tolerant q':>12}{'speedup':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, text in build_corpus().items():
+        legacy_t, legacy_v = bench(legacy_parse, text, args.repeat)
+        new_t, new_v = bench(tolerant_parse, text, args.repeat)
+        print(
+            f"{name:<24}{len(text.encode()):>8}{legacy_t * 1e6:>12.1f}{question_count(legacy_v):>10}"
+            f"{new_t * 1e6:>13.1f}{question_count(new_v):>12}{legacy_t / new_t:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+题目切分基准
+
+用合成的多页OCR全文（每页约24道题：阿拉伯/中文/括号题号、选择题选项、带小数的计算题），
+按页数 1 → 100 对比改造前后的 parse_questions：
+- legacy：8个题号模式各 finditer 一遍全文再排序合并切分点；每一段再用未编译的模式
+  逐个 re.search 找题号、re.findall 打分题型、re.sub 去题号和答案；
+- single-pass：一个预编译的命名分支交替式扫描一遍全文，题号直接取自段首匹配，其余模式预编译
+  （QuestionParser 当前实现）。
+
+输出每种页数的总耗时和每页耗时，每页耗时基本不随页数变化即为线性；
+另外给出 iter_questions 拿到第一道题的耗时：只含全文预处理和第一段解析，远小于整篇解析。
+
+运行：
+    PYTHONPATH=src python scripts/benchmarks/bench_question_segmenter.py [--pages 1,10,25,50,100] [--repeat 5]
+"""
+import argparse
+import logging
+import re
+import statistics
+import time
+from typing import Callable, List
+
+import structlog
+
+from ai_tutor.services.parsing import QuestionParser
+from ai_tutor.services.parsing.question_parser import (
+    ANSWER_REGION_PATTERNS,
+    QUESTION_MARKERS,
+    QUESTION_TYPE_PATTERNS,
+    AnswerRegion,
+    ParsedQuestion,
+    QuestionType,
+)
+
+LEGACY_NUMBER_PATTERNS = [pattern for _, pattern, _ in QUESTION_MARKERS]
+LEGACY_TYPE_PATTERNS = {q_type: [p.pattern for p in patterns] for q_type, patterns in QUESTION_TYPE_PATTERNS.items()}
+LEGACY_ANSWER_PATTERNS = [p.pattern for p in ANSWER_REGION_PATTERNS]
+CHINESE = "一二三四五六七八九十"
+
+
+class LegacyQuestionParser(QuestionParser):
+    """复刻改造前的解析流程（不含日志与文字块定位）"""
+
+    def parse_questions(self, text, blocks=None) -> List[ParsedQuestion]:
+        cleaned = self._preprocess_text(text)
+        splits = []
+        for pattern in LEGACY_NUMBER_PATTERNS:
+            splits.extend(match.start() for match in re.finditer(pattern, cleaned, re.IGNORECASE))
+        splits.sort()
+        segments = []
+        for i, start in enumerate(splits):
+            segment = cleaned[start:splits[i + 1] if i + 1 < len(splits) else len(cleaned)].strip()
+            if len(segment) > 10:
+                segments.append(segment)
+        return [self._legacy_question(segment, i + 1) for i, segment in enumerate(segments)]
+
+    def _legacy_question(self, segment: str, default_number: int) -> ParsedQuestion:
+        number = None
+        for pattern in LEGACY_NUMBER_PATTERNS:
+            match = re.search(pattern, segment, re.IGNORECASE)
+            if match and (match.group(1).isdigit() or match.group(1) in CHINESE):
+                number = int(match.group(1)) if match.group(1).isdigit() else CHINESE.index(match.group(1)) + 1
+                break
+
+        scores = {
+            q_type: sum(len(re.findall(p, segment, re.IGNORECASE)) for p in patterns)
+            for q_type, patterns in LEGACY_TYPE_PATTERNS.items()
+        }
+        best_type, best_score = max(scores.items(), key=lambda x: x[1])
+        question_type = best_type if best_score > 0 else QuestionType.UNKNOWN
+
+        text = segment
+        for pattern in LEGACY_NUMBER_PATTERNS:
+            text = re.sub(pattern, '', text, count=1)
+        for pattern in LEGACY_ANSWER_PATTERNS:
+            text = re.sub(pattern, '', text, flags=re.IGNORECASE)
+        text = re.sub(r'\s+', ' ', text).strip()[:300]
+
+        regions = []
+        for pattern in LEGACY_ANSWER_PATTERNS:
+            for match in re.finditer(pattern, segment, re.IGNORECASE):
+                content = match.group(1).strip()
+                if content:
+                    regions.append(AnswerRegion(
+                        match.start(1), match.end(1), content,
+                        self._calculate_answer_confidence(content), self._classify_answer_type(content),
+                    ))
+        return ParsedQuestion(
+            question_number=number or default_number,
+            question_text=text,
+            question_type=question_type,
+            answer_regions=regions,
+            student_answer=self._extract_student_answer(segment, regions),
+            raw_text=segment,
+            confidence=self._calculate_confidence(segment, question_type, regions),
+            metadata={},
+        )
+
+
+def make_page(page: int) -> str:
+    """一页OCR文字：卷头 + 3个大题，每个大题8道小题"""
+    lines = [f"数学综合练习 第{page}页 姓名：______ 班级：______"]
+    number = (page - 1) * 24
+    for part in range(3):
+        lines.append(f"{CHINESE[part]}、{['选择题', '填空题', '解答题'][part]}（每题4分）")
+        for _ in range(8):
+            number += 1
+            if part == 0:
+                lines.append(f"（{number}）下列哪个是正确的？ A. 2+2=5 B. 3×4=12 C. 5÷2=3 D. 6-1=4 学生答案：B")
+            elif part == 1:
+                lines.append(f"{number}. 填空：圆的半径为 {number % 9 + 1}.5cm，面积为 ______ 平方厘米。 答：{number * 3}")
+            else:
+                lines.append(f"第{number}题 解方程 {number}x - 6 = {number * 2}，求 x 的值并写出过程。\n学生答：x = {number % 7}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def timed(fn: Callable[[], object], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default="1,10,25,50,100")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    legacy, current = LegacyQuestionParser(), QuestionParser()
+
+    print(f"{'pages':>6}{'chars':>10}{'questions':>11}{'legacy ms':>12}{'us/page':>10}"
+          f"{'single ms':>12}{'us/page':>10}{'first q ms':>12}")
+    for pages in (int(p) for p in args.pages.split(",")):
+        text = "\n".join(make_page(page) for page in range(1, pages + 1))
+        old, new = legacy.parse_questions(text), current.parse_questions(text)
+        assert [q.raw_text for q in old] == [q.raw_text for q in new]
+
+        legacy_time = timed(lambda: legacy.parse_questions(text), args.repeat)
+        single_time = timed(lambda: current.parse_questions(text), args.repeat)
+        first_time = timed(lambda: next(current.iter_questions(text)), args.repeat)
+        print(f"{pages:>6}{len(text):>10}{len(new):>11}{legacy_time * 1000:>12.2f}{legacy_time / pages * 1e6:>10.0f}"
+              f"{single_time * 1000:>12.2f}{single_time / pages * 1e6:>10.0f}{first_time * 1000:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+学生列表序列化基准
+
+1k个学生（SQLite内存库），对比改造前后的两条路径：
+- legacy：逐行 StudentResponse.model_validate，返回模型后由 FastAPI 按 response_model 再校验一遍、
+  jsonable_encoder 转成dict，再用标准库 json 的 JSONResponse 输出；
+- fast：TypeAdapter(List[StudentResponse]) 整表校验，pydantic-core 直接序列化为JSON字节
+  （/api/v1/students 当前实现），其余路由默认使用 orjson 的 FastJSONResponse。
+
+两组测量：
+- serialize：1000行ORM对象 → 响应字节（只计校验与序列化，不含查询）；
+- endpoint：通过ASGI调用复刻的 GET /api/v1/students，每页100条翻完10页（1k行，含SQLite查询）。
+
+运行：
+    PYTHONPATH=src python scripts/benchmarks/bench_student_list.py [--rows 1000] [--repeat 50]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List
+
+import httpx
+from fastapi import APIRouter, Depends, FastAPI, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine, desc
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from ai_tutor.db.database import Base
+from ai_tutor.models import homework, student  # noqa: F401  注册表结构
+from ai_tutor.models.student import Student
+from ai_tutor.schemas.student_schemas import (
+    PaginationParams,
+    StudentListResponse,
+    StudentResponse,
+    student_list_adapter,
+)
+from ai_tutor.utils import fastjson
+from ai_tutor.utils.fastjson import FastJSONResponse, model_response
+
+
+PAGE_SIZE = 100
+
+
+def seed(factory: sessionmaker, rows: int) -> None:
+    db = factory()
+    start = datetime(2025, 3, 1, 8, 0)
+    db.add_all(
+        Student(
+            name=f"学生{i:04d}",
+            grade="初二",
+            class_name=f"{i % 12 + 1}班",
+            student_id=f"S{i:05d}",
+            phone="13800138000",
+            preferred_subjects=["math", "physics"],
+            learning_style="visual",
+            is_active=True,
+            created_at=start + timedelta(minutes=i),
+            updated_at=start + timedelta(minutes=i, seconds=30),
+        )
+        for i in range(rows)
+    )
+    db.commit()
+    db.close()
+
+
+def legacy_bytes(rows: List[Student]) -> bytes:
+    """改造前：逐行校验 → response_model 再校验 → jsonable_encoder → 标准库json"""
+    result = StudentListResponse.create(
+        students=[StudentResponse.model_validate(s) for s in rows],
+        total_count=len(rows),
+        pagination=PaginationParams(),
+    )
+    revalidated = StudentListResponse.model_validate(result.model_dump())
+    return JSONResponse(jsonable_encoder(revalidated)).body
+
+
+def fast_bytes(rows: List[Student]) -> bytes:
+    result = StudentListResponse.create(
+        students=student_list_adapter.validate_python(rows, from_attributes=True),
+        total_count=len(rows),
+        pagination=PaginationParams(),
+    )
+    return result.model_dump_json().encode()
+
+
+def students_app(factory: sessionmaker, fast: bool) -> FastAPI:
+    """复刻 /api/v1/students 的查询与响应路径（不含日志），只在校验与序列化方式上不同"""
+    router = APIRouter(prefix="/students")
+
+    def db_dep():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @router.get("", response_model=StudentListResponse)
+    async def list_students(
+        page: int = Query(1, ge=1),
+        page_size: int = Query(20, ge=1, le=100),
+        db: Session = Depends(db_dep),
+    ):
+        pagination = PaginationParams(page=page, page_size=page_size)
+        query = db.query(Student)
+        total_count = query.count()
+        rows = query.order_by(desc(Student.created_at), Student.id).offset(pagination.offset).limit(page_size).all()
+        if not fast:
+            return StudentListResponse.create(
+                students=[StudentResponse.model_validate(s) for s in rows],
+                total_count=total_count,
+                pagination=pagination,
+            )
+        result = StudentListResponse.create(
+            students=student_list_adapter.validate_python(rows, from_attributes=True),
+            total_count=total_count,
+            pagination=pagination,
+        )
+        return model_response(result)
+
+    app = FastAPI(default_response_class=FastJSONResponse) if fast else FastAPI()
+    app.include_router(router, prefix="/api/v1")
+    return app
+
+
+def time_sync(fn: Callable[[], object], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def time_async(fn: Callable[[], Awaitable[object]], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def crawl(client: httpx.AsyncClient, pages: int) -> None:
+    for page in range(1, pages + 1):
+        response = await client.get("/api/v1/students", params={"page": page, "page_size": PAGE_SIZE})
+        response.raise_for_status()
+
+
+def report(name: str, samples: List[float]) -> None:
+    samples = sorted(samples)
+    p50 = statistics.median(samples)
+    p95 = samples[max(0, int(len(samples) * 0.95) - 1)]
+    print(f"  {name:<8}{p50 * 1000:>10.2f}{p95 * 1000:>10.2f}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False)
+    seed(factory, args.rows)
+
+    db = factory()
+    rows = db.query(Student).order_by(Student.id).all()
+    assert StudentListResponse.model_validate_json(legacy_bytes(rows)) == StudentListResponse.model_validate_json(
+        fast_bytes(rows)
+    )
+
+    print(f"orjson: {'yes' if fastjson.orjson is not None else 'no (stdlib json fallback)'}")
+    print(f"serialize {len(rows)} rows (ms)     p50       p95")
+    for name, fn in (("legacy", legacy_bytes), ("fast", fast_bytes)):
+        time_sync(lambda: fn(rows), 5)
+        report(name, time_sync(lambda: fn(rows), args.repeat))
+    db.close()
+
+    pages = max(1, args.rows // PAGE_SIZE)
+    print(f"GET /api/v1/students x{pages} pages of {PAGE_SIZE} (ms)  p50       p95")
+    for name, app in (("legacy", students_app(factory, fast=False)), ("fast", students_app(factory, fast=True))):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await crawl(client, pages)
+            report(name, await time_async(lambda: crawl(client, pages), max(5, args.repeat // 5)))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+"""
+请求耗时统计与 Server-Timing 响应头
+
+纯ASGI中间件：每个请求开始时建立阶段耗时列表（ContextVar），处理过程中 stage_timer 记录的
+各阶段耗时在响应头发出时写入 Server-Timing，浏览器开发者工具的 Timing 面板可直接查看。
+流式响应（SSE）的响应头先于批改完成发出，只包含发出响应头之前已完成的阶段。
+
+请求耗时按路由模板（而非原始路径）记入直方图，避免路径参数造成标签基数膨胀。
+"""
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ...core.metrics import REQUEST_SECONDS, server_timing_header, start_request_timings
+
+
+def _route_label(scope: Scope) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return path or "unmatched"
+
+
+class ServerTimingMiddleware:
+    """记录请求耗时并附加 Server-Timing 响应头"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings = start_request_timings()
+        status = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing_header(timings, time.perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=_route_label(scope),
+                status=str(status),
+            )
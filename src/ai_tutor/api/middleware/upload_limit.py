@@ -0,0 +1,164 @@
+"""
+上传请求的大小限制与全局在途字节预算
+
+multipart 请求体在进入路由函数之前就会被完整解析，路由里再检查文件大小为时已晚。
+这个纯ASGI中间件在读取请求体之前：
+
+- 按 Content-Length 拒绝超过上限的请求（413），不读取请求体；
+- 从全局在途字节预算中预留本次请求的字节数，预算不足时返回 503 + Retry-After，
+  让客户端稍后重试，而不是在突发上传时把worker的内存撑爆；
+- 对没有 Content-Length（分块传输）的请求边读边计数，超过上限立即中断并返回 413。
+
+预留的字节在响应结束后释放（包括流式批改响应），因此预算同时约束了在途图片的解码与处理。
+
+批量批改接口按路径使用更高的请求体上限；它由流水线逐张解码，驻留内存的图片数有界，
+因此预留字节数封顶为单张上传的上限。
+"""
+from typing import Any, Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ...core.config import settings
+from ...core.logger import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class UploadBudget:
+    """进程内在途上传字节预算"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.in_flight = 0
+        self.requests = 0
+        self.rejected = 0
+
+    def try_acquire(self, size: int) -> bool:
+        """预留字节；没有在途请求时总是放行，避免单个大请求永远无法通过"""
+        if self.in_flight and self.in_flight + size > self.max_bytes:
+            self.rejected += 1
+            return False
+        self.in_flight += size
+        self.requests += 1
+        return True
+
+    def release(self, size: int) -> None:
+        self.in_flight = max(0, self.in_flight - size)
+        self.requests = max(0, self.requests - 1)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_bytes": self.max_bytes,
+            "in_flight_bytes": self.in_flight,
+            "in_flight_requests": self.requests,
+            "rejected": self.rejected,
+        }
+
+
+upload_budget = UploadBudget(settings.UPLOAD_INFLIGHT_BUDGET)
+
+
+class UploadLimitMiddleware:
+    """限制 multipart 上传请求的大小与并发在途字节"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_request_size: Optional[int] = None,
+        budget: Optional[UploadBudget] = None,
+        retry_after: Optional[int] = None,
+        path_limits: Optional[Dict[str, int]] = None,
+    ):
+        self.app = app
+        self.max_request_size = max_request_size or settings.MAX_UPLOAD_REQUEST_SIZE
+        self.path_limits = (
+            path_limits
+            if path_limits is not None
+            else {"/api/v1/homework/grade/batch": settings.BATCH_MAX_REQUEST_SIZE}
+        )
+        self.budget = budget or upload_budget
+        self.retry_after = retry_after or settings.UPLOAD_RETRY_AFTER
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT"):
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if not headers.get("content-type", "").startswith("multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.path_limits.get(scope["path"], self.max_request_size)
+        try:
+            declared: Optional[int] = int(headers["content-length"])
+        except (KeyError, ValueError):
+            declared = None
+
+        if declared is not None and declared > limit:
+            logger.warning("上传请求过大", path=scope["path"], content_length=declared, limit=limit)
+            await self._reject(scope, receive, send, 413, f"请求体过大。最大支持 {limit // (1024 * 1024)}MB")
+            return
+
+        reserved = min(declared if declared is not None else limit, self.max_request_size)
+        if not self.budget.try_acquire(reserved):
+            logger.warning(
+                "上传在途字节超出预算，拒绝请求",
+                path=scope["path"],
+                requested=reserved,
+                **self.budget.stats(),
+            )
+            await self._reject(
+                scope, receive, send, 503, "服务繁忙，请稍后重试",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # 让表单解析器以客户端断开结束，随后由 guarded_send 改写为413
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message: Message) -> None:
+            nonlocal response_started
+            if exceeded:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        finally:
+            self.budget.release(reserved)
+
+        if exceeded and not response_started:
+            logger.warning("上传请求体超过上限，已中断", path=scope["path"], received=received, limit=limit)
+            await self._reject(scope, receive, send, 413, f"请求体过大。最大支持 {limit // (1024 * 1024)}MB")
+
+    @staticmethod
+    async def _reject(
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+        status_code: int,
+        detail: str,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        response = JSONResponse(status_code=status_code, content={"detail": detail}, headers=headers)
+        await response(scope, receive, send)
@@ -1,12 +1,27 @@
 """
 AI服务相关API端点
 """
-from typing import List, Dict, Optional
-from fastapi import APIRouter, HTTPException
+from typing import List, Dict, Optional, AsyncIterator, Any
+import anyio
+from dataclasses import asdict
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from ...services.llm import get_llm_service
+from ...services.llm import (
+    get_llm_service,
+    LLMClientPool,
+    llm_single_flight,
+    latency_tracker,
+    CircuitOpenError,
+    circuit_breakers,
+)
+from ...services.llm.cache import get_llm_response_cache
+from ...services.llm.rate_limit import rate_limit_stats
+from ...services.llm.usage import get_usage_recorder
+from ...core.dependencies import get_llm_client_pool
 from ...core.logger import get_logger
+from ...utils.sse import sse_event, SSE_HEADERS
 
 router = APIRouter()
 logger = get_logger(__name__)
@@ -21,10 +36,11 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     """聊天请求模型"""
     messages: List[ChatMessage]
-    provider: Optional[str] = "qwen"  # "qwen" 或 "kimi"
+    provider: Optional[str] = "qwen"  # "qwen"、"kimi" 或 "auto"（按延迟路由）
     model: Optional[str] = None
     temperature: Optional[float] = 0.7
     max_tokens: Optional[int] = 2000
+    stream: Optional[bool] = False  # 是否以SSE流式返回
 
 
 class GenerateRequest(BaseModel):
@@ -34,23 +50,53 @@ class GenerateRequest(BaseModel):
     model: Optional[str] = None
     temperature: Optional[float] = 0.7
     max_tokens: Optional[int] = 2000
+    stream: Optional[bool] = False  # 是否以SSE流式返回
+
+
+async def _relay_as_sse(
+    http_request: Request,
+    chunks: AsyncIterator[str],
+    meta: Dict[str, Any],
+) -> AsyncIterator[str]:
+    """将增量文本转为SSE消息；客户端断开时停止迭代以取消上游请求"""
+    response_length = 0
+    try:
+        async for delta in chunks:
+            if await http_request.is_disconnected():
+                logger.info("客户端已断开，取消上游流式请求", **meta)
+                return
+            response_length += len(delta)
+            yield sse_event({"delta": delta})
+        yield sse_event({**meta, "response_length": response_length}, event="done")
+    except Exception as e:
+        logger.error("AI流式响应失败", error=str(e), **meta)
+        yield sse_event({"message": str(e)}, event="error")
+    finally:
+        # 即使当前任务已被取消，也要关闭上游HTTP流
+        with anyio.CancelScope(shield=True):
+            await chunks.aclose()
 
 
 @router.post("/chat", summary="AI聊天对话")
-async def chat_with_ai(request: ChatRequest):
+async def chat_with_ai(
+    request: ChatRequest,
+    http_request: Request,
+    pool: LLMClientPool = Depends(get_llm_client_pool),
+):
     """
     与AI进行聊天对话
 
     - **messages**: 消息列表
-    - **provider**: AI服务提供商 (qwen/kimi)
+    - **provider**: AI服务提供商 (qwen/kimi/auto)
     - **model**: 模型名称（可选）
     - **temperature**: 生成温度（0-1）
     - **max_tokens**: 最大生成token数
+    - **stream**: 为true时以 text/event-stream 逐段返回
     """
 
     try:
         # 获取AI服务
-        llm_service = get_llm_service(request.provider)
+        llm_service = get_llm_service(request.provider, pool=pool)
 
         # 转换消息格式
         messages = [{"role": msg.role, "content": msg.content} for msg in request.messages]
@@ -64,12 +110,27 @@ async def chat_with_ai(request: ChatRequest):
             messages_detail=[{"role": msg["role"], "content": msg["content"][:100]} for msg in messages]
         )
 
+        if request.stream:
+            chunks = llm_service.stream_chat(
+                messages,
+                model=request.model,
+                temperature=request.temperature,
+                max_tokens=request.max_tokens,
+                caller="api.ai.chat"
+            )
+            return StreamingResponse(
+                _relay_as_sse(http_request, chunks, {"provider": request.provider, "model": request.model}),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS,
+            )
+
         # 调用AI服务
         response = await llm_service.chat(
             messages=messages,
             model=request.model,
             temperature=request.temperature,
-            max_tokens=request.max_tokens
+            max_tokens=request.max_tokens,
+            caller="api.ai.chat"
         )
 
         logger.info(
@@ -99,27 +160,47 @@ async def chat_with_ai(request: ChatRequest):
 
 
 @router.post("/generate", summary="AI文本生成")
-async def generate_text(request: GenerateRequest):
+async def generate_text(
+    request: GenerateRequest,
+    http_request: Request,
+    pool: LLMClientPool = Depends(get_llm_client_pool),
+):
     """
     根据提示词生成文本
 
     - **prompt**: 提示词
-    - **provider**: AI服务提供商 (qwen/kimi)
+    - **provider**: AI服务提供商 (qwen/kimi/auto)
     - **model**: 模型名称（可选）
     - **temperature**: 生成温度（0-1）
     - **max_tokens**: 最大生成token数
+    - **stream**: 为true时以 text/event-stream 逐段返回
     """
 
     try:
         # 获取AI服务
-        llm_service = get_llm_service(request.provider)
+        llm_service = get_llm_service(request.provider, pool=pool)
+
+        if request.stream:
+            chunks = llm_service.stream_generate(
+                request.prompt,
+                model=request.model,
+                temperature=request.temperature,
+                max_tokens=request.max_tokens,
+                caller="api.ai.generate"
+            )
+            return StreamingResponse(
+                _relay_as_sse(http_request, chunks, {"provider": request.provider, "model": request.model}),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS,
+            )
 
         # 生成文本
         response = await llm_service.generate(
             prompt=request.prompt,
             model=request.model,
             temperature=request.temperature,
-            max_tokens=request.max_tokens
+            max_tokens=request.max_tokens,
+            caller="api.ai.generate"
         )
 
         logger.info(
@@ -149,7 +230,7 @@ async def generate_text(request: GenerateRequest):
 
 
 @router.get("/health", summary="AI服务健康检查")
-async def ai_health():
+async def ai_health(pool: LLMClientPool = Depends(get_llm_client_pool)):
     """检查AI服务健康状态"""
 
     health_status = {
@@ -159,19 +240,23 @@ async def ai_health():
 
     # 检查Qwen服务
     try:
-        qwen_service = get_llm_service("qwen")
+        qwen_service = get_llm_service("qwen", pool=pool)
         # 发送简单测试消息
-        test_response = await qwen_service.generate("hello", max_tokens=10)
+        test_response = await qwen_service.generate("hello", max_tokens=10, cache=False, fallback=False, caller="api.ai.health")
         health_status["qwen"] = {"status": "healthy", "error": None}
+    except CircuitOpenError as e:
+        health_status["qwen"] = {"status": "circuit_open", "error": str(e)}
     except Exception as e:
         health_status["qwen"] = {"status": "unhealthy", "error": str(e)}
 
     # 检查Kimi服务
     try:
-        kimi_service = get_llm_service("kimi")
+        kimi_service = get_llm_service("kimi", pool=pool)
         # 发送简单测试消息
-        test_response = await kimi_service.generate("hello", max_tokens=10)
+        test_response = await kimi_service.generate("hello", max_tokens=10, cache=False, fallback=False, caller="api.ai.health")
         health_status["kimi"] = {"status": "healthy", "error": None}
+    except CircuitOpenError as e:
+        health_status["kimi"] = {"status": "circuit_open", "error": str(e)}
     except Exception as e:
         health_status["kimi"] = {"status": "unhealthy", "error": str(e)}
 
@@ -180,5 +265,76 @@ async def ai_health():
 
     return {
         "status": "healthy" if overall_healthy else "unhealthy",
-        "services": health_status
+        "services": health_status,
+        "circuit_breakers": circuit_breakers.snapshot()
+    }
+
+
+@router.get("/pool", summary="LLM连接池状态")
+async def llm_pool_stats(pool: LLMClientPool = Depends(get_llm_client_pool)):
+    """查看各服务商共享HTTP连接池的连接数与请求数，用于压测时调整池大小"""
+    return {
+        "success": True,
+        "data": pool.stats(),
+        "message": "获取连接池状态成功"
+    }
+
+
+@router.get("/cache", summary="LLM响应缓存统计")
+async def llm_cache_stats():
+    """查看LLM响应缓存的各层命中率，以及被合并的并发重复请求数"""
+    return {
+        "success": True,
+        "data": {
+            **get_llm_response_cache().stats(),
+            "single_flight": llm_single_flight.stats(),
+        },
+        "message": "获取缓存统计成功"
+    }
+
+
+@router.get("/limits", summary="LLM限流状态")
+async def llm_limit_stats():
+    """查看各服务商的令牌桶限流与自适应并发窗口状态"""
+    return {
+        "success": True,
+        "data": rate_limit_stats(),
+        "message": "获取限流状态成功"
+    }
+
+
+@router.get("/routing", summary="LLM路由统计")
+async def llm_routing_stats():
+    """查看 provider=auto 时各服务商的延迟分布、胜出次数与对冲节省的时间"""
+    return {
+        "success": True,
+        "data": latency_tracker.snapshot(),
+        "message": "获取路由统计成功"
+    }
+
+
+@router.get("/usage", summary="LLM用量与成本统计")
+async def llm_usage(
+    group_by: str = "caller",
+    order_by: str = "total_tokens",
+    limit: int = 20,
+    recent: int = 0,
+):
+    """
+    按维度汇总LLM调用的token、成本与延迟
+
+    - **group_by**: 分组维度（caller/provider/model，或调用标签如 subject/prompt_version）
+    - **order_by**: 排序指标（total_tokens/cost/calls/avg_latency_ms/max_latency_ms等）
+    - **limit**: 返回的分组数
+    - **recent**: 额外返回本进程最近的N条原始记录
+    """
+    recorder = get_usage_recorder()
+    await recorder.refresh()
+    data = recorder.report(group_by=group_by, order_by=order_by, limit=limit)
+    if recent > 0:
+        data["recent"] = [asdict(record) for record in list(recorder.recent)[-recent:]]
+    return {
+        "success": True,
+        "data": data,
+        "message": "获取用量统计成功"
     }
@@ -3,7 +3,7 @@
 """
 import logging
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 
 from ...db.database import get_db
@@ -13,6 +13,7 @@ from ...schemas.error_analysis import (
     ErrorPatternAnalysis,
     ErrorTrendAnalysis
 )
+from ...utils.fastjson import PreSerialized
 
 logger = logging.getLogger(__name__)
 
@@ -200,43 +201,47 @@ async def health_check():
         }
 
 
+# 错误类型列表是静态数据，只序列化一次
+ERROR_TYPES = PreSerialized({
+    "error_types": [
+        {
+            "code": "calculation_error",
+            "name": "计算错误",
+            "description": "数学计算过程中的错误",
+            "subjects": ["math", "physics", "chemistry"]
+        },
+        {
+            "code": "concept_confusion",
+            "name": "概念混淆",
+            "description": "对基础概念理解有误",
+            "subjects": ["math", "physics", "chemistry", "biology"]
+        },
+        {
+            "code": "formula_misuse",
+            "name": "公式误用",
+            "description": "公式使用不当或条件不符",
+            "subjects": ["math", "physics", "chemistry"]
+        },
+        {
+            "code": "grammar_error",
+            "name": "语法错误",
+            "description": "语法使用错误",
+            "subjects": ["english", "chinese"]
+        },
+        {
+            "code": "vocabulary_error",
+            "name": "词汇错误",
+            "description": "词汇选择或使用错误",
+            "subjects": ["english"]
+        }
+    ]
+})
+
+
 @router.get("/error-types")
-async def get_error_types():
+async def get_error_types(request: Request):
     """获取支持的错误类型列表"""
-    return {
-        "error_types": [
-            {
-                "code": "calculation_error",
-                "name": "计算错误",
-                "description": "数学计算过程中的错误",
-                "subjects": ["math", "physics", "chemistry"]
-            },
-            {
-                "code": "concept_confusion",
-                "name": "概念混淆",
-                "description": "对基础概念理解有误",
-                "subjects": ["math", "physics", "chemistry", "biology"]
-            },
-            {
-                "code": "formula_misuse",
-                "name": "公式误用",
-                "description": "公式使用不当或条件不符",
-                "subjects": ["math", "physics", "chemistry"]
-            },
-            {
-                "code": "grammar_error",
-                "name": "语法错误",
-                "description": "语法使用错误",
-                "subjects": ["english", "chinese"]
-            },
-            {
-                "code": "vocabulary_error",
-                "name": "词汇错误",
-                "description": "词汇选择或使用错误",
-                "subjects": ["english"]
-            }
-        ]
-    }
+    return ERROR_TYPES.response(request)
 
 
 @router.get("/students/{student_id}/improvement-plan/{subject}")
@@ -1,15 +1,31 @@
 """
 作业批改相关API端点
 """
-from typing import Optional
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from fastapi.responses import JSONResponse
-from PIL import Image
 from io import BytesIO
+from typing import Any, BinaryIO, Dict, List, Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Depends, Header, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
 from ...services.student import HomeworkService
+from ...services.student.batch_grading import BatchGradingPipeline, close_batch_items, collect_batch_items
+from ...services.student.grading_jobs import GradingQueueFullError, get_grading_job_manager
+from ...services.student.idempotency import (
+    IdempotencyConflictError,
+    IdempotencyInProgressError,
+    content_fingerprint,
+    get_grading_idempotency,
+    make_idempotency_key,
+)
+from ...services.student.persistence import get_homework_writer
+from ...services.llm import get_llm_service, LLMClientPool, circuit_breakers
 from ...core.config import settings
+from ...core.dependencies import get_llm_client_pool
 from ...core.logger import get_logger
+from ...utils.fastjson import FastJSONResponse, PreSerialized
+from ...utils.sse import sse_event, SSE_HEADERS
+from ...utils.uploads import decode_upload, file_digest, read_upload_bytes, read_upload_image, validate_upload
+from ..middleware.upload_limit import upload_budget
 
 router = APIRouter()
 logger = get_logger(__name__)
@@ -20,55 +36,90 @@ async def grade_homework(
     file: UploadFile = File(...),
     subject: str = Form("math"),
     provider: str = Form("qwen"),
+    student_id: Optional[int] = Form(None),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    pool: LLMClientPool = Depends(get_llm_client_pool),
 ):
     """
     作业批改接口
 
     - **file**: 作业图片文件
     - **subject**: 科目 (math/english/physics)
-    - **provider**: AI服务提供商 (qwen/kimi)
+    - **provider**: AI服务提供商 (qwen/kimi/auto)
+    - **student_id**: 学生ID（可选），提供时批改结果在后台写入作业记录
+    - **Idempotency-Key**: 请求头（可选），客户端为一次提交生成的唯一键，重试时携带同一个键
+
+    同一学生重复提交同一张图片（或携带同一个 Idempotency-Key）不会重新批改：
+    已批改完成时直接返回保存的结果，正在批改时等待同一次批改的结果，响应头带 Idempotent-Replayed: true。
     """
+    file_size = validate_upload(file)
+    source: BinaryIO = file.file
+    key = None
+    if settings.GRADING_IDEMPOTENCY_ENABLED:
+        # 同一键的批改由第一个请求发起、其他请求共享：图片先读入内存，
+        # 第一个客户端断开后其上传文件被关闭，共享的批改仍能继续
+        await file.seek(0)
+        source = BytesIO(await file.read())
+        digest = await run_in_threadpool(file_digest, source)
+        fingerprint = content_fingerprint(digest, subject)
+        key = make_idempotency_key(student_id, fingerprint, idempotency_key)
 
-    # 验证文件类型
-    if file.content_type not in settings.ALLOWED_IMAGE_TYPES:
-        logger.warning("不支持的文件类型", content_type=file.content_type)
-        raise HTTPException(
-            status_code=400,
-            detail=f"不支持的文件类型: {file.content_type}"
-        )
+    filename = file.filename
 
-    # 验证文件大小
-    file_content = await file.read()
-    if len(file_content) > settings.MAX_FILE_SIZE:
-        logger.warning("文件过大", file_size=len(file_content))
-        raise HTTPException(
-            status_code=400,
-            detail=f"文件过大。最大支持 {settings.MAX_FILE_SIZE // (1024*1024)}MB"
-        )
+    async def grade() -> Dict[str, Any]:
+        return await _grade_upload(source, filename, file_size, subject, provider, student_id, pool)
+
+    replayed = False
+    if key is None:
+        content = await grade()
+    else:
+        try:
+            content, replayed = await get_grading_idempotency().run(key, fingerprint, grade)
+        except IdempotencyConflictError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except IdempotencyInProgressError as e:
+            return JSONResponse(
+                status_code=409,
+                content={"detail": str(e)},
+                headers={"Retry-After": str(settings.UPLOAD_RETRY_AFTER)},
+            )
+        if replayed:
+            logger.info("重复提交未重新批改", filename=filename, student_id=student_id)
+
+    return FastJSONResponse(
+        status_code=200 if content["success"] else 500,
+        content=content,
+        headers={"Idempotent-Replayed": "true"} if replayed else None,
+    )
+
+
+async def _grade_upload(
+    source: BinaryIO,
+    filename: Optional[str],
+    file_size: int,
+    subject: str,
+    provider: str,
+    student_id: Optional[int],
+    pool: LLMClientPool,
+) -> Dict[str, Any]:
+    """解码并批改已校验的作业图片，返回响应内容（success 为假表示批改失败）"""
+    image = await decode_upload(source, filename)
 
     try:
         logger.info(
             "开始处理作业批改请求",
-            filename=file.filename,
+            filename=filename,
             subject=subject,
             provider=provider,
-            file_size=len(file_content)
+            file_size=file_size
         )
 
-        # 加载图片
-        try:
-            image = Image.open(BytesIO(file_content))
-            logger.info("图片加载成功", filename=file.filename, image_size=image.size, image_mode=image.mode)
-        except Exception as img_error:
-            logger.error("图片加载失败", filename=file.filename, error=str(img_error))
-            raise HTTPException(
-                status_code=400,
-                detail=f"图片格式错误或损坏: {str(img_error)}"
-            )
-
         # 初始化作业批改服务
         try:
-            homework_service = HomeworkService(provider=provider)
+            homework_service = HomeworkService(
+                provider=provider,
+                llm_service=get_llm_service(provider, pool=pool),
+            )
             logger.info("作业批改服务初始化成功", provider=provider)
         except Exception as service_error:
             logger.error("作业批改服务初始化失败", provider=provider, error=str(service_error))
@@ -81,40 +132,39 @@ async def grade_homework(
         try:
             result = await homework_service.grade_homework(
                 image=image,
-                subject=subject
+                subject=subject,
+                student_id=student_id,
+                title=filename,
             )
 
             # 检查是否有错误
             if result.get("correction", {}).get("error"):
                 logger.warning(
                     "批改过程中出现错误",
-                    filename=file.filename,
+                    filename=filename,
                     error_message=result["correction"].get("error_message"),
                     error_type=result["correction"].get("error_type")
                 )
 
-                return JSONResponse(
-                    status_code=500,
-                    content={
-                        "success": False,
-                        "error": {
-                            "type": result["correction"].get("error_type", "Unknown"),
-                            "message": result["correction"].get("error_message", "批改过程中发生未知错误"),
-                            "details": {
-                                "filename": file.filename,
-                                "subject": subject,
-                                "provider": provider,
-                                "processing_time": result["processing_time"]
-                            }
-                        },
-                        "message": "作业批改失败"
-                    }
-                )
+                return {
+                    "success": False,
+                    "error": {
+                        "type": result["correction"].get("error_type", "Unknown"),
+                        "message": result["correction"].get("error_message", "批改过程中发生未知错误"),
+                        "details": {
+                            "filename": filename,
+                            "subject": subject,
+                            "provider": provider,
+                            "processing_time": result["processing_time"]
+                        }
+                    },
+                    "message": "作业批改失败"
+                }
 
         except Exception as grading_error:
             logger.error(
                 "作业批改执行异常",
-                filename=file.filename,
+                filename=filename,
                 subject=subject,
                 provider=provider,
                 error=str(grading_error),
@@ -127,33 +177,32 @@ async def grade_homework(
 
         logger.info(
             "作业批改完成",
-            filename=file.filename,
+            filename=filename,
             subject=subject,
             provider=provider,
             processing_time=result["processing_time"],
             questions_count=len(result.get("parsed_questions", []))
         )
 
-        return JSONResponse(
-            status_code=200,
-            content={
-                "success": True,
-                "data": {
-                    "ocr_text": result["ocr_text"],
-                    "correction": result["correction"],
-                    "metadata": {
-                        "filename": file.filename,
-                        "subject": subject,
-                        "provider": provider,
-                        "processing_time": result["processing_time"],
-                        "file_size": len(file_content),
-                        "questions_parsed": len(result.get("parsed_questions", [])),
-                        "text_analysis": result.get("text_analysis", {})
-                    }
-                },
-                "message": "作业批改完成"
-            }
-        )
+        partial = bool(result.get("partial"))
+        return {
+            "success": True,
+            "data": {
+                "ocr_text": result["ocr_text"],
+                "correction": result["correction"],
+                "partial": partial,
+                "metadata": {
+                    "filename": filename,
+                    "subject": subject,
+                    "provider": provider,
+                    "processing_time": result["processing_time"],
+                    "file_size": file_size,
+                    "questions_parsed": len(result.get("parsed_questions", [])),
+                    "text_analysis": result.get("text_analysis", {})
+                }
+            },
+            "message": "部分题目批改失败，请重新提交" if partial else "作业批改完成"
+        }
 
     except HTTPException:
         # 重新抛出HTTP异常
@@ -161,12 +210,12 @@ async def grade_homework(
     except Exception as e:
         logger.error(
             "作业批改失败",
-            filename=file.filename,
+            filename=filename,
             subject=subject,
             provider=provider,
             error=str(e),
             error_type=type(e).__name__,
-            file_size=len(file_content)
+            file_size=file_size
         )
         raise HTTPException(
             status_code=500,
@@ -174,22 +223,215 @@ async def grade_homework(
         )
 
 
-@router.get("/subjects", summary="获取支持的科目列表")
-async def get_supported_subjects():
-    """获取系统支持的科目列表"""
-    subjects = [
-        {"code": "math", "name": "数学", "description": "数学作业批改"},
-        {"code": "english", "name": "英语", "description": "英语作业批改"},
-        {"code": "physics", "name": "物理", "description": "物理作业批改"},
-    ]
+@router.post("/grade/stream", summary="作业批改（流式）")
+async def grade_homework_stream(
+    file: UploadFile = File(...),
+    subject: str = Form("math"),
+    provider: str = Form("qwen"),
+    student_id: Optional[int] = Form(None),
+    pool: LLMClientPool = Depends(get_llm_client_pool),
+):
+    """
+    流式作业批改接口，以 text/event-stream 返回（提供 student_id 时批改结果在后台写入作业记录）：
+
+    - **ocr**: OCR识别完成
+    - **question**: 单道题批改结果，生成完一题即推送一题
+    - **summary**: 全部批改完成后的总体结果（与 /grade 的结果结构相同）
+    - **error**: 批改失败
+    """
+    image, file_size = await read_upload_image(file)
+
+    try:
+        homework_service = HomeworkService(
+            provider=provider,
+            llm_service=get_llm_service(provider, pool=pool),
+        )
+    except Exception as service_error:
+        logger.error("作业批改服务初始化失败", provider=provider, error=str(service_error))
+        raise HTTPException(
+            status_code=503,
+            detail=f"服务初始化失败，请检查配置: {str(service_error)}"
+        )
+
+    logger.info(
+        "开始处理流式作业批改请求",
+        filename=file.filename,
+        subject=subject,
+        provider=provider,
+        file_size=file_size
+    )
+
+    async def event_stream():
+        async for item in homework_service.grade_homework_stream(
+            image=image, subject=subject, student_id=student_id, title=file.filename
+        ):
+            yield sse_event(item["data"], event=item["event"])
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
+@router.post("/grade/batch", summary="班级批量批改（流式）")
+async def grade_homework_batch(
+    files: List[UploadFile] = File(...),
+    subject: str = Form("math"),
+    provider: str = Form("qwen"),
+    pool: LLMClientPool = Depends(get_llm_client_pool),
+):
+    """
+    批量批改一个班的作业，以 text/event-stream 返回：
+
+    - **files**: 多张作业图片，或包含图片的zip压缩包（文件名视为学生姓名/学号）
+    - **result**: 单个学生的批改结果，按完成顺序推送
+    - **report**: 全部完成后的批次吞吐报告
+
+    解码、OCR、解析、LLM批改四个阶段流水线执行，OCR与LLM调用互相重叠。
+    """
+    # 上传在此复制为批次持有的临时文件：处理函数返回后表单文件即被关闭，流式响应体才开始解码
+    items = await run_in_threadpool(collect_batch_items, files)
+    try:
+        if not items:
+            raise HTTPException(status_code=400, detail="未找到可批改的作业图片")
+        if len(items) > settings.BATCH_MAX_FILES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"单批最多 {settings.BATCH_MAX_FILES} 张作业，本次 {len(items)} 张"
+            )
+
+        try:
+            homework_service = HomeworkService(
+                provider=provider,
+                llm_service=get_llm_service(provider, pool=pool),
+            )
+        except Exception as service_error:
+            logger.error("作业批改服务初始化失败", provider=provider, error=str(service_error))
+            raise HTTPException(
+                status_code=503,
+                detail=f"服务初始化失败，请检查配置: {str(service_error)}"
+            )
+    except HTTPException:
+        close_batch_items(items)
+        raise
+
+    logger.info("开始处理批量批改请求", items=len(items), subject=subject, provider=provider)
+    pipeline = BatchGradingPipeline(homework_service, subject=subject)
+
+    async def event_stream():
+        try:
+            async for item in pipeline.run(items):
+                yield sse_event(item["data"], event=item["event"])
+        finally:
+            close_batch_items(items)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
+@router.post("/jobs", summary="提交异步批改任务", status_code=202)
+async def submit_grading_job(
+    file: UploadFile = File(...),
+    subject: str = Form("math"),
+    provider: str = Form("qwen"),
+    student_id: Optional[int] = Form(None),
+):
+    """
+    异步作业批改：立即返回任务ID，批改在后台worker中进行
+
+    - **file**: 作业图片文件
+    - **subject**: 科目 (math/english/physics)
+    - **provider**: AI服务提供商 (qwen/kimi/auto)
+    - **student_id**: 学生ID（可选），提供时批改状态同步写入作业记录
+
+    通过 GET /homework/jobs/{job_id}?wait=秒数 查询或长轮询结果。
+    """
+    if not settings.GRADING_JOBS_ENABLED:
+        raise HTTPException(status_code=503, detail="异步批改未启用，请使用 /homework/grade")
+
+    data, file_size = await read_upload_bytes(file)
+    try:
+        job = await get_grading_job_manager().submit(
+            data,
+            subject=subject,
+            provider=provider,
+            student_id=student_id,
+            filename=file.filename,
+        )
+    except GradingQueueFullError as e:
+        logger.warning("批改任务排队已满", error=str(e))
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "批改任务繁忙，请稍后重试"},
+            headers={"Retry-After": str(settings.UPLOAD_RETRY_AFTER)},
+        )
+
+    logger.info(
+        "批改任务已受理",
+        job_id=job.id,
+        filename=file.filename,
+        subject=subject,
+        provider=provider,
+        file_size=file_size,
+    )
+    return JSONResponse(
+        status_code=202,
+        content={
+            "success": True,
+            "data": {
+                "job_id": job.id,
+                "status": job.status.value,
+                "status_url": f"/api/v1/homework/jobs/{job.id}",
+            },
+            "message": "批改任务已提交"
+        },
+    )
+
+
+@router.get("/jobs/{job_id}", summary="查询异步批改任务")
+async def get_grading_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=settings.GRADING_JOB_LONG_POLL_MAX, description="长轮询等待秒数"),
+):
+    """
+    查询批改任务状态：pending / processing / completed / error
+
+    带 wait 参数时在任务结束或等待超时后返回。
+    """
+    manager = get_grading_job_manager()
+    job = await manager.wait(job_id, wait) if wait > 0 else await manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"批改任务不存在或已过期: {job_id}")
 
     return {
         "success": True,
-        "data": subjects,
-        "message": "获取科目列表成功"
+        "data": job.to_dict(),
+        "message": "获取批改任务成功"
     }
 
 
+# 科目列表不随请求变化，只序列化一次
+SUPPORTED_SUBJECTS = PreSerialized({
+    "success": True,
+    "data": [
+        {"code": "math", "name": "数学", "description": "数学作业批改"},
+        {"code": "english", "name": "英语", "description": "英语作业批改"},
+        {"code": "physics", "name": "物理", "description": "物理作业批改"},
+    ],
+    "message": "获取科目列表成功"
+})
+
+
+@router.get("/subjects", summary="获取支持的科目列表")
+async def get_supported_subjects(request: Request):
+    """获取系统支持的科目列表"""
+    return SUPPORTED_SUBJECTS.response(request)
+
+
 @router.get("/health", summary="作业批改服务健康检查")
 async def homework_health():
     """检查作业批改服务健康状态"""
@@ -199,16 +441,26 @@ async def homework_health():
         ocr_service = get_ocr_service()
 
         # 测试AI服务
-        from ...services.llm import get_llm_service
         ai_service = get_llm_service("qwen")
 
+        # 服务商熔断时备用服务商仍可批改，整体降级而非不可用
+        providers_available = {
+            provider: circuit_breakers.is_available(provider) for provider in ("qwen", "kimi")
+        }
+
         return {
-            "status": "healthy",
+            "status": "healthy" if all(providers_available.values()) else "degraded",
             "services": {
                 "ocr": "available",
-                "ai_qwen": "available",
+                "ai_qwen": "available" if providers_available["qwen"] else "circuit_open",
+                "ai_kimi": "available" if providers_available["kimi"] else "circuit_open",
                 "homework_service": "ready"
-            }
+            },
+            "circuit_breakers": circuit_breakers.snapshot(),
+            "uploads": upload_budget.stats(),
+            "grading_jobs": await get_grading_job_manager().stats(),
+            "persistence": get_homework_writer().stats(),
+            "idempotency": get_grading_idempotency().stats()
         }
 
     except Exception as e:
@@ -3,12 +3,10 @@ OCR相关API端点
 """
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from fastapi.responses import JSONResponse
-from PIL import Image
-from io import BytesIO
-
-from ...services.ocr import get_ocr_service
+from ...services.ocr import get_ocr_service, get_ocr_result_cache, ocr_single_flight, PooledTesseractOCR
 from ...core.config import settings
 from ...core.logger import get_logger
+from ...utils.uploads import read_upload_image
 
 router = APIRouter()
 logger = get_logger(__name__)
@@ -24,27 +22,10 @@ async def extract_text_from_image(file: UploadFile = File(...)):
     返回提取的文本内容
     """
     
-    # 验证文件类型
-    if file.content_type not in settings.ALLOWED_IMAGE_TYPES:
-        logger.warning("不支持的文件类型", content_type=file.content_type)
-        raise HTTPException(
-            status_code=400,
-            detail=f"不支持的文件类型: {file.content_type}。支持的类型: {settings.ALLOWED_IMAGE_TYPES}"
-        )
-    
-    # 验证文件大小
-    file_content = await file.read()
-    if len(file_content) > settings.MAX_FILE_SIZE:
-        logger.warning("文件过大", file_size=len(file_content), max_size=settings.MAX_FILE_SIZE)
-        raise HTTPException(
-            status_code=400,
-            detail=f"文件过大。最大支持 {settings.MAX_FILE_SIZE // (1024*1024)}MB"
-        )
+    # 验证文件类型与大小并解码图片
+    image, file_size = await read_upload_image(file)
     
     try:
-        # 加载图片
-        image = Image.open(BytesIO(file_content))
-        
         # 获取OCR服务
         ocr_service = get_ocr_service()
         
@@ -54,7 +35,7 @@ async def extract_text_from_image(file: UploadFile = File(...)):
         logger.info(
             "OCR提取完成",
             filename=file.filename,
-            file_size=len(file_content),
+            file_size=file_size,
             text_length=len(extracted_text)
         )
         
@@ -67,7 +48,7 @@ async def extract_text_from_image(file: UploadFile = File(...)):
                     "metadata": {
                         "filename": file.filename,
                         "content_type": file.content_type,
-                        "file_size": len(file_content),
+                        "file_size": file_size,
                         "text_length": len(extracted_text),
                         "ocr_engine": settings.OCR_ENGINE
                     }
@@ -89,11 +70,18 @@ async def ocr_health():
     """OCR服务健康检查"""
     try:
         ocr_service = get_ocr_service()
-        return {
+        result = {
             "status": "healthy",
             "ocr_engine": settings.OCR_ENGINE,
-            "service_class": ocr_service.__class__.__name__
+            "service_class": ocr_service.__class__.__name__,
+            "single_flight": ocr_single_flight.stats(),
+            "cache": get_ocr_result_cache().stats() if settings.OCR_CACHE_ENABLED else None,
         }
+        if isinstance(ocr_service, PooledTesseractOCR):
+            result["engine_pool"] = ocr_service.pool.stats()
+            if ocr_service.pool.last_health and ocr_service.pool.last_health["status"] != "healthy":
+                result["status"] = "degraded"
+        return result
     except Exception as e:
         logger.error("OCR服务不健康", error=str(e))
         return JSONResponse(
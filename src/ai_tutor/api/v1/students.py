@@ -5,7 +5,7 @@
 """
 
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Response
 from sqlalchemy.orm import Session
 
 from ...core.dependencies import get_db, get_student_service
@@ -22,6 +22,7 @@ from ...schemas.student_schemas import (
     LearningTrend,
     HomeworkSubmission,
     HomeworkHistoryResponse,
+    student_list_adapter,
 )
 from ...services.student.student_service import StudentService
 from ...services.student.progress_service import get_progress_service, ProgressService
@@ -32,6 +33,7 @@ from ...services.student.exceptions import (
     DatabaseOperationError,
 )
 from ...core.logger import get_logger
+from ...utils.fastjson import model_response
 
 logger = get_logger(__name__)
 router = APIRouter(prefix="/students", tags=["students"])
@@ -373,7 +375,7 @@ async def list_students(
     is_active: Optional[bool] = Query(None, description="按活跃状态筛选"),
     has_homework: Optional[bool] = Query(None, description="是否有作业记录"),
     student_service: StudentService = Depends(get_student_service),
-) -> StudentListResponse:
+) -> Response:
     """
     获取学生列表（支持分页和筛选）
 
@@ -399,7 +401,8 @@ async def list_students(
         result = await student_service.list_students(filters=filters, pagination=pagination)
 
         logger.info("查询学生列表成功", total_count=result.total_count, page_count=len(result.students))
-        return result
+        # 服务层已按 StudentListResponse 校验过，直接序列化，不再经 response_model 二次校验
+        return model_response(result)
 
     except DatabaseOperationError as e:
         logger.error("查询学生列表失败", error=str(e))
@@ -411,7 +414,7 @@ async def search_students(
     keyword: str = Query(..., description="搜索关键词", min_length=1),
     limit: int = Query(20, description="结果数量限制", ge=1, le=100),
     student_service: StudentService = Depends(get_student_service),
-) -> List[StudentResponse]:
+) -> Response:
     """
     搜索学生（按姓名、学号、班级）
 
@@ -423,7 +426,7 @@ async def search_students(
         logger.info("搜索学生", keyword=keyword, limit=limit)
         result = await student_service.search_students(keyword, limit=limit)
         logger.info("搜索学生完成", keyword=keyword, result_count=len(result))
-        return result
+        return model_response(result, student_list_adapter)
     except DatabaseOperationError as e:
         logger.error("搜索学生失败", keyword=keyword, error=str(e))
         raise HTTPException(status_code=500, detail="服务器内部错误")
@@ -1,7 +1,7 @@
 """
 应用核心配置模块
 """
-from typing import Optional
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings
 
 
@@ -18,8 +18,134 @@ class Settings(BaseSettings):
     KIMI_API_KEY: str = ""
     KIMI_BASE_URL: str = "https://api.moonshot.cn/v1"
 
+    # LLM HTTP连接池配置
+    LLM_HTTP_TIMEOUT: float = 60.0
+    LLM_POOL_MAX_CONNECTIONS: int = 100
+    LLM_POOL_MAX_KEEPALIVE: int = 20
+    LLM_POOL_KEEPALIVE_EXPIRY: float = 30.0  # 空闲连接保活时间（秒）
+    LLM_HTTP2: bool = False  # 需要安装 h2
+    LLM_POOL_PREWARM: bool = True
+    LLM_POOL_PREWARM_CONNECTIONS: int = 2
+
+    # LLM响应缓存配置
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL: int = 24 * 3600  # 秒
+    LLM_CACHE_MAX_TEMPERATURE: float = 0.3  # 不高于该温度的调用视为确定性调用
+    LLM_CACHE_MEMORY_MAX_ENTRIES: int = 512
+    LLM_CACHE_DIR: str = ".cache/llm_responses"  # Redis不可用时的磁盘缓存目录
+    LLM_CACHE_DISK_MAX_ENTRIES: int = 5000
+
+    # LLM限流配置（按账号配额调整，0表示不限制）
+    LLM_RATE_LIMIT_ENABLED: bool = True
+    QWEN_RPM_LIMIT: int = 600
+    QWEN_TPM_LIMIT: int = 1_000_000
+    KIMI_RPM_LIMIT: int = 200
+    KIMI_TPM_LIMIT: int = 256_000
+    LLM_RETRY_AFTER_DEFAULT: float = 5.0  # 429未带Retry-After时的暂停秒数
+    LLM_CONCURRENCY_INITIAL: int = 8
+    LLM_CONCURRENCY_MIN: int = 1
+    LLM_CONCURRENCY_MAX: int = 64
+
+    # 多服务商路由配置（provider=auto）
+    LLM_ROUTING_WINDOW: int = 200  # 每个服务商保留的最近样本数
+    LLM_ROUTING_MAX_ERROR_RATE: float = 0.5  # 超过该错误率视为不健康
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # 样本不足时使用默认对冲延迟
+    LLM_HEDGE_DEFAULT_DELAY: float = 8.0  # 秒
+    LLM_HEDGE_MIN_DELAY: float = 0.5  # 秒
+
+    # 结构化输出：批改请求携带 response_format=json_object（需服务商支持）
+    LLM_GRADING_JSON_MODE: bool = False
+
+    # 熔断配置（按服务商+模型）
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5  # 连续失败次数达到后打开熔断
+    LLM_BREAKER_RECOVERY_TIMEOUT: float = 30.0  # 熔断后多久进入半开探测（秒）
+    LLM_BREAKER_HALF_OPEN_CALLS: int = 1  # 半开状态允许的并发探测请求数
+    LLM_FALLBACK_PROVIDERS: Dict[str, str] = {"qwen": "kimi", "kimi": "qwen"}  # 熔断时的备用服务商
+
+    # 用量与成本统计
+    LLM_USAGE_PERSIST: bool = True  # 是否写入Redis Stream（Redis不可用时只在进程内汇总）
+    LLM_USAGE_STREAM_MAXLEN: int = 100_000  # Stream保留的最近记录数
+    LLM_USAGE_ROLLUP_INTERVAL: float = 30.0  # 汇总任务间隔（秒）
+    LLM_USAGE_BUFFER_MAX: int = 10_000  # 待写入记录的内存上限
+    # 每千token单价（元）：[输入, 输出]
+    LLM_PRICING: Dict[str, List[float]] = {
+        "qwen-plus": [0.0008, 0.002],
+        "qwen-turbo": [0.0003, 0.0006],
+        "qwen-max": [0.0024, 0.0096],
+        "moonshot-v1-8k": [0.012, 0.012],
+        "moonshot-v1-32k": [0.024, 0.024],
+        "moonshot-v1-128k": [0.06, 0.06],
+    }
+
     # OCR配置
-    OCR_ENGINE: str = "tesseract"  # tesseract 或 paddleocr
+    # tesseract、tesseract_pool（常驻进程池）或 paddleocr；
+    # tesseract_pool 只有安装了 ocr 扩展（tesserocr）才能常驻引擎，否则worker仍逐张启动tesseract子进程
+    OCR_ENGINE: str = "tesseract"
+    OCR_LANG: str = "chi_sim+eng"
+    OCR_POOL_SIZE: int = 2  # 常驻Tesseract进程数，0表示按CPU核数
+    OCR_POOL_TASK_TIMEOUT: float = 60.0  # 单张图片识别超时（秒），超时视为worker卡死并重建
+    OCR_POOL_MAX_TASKS_PER_CHILD: int = 500  # worker处理多少张后回收，0表示不回收
+    OCR_POOL_HEALTH_INTERVAL: float = 30.0  # 探活间隔（秒）
+    OCR_TARGET_DPI: int = 200  # 预处理降采样的目标DPI（未知DPI时按A4纸估算）
+    OCR_SAUVOLA_WINDOW: int = 25  # Sauvola二值化窗口（像素，奇数）
+    OCR_SAUVOLA_K: float = 0.2
+    OCR_DESKEW_MAX_ANGLE: float = 5.0  # 倾斜校正的最大搜索角度（度），0表示不校正
+    OCR_LAYOUT_TILING: bool = True  # 按版面切分为文字块并行识别
+    OCR_LAYOUT_MIN_GAP: int = 24  # 视为文字块分隔的最小空白行高（目标DPI下的像素）
+    OCR_LAYOUT_MIN_HEIGHT: int = 80  # 文字块最小高度，过矮的与相邻块合并
+    OCR_LAYOUT_MAX_TILES: int = 8  # 每页最多切分的文字块数
+
+    # OCR结果缓存配置
+    OCR_CACHE_ENABLED: bool = True
+    OCR_CACHE_TTL: int = 7 * 24 * 3600  # 秒
+    OCR_CACHE_MEMORY_MAX_ENTRIES: int = 256
+    OCR_CACHE_DIR: str = ".cache/ocr_results"  # Redis不可用时的磁盘缓存目录
+    OCR_CACHE_DISK_MAX_ENTRIES: int = 5000
+    # 按感知哈希匹配重新压缩/轻微裁剪的同一张图片；同一份练习卷上不同学生的作答也会被判为近似，默认关闭
+    OCR_CACHE_NEAR_DUPLICATES: bool = False
+    OCR_CACHE_INDEX_MAX_ENTRIES: int = 20000
+    OCR_CACHE_MAX_HAMMING: int = 6  # 64位粗哈希的最大汉明距离（不超过7）
+    OCR_CACHE_MAX_FINE_HAMMING: int = 24  # 256位细哈希复核的最大汉明距离
+
+    # 异步批改任务配置
+    GRADING_JOBS_ENABLED: bool = True
+    GRADING_JOB_WORKERS: int = 4  # 每个进程的常驻批改worker数
+    GRADING_JOB_MAX_ATTEMPTS: int = 3  # 含首次执行的最大尝试次数
+    GRADING_JOB_VISIBILITY_TIMEOUT: float = 180.0  # 租约时长（秒），worker失联超过该时间任务重新入队
+    GRADING_JOB_RETRY_BACKOFF: float = 2.0  # 首次重试的延迟（秒），之后按2倍递增
+    GRADING_JOB_RESULT_TTL: int = 24 * 3600  # 任务记录与结果保留时长（秒）
+    GRADING_JOB_MAX_PENDING: int = 1000  # 排队任务上限，超出时提交返回503
+    # 进程内队列（无Redis时）暂存的图片总字节上限，超出时提交返回503；0表示不限制
+    GRADING_JOB_MEMORY_MAX_BYTES: int = 256 * 1024 * 1024
+    GRADING_JOB_DRAIN_TIMEOUT: float = 30.0  # 关闭时等待处理中任务完成的时长（秒）
+    GRADING_JOB_LONG_POLL_MAX: float = 30.0  # 长轮询最长等待（秒）
+
+    # 重复提交去重配置（/homework/grade 按 学生ID+图片内容哈希 或 Idempotency-Key）
+    GRADING_IDEMPOTENCY_ENABLED: bool = True
+    GRADING_IDEMPOTENCY_TTL: int = 24 * 3600  # 已完成批改结果的保留时长（秒）
+    GRADING_IDEMPOTENCY_LEASE: float = 300.0  # 批改中标记的有效期（秒），持有进程崩溃后过期可重新批改
+    GRADING_IDEMPOTENCY_MEMORY_MAX_ENTRIES: int = 2000  # Redis不可用时进程内保留的记录数
+
+    # 长试卷分块批改配置
+    GRADING_CHUNKED_ENABLED: bool = True  # 题目较多时按题分块并行批改
+    GRADING_CHUNK_SIZE: int = 5  # 每块最多题数
+    GRADING_CHUNK_MIN_QUESTIONS: int = 10  # 解析出的题数达到该值才分块
+    GRADING_CHUNK_MAX_CHUNKS: int = 8  # 每份作业最多并行的块数，题目更多时增大每块题数
+    GRADING_CHUNK_HEADER_CHARS: int = 400  # 每块附带的共享卷头（标题、考试说明）最大字符数
+
+    # 批改结果落库配置
+    HOMEWORK_PERSIST_ENABLED: bool = True  # 带学生ID的批改结果写入 homework_sessions / questions
+    HOMEWORK_PERSIST_MAX_PENDING: int = 1000  # 待写入队列上限，超出时丢弃并告警
+    HOMEWORK_PERSIST_WORKERS: int = 2  # 后台写入并发数
+
+    # 班级批量批改配置
+    BATCH_MAX_FILES: int = 60  # 每批最多图片数（含zip中的图片）
+    BATCH_MAX_REQUEST_SIZE: int = 200 * 1024 * 1024  # 批量上传请求体上限
+    BATCH_DECODE_CONCURRENCY: int = 2  # 各阶段并发数
+    BATCH_OCR_CONCURRENCY: int = 0  # 0表示与OCR进程池大小一致
+    BATCH_PARSE_CONCURRENCY: int = 1
+    BATCH_LLM_CONCURRENCY: int = 8
+    BATCH_STAGE_QUEUE_SIZE: int = 4  # 阶段之间的队列容量，满了反压上游阶段
 
     # 应用配置
     SECRET_KEY: str = "your-secret-key-change-in-production"
@@ -28,6 +154,9 @@ class Settings(BaseSettings):
 
     # 文件上传配置
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
+    MAX_UPLOAD_REQUEST_SIZE: int = 11 * 1024 * 1024  # 单个multipart请求体上限（含表单字段开销）
+    UPLOAD_INFLIGHT_BUDGET: int = 64 * 1024 * 1024  # 全进程同时处理中的上传字节上限，超出返回503
+    UPLOAD_RETRY_AFTER: int = 2  # 503响应的 Retry-After（秒）
     ALLOWED_IMAGE_TYPES: list[str] = ["image/jpeg", "image/png", "image/jpg", "image/webp"]
 
     # 跨域配置
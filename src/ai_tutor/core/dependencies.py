@@ -3,10 +3,11 @@ FastAPI依赖注入配置
 """
 from typing import Generator
 from sqlalchemy.orm import Session
-from fastapi import Depends
+from fastapi import Depends, Request
 
 from ..db.database import get_db
 from ..services.student.student_service import StudentService
+from ..services.llm.client_pool import LLMClientPool, llm_client_pool
 
 
 def get_student_service(db: Session = Depends(get_db)) -> StudentService:
@@ -19,3 +20,15 @@ def get_student_service(db: Session = Depends(get_db)) -> StudentService:
         StudentService: 学生管理服务实例
     """
     return StudentService(db)
+
+
+def get_llm_client_pool(request: Request) -> LLMClientPool:
+    """获取应用级LLM连接池
+
+    Args:
+        request: 当前请求
+
+    Returns:
+        LLMClientPool: lifespan中创建的连接池，未启动时回退到全局实例
+    """
+    return getattr(request.app.state, "llm_client_pool", llm_client_pool)
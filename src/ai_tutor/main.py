@@ -5,11 +5,20 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 
 from .core.config import settings
 from .core.logger import configure_logging, get_logger
+from .core.metrics import PROMETHEUS_CONTENT_TYPE, registry as metrics_registry
 from .api.v1 import router as api_v1_router
+from .api.middleware.server_timing import ServerTimingMiddleware
+from .api.middleware.upload_limit import UploadLimitMiddleware
+from .services.llm.client_pool import llm_client_pool
+from .services.llm.usage import get_usage_recorder
+from .services.ocr.engine_pool import get_tesseract_engine_pool
+from .services.student.grading_jobs import get_grading_job_manager
+from .services.student.persistence import get_homework_writer
+from .utils.fastjson import FastJSONResponse
 
 # 配置日志
 configure_logging()
@@ -24,7 +33,22 @@ async def lifespan(app: FastAPI):
     # 启动时的初始化逻辑
     # TODO: 初始化数据库连接池
     # TODO: 初始化Redis连接
-    # TODO: 加载AI模型配置
+    # 初始化LLM连接池并预热连接
+    await llm_client_pool.start()
+    app.state.llm_client_pool = llm_client_pool
+    # 启动LLM用量汇总任务
+    get_usage_recorder().start()
+    # 常驻OCR进程池：预热worker并定期探活
+    if settings.OCR_ENGINE.lower() == "tesseract_pool":
+        ocr_pool = get_tesseract_engine_pool()
+        await ocr_pool.start()
+        ocr_pool.start_health_checks()
+    # 批改结果后台落库
+    if settings.HOMEWORK_PERSIST_ENABLED:
+        get_homework_writer().start()
+    # 异步批改worker
+    if settings.GRADING_JOBS_ENABLED:
+        get_grading_job_manager().start()
 
     yield
 
@@ -32,6 +56,15 @@ async def lifespan(app: FastAPI):
     logger.info("应用关闭中...")
     # TODO: 关闭数据库连接
     # TODO: 关闭Redis连接
+    # 先排空批改任务，它们还要用到OCR进程池与LLM连接池
+    if settings.GRADING_JOBS_ENABLED:
+        await get_grading_job_manager().shutdown()
+    if settings.HOMEWORK_PERSIST_ENABLED:
+        await get_homework_writer().stop()
+    await get_usage_recorder().stop()
+    if settings.OCR_ENGINE.lower() == "tesseract_pool":
+        await get_tesseract_engine_pool().shutdown()
+    await llm_client_pool.close()
 
 
 # 创建FastAPI应用实例
@@ -41,6 +74,7 @@ app = FastAPI(
     version="0.1.0",
     docs_url="/docs" if settings.DEBUG else None,
     redoc_url="/redoc" if settings.DEBUG else None,
+    default_response_class=FastJSONResponse,
     lifespan=lifespan
 )
 
@@ -53,6 +87,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 上传大小限制与在途字节预算（在解析请求体之前生效）
+app.add_middleware(UploadLimitMiddleware)
+
+# 请求耗时直方图与 Server-Timing 响应头（最外层，包含上传限制在内的全部耗时）
+app.add_middleware(ServerTimingMiddleware)
+
 # 挂载静态文件
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -80,6 +120,12 @@ async def health():
     return {"status": "healthy", "version": "0.1.0"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus指标（本进程）"""
+    return Response(content=metrics_registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
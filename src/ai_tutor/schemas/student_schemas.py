@@ -4,7 +4,7 @@
 
 from typing import List, Optional, Any
 from datetime import datetime
-from pydantic import BaseModel, Field, field_validator, ConfigDict
+from pydantic import BaseModel, Field, field_validator, ConfigDict, TypeAdapter
 from enum import Enum
 
 
@@ -65,6 +65,10 @@ class StudentResponse(StudentBase):
     model_config = ConfigDict(from_attributes=True, use_enum_values=True)
 
 
+# 整个列表一次校验/序列化（在pydantic-core内循环），代替逐行 model_validate
+student_list_adapter = TypeAdapter(List[StudentResponse])
+
+
 class StudentFilter(BaseModel):
     """学生查询过滤器"""
 
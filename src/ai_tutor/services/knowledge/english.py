@@ -1,6 +1,7 @@
 from typing import List, Dict, Any
 
 from ai_tutor.core.logger import get_logger
+from ai_tutor.services.llm.usage import usage_tags
 from .extractor import KnowledgeExtractor, register_extractor
 
 logger = get_logger(__name__)
@@ -70,7 +71,8 @@ class EnglishKnowledgeExtractor(KnowledgeExtractor):
         prompt = self._build_prompt(text)
 
         try:
-            response_text = await self.llm_service.generate(prompt)
+            with usage_tags(caller="knowledge.extract", subject="english"):
+                response_text = await self.llm_service.generate(prompt, cache=True)
             parsed_json = self.llm_service.safe_json_parse(response_text)
             knowledge_points = self._format_response(parsed_json)
 
@@ -1,6 +1,40 @@
 """
 AI大模型服务模块
 """
-from .base import LLMService, QwenService, KimiService, get_llm_service
+from .base import (
+    LLMService,
+    OpenAICompatibleService,
+    QwenService,
+    KimiService,
+    get_llm_service,
+    llm_single_flight,
+)
+from .client_pool import LLMClientPool, llm_client_pool
+from .exceptions import LLMServiceError, LLMAPIError, LLMRateLimitError
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState, circuit_breakers
+from .usage import UsageRecorder, get_usage_recorder, usage_tags
+from .router import RoutingLLMService, LatencyTracker, latency_tracker
 
-__all__ = ["LLMService", "QwenService", "KimiService", "get_llm_service"]
+__all__ = [
+    "LLMService",
+    "OpenAICompatibleService",
+    "QwenService",
+    "KimiService",
+    "get_llm_service",
+    "llm_single_flight",
+    "LLMClientPool",
+    "llm_client_pool",
+    "LLMServiceError",
+    "LLMAPIError",
+    "LLMRateLimitError",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "CircuitState",
+    "circuit_breakers",
+    "RoutingLLMService",
+    "LatencyTracker",
+    "latency_tracker",
+    "UsageRecorder",
+    "get_usage_recorder",
+    "usage_tags",
+]
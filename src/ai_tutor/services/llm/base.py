@@ -3,13 +3,32 @@ AI大模型服务基础模块
 """
 import json
 import re
+import time
 import asyncio
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Union, AsyncIterator, Tuple
 import httpx
 
 from ...core.logger import LoggerMixin
 from ...core.config import settings
+from ...core.metrics import LLM_RETRIES, PARSE_FALLBACKS
+from .client_pool import LLMClientPool, llm_client_pool
+from .cache import get_llm_response_cache
+from .exceptions import LLMAPIError, LLMRateLimitError, LLMServiceError
+from .circuit_breaker import CircuitOpenError, circuit_breakers, counts_as_failure
+from .usage import get_usage_recorder, pop_usage_tags
+from .json_repair import JSONRepairError, tolerant_json_decode
+from .rate_limit import (
+    get_rate_limiter,
+    get_concurrency_limiter,
+    estimate_tokens,
+    parse_retry_after,
+)
+from ...utils.singleflight import SingleFlight
+
+
+# 进程内相同请求的合并器
+llm_single_flight = SingleFlight("llm")
 
 
 class LLMService(ABC, LoggerMixin):
@@ -25,110 +44,57 @@ class LLMService(ABC, LoggerMixin):
         """根据提示词生成文本"""
         pass
 
+    async def stream_chat(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """流式获取回复，逐段产出增量文本（默认实现一次性返回完整回复）"""
+        yield await self.chat(messages, **kwargs)
+
+    async def stream_generate(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """根据提示词流式生成文本"""
+        async for delta in self.stream_chat([{"role": "user", "content": prompt}], **kwargs):
+            yield delta
+
     def safe_json_parse(self, text: str, fallback_parser: Optional[callable] = None) -> Dict[str, Any]:
-        """安全的JSON解析，支持容错和降级策略"""
+        """安全的JSON解析，支持容错和降级策略
+
+        格式良好的JSON直接解析；否则经一次线性扫描容错解码（代码块、尾随逗号、
+        Python字面量、单引号、截断结尾等），仍失败时依次使用降级解析器与文本提取。
+        """
         if not text or not text.strip():
             self.log_warning("收到空文本，返回默认结构")
             return self._get_fallback_structure()
 
-        original_text = text
-        cleaned_text = text.strip()
-
-        # 第一次尝试：直接解析
-        try:
-            return json.loads(cleaned_text)
-        except json.JSONDecodeError as e:
-            self.log_warning("JSON直接解析失败", error=str(e), text_preview=cleaned_text[:200])
-
-        # 第二次尝试：清洗常见格式问题
-        try:
-            cleaned_text = self._clean_json_text(cleaned_text)
-            return json.loads(cleaned_text)
-        except json.JSONDecodeError as e:
-            self.log_warning("JSON清洗后解析失败", error=str(e))
-
-        # 第三次尝试：提取JSON部分
         try:
-            extracted_json = self._extract_json_from_text(cleaned_text)
-            if extracted_json:
-                return json.loads(extracted_json)
-        except json.JSONDecodeError as e:
-            self.log_warning("JSON提取后解析失败", error=str(e))
-
-        # 第四次尝试：修复常见JSON错误
-        try:
-            fixed_json = self._fix_common_json_errors(cleaned_text)
-            return json.loads(fixed_json)
-        except json.JSONDecodeError as e:
-            self.log_warning("JSON修复后解析失败", error=str(e))
+            result = tolerant_json_decode(text)
+        except JSONRepairError as e:
+            self.log_warning("JSON解析失败", error=str(e), text_preview=text[:200])
+        else:
+            # 调用方都按对象取字段，数组或标量视为解析失败，走降级
+            if isinstance(result.value, dict):
+                if result.repaired:
+                    PARSE_FALLBACKS.inc(kind="repaired")
+                    self.log_warning(
+                        "JSON经容错修复后解析",
+                        truncated=result.truncated,
+                        text_preview=text[:200],
+                    )
+                return result.value
+            self.log_warning("JSON解析结果不是对象", value_type=type(result.value).__name__)
 
-        # 最后的降级策略
+        # 降级策略
         if fallback_parser:
             try:
-                result = fallback_parser(original_text)
+                result = fallback_parser(text)
                 if isinstance(result, dict):
+                    PARSE_FALLBACKS.inc(kind="fallback_parser")
                     self.log_event("使用降级解析器成功")
                     return result
             except Exception as e:
                 self.log_error("降级解析器失败", exception_msg=str(e))
 
         # 所有方法都失败，使用文本提取的最后手段
-        self.log_error("所有JSON解析方法失败，使用紧急降级策略", original_text=original_text[:500])
-        return self._emergency_text_extraction(original_text)
-
-    def _clean_json_text(self, text: str) -> str:
-        """清理JSON文本的常见格式问题"""
-        # 移除代码块标记
-        text = re.sub(r'^```(?:json)?\s*', '', text, flags=re.MULTILINE)
-        text = re.sub(r'```\s*$', '', text, flags=re.MULTILINE)
-
-        # 移除前后的引号和空格
-        text = text.strip().strip('`"\'')
-
-        # 处理尾随逗号
-        text = re.sub(r',\s*([}\]])', r'\1', text)
-
-        # 修复双引号问题
-        text = re.sub(r'(["\'])([^"\']*)(["\'])', r'"\2"', text)
-
-        return text
-
-    def _extract_json_from_text(self, text: str) -> Optional[str]:
-        """从文本中提取JSON部分"""
-        # 尝试匹配最外层的JSON对象
-        json_pattern = r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'
-        matches = re.findall(json_pattern, text, re.DOTALL)
-
-        if matches:
-            # 选择最长的匹配（可能是最完整的）
-            return max(matches, key=len)
-
-        # 尝试匹配JSON数组
-        array_pattern = r'\[[^\[\]]*(?:\[[^\[\]]*\][^\[\]]*)*\]'
-        matches = re.findall(array_pattern, text, re.DOTALL)
-
-        if matches:
-            return max(matches, key=len)
-
-        return None
-
-    def _fix_common_json_errors(self, text: str) -> str:
-        """修复常见的JSON错误"""
-        # 修复缺失的引号
-        text = re.sub(r'(\w+):', r'"\1":', text)  # 为key添加引号
-
-        # 修复Python的True/False/None
-        text = re.sub(r'\bTrue\b', 'true', text)
-        text = re.sub(r'\bFalse\b', 'false', text)
-        text = re.sub(r'\bNone\b', 'null', text)
-
-        # 修复单引号为双引号
-        text = re.sub(r"\'([^\']*)\'",'"\1"', text)
-
-        # 移除多余的逗号
-        text = re.sub(r',\s*([}\]])', r'\1', text)
-
-        return text
+        PARSE_FALLBACKS.inc(kind="emergency")
+        self.log_error("所有JSON解析方法失败，使用紧急降级策略", original_text=text[:500])
+        return self._emergency_text_extraction(text)
 
     def _emergency_text_extraction(self, text: str) -> Dict[str, Any]:
         """紧急情况下的文本提取降级策略"""
@@ -177,28 +143,124 @@ class LLMService(ABC, LoggerMixin):
         }
 
 
-class QwenService(LLMService):
-    """通义千问AI服务"""
+class OpenAICompatibleService(LLMService):
+    """OpenAI兼容协议（/chat/completions）的服务基类"""
+
+    provider_name: str = ""
+    display_name: str = ""
+    default_model: str = ""
 
-    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None):
-        self.api_key = api_key or settings.QWEN_API_KEY
-        self.base_url = base_url or settings.QWEN_BASE_URL
-        self.client = httpx.AsyncClient(timeout=60.0)  # 增加超时时间到60秒
+    def __init__(self, api_key: str, base_url: str, client: Optional[httpx.AsyncClient] = None):
+        if not api_key:
+            raise ValueError(f"{self.display_name} API key 未配置")
+
+        self.api_key = api_key
+        self.base_url = base_url
+        # 未注入共享客户端时自行创建，并在 __aexit__ 中关闭
+        self._owns_client = client is None
+        self.client = client or httpx.AsyncClient(timeout=settings.LLM_HTTP_TIMEOUT)
         self.max_retries = 3  # 最大重试次数
         self.retry_delay = 2  # 重试延迟（秒）
 
-        if not self.api_key:
-            raise ValueError("Qwen API key 未配置")
-
     async def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
-        """调用通义千问聊天接口（支持重试）"""
+        """调用聊天接口（支持响应缓存与重试）
+
+        kwargs中的 cache=True/False 可显式开启或关闭缓存；
+        未指定时仅缓存温度不高于 LLM_CACHE_MAX_TEMPERATURE 的确定性调用。
+        可缓存的调用同时参与请求合并，并发的相同请求共享一次上游调用。
+        当前服务商熔断时转给 LLM_FALLBACK_PROVIDERS 中的备用服务商，fallback=False 可关闭。
+        """
+        allow_fallback = kwargs.pop("fallback", True)
+        try:
+            return await self._chat_cached(messages, **kwargs)
+        except CircuitOpenError as e:
+            fallback = self._fallback_service() if allow_fallback else None
+            if fallback is None:
+                raise
+            LLM_RETRIES.inc(provider=self.provider_name, reason="circuit_fallback")
+            self.log_warning(
+                f"{self.display_name} 熔断中，转用备用服务商",
+                fallback=fallback.provider_name,
+                retry_in=round(e.retry_in, 1),
+            )
+            kwargs.pop("model", None)  # 模型名按服务商区分，备用服务商使用其默认模型
+            return await fallback.chat(messages, fallback=False, **kwargs)
+
+    async def _chat_cached(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """经过响应缓存与请求合并的聊天调用"""
+        use_cache = kwargs.pop("cache", None)
+        if not settings.LLM_CACHE_ENABLED:
+            use_cache = False
+
+        data = self._build_request_data(messages, **kwargs)
+        if use_cache is None:
+            use_cache = data["temperature"] <= settings.LLM_CACHE_MAX_TEMPERATURE
+        if not use_cache:
+            return await self._chat_with_retry(messages, **kwargs)
+
+        cache = get_llm_response_cache()
+        cache_key = cache.make_key(self.provider_name, data)
+        cached = await cache.get(cache_key)
+        if cached is not None:
+            self.log_event(f"{self.display_name} 命中响应缓存", cache_key=cache_key[:16])
+            return cached
+
+        async def call_and_store() -> str:
+            content = await self._chat_with_retry(messages, **kwargs)
+            await cache.set(cache_key, content)
+            return content
+
+        # 并发中的相同请求只向服务商发送一次
+        return await llm_single_flight.do(cache_key, call_and_store)
+
+    def _fallback_service(self) -> Optional["OpenAICompatibleService"]:
+        """熔断时的备用服务商（未配置、密钥缺失或同样熔断时返回None）"""
+        name = settings.LLM_FALLBACK_PROVIDERS.get(self.provider_name)
+        if not name or name == self.provider_name or not circuit_breakers.is_available(name):
+            return None
+        try:
+            return get_llm_service(name)
+        except ValueError:
+            return None
+
+    async def _chat_with_retry(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """带限流、熔断与重试的聊天调用（重试超时与429），每次尝试记录用量"""
+        tags = pop_usage_tags(kwargs)
+        recorder = get_usage_recorder()
+        rate_limiter = get_rate_limiter(self.provider_name)
+        concurrency = get_concurrency_limiter(self.provider_name)
+        data = self._build_request_data(messages, **kwargs)
+        breaker = circuit_breakers.get(self.provider_name, data["model"])
+        estimated_tokens = estimate_tokens(messages, data["max_tokens"])
+
         for attempt in range(self.max_retries):
+            # 熔断中立即失败，不再等待限流或发起请求
+            breaker.before_call()
+            started = time.perf_counter()
             try:
-                return await self._chat_single_attempt(messages, **kwargs)
-            except (httpx.TimeoutException, httpx.ConnectTimeout, httpx.ReadTimeout) as e:
+                await rate_limiter.acquire(estimated_tokens)
+                async with concurrency.slot():
+                    started = time.perf_counter()
+                    content, usage = await self._chat_single_attempt(messages, **kwargs)
+                    latency = time.perf_counter() - started
+                    concurrency.on_success(latency)
+                breaker.record_success()
+                recorder.record(self.provider_name, data["model"], usage, latency, tags)
+                await rate_limiter.record_usage(estimated_tokens, usage.get("total_tokens"))
+                return content
+            except asyncio.CancelledError:
+                breaker.record_ignored()
+                raise
+            except httpx.TimeoutException as e:
+                breaker.record_failure(e)
+                recorder.record(
+                    self.provider_name, data["model"], None, time.perf_counter() - started, tags, ok=False
+                )
+                concurrency.on_throttle()
                 if attempt < self.max_retries - 1:
+                    LLM_RETRIES.inc(provider=self.provider_name, reason="timeout")
                     self.log_event(
-                        "API调用超时，准备重试",
+                        f"{self.display_name} API调用超时，准备重试",
                         attempt=attempt + 1,
                         max_retries=self.max_retries,
                         delay_seconds=self.retry_delay
@@ -207,147 +269,78 @@ class QwenService(LLMService):
                     continue
                 else:
                     # 最后一次重试也失败了
-                    self.log_error("所有重试尝试都失败", attempts=self.max_retries)
+                    self.log_error(f"{self.display_name} API所有重试尝试都失败", attempts=self.max_retries)
                     raise e
-            except Exception as e:
-                # 非超时异常不重试，直接抛出
-                raise e
-
-        # 这里不应该到达，但为了安全起见
-        raise Exception("所有重试尝试都失败")
-
-    async def _chat_single_attempt(self, messages: List[Dict[str, str]], **kwargs) -> str:
-        """单次API调用尝试"""
-        try:
-            # 准备请求数据
-            data = {
-                "model": kwargs.get("model") or "qwen-plus",
-                "messages": messages,
-                "temperature": kwargs.get("temperature", 0.7),
-                "max_tokens": kwargs.get("max_tokens", 2000),
-            }
-
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-
-            self.log_event(
-                "发送Qwen API请求",
-                model=data["model"],
-                messages_count=len(messages),
-                temperature=data["temperature"]
-            )
-
-            # 发送请求
-            response = await self.client.post(
-                f"{self.base_url}/chat/completions",
-                json=data,
-                headers=headers
-            )
-
-            response.raise_for_status()
-            result = response.json()
-
-            # 提取回复内容
-            content = result["choices"][0]["message"]["content"]
-
-            self.log_event(
-                "Qwen API响应成功",
-                response_length=len(content),
-                usage=result.get("usage", {})
-            )
-
-            return content.strip()
-
-        except httpx.TimeoutException:
-            self.log_error("Qwen API请求超时", timeout_seconds=60.0)
-            raise  # 让上层重试机制处理
-        except httpx.ConnectTimeout:
-            self.log_error("Qwen API连接超时")
-            raise  # 让上层重试机制处理
-        except httpx.ReadTimeout:
-            self.log_error("Qwen API读取超时")
-            raise  # 让上层重试机制处理
-        except httpx.HTTPStatusError as e:
-            error_detail = e.response.text if hasattr(e.response, 'text') else str(e)
-            self.log_error("Qwen API HTTP错误",
-                          status_code=e.response.status_code,
-                          response=error_detail[:500])
-            raise Exception(f"Qwen API调用失败 (HTTP {e.response.status_code}): {error_detail[:200]}")
-        except Exception as e:
-            error_msg = str(e) if str(e) else f"{type(e).__name__}: 未知错误"
-            self.log_error("Qwen API调用异常",
-                          exception_type=type(e).__name__,
-                          exception_msg=error_msg)
-            raise Exception(f"Qwen API调用异常: {error_msg}")
-
-    async def generate(self, prompt: str, **kwargs) -> str:
-        """生成文本"""
-        messages = [{"role": "user", "content": prompt}]
-        return await self.chat(messages, **kwargs)
-
-    async def __aenter__(self):
-        return self
-
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.client.aclose()
-
-
-class KimiService(LLMService):
-    """Kimi AI服务"""
-
-    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None):
-        self.api_key = api_key or settings.KIMI_API_KEY
-        self.base_url = base_url or settings.KIMI_BASE_URL
-        self.client = httpx.AsyncClient(timeout=60.0)  # 增加超时时间到60秒
-        self.max_retries = 3  # 最大重试次数
-        self.retry_delay = 2  # 重试延迟（秒）
-
-        if not self.api_key:
-            raise ValueError("Kimi API key 未配置")
-
-    async def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
-        """调用Kimi聊天接口（支持重试）"""
-        for attempt in range(self.max_retries):
-            try:
-                return await self._chat_single_attempt(messages, **kwargs)
-            except (httpx.TimeoutException, httpx.ConnectTimeout, httpx.ReadTimeout) as e:
+            except LLMRateLimitError as e:
+                # 暂停后由限流器统一等待 Retry-After，所有worker共同遵守
+                breaker.record_ignored()
+                recorder.record(
+                    self.provider_name, data["model"], None, time.perf_counter() - started, tags, ok=False
+                )
+                concurrency.on_throttle()
+                await rate_limiter.pause(e.retry_after or settings.LLM_RETRY_AFTER_DEFAULT)
                 if attempt < self.max_retries - 1:
+                    LLM_RETRIES.inc(provider=self.provider_name, reason="rate_limited")
                     self.log_event(
-                        "Kimi API调用超时，准备重试",
+                        f"{self.display_name} API限流，准备重试",
                         attempt=attempt + 1,
                         max_retries=self.max_retries,
-                        delay_seconds=self.retry_delay
+                        retry_after=e.retry_after
                     )
-                    await asyncio.sleep(self.retry_delay * (attempt + 1))
                     continue
-                else:
-                    self.log_error("Kimi API所有重试尝试都失败", attempts=self.max_retries)
-                    raise e
+                self.log_error(f"{self.display_name} API所有重试尝试都失败", attempts=self.max_retries)
+                raise
             except Exception as e:
+                # 其他异常不重试，直接抛出
+                if counts_as_failure(e):
+                    breaker.record_failure(e)
+                    concurrency.on_throttle()
+                else:
+                    breaker.record_ignored()
+                recorder.record(
+                    self.provider_name, data["model"], None, time.perf_counter() - started, tags, ok=False
+                )
                 raise e
 
-        raise Exception("Kimi API所有重试尝试都失败")
+        # 这里不应该到达，但为了安全起见
+        raise Exception(f"{self.display_name} API所有重试尝试都失败")
+
+    def _build_request_data(self, messages: List[Dict[str, str]], **kwargs) -> Dict[str, Any]:
+        """构造请求体
+
+        response_format="json_object" 时要求服务商只输出合法JSON（结构化输出模式）
+        """
+        data = {
+            "model": kwargs.get("model") or self.default_model,
+            "messages": messages,
+            "temperature": kwargs.get("temperature") if kwargs.get("temperature") is not None else 0.7,
+            "max_tokens": kwargs.get("max_tokens") or 2000,
+        }
+        response_format = kwargs.get("response_format")
+        if response_format:
+            data["response_format"] = (
+                {"type": response_format} if isinstance(response_format, str) else response_format
+            )
+        return data
+
+    def _build_headers(self) -> Dict[str, str]:
+        """构造请求头"""
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
 
-    async def _chat_single_attempt(self, messages: List[Dict[str, str]], **kwargs) -> str:
-        """单次Kimi API调用尝试"""
+    async def _chat_single_attempt(
+        self, messages: List[Dict[str, str]], **kwargs
+    ) -> Tuple[str, Dict[str, Any]]:
+        """单次API调用尝试，返回回复内容与usage"""
+        name = self.display_name
         try:
             # 准备请求数据
-            data = {
-                "model": kwargs.get("model") or "moonshot-v1-8k",
-                "messages": messages,
-                "temperature": kwargs.get("temperature", 0.7),
-                "max_tokens": kwargs.get("max_tokens", 2000),
-            }
-
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
+            data = self._build_request_data(messages, **kwargs)
 
             self.log_event(
-                "发送Kimi API请求",
+                f"发送{name} API请求",
                 model=data["model"],
                 messages_count=len(messages),
                 temperature=data["temperature"]
@@ -357,7 +350,7 @@ class KimiService(LLMService):
             response = await self.client.post(
                 f"{self.base_url}/chat/completions",
                 json=data,
-                headers=headers
+                headers=self._build_headers()
             )
 
             response.raise_for_status()
@@ -365,36 +358,168 @@ class KimiService(LLMService):
 
             # 提取回复内容
             content = result["choices"][0]["message"]["content"]
+            usage = result.get("usage") or {}
 
             self.log_event(
-                "Kimi API响应成功",
+                f"{name} API响应成功",
                 response_length=len(content),
-                usage=result.get("usage", {})
+                usage=usage
             )
 
-            return content.strip()
+            return content.strip(), usage
 
         except httpx.TimeoutException:
-            self.log_error("Kimi API请求超时", timeout_seconds=60.0)
-            raise  # 让上层重试机制处理
-        except httpx.ConnectTimeout:
-            self.log_error("Kimi API连接超时")
-            raise  # 让上层重试机制处理
-        except httpx.ReadTimeout:
-            self.log_error("Kimi API读取超时")
+            self.log_error(f"{name} API请求超时", timeout_seconds=settings.LLM_HTTP_TIMEOUT)
             raise  # 让上层重试机制处理
         except httpx.HTTPStatusError as e:
             error_detail = e.response.text if hasattr(e.response, 'text') else str(e)
-            self.log_error("Kimi API HTTP错误",
+            self.log_error(f"{name} API HTTP错误",
                           status_code=e.response.status_code,
                           response=error_detail[:500])
-            raise Exception(f"Kimi API调用失败 (HTTP {e.response.status_code}): {error_detail[:200]}")
+            if e.response.status_code == 429:
+                raise LLMRateLimitError(
+                    f"{name} API调用失败 (HTTP 429): {error_detail[:200]}",
+                    provider=self.provider_name,
+                    retry_after=parse_retry_after(e.response.headers.get("Retry-After")),
+                )
+            raise LLMAPIError(
+                f"{name} API调用失败 (HTTP {e.response.status_code}): {error_detail[:200]}",
+                provider=self.provider_name,
+                status_code=e.response.status_code,
+            )
         except Exception as e:
             error_msg = str(e) if str(e) else f"{type(e).__name__}: 未知错误"
-            self.log_error("Kimi API调用异常",
+            self.log_error(f"{name} API调用异常",
                           exception_type=type(e).__name__,
                           exception_msg=error_msg)
-            raise Exception(f"Kimi API调用异常: {error_msg}")
+            raise LLMServiceError(f"{name} API调用异常: {error_msg}", provider=self.provider_name)
+
+    async def stream_chat(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """以 stream=true 调用聊天接口，逐段产出增量文本
+
+        调用方停止迭代（如客户端断开）时，上游HTTP响应随之关闭，请求被取消。
+        当前服务商熔断时转给备用服务商（fallback=False 可关闭）。
+        """
+        name = self.display_name
+        kwargs.pop("cache", None)
+        allow_fallback = kwargs.pop("fallback", True)
+        data = self._build_request_data(messages, **kwargs)
+        data["stream"] = True
+        data["stream_options"] = {"include_usage": True}
+
+        breaker = circuit_breakers.get(self.provider_name, data["model"])
+        try:
+            breaker.before_call()
+        except CircuitOpenError:
+            fallback = self._fallback_service() if allow_fallback else None
+            if fallback is None:
+                raise
+            self.log_warning(f"{name} 熔断中，流式请求转用备用服务商", fallback=fallback.provider_name)
+            kwargs.pop("model", None)
+            async for delta in fallback.stream_chat(messages, fallback=False, **kwargs):
+                yield delta
+            return
+
+        tags = pop_usage_tags(kwargs)
+        self.log_event(
+            f"发送{name}流式请求",
+            model=data["model"],
+            messages_count=len(messages),
+            temperature=data["temperature"]
+        )
+
+        rate_limiter = get_rate_limiter(self.provider_name)
+        concurrency = get_concurrency_limiter(self.provider_name)
+        estimated_tokens = estimate_tokens(messages, data["max_tokens"])
+        started = time.perf_counter()
+        first_token_at: Optional[float] = None
+        usage: Dict[str, Any] = {}
+        chunks = 0
+        completed = False
+        cancelled = False
+        failure: Optional[BaseException] = None
+        try:
+            await rate_limiter.acquire(estimated_tokens)
+            # 与非流式调用共用并发窗口，名额一直占用到流结束或客户端断开
+            async with concurrency.slot():
+                started = time.perf_counter()
+                async with self.client.stream(
+                    "POST",
+                    f"{self.base_url}/chat/completions",
+                    json=data,
+                    headers=self._build_headers()
+                ) as response:
+                    if response.status_code >= 400:
+                        error_detail = (await response.aread()).decode("utf-8", errors="replace")
+                        self.log_error(f"{name} API HTTP错误",
+                                      status_code=response.status_code,
+                                      response=error_detail[:500])
+                        if response.status_code == 429:
+                            raise LLMRateLimitError(
+                                f"{name} API调用失败 (HTTP 429): {error_detail[:200]}",
+                                provider=self.provider_name,
+                                retry_after=parse_retry_after(response.headers.get("Retry-After")),
+                            )
+                        raise LLMAPIError(
+                            f"{name} API调用失败 (HTTP {response.status_code}): {error_detail[:200]}",
+                            provider=self.provider_name,
+                            status_code=response.status_code,
+                        )
+
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        payload = line[5:].strip()
+                        if payload == "[DONE]":
+                            break
+                        chunk = json.loads(payload)
+                        if chunk.get("usage"):
+                            usage = chunk["usage"]
+                        for choice in chunk.get("choices") or []:
+                            delta = (choice.get("delta") or {}).get("content")
+                            if delta:
+                                if first_token_at is None:
+                                    first_token_at = time.perf_counter()
+                                chunks += 1
+                                yield delta
+                concurrency.on_success(time.perf_counter() - started)
+            completed = True
+            await rate_limiter.record_usage(estimated_tokens, usage.get("total_tokens"))
+        except (GeneratorExit, asyncio.CancelledError):
+            # 客户端断开：既不算成功，也不计入熔断与并发收缩
+            cancelled = True
+            raise
+        except Exception as e:
+            failure = e
+            if isinstance(e, LLMRateLimitError) or counts_as_failure(e):
+                concurrency.on_throttle()
+            raise
+        finally:
+            if completed:
+                breaker.record_success()
+            elif failure is not None and counts_as_failure(failure):
+                breaker.record_failure(failure)
+            else:
+                breaker.record_ignored()
+            # 客户端中途断开时服务商不再返回usage，token数记为0，按未成功记录
+            get_usage_recorder().record(
+                self.provider_name,
+                data["model"],
+                usage,
+                time.perf_counter() - started,
+                tags,
+                ok=completed,
+                stream=True,
+            )
+            self.log_event(
+                f"{name}流式响应结束",
+                completed=completed,
+                cancelled=cancelled,
+                chunks=chunks,
+                time_to_first_token=round(first_token_at - started, 3) if first_token_at else None,
+                duration=round(time.perf_counter() - started, 3),
+                usage=usage
+            )
 
     async def generate(self, prompt: str, **kwargs) -> str:
         """生成文本"""
@@ -405,15 +530,68 @@ class KimiService(LLMService):
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.client.aclose()
+        if self._owns_client:
+            await self.client.aclose()
 
 
-def get_llm_service(provider: str = "qwen") -> LLMService:
-    """获取AI服务实例"""
-    if provider.lower() == "qwen":
-        return QwenService()
-    elif provider.lower() == "kimi":
-        return KimiService()
+class QwenService(OpenAICompatibleService):
+    """通义千问AI服务"""
+
+    provider_name = "qwen"
+    display_name = "Qwen"
+    default_model = "qwen-plus"
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        super().__init__(
+            api_key or settings.QWEN_API_KEY,
+            base_url or settings.QWEN_BASE_URL,
+            client,
+        )
+
+
+class KimiService(OpenAICompatibleService):
+    """Kimi AI服务"""
+
+    provider_name = "kimi"
+    display_name = "Kimi"
+    default_model = "moonshot-v1-8k"
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        super().__init__(
+            api_key or settings.KIMI_API_KEY,
+            base_url or settings.KIMI_BASE_URL,
+            client,
+        )
+
+
+def get_llm_service(provider: str = "qwen", pool: Optional[LLMClientPool] = None) -> LLMService:
+    """获取AI服务实例（复用连接池中的共享客户端）
+
+    provider 为 "auto" 时返回在已配置密钥的服务商之间按延迟路由的服务。
+    """
+    pool = pool or llm_client_pool
+    if provider.lower() == "auto":
+        from .router import RoutingLLMService
+
+        services: Dict[str, LLMService] = {}
+        for name, service_cls in (("qwen", QwenService), ("kimi", KimiService)):
+            try:
+                services[name] = service_cls(client=pool.get_client(name))
+            except ValueError:
+                continue
+        return RoutingLLMService(services)
+    if provider.lower() == "kimi":
+        return KimiService(client=pool.get_client("kimi"))
     else:
         # 默认使用通义千问
-        return QwenService()
+        return QwenService(client=pool.get_client("qwen"))
@@ -0,0 +1,223 @@
+"""
+LLM响应缓存
+
+两级缓存：进程内LRU + Redis（Redis不可用时回退到磁盘）。
+只缓存确定性调用（低温度或调用方显式开启），键由服务商、模型、消息和采样参数决定。
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+from ...core.logger import LoggerMixin
+from ...core.config import settings
+
+
+class CacheTier(ABC, LoggerMixin):
+    """缓存层抽象基类"""
+
+    name: str = ""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        """读取缓存，未命中或已过期返回None"""
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        """写入缓存"""
+        pass
+
+
+class MemoryLRUTier(CacheTier):
+    """进程内有界LRU缓存"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        self._entries[key] = (time.time() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisTier(CacheTier):
+    """基于共享Redis的缓存层（同步客户端在线程池中调用）"""
+
+    name = "redis"
+
+    def __init__(self, client, prefix: str = "ai_tutor:llm_cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.client.get, self.prefix + key)
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None, lambda: self.client.set(self.prefix + key, value, ex=ttl)
+        )
+
+
+class DiskTier(CacheTier):
+    """Redis不可用时的磁盘缓存层，每个键一个文件，超出上限时淘汰最旧文件"""
+
+    name = "disk"
+
+    def __init__(self, directory: str, max_entries: int):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _read(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if entry["expires_at"] < time.time():
+            path.unlink(missing_ok=True)
+            return None
+        return entry["value"]
+
+    def _write(self, key: str, value: str, ttl: int) -> None:
+        path = self._path(key)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"expires_at": time.time() + ttl, "value": value}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self) -> None:
+        files = list(self.directory.glob("*.json"))
+        overflow = len(files) - self.max_entries
+        if overflow <= 0:
+            return
+        files.sort(key=lambda p: p.stat().st_mtime)
+        for path in files[:overflow]:
+            path.unlink(missing_ok=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._read, key)
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._write, key, value, ttl)
+
+
+class LLMResponseCache(LoggerMixin):
+    """LLM响应两级缓存"""
+
+    def __init__(self, memory: MemoryLRUTier, backend: Optional[CacheTier] = None, ttl: int = 3600):
+        self.memory = memory
+        self.backend = backend
+        self.ttl = ttl
+        self._hits: Dict[str, int] = {memory.name: 0}
+        if backend is not None:
+            self._hits[backend.name] = 0
+        self._misses = 0
+        self._errors = 0
+
+    @staticmethod
+    def make_key(provider: str, request_data: Dict[str, Any]) -> str:
+        """根据服务商与完整请求体（模型、消息、采样参数）生成缓存键"""
+        payload = json.dumps(
+            {"provider": provider, "request": request_data},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """依次查询内存层与后端层，后端命中时回填内存层"""
+        value = await self.memory.get(key)
+        if value is not None:
+            self._hits[self.memory.name] += 1
+            return value
+
+        if self.backend is not None:
+            try:
+                value = await self.backend.get(key)
+            except Exception as e:
+                self._errors += 1
+                self.log_warning("LLM缓存读取失败", tier=self.backend.name, error=str(e))
+                value = None
+            if value is not None:
+                self._hits[self.backend.name] += 1
+                await self.memory.set(key, value, self.ttl)
+                return value
+
+        self._misses += 1
+        return None
+
+    async def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        """写入所有缓存层"""
+        ttl = ttl or self.ttl
+        await self.memory.set(key, value, ttl)
+        if self.backend is not None:
+            try:
+                await self.backend.set(key, value, ttl)
+            except Exception as e:
+                self._errors += 1
+                self.log_warning("LLM缓存写入失败", tier=self.backend.name, error=str(e))
+
+    def stats(self) -> Dict[str, Any]:
+        """命中/未命中统计"""
+        hits = sum(self._hits.values())
+        total = hits + self._misses
+        return {
+            "backend": self.backend.name if self.backend else None,
+            "hits": dict(self._hits),
+            "misses": self._misses,
+            "errors": self._errors,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "memory_entries": len(self.memory),
+        }
+
+
+_llm_response_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_response_cache() -> LLMResponseCache:
+    """获取全局LLM响应缓存（首次调用时按配置创建）"""
+    global _llm_response_cache
+    if _llm_response_cache is None:
+        from ...db.database import redis_client
+
+        memory = MemoryLRUTier(settings.LLM_CACHE_MEMORY_MAX_ENTRIES)
+        if redis_client is not None:
+            backend: CacheTier = RedisTier(redis_client)
+        else:
+            backend = DiskTier(settings.LLM_CACHE_DIR, settings.LLM_CACHE_DISK_MAX_ENTRIES)
+        _llm_response_cache = LLMResponseCache(memory, backend, ttl=settings.LLM_CACHE_TTL)
+    return _llm_response_cache
@@ -0,0 +1,184 @@
+"""
+服务商熔断器
+
+按 (服务商, 模型) 维护 CLOSED / OPEN / HALF_OPEN 三态：
+连续失败达到阈值后打开熔断，期间调用立即失败；冷却时间过后进入半开状态，
+放行少量探测请求，成功则关闭熔断，失败则重新打开。
+"""
+import time
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from ...core.logger import LoggerMixin
+from ...core.config import settings
+from .exceptions import LLMAPIError, LLMServiceError
+
+
+class CircuitState(Enum):
+    """熔断器状态"""
+    CLOSED = "closed"        # 正常放行
+    OPEN = "open"            # 熔断中，直接失败
+    HALF_OPEN = "half_open"  # 探测恢复
+
+
+class CircuitOpenError(LLMServiceError):
+    """熔断器处于打开状态"""
+
+    def __init__(self, provider: str, model: str, retry_in: float):
+        self.model = model
+        self.retry_in = retry_in
+        super().__init__(
+            f"{provider}/{model} 熔断中，{retry_in:.0f}秒后重试",
+            provider=provider,
+        )
+
+
+class CircuitBreaker(LoggerMixin):
+    """单个服务商+模型的熔断器"""
+
+    def __init__(
+        self,
+        provider: str,
+        model: str,
+        failure_threshold: int,
+        recovery_timeout: float,
+        half_open_max_calls: int = 1,
+    ):
+        self.provider = provider
+        self.model = model
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CircuitState.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self.total_rejected = 0
+        self.times_opened = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def state(self) -> CircuitState:
+        """当前状态（冷却结束后自动从OPEN转为HALF_OPEN）"""
+        if self._state == CircuitState.OPEN and self._retry_in() <= 0:
+            self._transition(CircuitState.HALF_OPEN)
+        return self._state
+
+    def _retry_in(self) -> float:
+        return self._opened_at + self.recovery_timeout - time.monotonic()
+
+    def _transition(self, state: CircuitState) -> None:
+        if state == self._state:
+            return
+        self.log_event(
+            "熔断器状态变化",
+            provider=self.provider,
+            model=self.model,
+            from_state=self._state.value,
+            to_state=state.value,
+        )
+        self._state = state
+        if state == CircuitState.OPEN:
+            self._opened_at = time.monotonic()
+            self.times_opened += 1
+        if state == CircuitState.HALF_OPEN:
+            self._half_open_calls = 0
+
+    def before_call(self) -> None:
+        """调用前检查，熔断中抛出 CircuitOpenError"""
+        state = self.state
+        if state == CircuitState.OPEN:
+            self.total_rejected += 1
+            raise CircuitOpenError(self.provider, self.model, self._retry_in())
+        if state == CircuitState.HALF_OPEN:
+            if self._half_open_calls >= self.half_open_max_calls:
+                self.total_rejected += 1
+                raise CircuitOpenError(self.provider, self.model, 0)
+            self._half_open_calls += 1
+
+    def record_success(self) -> None:
+        self._consecutive_failures = 0
+        self._transition(CircuitState.CLOSED)
+
+    def record_failure(self, error: BaseException) -> None:
+        self.last_error = str(error)[:200]
+        if self._state == CircuitState.HALF_OPEN:
+            self._transition(CircuitState.OPEN)
+            return
+        self._consecutive_failures += 1
+        if self._consecutive_failures >= self.failure_threshold:
+            self._transition(CircuitState.OPEN)
+
+    def record_ignored(self) -> None:
+        """调用结束但不计入熔断统计（如限流、请求参数错误、被取消），释放半开探测名额"""
+        if self._state == CircuitState.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def allows_calls(self) -> bool:
+        """不改变状态地判断当前是否会放行"""
+        state = self.state
+        if state == CircuitState.HALF_OPEN:
+            return self._half_open_calls < self.half_open_max_calls
+        return state == CircuitState.CLOSED
+
+    def snapshot(self) -> Dict[str, Any]:
+        state = self.state
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "state": state.value,
+            "consecutive_failures": self._consecutive_failures,
+            "retry_in": round(max(0.0, self._retry_in()), 1) if state == CircuitState.OPEN else 0,
+            "times_opened": self.times_opened,
+            "rejected": self.total_rejected,
+            "last_error": self.last_error,
+        }
+
+
+class CircuitBreakerRegistry:
+    """按 (服务商, 模型) 管理熔断器"""
+
+    def __init__(self):
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+
+    def get(self, provider: str, model: str) -> CircuitBreaker:
+        key = (provider, model)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                provider,
+                model,
+                failure_threshold=settings.LLM_BREAKER_FAILURE_THRESHOLD,
+                recovery_timeout=settings.LLM_BREAKER_RECOVERY_TIMEOUT,
+                half_open_max_calls=settings.LLM_BREAKER_HALF_OPEN_CALLS,
+            )
+            self._breakers[key] = breaker
+        return breaker
+
+    def is_available(self, provider: str) -> bool:
+        """服务商是否至少有一个模型未熔断（未调用过的服务商视为可用）"""
+        breakers = [b for (p, _), b in self._breakers.items() if p == provider]
+        return not breakers or any(b.allows_calls() for b in breakers)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {f"{p}/{m}": b.snapshot() for (p, m), b in self._breakers.items()}
+
+    def reset(self) -> None:
+        self._breakers.clear()
+
+
+def counts_as_failure(error: BaseException) -> bool:
+    """是否计入熔断：超时、连接异常与5xx计入；限流与4xx属于调用方问题，不计入"""
+    if isinstance(error, httpx.TimeoutException):
+        return True
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, LLMAPIError):
+        return error.status_code is None or error.status_code >= 500
+    return isinstance(error, (LLMServiceError, httpx.TransportError))
+
+
+# 全局熔断器注册表
+circuit_breakers = CircuitBreakerRegistry()
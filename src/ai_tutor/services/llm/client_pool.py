@@ -0,0 +1,164 @@
+"""
+LLM HTTP连接池管理
+
+每个服务商在进程内共享一个长连接的 httpx.AsyncClient，由应用 lifespan 负责创建与关闭。
+"""
+import asyncio
+import importlib.util
+from typing import Dict, Any, Optional, List
+
+import httpx
+
+from ...core.logger import LoggerMixin
+from ...core.config import settings
+
+
+def get_provider_base_url(provider: str) -> str:
+    """获取服务商的API地址"""
+    if provider == "kimi":
+        return settings.KIMI_BASE_URL
+    return settings.QWEN_BASE_URL
+
+
+def get_provider_api_key(provider: str) -> str:
+    """获取服务商的API密钥"""
+    if provider == "kimi":
+        return settings.KIMI_API_KEY
+    return settings.QWEN_API_KEY
+
+
+class LLMClientPool(LoggerMixin):
+    """按服务商划分的共享HTTP客户端池"""
+
+    PROVIDERS = ("qwen", "kimi")
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._request_counts: Dict[str, int] = {}
+        self._http2_enabled = False
+
+    def _http2_available(self) -> bool:
+        """检查是否安装了HTTP/2依赖(h2)"""
+        return importlib.util.find_spec("h2") is not None
+
+    def _create_client(self, provider: str) -> httpx.AsyncClient:
+        """创建带连接池限制的客户端"""
+        http2 = settings.LLM_HTTP2
+        if http2 and not self._http2_available():
+            self.log_warning("未安装h2，HTTP/2已降级为HTTP/1.1", provider=provider)
+            http2 = False
+        self._http2_enabled = http2
+
+        limits = httpx.Limits(
+            max_connections=settings.LLM_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=settings.LLM_POOL_KEEPALIVE_EXPIRY,
+        )
+
+        async def count_request(request: httpx.Request) -> None:
+            self._request_counts[provider] = self._request_counts.get(provider, 0) + 1
+
+        self.log_event(
+            "创建LLM连接池",
+            provider=provider,
+            http2=http2,
+            max_connections=limits.max_connections,
+            max_keepalive=limits.max_keepalive_connections,
+        )
+        return httpx.AsyncClient(
+            timeout=settings.LLM_HTTP_TIMEOUT,
+            limits=limits,
+            http2=http2,
+            event_hooks={"request": [count_request]},
+        )
+
+    def get_client(self, provider: str) -> httpx.AsyncClient:
+        """获取服务商对应的共享客户端（不存在时惰性创建）"""
+        provider = provider.lower()
+        client = self._clients.get(provider)
+        if client is None or client.is_closed:
+            client = self._create_client(provider)
+            self._clients[provider] = client
+        return client
+
+    async def start(self, providers: Optional[List[str]] = None) -> None:
+        """创建连接池，并为已配置密钥的服务商预热连接"""
+        providers = providers or list(self.PROVIDERS)
+        for provider in providers:
+            self.get_client(provider)
+
+        if not settings.LLM_POOL_PREWARM:
+            return
+
+        warm_tasks = [
+            self._prewarm(provider)
+            for provider in providers
+            if get_provider_api_key(provider)
+        ]
+        if warm_tasks:
+            await asyncio.gather(*warm_tasks)
+
+    async def _prewarm(self, provider: str) -> None:
+        """提前完成TCP/TLS握手，使首个请求直接复用连接"""
+        client = self.get_client(provider)
+        base_url = get_provider_base_url(provider)
+        count = max(1, settings.LLM_POOL_PREWARM_CONNECTIONS)
+
+        async def _touch() -> None:
+            # 任何HTTP响应都说明连接已建立，状态码无关紧要
+            await client.head(base_url, timeout=5.0)
+
+        results = await asyncio.gather(*(_touch() for _ in range(count)), return_exceptions=True)
+        failures = [r for r in results if isinstance(r, Exception)]
+        if failures:
+            self.log_warning("LLM连接预热失败", provider=provider, error=str(failures[0]))
+        else:
+            self.log_event("LLM连接预热完成", provider=provider, connections=count)
+
+    async def close(self) -> None:
+        """关闭所有客户端"""
+        for provider, client in list(self._clients.items()):
+            try:
+                await client.aclose()
+            except Exception as e:
+                self.log_warning("关闭LLM连接池失败", provider=provider, error=str(e))
+        self._clients.clear()
+        self.log_event("LLM连接池已关闭")
+
+    def _connection_stats(self, client: httpx.AsyncClient) -> Dict[str, int]:
+        """读取底层httpcore连接池中的连接状态"""
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return {"total": 0, "idle": 0, "active": 0}
+
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {
+            "total": len(connections),
+            "idle": idle,
+            "active": len(connections) - idle,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """连接池统计，用于压测时调整池大小"""
+        return {
+            "limits": {
+                "max_connections": settings.LLM_POOL_MAX_CONNECTIONS,
+                "max_keepalive_connections": settings.LLM_POOL_MAX_KEEPALIVE,
+                "keepalive_expiry": settings.LLM_POOL_KEEPALIVE_EXPIRY,
+                "http2": self._http2_enabled,
+            },
+            "providers": {
+                provider: {
+                    "base_url": get_provider_base_url(provider),
+                    "closed": client.is_closed,
+                    "requests_total": self._request_counts.get(provider, 0),
+                    "connections": self._connection_stats(client),
+                }
+                for provider, client in self._clients.items()
+            },
+        }
+
+
+# 全局连接池实例
+llm_client_pool = LLMClientPool()
@@ -0,0 +1,29 @@
+"""
+AI大模型服务相关的自定义异常类
+"""
+from typing import Optional
+
+
+class LLMServiceError(Exception):
+    """AI大模型服务基础异常"""
+
+    def __init__(self, message: str, provider: Optional[str] = None):
+        self.message = message
+        self.provider = provider
+        super().__init__(self.message)
+
+
+class LLMAPIError(LLMServiceError):
+    """服务商返回HTTP错误"""
+
+    def __init__(self, message: str, provider: Optional[str] = None, status_code: Optional[int] = None):
+        self.status_code = status_code
+        super().__init__(message, provider)
+
+
+class LLMRateLimitError(LLMAPIError):
+    """服务商返回429限流"""
+
+    def __init__(self, message: str, provider: Optional[str] = None, retry_after: Optional[float] = None):
+        self.retry_after = retry_after
+        super().__init__(message, provider, status_code=429)
@@ -0,0 +1,284 @@
+"""
+容错JSON解码
+
+LLM返回的JSON常见问题：外层包裹 ```json 代码块或说明文字、尾随逗号、
+Python字面量（True/False/None）、单引号字符串、未加引号的键、注释，
+以及因 max_tokens 截断而缺失的结尾。
+
+解码分两步：先用标准库 json.loads 直接解析（格式良好时为C实现的快速路径），
+失败时再做一次从左到右的容错解析，截断处自动补全未闭合的字符串、对象和数组，
+不再反复正则改写与重试。容错解析在浅层（深度不超过 _FAST_DEPTH）的每个对象/数组处
+先用C解码器尝试整体解码，只有真正有问题的子树才逐字符扫描，
+总代价不超过 O(_FAST_DEPTH × 文本长度)。
+"""
+import json
+import re
+from dataclasses import dataclass
+from json.decoder import scanstring
+from typing import Any, List, Optional, Tuple
+
+
+class JSONRepairError(ValueError):
+    """文本中找不到可解析的JSON"""
+    pass
+
+
+@dataclass
+class RepairResult:
+    """解码结果"""
+
+    value: Any
+    repaired: bool = False  # 是否经过容错修复
+    truncated: bool = False  # 是否补全了被截断的结尾
+
+
+_MISSING = object()
+_WHITESPACE = re.compile(r"[ \t\n\r\ufeff\u3000]*")
+_NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_IDENTIFIER = re.compile(r"[A-Za-z_$\u4e00-\u9fff][\w$\u4e00-\u9fff-]*")
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "/": "/", "\\": "\\", '"': '"', "'": "'"}
+_LITERALS = {
+    "true": True, "True": True,
+    "false": False, "False": False,
+    "null": None, "None": None, "undefined": None,
+    "NaN": None, "Infinity": None,
+}
+_FENCE = "```"
+_FAST_DEPTH = 4
+_C_DECODER = json.JSONDecoder(strict=False)
+
+
+class _TolerantParser:
+    """单遍递归下降解析器，所有方法接收并返回扫描位置"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.length = len(text)
+        self.repaired = False
+        self.truncated = False
+        self.depth = 0
+
+    def skip(self, i: int) -> int:
+        """跳过空白与 // 、/* */ 注释"""
+        text = self.text
+        while True:
+            i = _WHITESPACE.match(text, i).end()
+            if text.startswith("//", i):
+                end = text.find("\n", i)
+                i = self.length if end < 0 else end + 1
+                self.repaired = True
+            elif text.startswith("/*", i):
+                end = text.find("*/", i + 2)
+                i = self.length if end < 0 else end + 2
+                self.repaired = True
+            else:
+                return i
+
+    def value(self, i: int) -> Tuple[Any, int]:
+        """解析一个值，无法识别时返回 _MISSING 且不移动位置"""
+        if i >= self.length:
+            return _MISSING, i
+        ch = self.text[i]
+        if ch == "{" or ch == "[":
+            if self.depth < _FAST_DEPTH:
+                try:
+                    return _C_DECODER.raw_decode(self.text, i)
+                except (ValueError, RecursionError):
+                    pass
+            self.depth += 1
+            try:
+                return self.obj(i + 1) if ch == "{" else self.array(i + 1)
+            finally:
+                self.depth -= 1
+        if ch == '"' or ch == "'":
+            return self.string(i)
+
+        match = _NUMBER.match(self.text, i)
+        if match:
+            raw = match.group()
+            try:
+                number = float(raw) if any(c in raw for c in ".eE") else int(raw)
+            except ValueError:
+                return _MISSING, i
+            if raw[0] == "+" or raw[-1] == "." or raw.startswith((".", "-.", "+.")):
+                self.repaired = True
+            return number, match.end()
+
+        match = _IDENTIFIER.match(self.text, i)
+        if match:
+            word = match.group()
+            if word in _LITERALS:
+                if word not in ("true", "false", "null"):
+                    self.repaired = True
+                return _LITERALS[word], match.end()
+            # 未加引号的字符串值
+            self.repaired = True
+            return word, match.end()
+        return _MISSING, i
+
+    def string(self, i: int) -> Tuple[str, int]:
+        quote = self.text[i]
+        if quote == '"':
+            try:
+                # strict=False 允许字符串内出现未转义的换行等控制字符
+                return scanstring(self.text, i + 1, False)
+            except ValueError:
+                pass
+        self.repaired = True
+        # 单引号字符串、含非法转义或被截断的双引号字符串：逐字符找结束引号
+        chars: List[str] = []
+        text = self.text
+        j = i + 1
+        while j < self.length:
+            ch = text[j]
+            if ch == quote:
+                return "".join(chars), j + 1
+            if ch == "\\" and j + 1 < self.length:
+                nxt = text[j + 1]
+                if nxt == "u" and re.fullmatch(r"[0-9a-fA-F]{4}", text[j + 2:j + 6]):
+                    chars.append(chr(int(text[j + 2:j + 6], 16)))
+                    j += 6
+                    continue
+                # 非法转义（如LaTeX的 \sqrt）保留反斜杠
+                chars.append(_ESCAPES.get(nxt, ch + nxt))
+                j += 2
+                continue
+            chars.append(ch)
+            j += 1
+        self.truncated = True
+        return "".join(chars), j
+
+    def key(self, i: int) -> Tuple[Any, int]:
+        ch = self.text[i]
+        if ch == '"' or ch == "'":
+            return self.string(i)
+        match = _IDENTIFIER.match(self.text, i) or _NUMBER.match(self.text, i)
+        if match:
+            self.repaired = True
+            return match.group(), match.end()
+        return _MISSING, i
+
+    def obj(self, i: int) -> Tuple[dict, int]:
+        result: dict = {}
+        text = self.text
+        while True:
+            i = self.skip(i)
+            if i >= self.length:
+                self.truncated = True
+                return result, i
+            ch = text[i]
+            if ch == "}":
+                return result, i + 1
+            if ch == ",":
+                i += 1
+                continue
+            if ch == "]":
+                # 括号不匹配：视为对象结束
+                self.repaired = True
+                return result, i
+
+            key, j = self.key(i)
+            if key is _MISSING:
+                self.repaired = True
+                i += 1
+                continue
+            j = self.skip(j)
+            if j < self.length and text[j] in ":=：":
+                j = self.skip(j + 1)
+            else:
+                self.repaired = True
+            if j >= self.length:
+                # 截断在键之后，丢弃没有值的键
+                self.truncated = True
+                return result, j
+
+            value, k = self.value(j)
+            if value is _MISSING:
+                self.repaired = True
+                i = j if j > i else i + 1
+                continue
+            result[key] = value
+            i = k
+
+    def array(self, i: int) -> Tuple[list, int]:
+        result: list = []
+        text = self.text
+        while True:
+            i = self.skip(i)
+            if i >= self.length:
+                self.truncated = True
+                return result, i
+            ch = text[i]
+            if ch == "]":
+                return result, i + 1
+            if ch == ",":
+                i += 1
+                continue
+            if ch == "}":
+                self.repaired = True
+                return result, i
+
+            value, j = self.value(i)
+            if value is _MISSING:
+                self.repaired = True
+                i += 1
+                continue
+            result.append(value)
+            i = j
+
+
+def _strip_fence(text: str) -> str:
+    """去掉包裹JSON的 ```json ... ``` 标记（不以代码块开头时原样返回）
+
+    只去掉开头的标记行和全文末尾的 ```，不在中间第一个 ``` 处截断：
+    解析器在JSON值结束处自然停止，JSON字符串值里出现的 ``` 不能当作代码块边界。
+    """
+    start = len(text) - len(text.lstrip())
+    if not text.startswith(_FENCE, start):
+        return text
+    body_start = text.find("\n", start)
+    if body_start < 0:
+        return text
+    body = text[body_start + 1:].rstrip()
+    return body[:-len(_FENCE)] if body.endswith(_FENCE) else body
+
+
+def _find_start(text: str) -> int:
+    """JSON起始位置：优先第一个 {，没有对象时才取第一个 [（说明文字里的方括号不能抢先）"""
+    start = text.find("{")
+    return start if start >= 0 else text.find("[")
+
+
+def tolerant_json_decode(text: str) -> RepairResult:
+    """解码LLM输出中的JSON，找不到JSON时抛出 JSONRepairError"""
+    stripped = text.strip()
+    # 快速路径：格式良好的JSON（包括 response_format=json_object 的输出）
+    try:
+        return RepairResult(json.loads(stripped))
+    except (ValueError, RecursionError):
+        pass
+
+    body = _strip_fence(stripped)
+    start = _find_start(body)
+    if start < 0:
+        raise JSONRepairError("文本中没有JSON对象或数组")
+
+    parser = _TolerantParser(body)
+    try:
+        value, _ = parser.value(start)
+    except RecursionError:
+        raise JSONRepairError("JSON嵌套层级过深")
+    return RepairResult(value, repaired=True, truncated=parser.truncated)
+
+
+def tolerant_json_loads(text: str) -> Any:
+    """tolerant_json_decode 的简写，只返回解码后的值"""
+    return tolerant_json_decode(text).value
+
+
+def parse_first_value(text: str) -> Optional[Any]:
+    """容错解码，失败返回None（用于逐元素的增量解析）"""
+    try:
+        return tolerant_json_loads(text)
+    except JSONRepairError:
+        return None
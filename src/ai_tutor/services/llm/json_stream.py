@@ -0,0 +1,93 @@
+"""
+增量JSON解析
+
+LLM流式输出批改结果时，逐段喂入文本，一旦顶层对象中指定数组（默认 questions）
+的某个元素完整闭合就立即产出，无需等待整个JSON生成完毕。
+"""
+from typing import Any, List, Optional
+
+from .json_repair import parse_first_value
+
+
+class IncrementalJSONArrayParser:
+    """从流式文本中增量提取顶层对象某个数组字段的元素
+
+    每个字符只扫描一次：跟踪字符串/转义状态与括号深度，记录顶层对象中最近的键，
+    当目标键对应的数组中某个对象或数组元素闭合时解析并返回该元素。
+    """
+
+    def __init__(self, array_key: str = "questions"):
+        self.array_key = array_key
+        self._chunks: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key_chars: Optional[List[str]] = None
+        self._last_key: Optional[str] = None
+        self._array_depth: Optional[int] = None  # 目标数组内部的深度
+        self._array_closed = False
+        self._element_chars: Optional[List[str]] = None
+        self.emitted = 0
+
+    @property
+    def text(self) -> str:
+        """目前为止收到的完整文本"""
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str) -> List[Any]:
+        """喂入一段文本，返回本段中新完成的数组元素"""
+        self._chunks.append(chunk)
+        completed: List[Any] = []
+
+        for ch in chunk:
+            if self._element_chars is not None:
+                self._element_chars.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._key_chars is not None:
+                        self._last_key = "".join(self._key_chars)
+                        self._key_chars = None
+                elif self._key_chars is not None:
+                    self._key_chars.append(ch)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                # 只记录顶层对象中的字符串，用于识别目标键
+                self._key_chars = [] if self._depth == 1 else None
+            elif ch in "{[":
+                in_target_array = self._array_depth is not None and not self._array_closed
+                if in_target_array and self._depth == self._array_depth and self._element_chars is None:
+                    self._element_chars = [ch]
+                self._depth += 1
+                if (
+                    ch == "["
+                    and self._depth == 2
+                    and self._array_depth is None
+                    and self._last_key == self.array_key
+                ):
+                    self._array_depth = self._depth
+            elif ch in "}]":
+                self._depth -= 1
+                if self._array_depth is None or self._array_closed:
+                    continue
+                if self._element_chars is not None and self._depth == self._array_depth:
+                    element = self._decode_element("".join(self._element_chars))
+                    self._element_chars = None
+                    if element is not None:
+                        self.emitted += 1
+                        completed.append(element)
+                elif self._depth < self._array_depth:
+                    self._array_closed = True
+
+        return completed
+
+    def _decode_element(self, raw: str) -> Optional[Any]:
+        """容错解析单个元素，失败时丢弃（最终结果仍由完整文本解析兜底）"""
+        return parse_first_value(raw)
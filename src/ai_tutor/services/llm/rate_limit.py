@@ -0,0 +1,359 @@
+"""
+LLM服务商限流
+
+- ProviderRateLimiter：按服务商统计 请求数/分钟 与 token数/分钟 的令牌桶，
+  通过Redis在多个worker进程间共享，Redis不可用时退化为进程内令牌桶；
+  收到429时按 Retry-After 暂停该服务商的所有请求。
+- AdaptiveConcurrencyLimiter：AIMD并发窗口，请求成功时缓慢扩大，限流/超时/错误时减半，
+  使吞吐贴近配额上限而不引发错误风暴。窗口不按延迟收缩：短对话和1800 token的批改
+  混在一起时，延迟本身的差异就有数倍，按延迟收缩会在没有任何错误的情况下把窗口压到最小。
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from ...core.logger import LoggerMixin
+from ...core.config import settings
+
+
+# Redis令牌桶脚本：原子地补充两个桶并尝试扣减，返回需要等待的毫秒数（0表示已放行）
+_TOKEN_BUCKET_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local paused = redis.call('PTTL', KEYS[3])
+if paused > 0 then
+  return paused
+end
+local wait = 0
+local levels = {}
+for i = 1, 2 do
+  local capacity = tonumber(ARGV[i * 2 - 1])
+  local cost = tonumber(ARGV[i * 2])
+  local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+  local level = tonumber(state[1]) or capacity
+  local ts = tonumber(state[2]) or now
+  level = math.min(capacity, level + (now - ts) * capacity / 60000)
+  if cost > capacity then
+    cost = capacity
+  end
+  if level < cost then
+    wait = math.max(wait, math.ceil((cost - level) * 60000 / capacity))
+  end
+  levels[i] = {level, cost}
+end
+for i = 1, 2 do
+  local level = levels[i][1]
+  if wait == 0 then
+    level = level - levels[i][2]
+  end
+  redis.call('HSET', KEYS[i], 'tokens', level, 'ts', now)
+  redis.call('PEXPIRE', KEYS[i], 120000)
+end
+return wait
+"""
+
+
+class TokenBucket:
+    """进程内令牌桶（按分钟配额匀速补充）"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, cost: float) -> float:
+        """凑够cost个令牌还需等待的秒数"""
+        self._refill()
+        cost = min(cost, self.capacity)
+        if self.level >= cost:
+            return 0.0
+        return (cost - self.level) * 60 / self.capacity
+
+    def take(self, cost: float) -> None:
+        self.level -= min(cost, self.capacity)
+
+    def adjust(self, delta: float) -> None:
+        """按实际用量修正（正数退还，负数补扣）"""
+        self._refill()
+        self.level = min(self.capacity, self.level + delta)
+
+
+class ProviderRateLimiter(LoggerMixin):
+    """单个服务商的 RPM/TPM 限流器"""
+
+    def __init__(self, provider: str, rpm: int, tpm: int, redis_client=None):
+        self.provider = provider
+        self.rpm = rpm
+        self.tpm = tpm
+        self.redis = redis_client
+        self._requests = TokenBucket(rpm) if rpm > 0 else None
+        self._tokens = TokenBucket(tpm) if tpm > 0 else None
+        self._paused_until = 0.0
+        self._script = redis_client.register_script(_TOKEN_BUCKET_SCRIPT) if redis_client else None
+        self._keys = [
+            f"ai_tutor:ratelimit:{provider}:rpm",
+            f"ai_tutor:ratelimit:{provider}:tpm",
+            f"ai_tutor:ratelimit:{provider}:pause",
+        ]
+        self.throttled = 0  # 因限流而等待的次数
+        self.waited_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rpm > 0 or self.tpm > 0
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        """等待直到本次请求（含预估token数）不超过配额；未配置配额时仍遵守429后的暂停"""
+        waited = False
+        while True:
+            if self.enabled:
+                wait = await self._try_acquire(estimated_tokens)
+            else:
+                wait = await self._pause_remaining()
+            if wait <= 0:
+                break
+            if not waited:
+                self.throttled += 1
+                waited = True
+            self.waited_seconds += wait
+            await asyncio.sleep(min(wait, 5.0))
+
+    async def _pause_remaining(self) -> float:
+        """429暂停还剩的秒数（本进程与其他进程写入的暂停取较长者）"""
+        paused = self._paused_until - time.monotonic()
+        if self.redis is not None:
+            try:
+                loop = asyncio.get_running_loop()
+                ttl_ms = await loop.run_in_executor(None, self.redis.pttl, self._keys[2])
+                paused = max(paused, int(ttl_ms) / 1000)
+            except Exception as e:
+                self.log_warning("Redis限流暂停读取失败", provider=self.provider, error=str(e))
+        return max(0.0, paused)
+
+    async def _try_acquire(self, estimated_tokens: int) -> float:
+        """尝试扣减配额，返回需要等待的秒数"""
+        if self._script is not None:
+            try:
+                loop = asyncio.get_running_loop()
+                wait_ms = await loop.run_in_executor(
+                    None,
+                    lambda: self._script(
+                        keys=self._keys,
+                        args=[
+                            self.rpm or 10**9, 1,
+                            self.tpm or 10**12, estimated_tokens,
+                        ],
+                    ),
+                )
+                return int(wait_ms) / 1000
+            except Exception as e:
+                self.log_warning("Redis限流不可用，使用进程内令牌桶", provider=self.provider, error=str(e))
+
+        paused = self._paused_until - time.monotonic()
+        if paused > 0:
+            return paused
+        wait = max(
+            self._requests.wait_time(1) if self._requests else 0.0,
+            self._tokens.wait_time(estimated_tokens) if self._tokens else 0.0,
+        )
+        if wait == 0:
+            if self._requests:
+                self._requests.take(1)
+            if self._tokens:
+                self._tokens.take(estimated_tokens)
+        return wait
+
+    async def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """用实际token用量修正预估值"""
+        if not self.tpm or actual_tokens is None:
+            return
+        delta = estimated_tokens - actual_tokens
+        if delta == 0:
+            return
+        if self._tokens:
+            self._tokens.adjust(delta)
+        if self.redis is not None:
+            try:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(
+                    None, lambda: self.redis.hincrbyfloat(self._keys[1], "tokens", delta)
+                )
+            except Exception as e:
+                self.log_warning("Redis限流用量修正失败", provider=self.provider, error=str(e))
+
+    async def pause(self, seconds: float) -> None:
+        """按 Retry-After 暂停该服务商的所有请求（跨进程生效）"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.log_warning("服务商限流，暂停发送请求", provider=self.provider, pause_seconds=seconds)
+        if self.redis is not None:
+            try:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(
+                    None,
+                    lambda: self.redis.set(self._keys[2], "1", px=max(1, int(seconds * 1000))),
+                )
+            except Exception as e:
+                self.log_warning("Redis限流暂停写入失败", provider=self.provider, error=str(e))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis" if self.redis is not None else "local",
+            "rpm_limit": self.rpm,
+            "tpm_limit": self.tpm,
+            "throttled": self.throttled,
+            "waited_seconds": round(self.waited_seconds, 3),
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 3),
+        }
+
+
+class AdaptiveConcurrencyLimiter(LoggerMixin):
+    """基于错误与限流的AIMD并发窗口"""
+
+    def __init__(
+        self,
+        provider: str,
+        initial: int,
+        minimum: int,
+        maximum: int,
+    ):
+        self.provider = provider
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.inflight = 0
+        self._latency_ewma: Optional[float] = None
+        self._waiters: "deque[asyncio.Future]" = deque()
+        self.successes = 0
+        self.failures = 0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """占用一个并发名额，窗口已满时排队等待"""
+        while self.inflight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.inflight += 1
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            self._wake()
+
+    def on_success(self, latency: float) -> None:
+        """请求成功：加性扩大窗口（延迟只用于统计）"""
+        self.successes += 1
+        if self._latency_ewma is None:
+            self._latency_ewma = latency
+        else:
+            self._latency_ewma = 0.9 * self._latency_ewma + 0.1 * latency
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        self._wake()
+
+    def on_throttle(self) -> None:
+        """限流、超时或请求错误：并发窗口减半"""
+        self.failures += 1
+        self.limit = max(self.minimum, self.limit / 2)
+        self.log_warning("并发窗口收缩", provider=self.provider, limit=round(self.limit, 2))
+
+    def _wake(self) -> None:
+        """按空余名额唤醒排队的请求"""
+        free = int(self.limit) - self.inflight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "inflight": self.inflight,
+            "latency_ewma": round(self._latency_ewma, 3) if self._latency_ewma else None,
+            "successes": self.successes,
+            "failures": self.failures,
+        }
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """预估一次调用消耗的token数（中文约一字一token，按上限计入输出）"""
+    prompt_chars = sum(len(m.get("content") or "") for m in messages)
+    return prompt_chars + max_tokens
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头（秒数或HTTP日期）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_rate_limiters: Dict[str, ProviderRateLimiter] = {}
+_concurrency_limiters: Dict[str, AdaptiveConcurrencyLimiter] = {}
+
+
+def _provider_quota(provider: str) -> Dict[str, int]:
+    if not settings.LLM_RATE_LIMIT_ENABLED:
+        return {"rpm": 0, "tpm": 0}
+    if provider == "kimi":
+        return {"rpm": settings.KIMI_RPM_LIMIT, "tpm": settings.KIMI_TPM_LIMIT}
+    return {"rpm": settings.QWEN_RPM_LIMIT, "tpm": settings.QWEN_TPM_LIMIT}
+
+
+def get_rate_limiter(provider: str) -> ProviderRateLimiter:
+    """获取服务商的限流器（首次调用时按配置创建）"""
+    limiter = _rate_limiters.get(provider)
+    if limiter is None:
+        from ...db.database import redis_client
+
+        quota = _provider_quota(provider)
+        limiter = ProviderRateLimiter(provider, quota["rpm"], quota["tpm"], redis_client)
+        _rate_limiters[provider] = limiter
+    return limiter
+
+
+def get_concurrency_limiter(provider: str) -> AdaptiveConcurrencyLimiter:
+    """获取服务商的自适应并发窗口"""
+    limiter = _concurrency_limiters.get(provider)
+    if limiter is None:
+        limiter = AdaptiveConcurrencyLimiter(
+            provider,
+            initial=settings.LLM_CONCURRENCY_INITIAL,
+            minimum=settings.LLM_CONCURRENCY_MIN,
+            maximum=settings.LLM_CONCURRENCY_MAX,
+        )
+        _concurrency_limiters[provider] = limiter
+    return limiter
+
+
+def rate_limit_stats() -> Dict[str, Any]:
+    """所有服务商的限流与并发窗口状态"""
+    providers = set(_rate_limiters) | set(_concurrency_limiters)
+    return {
+        provider: {
+            "rate_limit": _rate_limiters[provider].stats() if provider in _rate_limiters else None,
+            "concurrency": _concurrency_limiters[provider].stats() if provider in _concurrency_limiters else None,
+        }
+        for provider in sorted(providers)
+    }
@@ -0,0 +1,246 @@
+"""
+多服务商路由
+
+按滚动窗口内的延迟分布与错误率为服务商排序，优先选择最快且健康的服务商；
+对延迟敏感的调用可开启对冲：主服务商超过其p95延迟仍未返回时，
+向次优服务商发起同样的请求，先成功者胜出，另一个被取消。
+熔断中的服务商不参与排序（全部熔断时仍按原顺序调用，由熔断器快速失败）。
+"""
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from ...core.logger import LoggerMixin
+from ...core.config import settings
+from .base import LLMService
+from .circuit_breaker import circuit_breakers
+
+# 只对某一服务商有意义的参数，对冲到其他服务商时不传递
+PROVIDER_SPECIFIC_KWARGS = ("model",)
+
+
+class ProviderLatencyStats:
+    """单个服务商的滚动延迟/错误统计"""
+
+    def __init__(self, window: int):
+        self._samples: Deque[Tuple[float, bool]] = deque(maxlen=window)
+
+    def record(self, latency: float, ok: bool) -> None:
+        self._samples.append((latency, ok))
+
+    @property
+    def count(self) -> int:
+        return len(self._samples)
+
+    def _latencies(self) -> List[float]:
+        return sorted(latency for latency, ok in self._samples if ok)
+
+    def percentile(self, q: float) -> Optional[float]:
+        latencies = self._latencies()
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(q * len(latencies)))
+        return latencies[index]
+
+    def tail_mean(self, threshold: float) -> Optional[float]:
+        """超过阈值的样本的平均延迟，即已知超过阈值时的期望总延迟"""
+        tail = [latency for latency in self._latencies() if latency > threshold]
+        return sum(tail) / len(tail) if tail else None
+
+    @property
+    def error_rate(self) -> float:
+        if not self._samples:
+            return 0.0
+        return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+
+class LatencyTracker(LoggerMixin):
+    """跨请求共享的服务商延迟跟踪器"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._stats: Dict[str, ProviderLatencyStats] = {}
+        self.wins: Dict[str, int] = {}
+        self.hedges_fired = 0
+        self.hedge_wins = 0
+        self.hedge_saved_seconds = 0.0
+
+    def stats_for(self, provider: str) -> ProviderLatencyStats:
+        if provider not in self._stats:
+            self._stats[provider] = ProviderLatencyStats(self.window)
+        return self._stats[provider]
+
+    def record(self, provider: str, latency: float, ok: bool) -> None:
+        self.stats_for(provider).record(latency, ok)
+
+    def score(self, provider: str) -> Tuple[int, float]:
+        """排序分：先看是否健康，再看p50延迟（按错误率加权）；无样本的服务商优先探测"""
+        stats = self.stats_for(provider)
+        unhealthy = int(stats.error_rate > settings.LLM_ROUTING_MAX_ERROR_RATE)
+        p50 = stats.percentile(0.5)
+        if p50 is None:
+            return unhealthy, 0.0
+        return unhealthy, p50 * (1 + stats.error_rate)
+
+    def rank(self, providers: List[str]) -> List[str]:
+        return sorted(providers, key=self.score)
+
+    def hedge_delay(self, provider: str) -> float:
+        """对冲等待时间：主服务商的p95延迟，样本不足时使用默认值"""
+        stats = self.stats_for(provider)
+        p95 = stats.percentile(0.95)
+        if stats.count < settings.LLM_HEDGE_MIN_SAMPLES or p95 is None:
+            return settings.LLM_HEDGE_DEFAULT_DELAY
+        return max(settings.LLM_HEDGE_MIN_DELAY, p95)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "providers": {
+                provider: {
+                    "samples": stats.count,
+                    "p50": stats.percentile(0.5),
+                    "p95": stats.percentile(0.95),
+                    "error_rate": round(stats.error_rate, 4),
+                    "hedge_delay": self.hedge_delay(provider),
+                }
+                for provider, stats in self._stats.items()
+            },
+            "wins": dict(self.wins),
+            "hedges_fired": self.hedges_fired,
+            "hedge_wins": self.hedge_wins,
+            "hedge_saved_seconds": round(self.hedge_saved_seconds, 3),
+        }
+
+
+@dataclass
+class RoutingDecision:
+    """单次路由结果"""
+
+    primary: str
+    winner: str
+    hedged: bool
+    latency: float
+    hedge_saved: float = 0.0
+
+
+class RoutingLLMService(LLMService):
+    """在多个服务商之间按延迟路由的LLM服务"""
+
+    def __init__(self, services: Dict[str, LLMService], tracker: Optional["LatencyTracker"] = None):
+        if not services:
+            raise ValueError("没有可用的AI服务商")
+        self.services = services
+        self.tracker = tracker or latency_tracker
+        self.last_decision: Optional[RoutingDecision] = None
+
+    async def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """路由到最快的健康服务商；hedge=True 时对慢请求发起对冲"""
+        hedge = kwargs.pop("hedge", False)
+        order = self._candidates()
+        primary = order[0]
+        started = time.perf_counter()
+
+        if hedge and len(order) > 1:
+            content, decision = await self._hedged_chat(order[0], order[1], messages, kwargs, started)
+        else:
+            content = await self._call(primary, messages, kwargs)
+            decision = RoutingDecision(primary, primary, False, time.perf_counter() - started)
+
+        self._finish(decision)
+        return content
+
+    async def generate(self, prompt: str, **kwargs) -> str:
+        return await self.chat([{"role": "user", "content": prompt}], **kwargs)
+
+    async def stream_chat(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """流式调用不对冲，直接使用排名第一的服务商"""
+        kwargs.pop("hedge", None)
+        primary = self._candidates()[0]
+        async for delta in self.services[primary].stream_chat(messages, fallback=False, **kwargs):
+            yield delta
+
+    def _candidates(self) -> List[str]:
+        """按延迟排序的服务商，熔断中的排除在外"""
+        ranked = self.tracker.rank(list(self.services))
+        return [p for p in ranked if circuit_breakers.is_available(p)] or ranked
+
+    async def _call(self, provider: str, messages: List[Dict[str, str]], kwargs: Dict[str, Any]) -> str:
+        """调用单个服务商并记录延迟"""
+        started = time.perf_counter()
+        try:
+            # 路由自身负责切换服务商，关闭单服务商的熔断回退
+            content = await self.services[provider].chat(messages, fallback=False, **kwargs)
+        except asyncio.CancelledError:
+            # 被对冲取消的请求没有真实延迟，不记入统计，以免把截断值当作成功样本拉低p95
+            raise
+        except Exception:
+            self.tracker.record(provider, time.perf_counter() - started, False)
+            raise
+        self.tracker.record(provider, time.perf_counter() - started, True)
+        return content
+
+    async def _hedged_chat(
+        self,
+        primary: str,
+        secondary: str,
+        messages: List[Dict[str, str]],
+        kwargs: Dict[str, Any],
+        started: float,
+    ) -> Tuple[str, RoutingDecision]:
+        delay = self.tracker.hedge_delay(primary)
+        primary_task = asyncio.create_task(self._call(primary, messages, kwargs))
+        done, _ = await asyncio.wait({primary_task}, timeout=delay)
+        if done and not primary_task.exception():
+            return primary_task.result(), RoutingDecision(primary, primary, False, time.perf_counter() - started)
+
+        self.tracker.hedges_fired += 1
+        self.log_event(
+            "主服务商响应过慢或失败，发起对冲请求",
+            primary=primary,
+            secondary=secondary,
+            hedge_delay=round(delay, 3),
+        )
+        secondary_kwargs = {k: v for k, v in kwargs.items() if k not in PROVIDER_SPECIFIC_KWARGS}
+        tasks = {secondary: asyncio.create_task(self._call(secondary, messages, secondary_kwargs))}
+        if not done:
+            tasks[primary] = primary_task
+
+        errors: Dict[str, BaseException] = {}
+        if done:
+            errors[primary] = primary_task.exception()
+        try:
+            while tasks:
+                finished, _ = await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_COMPLETED)
+                for provider, task in list(tasks.items()):
+                    if task not in finished:
+                        continue
+                    del tasks[provider]
+                    if task.exception() is not None:
+                        errors[provider] = task.exception()
+                        continue
+                    latency = time.perf_counter() - started
+                    saved = 0.0
+                    if provider == secondary:
+                        expected = self.tracker.stats_for(primary).tail_mean(delay)
+                        saved = max(0.0, expected - latency) if expected else 0.0
+                    return task.result(), RoutingDecision(primary, provider, True, latency, saved)
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        raise errors.get(primary) or errors[secondary]
+
+    def _finish(self, decision: RoutingDecision) -> None:
+        self.last_decision = decision
+        tracker = self.tracker
+        tracker.wins[decision.winner] = tracker.wins.get(decision.winner, 0) + 1
+        if decision.hedged and decision.winner != decision.primary:
+            tracker.hedge_wins += 1
+            tracker.hedge_saved_seconds += decision.hedge_saved
+        self.log_event("AI服务路由完成", **asdict(decision))
+
+
+# 全局延迟跟踪器（进程内共享）
+latency_tracker = LatencyTracker(window=settings.LLM_ROUTING_WINDOW)
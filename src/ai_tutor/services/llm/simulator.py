@@ -0,0 +1,302 @@
+"""
+离线LLM服务商模拟器
+
+本地ASGI应用，实现OpenAI兼容的 /chat/completions 协议（含 stream=true 的SSE），
+用于在无外网环境下压测 QwenService/KimiService/HomeworkService：
+
+- 延迟分布：fixed / uniform / normal / lognormal，作用于首token（非流式为整体响应前）
+- 故障注入：按比例返回5xx错误或429（附 Retry-After）
+- 限流：每分钟请求数上限，超出返回429；输出按 token/秒 节流
+- 内容：批改类提示词返回符合批改格式的JSON（可按比例包裹代码块、加尾随逗号，
+  模拟不规范输出；请求带 response_format=json_object 时总是返回合法JSON），其余返回回显文本
+
+启动（默认端口8090，可用 LLM_SIM_* 环境变量配置）：
+    uv run python -m ai_tutor.services.llm.simulator
+然后在 .env 中设置：
+    QWEN_BASE_URL=http://127.0.0.1:8090/v1
+    KIMI_BASE_URL=http://127.0.0.1:8090/v1
+运行期间可通过 POST /_sim/config 调整参数，GET /_sim/stats 查看注入统计。
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic_settings import BaseSettings
+
+from .rate_limit import TokenBucket
+
+
+class SimulatorConfig(BaseSettings):
+    """模拟器配置（环境变量前缀 LLM_SIM_）"""
+
+    latency: str = "lognormal:1.2,0.4"  # 分布:参数，如 fixed:0.5 / uniform:0.2,1.0 / normal:1.0,0.2
+    error_rate: float = 0.0  # 返回5xx的比例
+    error_status: int = 500
+    rate_limit_rate: float = 0.0  # 随机返回429的比例
+    retry_after: float = 1.0  # 429响应的 Retry-After（秒）
+    rpm: int = 0  # 每分钟请求上限，0表示不限
+    tokens_per_second: float = 0.0  # 输出速率，0表示不限
+    grading_questions: int = 0  # 批改JSON中的题目数，0表示按提示词中的题号推断
+    malformed_rate: float = 0.0  # 批改JSON不规范输出的比例（未开启JSON模式时）
+    seed: Optional[int] = None
+
+    class Config:
+        env_prefix = "LLM_SIM_"
+
+
+class LatencyModel:
+    """延迟分布，按 "分布:参数1,参数2" 格式解析"""
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal")
+
+    def __init__(self, spec: str):
+        kind, _, raw_params = spec.partition(":")
+        kind = kind.strip().lower()
+        if kind not in self.KINDS:
+            raise ValueError(f"不支持的延迟分布: {kind}")
+        params = [float(p) for p in raw_params.split(",") if p.strip()]
+        expected = 1 if kind == "fixed" else 2
+        if len(params) != expected:
+            raise ValueError(f"延迟分布 {kind} 需要 {expected} 个参数")
+        self.kind = kind
+        self.params = params
+
+    def sample(self, rng: random.Random) -> float:
+        """采样一次延迟（秒），lognormal 的参数为 中位数,sigma"""
+        if self.kind == "fixed":
+            value = self.params[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(*self.params)
+        elif self.kind == "normal":
+            value = rng.gauss(*self.params)
+        else:
+            median, sigma = self.params
+            value = rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        return max(0.0, value)
+
+
+def count_tokens(text: str) -> int:
+    """粗略token计数（约2个字符一个token）"""
+    return max(1, math.ceil(len(text) / 2))
+
+
+_QUESTION_MARKER = re.compile(r"^\s*(?:第\s*\d+\s*题|\d+\s*[.、．)）])", re.MULTILINE)
+
+
+def is_grading_prompt(prompt: str) -> bool:
+    return "questions" in prompt and ("批改" in prompt or "JSON" in prompt)
+
+
+def build_grading_json(prompt: str, questions: int, rng: random.Random) -> str:
+    """按标准批改格式生成JSON"""
+    count = questions or min(50, max(1, len(_QUESTION_MARKER.findall(prompt))))
+    items = []
+    for number in range(1, count + 1):
+        correct = rng.random() < 0.7
+        items.append({
+            "question_number": number,
+            "question_text": f"第{number}题（模拟）",
+            "student_answer": "模拟答案",
+            "is_correct": correct,
+            "score": 5 if correct else 2,
+            "max_score": 5,
+            "correct_answer": "模拟正确答案",
+            "error_analysis": "" if correct else "计算过程有误（模拟）",
+            "solution_steps": ["步骤1", "步骤2"],
+            "knowledge_points": ["模拟知识点"],
+            "difficulty_level": 3,
+            "mastery_level": 0.8 if correct else 0.4,
+        })
+    earned = sum(item["score"] for item in items)
+    total = 5 * count
+    return json.dumps({
+        "questions": items,
+        "overall_score": round(earned / total * 100, 1),
+        "total_score": 100.0,
+        "accuracy_rate": round(sum(item["is_correct"] for item in items) / count, 2),
+        "overall_suggestions": "模拟评价：整体掌握较好",
+        "weak_knowledge_points": ["模拟知识点"],
+        "study_recommendations": ["多做练习"],
+    }, ensure_ascii=False)
+
+
+class ProviderSimulator:
+    """模拟器状态：配置、随机源、限流桶与统计"""
+
+    def __init__(self, config: Optional[SimulatorConfig] = None):
+        self.config = config or SimulatorConfig()
+        self.configure()
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "streams": 0,
+            "errors_injected": 0,
+            "rate_limited": 0,
+            "completion_tokens": 0,
+        }
+
+    def configure(self, **updates: Any) -> None:
+        """更新配置（校验延迟分布后生效）"""
+        config = self.config.model_copy(update=updates)
+        self.latency = LatencyModel(config.latency)
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.bucket = TokenBucket(config.rpm) if config.rpm > 0 else None
+
+    def _injected_failure(self) -> Optional[JSONResponse]:
+        config = self.config
+        if self.bucket is not None:
+            if self.bucket.wait_time(1) > 0:
+                self.stats["rate_limited"] += 1
+                return self._rate_limited(self.bucket.wait_time(1))
+            self.bucket.take(1)
+        if self.rng.random() < config.rate_limit_rate:
+            self.stats["rate_limited"] += 1
+            return self._rate_limited(config.retry_after)
+        if self.rng.random() < config.error_rate:
+            self.stats["errors_injected"] += 1
+            return JSONResponse(
+                status_code=config.error_status,
+                content={"error": {"message": "simulated upstream error", "type": "server_error"}},
+            )
+        return None
+
+    def _rate_limited(self, retry_after: float) -> JSONResponse:
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            content={"error": {"message": "simulated rate limit", "type": "rate_limit_exceeded"}},
+        )
+
+    def _reply(self, messages: List[Dict[str, Any]], json_mode: bool = False) -> str:
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        if is_grading_prompt(prompt):
+            content = build_grading_json(prompt, self.config.grading_questions, self.rng)
+            if not json_mode and self.rng.random() < self.config.malformed_rate:
+                # 常见的不规范输出：代码块包裹 + 尾随逗号
+                content = f"```json\n{content[:-1]},}}\n```"
+            return content
+        last = str(messages[-1].get("content", "")) if messages else ""
+        return f"模拟回复：{last[:200]}"
+
+    def _usage(self, messages: List[Dict[str, Any]], content: str) -> Dict[str, int]:
+        prompt_tokens = sum(count_tokens(str(m.get("content", ""))) for m in messages)
+        completion_tokens = count_tokens(content)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    async def complete(self, body: Dict[str, Any]):
+        """处理一次 /chat/completions 请求"""
+        self.stats["requests"] += 1
+        failure = self._injected_failure()
+        if failure is not None:
+            return failure
+
+        messages = body.get("messages") or []
+        model = body.get("model", "simulated")
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+        content = self._reply(messages, json_mode)
+        usage = self._usage(messages, content)
+        self.stats["completion_tokens"] += usage["completion_tokens"]
+        first_token_delay = self.latency.sample(self.rng)
+
+        if body.get("stream"):
+            self.stats["streams"] += 1
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            return StreamingResponse(
+                self._stream(model, content, usage if include_usage else None, first_token_delay),
+                media_type="text/event-stream",
+            )
+
+        tps = self.config.tokens_per_second
+        await asyncio.sleep(first_token_delay + (usage["completion_tokens"] / tps if tps > 0 else 0))
+        return {
+            "id": f"chatcmpl-sim-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+            ],
+            "usage": usage,
+        }
+
+    async def _stream(
+        self,
+        model: str,
+        content: str,
+        usage: Optional[Dict[str, int]],
+        first_token_delay: float,
+    ) -> AsyncIterator[str]:
+        completion_id = f"chatcmpl-sim-{uuid.uuid4().hex[:12]}"
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, **extra: Any) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        await asyncio.sleep(first_token_delay)
+        yield chunk({"role": "assistant", "content": ""})
+
+        # 每个分片约为一个token（2个字符），按配置的速率输出
+        tps = self.config.tokens_per_second
+        for start in range(0, len(content), 2):
+            if tps > 0 and start:
+                await asyncio.sleep(1 / tps)
+            yield chunk({"content": content[start:start + 2]})
+
+        yield chunk({}, finish_reason="stop")
+        if usage is not None:
+            usage_chunk = {"id": completion_id, "object": "chat.completion.chunk", "model": model,
+                           "choices": [], "usage": usage}
+            yield f"data: {json.dumps(usage_chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+
+def create_simulator_app(config: Optional[SimulatorConfig] = None) -> FastAPI:
+    """创建模拟器ASGI应用"""
+    simulator = ProviderSimulator(config)
+    app = FastAPI(title="LLM Provider Simulator", docs_url=None, redoc_url=None)
+    app.state.simulator = simulator
+
+    @app.post("/chat/completions")
+    @app.post("/v1/chat/completions")
+    @app.post("/compatible-mode/v1/chat/completions")
+    async def chat_completions(request: Request):
+        return await simulator.complete(await request.json())
+
+    @app.get("/_sim/stats")
+    async def simulator_stats():
+        return {"config": simulator.config.model_dump(), "stats": simulator.stats}
+
+    @app.post("/_sim/config")
+    async def simulator_config(request: Request):
+        try:
+            simulator.configure(**(await request.json()))
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"error": str(e)})
+        return {"config": simulator.config.model_dump()}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(create_simulator_app(), host="127.0.0.1", port=int(os.getenv("LLM_SIM_PORT", "8090")))
@@ -0,0 +1,333 @@
+"""
+LLM用量与成本统计
+
+每次上游调用记录一条用量（token数、延迟、模型、服务商、调用方标签），
+追加写入Redis Stream（按长度截断的只追加日志），Redis不可用时只保留在进程内。
+汇总任务定期读取新记录，按调用方、模型及各标签维度累计token、成本与延迟，
+用于找出最耗token和最慢的提示词与接口。
+
+调用方标签有两种传入方式：
+- 调用时传 caller="api.ai.chat"、tags={"subject": "math"}；
+- 在上层用 `with usage_tags(caller=..., student_id=...)` 包裹，其中的所有调用继承这些标签。
+"""
+import asyncio
+import contextvars
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict, field
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from ...core.logger import LoggerMixin
+from ...core.config import settings
+
+
+_usage_context: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar(
+    "llm_usage_tags", default={}
+)
+
+
+@contextmanager
+def usage_tags(**tags: Any) -> Iterator[None]:
+    """为代码块内的所有LLM调用附加用量标签（嵌套时内层覆盖外层同名标签）"""
+    merged = {**_usage_context.get(), **{k: str(v) for k, v in tags.items() if v is not None}}
+    token = _usage_context.set(merged)
+    try:
+        yield
+    finally:
+        _usage_context.reset(token)
+
+
+def pop_usage_tags(kwargs: Dict[str, Any]) -> Dict[str, str]:
+    """从调用参数中取出 caller/tags，与上下文标签合并（调用参数优先）"""
+    tags = dict(_usage_context.get())
+    explicit = kwargs.pop("tags", None) or {}
+    tags.update({k: str(v) for k, v in explicit.items() if v is not None})
+    caller = kwargs.pop("caller", None)
+    if caller:
+        tags["caller"] = caller
+    return tags
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """按 LLM_PRICING 中的每千token单价估算成本（未配置的模型记为0）"""
+    price = settings.LLM_PRICING.get(model)
+    if not price:
+        return 0.0
+    input_price, output_price = price
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1000
+
+
+@dataclass
+class UsageRecord:
+    """单次上游调用的用量"""
+
+    provider: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    latency_ms: int = 0
+    ok: bool = True
+    stream: bool = False
+    caller: str = "unknown"
+    tags: Dict[str, str] = field(default_factory=dict)
+    cost: float = 0.0
+    ts: float = field(default_factory=time.time)
+
+    def to_fields(self) -> Dict[str, str]:
+        """转换为Redis Stream的字段（值均为字符串）"""
+        data = asdict(self)
+        data["ok"] = int(self.ok)
+        data["stream"] = int(self.stream)
+        data["tags"] = json.dumps(self.tags, ensure_ascii=False)
+        return {k: str(v) for k, v in data.items()}
+
+    @classmethod
+    def from_fields(cls, fields: Dict[str, str]) -> "UsageRecord":
+        return cls(
+            provider=fields["provider"],
+            model=fields["model"],
+            prompt_tokens=int(fields.get("prompt_tokens", 0)),
+            completion_tokens=int(fields.get("completion_tokens", 0)),
+            total_tokens=int(fields.get("total_tokens", 0)),
+            latency_ms=int(fields.get("latency_ms", 0)),
+            ok=fields.get("ok", "1") == "1",
+            stream=fields.get("stream", "0") == "1",
+            caller=fields.get("caller", "unknown"),
+            tags=json.loads(fields.get("tags") or "{}"),
+            cost=float(fields.get("cost", 0)),
+            ts=float(fields.get("ts", 0)),
+        )
+
+
+class UsageRollup:
+    """按维度累计的用量汇总"""
+
+    def __init__(self):
+        self.totals = self._empty()
+        self._groups: Dict[str, Dict[str, Dict[str, float]]] = {}
+
+    @staticmethod
+    def _empty() -> Dict[str, float]:
+        return {
+            "calls": 0,
+            "errors": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+            "cost": 0.0,
+            "latency_ms_total": 0,
+            "latency_ms_max": 0,
+        }
+
+    @staticmethod
+    def _fold(bucket: Dict[str, float], record: UsageRecord) -> None:
+        bucket["calls"] += 1
+        bucket["errors"] += 0 if record.ok else 1
+        bucket["prompt_tokens"] += record.prompt_tokens
+        bucket["completion_tokens"] += record.completion_tokens
+        bucket["total_tokens"] += record.total_tokens
+        bucket["cost"] += record.cost
+        bucket["latency_ms_total"] += record.latency_ms
+        bucket["latency_ms_max"] = max(bucket["latency_ms_max"], record.latency_ms)
+
+    def add(self, record: UsageRecord) -> None:
+        self._fold(self.totals, record)
+        dimensions = {
+            "caller": record.caller,
+            "provider": record.provider,
+            "model": f"{record.provider}/{record.model}",
+            **record.tags,
+        }
+        for dimension, value in dimensions.items():
+            group = self._groups.setdefault(dimension, {})
+            self._fold(group.setdefault(value, self._empty()), record)
+
+    @property
+    def dimensions(self) -> List[str]:
+        return sorted(self._groups)
+
+    @staticmethod
+    def _present(bucket: Dict[str, float]) -> Dict[str, Any]:
+        calls = bucket["calls"] or 1
+        return {
+            "calls": int(bucket["calls"]),
+            "errors": int(bucket["errors"]),
+            "prompt_tokens": int(bucket["prompt_tokens"]),
+            "completion_tokens": int(bucket["completion_tokens"]),
+            "total_tokens": int(bucket["total_tokens"]),
+            "cost": round(bucket["cost"], 6),
+            "avg_tokens": round(bucket["total_tokens"] / calls, 1),
+            "avg_latency_ms": round(bucket["latency_ms_total"] / calls, 1),
+            "max_latency_ms": int(bucket["latency_ms_max"]),
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        return self._present(self.totals)
+
+    def top(self, dimension: str, order_by: str = "total_tokens", limit: int = 20) -> List[Dict[str, Any]]:
+        """某个维度下按指定指标降序排列的分组"""
+        rows = [
+            {dimension: value, **self._present(bucket)}
+            for value, bucket in self._groups.get(dimension, {}).items()
+        ]
+        rows.sort(key=lambda row: row.get(order_by, 0), reverse=True)
+        return rows[:limit]
+
+
+class UsageRecorder(LoggerMixin):
+    """用量记录器：热路径只追加到内存缓冲，由汇总任务批量落库"""
+
+    def __init__(self, redis_client=None, stream_key: str = "ai_tutor:llm_usage", maxlen: int = 100_000):
+        self.redis = redis_client
+        self.stream_key = stream_key
+        self.maxlen = maxlen
+        self._pending: List[UsageRecord] = []
+        self.recent: Deque[UsageRecord] = deque(maxlen=200)
+        self.rollup = UsageRollup()
+        self._last_id = "0-0"
+        self._task: Optional[asyncio.Task] = None
+        # 接口手动刷新与定期汇总任务可能并发，串行化以免同一批Stream记录被重复计入
+        self._refresh_lock = asyncio.Lock()
+        self.dropped = 0
+
+    def record(
+        self,
+        provider: str,
+        model: str,
+        usage: Optional[Dict[str, Any]],
+        latency: float,
+        tags: Optional[Dict[str, str]] = None,
+        ok: bool = True,
+        stream: bool = False,
+    ) -> UsageRecord:
+        """记录一次上游调用（同步、无IO）"""
+        usage = usage or {}
+        tags = dict(tags or {})
+        prompt_tokens = int(usage.get("prompt_tokens") or 0)
+        completion_tokens = int(usage.get("completion_tokens") or 0)
+        record = UsageRecord(
+            provider=provider,
+            model=model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=int(usage.get("total_tokens") or prompt_tokens + completion_tokens),
+            latency_ms=int(latency * 1000),
+            ok=ok,
+            stream=stream,
+            caller=tags.pop("caller", "unknown"),
+            tags=tags,
+            cost=estimate_cost(model, prompt_tokens, completion_tokens),
+        )
+        if len(self._pending) >= settings.LLM_USAGE_BUFFER_MAX:
+            # 持久化长时间失败时丢弃最旧记录，避免内存无限增长
+            self._pending.pop(0)
+            self.dropped += 1
+        self._pending.append(record)
+        self.recent.append(record)
+        return record
+
+    def _write_stream(self, records: List[UsageRecord]) -> None:
+        pipe = self.redis.pipeline(transaction=False)
+        for record in records:
+            pipe.xadd(self.stream_key, record.to_fields(), maxlen=self.maxlen, approximate=True)
+        pipe.execute()
+
+    def _read_stream(self) -> List[UsageRecord]:
+        records = []
+        entries = self.redis.xrange(self.stream_key, min=f"({self._last_id}", count=1000)
+        while entries:
+            for entry_id, fields in entries:
+                records.append(UsageRecord.from_fields(fields))
+                self._last_id = entry_id
+            entries = self.redis.xrange(self.stream_key, min=f"({self._last_id}", count=1000)
+        return records
+
+    async def flush(self) -> int:
+        """将缓冲中的记录写入Redis Stream；无Redis时直接计入本进程汇总"""
+        records, self._pending = self._pending, []
+        if not records:
+            return 0
+        if self.redis is None:
+            for record in records:
+                self.rollup.add(record)
+            return len(records)
+
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._write_stream, records)
+        except Exception as e:
+            # 写入失败时放回缓冲，下一轮重试
+            self._pending = records + self._pending
+            self.log_warning("LLM用量写入Redis失败", error=str(e), pending=len(self._pending))
+            return 0
+        return len(records)
+
+    async def refresh(self) -> None:
+        """汇总：落库缓冲记录，再读取Stream中的新记录（含其他worker写入的）计入汇总"""
+        async with self._refresh_lock:
+            await self.flush()
+            if self.redis is None:
+                return
+            loop = asyncio.get_running_loop()
+            try:
+                records = await loop.run_in_executor(None, self._read_stream)
+            except Exception as e:
+                self.log_warning("LLM用量汇总读取失败", error=str(e))
+                return
+            for record in records:
+                self.rollup.add(record)
+
+    async def _run(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.log_error("LLM用量汇总任务异常", error=str(e))
+
+    def start(self, interval: Optional[float] = None) -> None:
+        """启动定期汇总任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(interval or settings.LLM_USAGE_ROLLUP_INTERVAL))
+
+    async def stop(self) -> None:
+        """停止汇总任务并落库剩余记录"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def report(self, group_by: str = "caller", order_by: str = "total_tokens", limit: int = 20) -> Dict[str, Any]:
+        return {
+            "backend": "redis_stream" if self.redis is not None else "memory",
+            "totals": self.rollup.summary(),
+            "group_by": group_by,
+            "order_by": order_by,
+            "groups": self.rollup.top(group_by, order_by, limit),
+            "dimensions": self.rollup.dimensions,
+            "pending": len(self._pending),
+            "dropped": self.dropped,
+        }
+
+
+_usage_recorder: Optional[UsageRecorder] = None
+
+
+def get_usage_recorder() -> UsageRecorder:
+    """获取全局用量记录器（首次调用时按Redis可用性创建）"""
+    global _usage_recorder
+    if _usage_recorder is None:
+        from ...db.database import redis_client
+
+        _usage_recorder = UsageRecorder(
+            redis_client if settings.LLM_USAGE_PERSIST else None,
+            maxlen=settings.LLM_USAGE_STREAM_MAXLEN,
+        )
+    return _usage_recorder
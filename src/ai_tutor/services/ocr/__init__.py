@@ -1,6 +1,30 @@
 """
 OCR服务模块
 """
-from .base import OCRService, TesseractOCR, get_ocr_service
+from .base import (
+    OCRService,
+    TesseractOCR,
+    PooledTesseractOCR,
+    get_ocr_service,
+    image_fingerprint,
+    ocr_single_flight,
+)
+from .cache import OCRResult, OCRResultCache, PerceptualIndex, get_ocr_result_cache
+from .layout import TextBlock
+from .engine_pool import TesseractEnginePool, get_tesseract_engine_pool
 
-__all__ = ["OCRService", "TesseractOCR", "get_ocr_service"]
+__all__ = [
+    "OCRService",
+    "TesseractOCR",
+    "PooledTesseractOCR",
+    "get_ocr_service",
+    "image_fingerprint",
+    "ocr_single_flight",
+    "OCRResult",
+    "OCRResultCache",
+    "PerceptualIndex",
+    "get_ocr_result_cache",
+    "TextBlock",
+    "TesseractEnginePool",
+    "get_tesseract_engine_pool",
+]
@@ -3,56 +3,88 @@ OCR服务基础模块
 """
 from abc import ABC, abstractmethod
 import asyncio
+import time
 from io import BytesIO
-from typing import Optional
+from typing import List, Optional, Tuple
 import pytesseract
 from PIL import Image
 
 from ...core.logger import LoggerMixin
 from ...core.config import settings
+from ...utils.singleflight import SingleFlight
+from .cache import OCRResult, fingerprint_and_signature, get_ocr_result_cache, image_fingerprint
+from .engine_pool import TesseractEnginePool, get_tesseract_engine_pool
+from .layout import TextBlock, split_page, stitch_blocks
+from .preprocess import preprocess_page, reduce_page
+
+
+# 进程内相同图片识别请求的合并器
+ocr_single_flight = SingleFlight("ocr")
 
 
 class OCRService(ABC, LoggerMixin):
     """OCR服务抽象基类"""
-    
-    @abstractmethod
+
+    engine_name: str = ""
+
     async def extract_text(self, image: Image.Image) -> str:
         """从图片中提取文本"""
+        return (await self.extract_result(image)).text
+
+    async def extract_result(self, image: Image.Image) -> OCRResult:
+        """识别图片：先查结果缓存（含近似重复图片），并发中的相同图片只识别一次"""
+        loop = asyncio.get_running_loop()
+        if not settings.OCR_CACHE_ENABLED:
+            fingerprint = await loop.run_in_executor(None, image_fingerprint, image)
+            return await ocr_single_flight.do(
+                f"{self.engine_name}:{fingerprint}",
+                lambda: self._recognize_result(image),
+            )
+
+        fingerprint, signature = await loop.run_in_executor(None, fingerprint_and_signature, image)
+        key = f"{self.engine_name}:{fingerprint}"
+        cache = get_ocr_result_cache()
+        cached = await cache.get(key, signature)
+        if cached is not None:
+            return cached
+
+        async def recognize_and_store() -> OCRResult:
+            result = await self._recognize_result(image)
+            await cache.set(key, result, signature)
+            return result
+
+        return await ocr_single_flight.do(key, recognize_and_store)
+
+    async def _recognize_result(self, image: Image.Image) -> OCRResult:
+        """识别并附带置信度等信息，能给出置信度的引擎可覆盖此方法"""
+        text = await self._recognize(image)
+        return OCRResult(text=text, engine=self.engine_name, created_at=time.time())
+
+    @abstractmethod
+    async def _recognize(self, image: Image.Image) -> str:
+        """执行实际的文字识别"""
         pass
     
     async def preprocess_image(self, image: Image.Image) -> Image.Image:
-        """图片预处理"""
-        # 转换为RGB格式
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # 如果图片太大，适当缩放
-        max_size = (2048, 2048)
-        if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
-            image.thumbnail(max_size, Image.Resampling.LANCZOS)
-            self.log_event("图片已缩放", original_size=image.size, new_size=image.size)
-        
-        return image
+        """图片预处理：灰度、按DPI降采样、Sauvola二值化与倾斜校正（在线程池中执行）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, preprocess_page, image)
 
 
 class TesseractOCR(OCRService):
     """基于Tesseract的OCR服务"""
     
+    engine_name = "tesseract"
+
     def __init__(self):
-        self.lang = 'chi_sim+eng'  # 支持中文简体和英文
+        self.lang = settings.OCR_LANG  # 默认支持中文简体和英文
     
-    async def extract_text(self, image: Image.Image) -> str:
+    async def _recognize(self, image: Image.Image) -> str:
         """使用Tesseract提取文本"""
         try:
-            # 预处理图片
-            processed_image = await self.preprocess_image(image)
-            
-            # 在线程池中运行Tesseract（避免阻塞）
+            # 预处理与识别在同一次线程池调用中完成（避免阻塞）
             loop = asyncio.get_event_loop()
-            text = await loop.run_in_executor(
-                None,
-                lambda: pytesseract.image_to_string(processed_image, lang=self.lang)
-            )
+            text = await loop.run_in_executor(None, self._preprocess_and_recognize, image)
             
             # 清理提取的文本
             text = text.strip()
@@ -64,12 +96,90 @@ class TesseractOCR(OCRService):
             self.log_error("OCR文本提取失败", error_msg=str(e))
             raise
 
+    def _preprocess_and_recognize(self, image: Image.Image) -> str:
+        return self._tesseract(preprocess_page(image))
+
+    def _tesseract(self, processed_image: Image.Image) -> str:
+        return pytesseract.image_to_string(
+            processed_image, lang=self.lang, config=f"--dpi {settings.OCR_TARGET_DPI}"
+        )
+
+    async def _recognize_result(self, image: Image.Image) -> OCRResult:
+        """按版面切分为若干文字块并行识别，再按阅读顺序拼接"""
+        if not settings.OCR_LAYOUT_TILING:
+            return await super()._recognize_result(image)
+        try:
+            loop = asyncio.get_running_loop()
+            blocks, tiles = await self._preprocess_and_split(image)
+            texts = await asyncio.gather(*(self._recognize_tile(tile) for tile in tiles))
+            text, blocks = stitch_blocks(blocks, texts)
+            self.log_event("OCR文本提取完成", text_length=len(text), tiles=len(tiles), engine=self.engine_name)
+            return OCRResult(text=text, engine=self.engine_name, created_at=time.time(), blocks=blocks)
+        except Exception as e:
+            self.log_error("OCR文本提取失败", error_msg=str(e), engine=self.engine_name)
+            raise
+
+    async def _preprocess_and_split(self, image: Image.Image) -> Tuple[List[TextBlock], List[Image.Image]]:
+        """预处理整页并按版面切分为图块（在线程池中执行）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self._split_page(preprocess_page(image)))
+
+    @staticmethod
+    def _split_page(page: Image.Image) -> Tuple[List[TextBlock], List[Image.Image]]:
+        """切分已预处理的页面"""
+        return split_page(
+            page,
+            min_gap=settings.OCR_LAYOUT_MIN_GAP,
+            min_height=settings.OCR_LAYOUT_MIN_HEIGHT,
+            max_tiles=settings.OCR_LAYOUT_MAX_TILES,
+        )
+
+    async def _recognize_tile(self, tile: Image.Image) -> str:
+        """识别一个已预处理的图块"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._tesseract, tile)
+
+
+class PooledTesseractOCR(TesseractOCR):
+    """基于常驻Tesseract进程池的OCR服务（语言模型在worker中只加载一次）"""
+
+    engine_name = "tesseract_pool"
+
+    def __init__(self, pool: Optional["TesseractEnginePool"] = None):
+        super().__init__()
+        self.pool = pool or get_tesseract_engine_pool()
+
+    async def _recognize(self, image: Image.Image) -> str:
+        """在进程池中提取文本（灰度降采样在本进程完成以减小传输量，二值化与纠偏在worker中完成）"""
+        try:
+            loop = asyncio.get_running_loop()
+            reduced_image = await loop.run_in_executor(None, reduce_page, image)
+            text = (await self.pool.recognize(reduced_image)).strip()
+            self.log_event("OCR文本提取完成", text_length=len(text), engine=self.engine_name)
+            return text
+        except Exception as e:
+            self.log_error("OCR文本提取失败", error_msg=str(e), engine=self.engine_name)
+            raise
+
+    async def _preprocess_and_split(self, image: Image.Image) -> Tuple[List[TextBlock], List[Image.Image]]:
+        """灰度降采样在本进程完成，二值化与纠偏在worker中完成，再在本进程切分版面"""
+        loop = asyncio.get_running_loop()
+        reduced_image = await loop.run_in_executor(None, reduce_page, image)
+        page = await self.pool.preprocess_page(reduced_image)
+        return await loop.run_in_executor(None, self._split_page, page)
+
+    async def _recognize_tile(self, tile: Image.Image) -> str:
+        """图块分发到进程池中的不同worker并行识别"""
+        return await self.pool.recognize(tile, preprocess=False)
+
 
 # OCR服务工厂函数
 def get_ocr_service() -> OCRService:
     """获取OCR服务实例"""
     engine = settings.OCR_ENGINE.lower()
     
+    if engine == "tesseract_pool":
+        return PooledTesseractOCR()
     if engine == "tesseract":
         return TesseractOCR()
     else:
@@ -0,0 +1,288 @@
+"""
+OCR识别结果缓存
+
+学生经常重复提交同一张照片，/ocr/extract 与 /homework/grade 也会对同一张图片各识别一次。
+缓存分两种命中方式：
+
+- 精确命中：以解码后像素的SHA-256为键（与文件编码格式无关），存放在内存LRU + Redis/磁盘；
+- 近似命中（OCR_CACHE_NEAR_DUPLICATES，默认关闭）：对每张已识别图片计算差值哈希（dHash），
+  重新压缩、轻微缩放或裁边后的同一页汉明距离很小。64位粗哈希按8位分段建立倒排索引，
+  由抽屉原理，距离不超过阈值的两张图片至少有一段完全相同，查询只需比较同段的候选，
+  无需遍历全部条目；候选再用256位细哈希与宽高比复核。
+
+  注意：同一份印刷练习卷上不同学生的作答只差几处手写，在这个分辨率下通常也判为近似，
+  会把一个学生的识别结果返回给另一个学生，所以只在不会出现这种情况的部署中打开。
+"""
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from PIL import Image
+
+from ...core.logger import LoggerMixin
+from ...core.config import settings
+from ..llm.cache import CacheTier, DiskTier, MemoryLRUTier, RedisTier
+from .layout import TextBlock
+
+
+@dataclass
+class OCRResult:
+    """一次识别的结果"""
+
+    text: str
+    confidence: Optional[float] = None  # 引擎给出的平均置信度（0-100），不支持时为None
+    engine: str = ""
+    created_at: float = 0.0
+    blocks: List[TextBlock] = field(default_factory=list)  # 分块识别时各文字块的位置与字符区间
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "OCRResult":
+        data = json.loads(raw)
+        data["blocks"] = [TextBlock.from_dict(block) for block in data.get("blocks", [])]
+        return cls(**data)
+
+
+def image_fingerprint(image: Image.Image) -> str:
+    """基于解码后像素计算的SHA-256指纹（与文件编码格式无关）"""
+    digest = hashlib.sha256()
+    digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode("ascii"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def dhash(image: Image.Image, hash_size: int = 8) -> int:
+    """差值哈希：缩成 (hash_size+1)×hash_size 的灰度图，比较相邻像素的明暗"""
+    width = hash_size + 1
+    small = image.convert("L").resize((width, hash_size), Image.Resampling.BILINEAR)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * width
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class ImageSignature(NamedTuple):
+    """图片的感知特征"""
+
+    coarse: int  # 8×8 dHash，用于索引
+    fine: int  # 16×16 dHash，用于复核
+    aspect: float  # 宽高比
+
+
+def compute_signature(image: Image.Image) -> ImageSignature:
+    """计算图片的粗/细两级感知哈希与宽高比"""
+    gray = image.convert("L")
+    return ImageSignature(dhash(gray, 8), dhash(gray, 16), image.size[0] / max(1, image.size[1]))
+
+
+def fingerprint_and_signature(image: Image.Image) -> Tuple[str, ImageSignature]:
+    """一次性计算像素指纹与感知哈希（在线程池中调用）"""
+    return image_fingerprint(image), compute_signature(image)
+
+
+class PerceptualIndex:
+    """感知哈希的有界近邻索引（分段倒排 + LRU淘汰）"""
+
+    hash_bits = 64
+    band_bits = 8
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_distance: int = 6,
+        max_fine_distance: int = 24,
+        min_bits: int = 4,
+        max_aspect_delta: float = 0.05,
+    ):
+        self.max_entries = max_entries
+        self.bands = self.hash_bits // self.band_bits
+        # 抽屉原理：距离 <= bands-1 时保证至少一段相同
+        self.max_distance = min(max_distance, self.bands - 1)
+        self.max_fine_distance = max_fine_distance
+        self.min_bits = min_bits
+        self.max_aspect_delta = max_aspect_delta
+        self._entries: "OrderedDict[str, ImageSignature]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, int], Set[str]] = {}
+
+    def _band_keys(self, value: int) -> List[Tuple[int, int]]:
+        mask = (1 << self.band_bits) - 1
+        return [(band, (value >> (band * self.band_bits)) & mask) for band in range(self.bands)]
+
+    def informative(self, value: int) -> bool:
+        """纯色或几乎空白的图片哈希几乎全为0或全为1，不参与近似匹配"""
+        bits = value.bit_count()
+        return self.min_bits <= bits <= self.hash_bits - self.min_bits
+
+    def add(self, key: str, signature: ImageSignature) -> None:
+        if not self.informative(signature.coarse):
+            return
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        self._entries[key] = signature
+        for band_key in self._band_keys(signature.coarse):
+            self._buckets.setdefault(band_key, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            old_key, old_signature = self._entries.popitem(last=False)
+            self._discard(old_key, old_signature.coarse)
+
+    def _discard(self, key: str, value: int) -> None:
+        for band_key in self._band_keys(value):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._discard(key, entry.coarse)
+
+    def nearest(self, signature: ImageSignature) -> Optional[Tuple[str, int]]:
+        """返回细哈希距离最近且粗/细哈希都不超过阈值的条目 (key, distance)"""
+        if not self.informative(signature.coarse):
+            return None
+        candidates: Set[str] = set()
+        for band_key in self._band_keys(signature.coarse):
+            candidates.update(self._buckets.get(band_key, ()))
+
+        best: Optional[Tuple[str, int]] = None
+        for key in candidates:
+            other = self._entries[key]
+            if abs(other.aspect - signature.aspect) > self.max_aspect_delta * max(signature.aspect, other.aspect):
+                continue
+            if hamming_distance(signature.coarse, other.coarse) > self.max_distance:
+                continue
+            distance = hamming_distance(signature.fine, other.fine)
+            if distance <= self.max_fine_distance and (best is None or distance < best[1]):
+                best = (key, distance)
+        if best is not None:
+            self._entries.move_to_end(best[0])
+        return best
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class OCRResultCache(LoggerMixin):
+    """OCR识别结果缓存（精确 + 近似命中）"""
+
+    def __init__(
+        self,
+        memory: MemoryLRUTier,
+        backend: Optional[CacheTier] = None,
+        index: Optional[PerceptualIndex] = None,
+        ttl: int = 7 * 24 * 3600,
+    ):
+        self.memory = memory
+        self.backend = backend
+        self.index = index
+        self.ttl = ttl
+        self._hits: Dict[str, int] = {"exact": 0, "near": 0}
+        self._misses = 0
+        self._errors = 0
+
+    async def _read(self, key: str) -> Optional[OCRResult]:
+        raw = await self.memory.get(key)
+        if raw is None and self.backend is not None:
+            try:
+                raw = await self.backend.get(key)
+            except Exception as e:
+                self._errors += 1
+                self.log_warning("OCR缓存读取失败", tier=self.backend.name, error=str(e))
+                raw = None
+            if raw is not None:
+                await self.memory.set(key, raw, self.ttl)
+        if raw is None:
+            return None
+        try:
+            return OCRResult.from_json(raw)
+        except (ValueError, TypeError):
+            self._errors += 1
+            return None
+
+    async def get(self, key: str, signature: Optional[ImageSignature] = None) -> Optional[OCRResult]:
+        """先按像素指纹精确查找，未命中时按感知哈希查找近似图片"""
+        result = await self._read(key)
+        if result is not None:
+            self._hits["exact"] += 1
+            return result
+
+        if signature is not None and self.index is not None:
+            match = self.index.nearest(signature)
+            if match is not None:
+                near_key, distance = match
+                result = await self._read(near_key)
+                if result is not None:
+                    self._hits["near"] += 1
+                    self.log_event("OCR缓存近似命中", distance=distance)
+                    return result
+                # 原条目已过期或被淘汰
+                self.index.remove(near_key)
+
+        self._misses += 1
+        return None
+
+    async def set(self, key: str, result: OCRResult, signature: Optional[ImageSignature] = None) -> None:
+        """写入缓存，并把感知哈希加入近似索引"""
+        raw = result.to_json()
+        await self.memory.set(key, raw, self.ttl)
+        if self.backend is not None:
+            try:
+                await self.backend.set(key, raw, self.ttl)
+            except Exception as e:
+                self._errors += 1
+                self.log_warning("OCR缓存写入失败", tier=self.backend.name, error=str(e))
+        if signature is not None and self.index is not None:
+            self.index.add(key, signature)
+
+    def stats(self) -> Dict[str, Any]:
+        """命中/未命中统计"""
+        hits = sum(self._hits.values())
+        total = hits + self._misses
+        return {
+            "backend": self.backend.name if self.backend else None,
+            "hits": dict(self._hits),
+            "misses": self._misses,
+            "errors": self._errors,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "memory_entries": len(self.memory),
+            "index_entries": len(self.index) if self.index is not None else 0,
+        }
+
+
+_ocr_result_cache: Optional[OCRResultCache] = None
+
+
+def get_ocr_result_cache() -> OCRResultCache:
+    """获取全局OCR结果缓存（首次调用时按配置创建）"""
+    global _ocr_result_cache
+    if _ocr_result_cache is None:
+        from ...db.database import redis_client
+
+        memory = MemoryLRUTier(settings.OCR_CACHE_MEMORY_MAX_ENTRIES)
+        if redis_client is not None:
+            backend: CacheTier = RedisTier(redis_client, prefix="ai_tutor:ocr_cache:")
+        else:
+            backend = DiskTier(settings.OCR_CACHE_DIR, settings.OCR_CACHE_DISK_MAX_ENTRIES)
+        index = None
+        if settings.OCR_CACHE_NEAR_DUPLICATES:
+            index = PerceptualIndex(
+                settings.OCR_CACHE_INDEX_MAX_ENTRIES,
+                max_distance=settings.OCR_CACHE_MAX_HAMMING,
+                max_fine_distance=settings.OCR_CACHE_MAX_FINE_HAMMING,
+            )
+        _ocr_result_cache = OCRResultCache(memory, backend, index, ttl=settings.OCR_CACHE_TTL)
+    return _ocr_result_cache
@@ -0,0 +1,275 @@
+"""
+Tesseract常驻进程池
+
+pytesseract 每次识别都要把图片写成临时PNG、启动一个 tesseract 子进程并重新加载
+chi_sim+eng 语言模型。进程池中的每个worker在启动时加载一次引擎并常驻：
+
+- 安装了 tesserocr 时，worker 持有一个 PyTessBaseAPI，语言模型只加载一次；
+- 未安装时降级为在worker内调用 pytesseract（仍可避免占用主进程的线程池）。
+
+图片以原始像素缓冲（mode, size, bytes）经进程间管道传给worker，不再落盘编码；
+Sauvola二值化与倾斜校正（见 preprocess.py）也在worker中执行。
+worker崩溃时整池重建并重试一次；识别超时视为worker卡死，同样重建；
+定期向每个worker发送探活请求，失败时重建。
+"""
+import asyncio
+import importlib.util
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from ...core.logger import LoggerMixin
+from ...core.config import settings
+from .preprocess import binarize_and_deskew
+
+
+# ---- worker进程内执行的函数（需为模块级函数以便跨进程序列化） ----
+
+_worker_state: Dict[str, Any] = {}
+
+
+def init_tesseract_worker(lang: str) -> None:
+    """worker启动时加载Tesseract引擎"""
+    _worker_state.update(lang=lang, started=time.time(), tasks=0, api=None, backend="pytesseract")
+    if importlib.util.find_spec("tesserocr") is not None:
+        import tesserocr
+
+        _worker_state["api"] = tesserocr.PyTessBaseAPI(lang=lang)
+        _worker_state["backend"] = "tesserocr"
+
+
+def recognize_in_worker(mode: str, size: Tuple[int, int], data: bytes, preprocess: bool = True) -> str:
+    """在worker中识别一张图片的原始像素"""
+    image = Image.frombytes(mode, size, data)
+    if preprocess:
+        image = binarize_and_deskew(image)
+    api = _worker_state.get("api")
+    if api is not None:
+        api.SetImage(image)
+        api.SetSourceResolution(settings.OCR_TARGET_DPI)
+        text = api.GetUTF8Text()
+    else:
+        import pytesseract
+
+        text = pytesseract.image_to_string(
+            image,
+            lang=_worker_state.get("lang", "chi_sim+eng"),
+            config=f"--dpi {settings.OCR_TARGET_DPI}",
+        )
+    _worker_state["tasks"] = _worker_state.get("tasks", 0) + 1
+    return text
+
+
+def preprocess_in_worker(mode: str, size: Tuple[int, int], data: bytes) -> Tuple[str, Tuple[int, int], bytes]:
+    """在worker中对一页做二值化与倾斜校正，返回处理后的原始像素（供主进程切分版面）"""
+    image = binarize_and_deskew(Image.frombytes(mode, size, data))
+    return image.mode, image.size, image.tobytes()
+
+
+def ping_worker() -> Dict[str, Any]:
+    """探活：返回worker的进程号、引擎与已处理任务数"""
+    return {
+        "pid": os.getpid(),
+        "backend": _worker_state.get("backend"),
+        "tasks": _worker_state.get("tasks", 0),
+        "uptime": round(time.time() - _worker_state.get("started", time.time()), 1),
+    }
+
+
+# ---- 主进程侧的进程池管理 ----
+
+class TesseractEnginePool(LoggerMixin):
+    """常驻Tesseract worker进程池"""
+
+    def __init__(
+        self,
+        size: int,
+        lang: str = "chi_sim+eng",
+        task_timeout: float = 60.0,
+        max_tasks_per_child: int = 0,
+        start_method: str = "spawn",
+        initializer: Callable[[str], None] = init_tesseract_worker,
+        task: Callable[..., str] = recognize_in_worker,
+        ping: Callable[[], Dict[str, Any]] = ping_worker,
+        preprocess: bool = True,
+        preprocess_task: Callable[..., Tuple[str, Tuple[int, int], bytes]] = preprocess_in_worker,
+    ):
+        self.size = max(1, size)
+        self.lang = lang
+        self.task_timeout = task_timeout
+        self.max_tasks_per_child = max_tasks_per_child
+        self.start_method = start_method
+        self._initializer = initializer
+        self._task = task
+        self._ping = ping
+        self.preprocess = preprocess
+        self._preprocess_task = preprocess_task
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._restart_lock = asyncio.Lock()
+        self._health_task: Optional[asyncio.Task] = None
+        self.tasks = 0
+        self.failures = 0
+        self.restarts = 0
+        self.last_health: Optional[Dict[str, Any]] = None
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        kwargs: Dict[str, Any] = {
+            "max_workers": self.size,
+            "mp_context": multiprocessing.get_context(self.start_method),
+            "initializer": self._initializer,
+            "initargs": (self.lang,),
+        }
+        # 定期回收worker以释放Tesseract累积的内存（fork方式不支持）
+        if self.max_tasks_per_child > 0 and self.start_method != "fork":
+            kwargs["max_tasks_per_child"] = self.max_tasks_per_child
+        return ProcessPoolExecutor(**kwargs)
+
+    @property
+    def started(self) -> bool:
+        return self._executor is not None
+
+    async def start(self) -> None:
+        """创建进程池并通过探活请求预热worker（加载引擎）"""
+        if self._executor is None:
+            self._executor = self._create_executor()
+            self.log_event("OCR进程池启动", size=self.size, lang=self.lang, start_method=self.start_method)
+            if importlib.util.find_spec("tesserocr") is None:
+                # worker与主进程环境相同，此处缺失即所有worker都降级
+                self.log_warning(
+                    "未安装tesserocr，OCR进程池降级为pytesseract，每张图片仍会启动tesseract子进程并重新加载语言模型；"
+                    "安装 ocr 扩展（pip install 'ai-tutor[ocr]'）后才能常驻引擎"
+                )
+        await self.health_check()
+
+    async def recognize(self, image: Image.Image, preprocess: Optional[bool] = None) -> str:
+        """在worker中识别图片（preprocess=False 表示图片已经预处理过）；进程池损坏时重建并重试一次"""
+        if self._executor is None:
+            await self.start()
+        preprocess = self.preprocess if preprocess is None else preprocess
+        text = await self._submit(self._task, image.mode, image.size, image.tobytes(), preprocess)
+        self.tasks += 1
+        return text
+
+    async def preprocess_page(self, image: Image.Image) -> Image.Image:
+        """在worker中对整页做二值化与倾斜校正（分块识别前切分版面用）"""
+        if self._executor is None:
+            await self.start()
+        mode, size, data = await self._submit(self._preprocess_task, image.mode, image.size, image.tobytes())
+        return Image.frombytes(mode, size, data)
+
+    async def _submit(self, fn: Callable[..., Any], *payload: Any) -> Any:
+        """提交到进程池；进程池损坏时重建并重试一次，超时时重建后抛出"""
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            executor = self._executor
+            try:
+                future = loop.run_in_executor(executor, fn, *payload)
+                return await asyncio.wait_for(future, timeout=self.task_timeout)
+            except BrokenProcessPool as e:
+                self.failures += 1
+                self.log_warning("OCR worker进程异常退出，重建进程池", attempt=attempt + 1, error=str(e))
+                await self._restart(executor)
+                if attempt == 1:
+                    raise
+                continue
+            except asyncio.TimeoutError:
+                self.failures += 1
+                self.log_error("OCR识别超时，重建进程池", timeout=self.task_timeout)
+                await self._restart(executor)
+                raise
+        raise RuntimeError("unreachable")
+
+    async def health_check(self) -> Dict[str, Any]:
+        """向每个worker发送探活请求，失败时重建进程池"""
+        executor = self._executor
+        if executor is None:
+            return {"status": "stopped", "workers": []}
+        loop = asyncio.get_running_loop()
+        try:
+            workers: List[Dict[str, Any]] = await asyncio.wait_for(
+                asyncio.gather(*(loop.run_in_executor(executor, self._ping) for _ in range(self.size))),
+                timeout=self.task_timeout,
+            )
+            unique = {w["pid"]: w for w in workers}
+            self.last_health = {"status": "healthy", "checked_at": time.time(), "workers": list(unique.values())}
+        except (BrokenProcessPool, asyncio.TimeoutError) as e:
+            self.log_warning("OCR进程池探活失败，重建进程池", error=type(e).__name__)
+            self.last_health = {"status": "restarting", "checked_at": time.time(), "error": type(e).__name__}
+            await self._restart(executor)
+        return self.last_health
+
+    async def _restart(self, broken: Optional[ProcessPoolExecutor]) -> None:
+        """重建进程池（多个请求同时发现损坏时只重建一次）"""
+        async with self._restart_lock:
+            if self._executor is not broken:
+                return
+            self.restarts += 1
+            if broken is not None:
+                # 终止可能卡死的worker，不等待正在执行的任务
+                for process in list((getattr(broken, "_processes", None) or {}).values()):
+                    if process.is_alive():
+                        process.terminate()
+                broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._create_executor()
+            self.log_event("OCR进程池已重建", restarts=self.restarts)
+
+    async def _run_health_checks(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.health_check()
+            except Exception as e:
+                self.log_error("OCR进程池探活任务异常", error=str(e))
+
+    def start_health_checks(self, interval: Optional[float] = None) -> None:
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.create_task(
+                self._run_health_checks(interval or settings.OCR_POOL_HEALTH_INTERVAL)
+            )
+
+    async def shutdown(self) -> None:
+        """停止探活任务并关闭进程池"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, lambda: executor.shutdown(wait=True, cancel_futures=True))
+            self.log_event("OCR进程池已关闭", tasks=self.tasks, restarts=self.restarts)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "lang": self.lang,
+            "started": self.started,
+            "tasks": self.tasks,
+            "failures": self.failures,
+            "restarts": self.restarts,
+            "health": self.last_health,
+        }
+
+
+_tesseract_engine_pool: Optional[TesseractEnginePool] = None
+
+
+def get_tesseract_engine_pool() -> TesseractEnginePool:
+    """获取全局Tesseract进程池（首次调用时按配置创建，进程在 start 时启动）"""
+    global _tesseract_engine_pool
+    if _tesseract_engine_pool is None:
+        _tesseract_engine_pool = TesseractEnginePool(
+            size=settings.OCR_POOL_SIZE or os.cpu_count() or 1,
+            lang=settings.OCR_LANG,
+            task_timeout=settings.OCR_POOL_TASK_TIMEOUT,
+            max_tasks_per_child=settings.OCR_POOL_MAX_TASKS_PER_CHILD,
+        )
+    return _tesseract_engine_pool
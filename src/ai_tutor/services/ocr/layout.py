@@ -0,0 +1,133 @@
+"""
+版面切分与分块识别
+
+整页A4作业作为一张图片送入Tesseract时只能用到一个CPU核。这里在预处理后的二值图上
+做水平投影：空白行连续超过 min_gap 的位置视为题目之间的间隔，把页面切成若干横向条带，
+过矮的条带与相邻条带合并，条带总数不超过 max_tiles。各条带裁掉左右空白后作为独立的图块
+并行识别，再按从上到下的阅读顺序拼接文本，并记录每块在拼接文本中的字符区间与页面坐标，
+供题目解析定位。
+"""
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+BLOCK_SEPARATOR = "\n\n"
+
+
+@dataclass
+class TextBlock:
+    """页面中的一个文字块"""
+
+    index: int
+    bbox: Tuple[int, int, int, int]  # (left, top, right, bottom)，预处理后图片上的像素坐标
+    text: str = ""
+    start: int = 0  # 在拼接后全文中的字符区间 [start, end)
+    end: int = 0
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TextBlock":
+        return cls(**{**data, "bbox": tuple(data["bbox"])})
+
+
+def _runs(mask: np.ndarray) -> List[Tuple[int, int]]:
+    """布尔序列中连续为True的区间 [start, end)"""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+
+def _merge_bands(bands: List[Tuple[int, int]], min_height: int, max_tiles: int) -> List[Tuple[int, int]]:
+    """合并过矮的条带，并把条带数压到 max_tiles 以内（优先合并间隔最小的相邻条带）"""
+    bands = list(bands)
+
+    def merge(i: int) -> None:
+        bands[i:i + 2] = [(bands[i][0], bands[i + 1][1])]
+
+    def gap(i: int) -> int:
+        return bands[i + 1][0] - bands[i][1]
+
+    while len(bands) > 1:
+        short = [i for i, (top, bottom) in enumerate(bands) if bottom - top < min_height]
+        if not short:
+            break
+        i = short[0]
+        if i == 0:
+            merge(0)
+        elif i == len(bands) - 1:
+            merge(i - 1)
+        else:
+            merge(i - 1 if gap(i - 1) <= gap(i) else i)
+
+    while len(bands) > max(1, max_tiles):
+        merge(min(range(len(bands) - 1), key=gap))
+    return bands
+
+
+def find_blocks(
+    binary: np.ndarray,
+    min_gap: int = 24,
+    min_height: int = 80,
+    max_tiles: int = 8,
+    margin: int = 8,
+) -> List[TextBlock]:
+    """在二值图（文字为0）上按水平投影切分文字块"""
+    ink = binary == 0
+    height, width = ink.shape
+    # 忽略零星噪点：一行中墨迹像素少于千分之二视为空白
+    row_has_ink = ink.sum(axis=1) > max(2, width // 500)
+    content = _runs(row_has_ink)
+    if not content:
+        return []
+
+    bands: List[Tuple[int, int]] = [content[0]]
+    for top, bottom in content[1:]:
+        if top - bands[-1][1] >= min_gap:
+            bands.append((top, bottom))
+        else:
+            bands[-1] = (bands[-1][0], bottom)
+    bands = _merge_bands(bands, min_height, max_tiles)
+
+    blocks: List[TextBlock] = []
+    for top, bottom in bands:
+        columns = np.flatnonzero(ink[top:bottom].any(axis=0))
+        if columns.size == 0:
+            continue
+        left = max(0, int(columns[0]) - margin)
+        right = min(width, int(columns[-1]) + 1 + margin)
+        blocks.append(
+            TextBlock(
+                index=len(blocks),
+                bbox=(left, max(0, top - margin), right, min(height, bottom + margin)),
+            )
+        )
+    return blocks
+
+
+def split_page(
+    page: Image.Image, min_gap: int, min_height: int, max_tiles: int
+) -> Tuple[List[TextBlock], List[Image.Image]]:
+    """切分预处理后的页面，返回文字块与对应的图块"""
+    blocks = find_blocks(np.asarray(page), min_gap=min_gap, min_height=min_height, max_tiles=max_tiles)
+    return blocks, [page.crop(block.bbox) for block in blocks]
+
+
+def stitch_blocks(blocks: Sequence[TextBlock], texts: Sequence[str]) -> Tuple[str, List[TextBlock]]:
+    """按阅读顺序拼接各块文本，丢弃空块并记录字符区间"""
+    parts: List[str] = []
+    stitched: List[TextBlock] = []
+    offset = 0
+    for block, text in zip(blocks, texts):
+        text = text.strip()
+        if not text:
+            continue
+        if parts:
+            offset += len(BLOCK_SEPARATOR)
+        parts.append(text)
+        stitched.append(
+            TextBlock(index=len(stitched), bbox=block.bbox, text=text, start=offset, end=offset + len(text))
+        )
+        offset += len(text)
+    return BLOCK_SEPARATOR.join(parts), stitched
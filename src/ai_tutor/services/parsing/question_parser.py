@@ -4,9 +4,50 @@
 import re
 from enum import Enum
 from dataclasses import dataclass
-from typing import List, Dict, Any, Optional, Tuple
+from typing import TYPE_CHECKING, List, Dict, Any, Iterator, Optional, Sequence, Tuple
 from ...core.logger import LoggerMixin
 
+if TYPE_CHECKING:
+    from ..ocr.layout import TextBlock
+
+
+# 行首或空白后的题号（1. / 1、 / 第1题 / (1)），排除小数，用于快速估计题目数
+QUESTION_START_PATTERN = re.compile(
+    r'(?:^|(?<=\s))(?:\d+\s*[\.。、．](?!\d)|第\s*[一二三四五六七八九十\d]+\s*[题道]|[（(]\d+[)）])',
+    re.MULTILINE,
+)
+
+# 题号模式：(分支名, 正则, 前导字符)。正则中唯一的捕获组是题号；
+# 前导字符非空时，前一个字符同属该类的位置不是题号起点（"12." 只在 "1" 处切分）
+QUESTION_MARKERS: Tuple[Tuple[str, str, str], ...] = (
+    ("dot", r'(\d+)\s*[\.。]', r'\d'),                                      # 1. 2. 3.
+    ("comma", r'(\d+)\s*[、,]', r'\d'),                                     # 1、2、3、
+    ("paren", r'\((\d+)\)', ''),                                            # (1) (2) (3)
+    ("full_paren", r'（(\d+)）', ''),                                        # （1）（2）（3）
+    ("ordinal", r'第\s*([一二三四五六七八九十\d]+)\s*[题道]', ''),             # 第一题 第二道
+    ("chinese", r'([一二三四五六七八九十]+)[、.]', r'[一二三四五六七八九十]'),   # 一、二、三、
+    ("option", r'([ABCD])\s*[\.。]', ''),                                    # A. B. C. D.
+    ("title", r'题目\s*(\d+)', ''),                                          # 题目1 题目2
+)
+
+
+def _marker_branch(name: str, pattern: str, leading: str) -> str:
+    """把题号模式改写为命名分支：整个题号为 name，题号数字为 name_no"""
+    body = re.sub(r'(?<!\\)\((?!\?)', f'(?P<{name}_no>', pattern, count=1)
+    guard = f'(?<!{leading})' if leading else ''
+    return f'{guard}(?P<{name}>{body})'
+
+
+# 所有题号模式合并成一个交替式，放在零宽前瞻里：一次扫描就能找到任一模式匹配的每个起点，
+# 不同模式的匹配互相重叠时（如 "题目1." 中的 "题目1" 和 "1."）也都保留，与逐个模式扫描的切分点一致；
+# 同一位置多个模式都匹配时取排在前面的分支
+QUESTION_MARKER_PATTERN = re.compile(
+    '(?=' + '|'.join(_marker_branch(*marker) for marker in QUESTION_MARKERS) + ')',
+    re.IGNORECASE,
+)
+
+CHINESE_DIGITS = {'一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+
 
 class QuestionType(Enum):
     """题目类型枚举"""
@@ -42,89 +83,141 @@ class ParsedQuestion:
     metadata: Dict[str, Any]
 
 
+# 题目类型识别模式
+QUESTION_TYPE_PATTERNS: Dict[QuestionType, List[re.Pattern]] = {
+    q_type: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+    for q_type, patterns in {
+        QuestionType.MULTIPLE_CHOICE: [
+            r'[ABCD][.、）)].*?[ABCD][.、）)]',
+            r'选择.*?答案',
+            r'下列.*?正确.*?是',
+            r'以下.*?选项'
+        ],
+        QuestionType.FILL_IN_BLANK: [
+            r'___+',
+            r'填空',
+            r'括号内',
+            r'\(\s*\)',
+            r'空白处'
+        ],
+        QuestionType.TRUE_FALSE: [
+            r'判断.*?对错',
+            r'正确.*?错误',
+            r'对.*?错',
+            r'√.*?×'
+        ],
+        QuestionType.CALCULATION: [
+            r'计算',
+            r'求.*?值',
+            r'解.*?方程',
+            r'=.*?\?',
+            r'\d+\s*[+\-×÷]\s*\d+'
+        ],
+        QuestionType.PROOF: [
+            r'证明',
+            r'求证',
+            r'试证',
+            r'证：'
+        ]
+    }.items()
+}
+
+# 答案区域识别模式
+ANSWER_REGION_PATTERNS: List[re.Pattern] = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        r'答案?[:：]\s*(.{1,100})',
+        r'解[:：]\s*(.{1,200})',
+        r'[学生]答[:：]?\s*(.{1,100})',
+        r'答题[:：]?\s*(.{1,100})',
+        r'[手写|笔迹|学生字迹][:：]?\s*(.{1,100})',
+    )
+]
+
+
 class QuestionParser(LoggerMixin):
     """题目解析器 - 识别和结构化解析题目"""
     
     def __init__(self):
-        # 题目编号识别模式
-        self.question_number_patterns = [
-            r'(\d+)\s*[\.。]',                    # 1. 2. 3.
-            r'(\d+)\s*[、,]',                    # 1、2、3、
-            r'\((\d+)\)',                        # (1) (2) (3)
-            r'（(\d+)）',                        # （1）（2）（3）
-            r'第\s*([一二三四五六七八九十\d]+)\s*[题道]',  # 第一题 第二道
-            r'([一二三四五六七八九十]+)[、.]',      # 一、二、三、
-            r'([ABCD])\s*[\.。]',                # A. B. C. D.
-            r'题目\s*(\d+)',                     # 题目1 题目2
-        ]
-        
-        # 题目类型识别模式
-        self.question_type_patterns = {
-            QuestionType.MULTIPLE_CHOICE: [
-                r'[ABCD][.、）)].*?[ABCD][.、）)]',
-                r'选择.*?答案',
-                r'下列.*?正确.*?是',
-                r'以下.*?选项'
-            ],
-            QuestionType.FILL_IN_BLANK: [
-                r'___+',
-                r'填空',
-                r'括号内',
-                r'\(\s*\)',
-                r'空白处'
-            ],
-            QuestionType.TRUE_FALSE: [
-                r'判断.*?对错',
-                r'正确.*?错误',
-                r'对.*?错',
-                r'√.*?×'
-            ],
-            QuestionType.CALCULATION: [
-                r'计算',
-                r'求.*?值',
-                r'解.*?方程',
-                r'=.*?\?',
-                r'\d+\s*[+\-×÷]\s*\d+'
-            ],
-            QuestionType.PROOF: [
-                r'证明',
-                r'求证',
-                r'试证',
-                r'证：'
-            ]
-        }
-        
-        # 答案区域识别模式
-        self.answer_region_patterns = [
-            r'答案?[:：]\s*(.{1,100})',
-            r'解[:：]\s*(.{1,200})',
-            r'[学生]答[:：]?\s*(.{1,100})',
-            r'答题[:：]?\s*(.{1,100})',
-            r'[手写|笔迹|学生字迹][:：]?\s*(.{1,100})',
-        ]
-    
-    def parse_questions(self, text: str) -> List[ParsedQuestion]:
-        """解析OCR文本中的所有题目"""
+        self.question_marker_pattern = QUESTION_MARKER_PATTERN
+        self.question_type_patterns = QUESTION_TYPE_PATTERNS
+        self.answer_region_patterns = ANSWER_REGION_PATTERNS
+
+    def parse_questions(
+        self, text: str, blocks: Optional[Sequence["TextBlock"]] = None
+    ) -> List[ParsedQuestion]:
+        """解析OCR文本中的所有题目
+
+        blocks 为分块OCR给出的文字块（按阅读顺序），用于在没有题号时按块分题，
+        并在每道题的 metadata 中记录所在文字块的序号与页面坐标。
+        """
         self.log_event("开始解析题目", text_length=len(text))
-        
-        # 预处理文本
+        parsed_questions = list(self.iter_questions(text, blocks))
+        self.log_event("题目解析完成", total_questions=len(parsed_questions))
+        return parsed_questions
+
+    def iter_questions(
+        self, text: str, blocks: Optional[Sequence["TextBlock"]] = None
+    ) -> Iterator[ParsedQuestion]:
+        """逐题解析OCR文本，解析出一道题就产出一道
+
+        题号切分只扫描一遍全文，耗时随文本长度线性增长；上百页的OCR全文可以边解析边处理，
+        不必等全部题目解析完。blocks 的用法同 parse_questions。
+        """
         cleaned_text = self._preprocess_text(text)
-        
-        # 分割题目
-        question_segments = self._segment_questions(cleaned_text)
-        
-        parsed_questions = []
-        for i, segment in enumerate(question_segments):
+        block_texts = [self._preprocess_text(block.text) for block in blocks or []]
+        spans = self._block_spans(cleaned_text, blocks, block_texts) if blocks else []
+
+        cursor = 0
+        span_index = 0
+        for i, (segment, start, marker) in enumerate(self._iter_segments(cleaned_text, block_texts)):
             try:
-                question = self._parse_single_question(segment, i + 1)
-                if question:
-                    parsed_questions.append(question)
+                question = self._parse_single_question(segment, i + 1, marker)
             except Exception as e:
                 self.log_warning(f"解析第{i+1}题失败", error=str(e), segment=segment[:100])
                 continue
-        
-        self.log_event("题目解析完成", total_questions=len(parsed_questions))
-        return parsed_questions
+
+            if spans:
+                # 按题目起始位置找到所在的文字块（题目与文字块都按位置递增）
+                pos = start if start >= 0 else cleaned_text.find(segment, cursor)
+                if pos >= 0:
+                    cursor = pos
+                    while span_index < len(spans) and spans[span_index][1] <= pos:
+                        span_index += 1
+                    if span_index < len(spans) and spans[span_index][0] <= pos:
+                        block = spans[span_index][2]
+                        question.metadata["block_index"] = block.index
+                        question.metadata["bbox"] = list(block.bbox)
+            yield question
+
+    def estimate_question_count(self, text: str) -> int:
+        """按题号粗略估计题目数（一次正则扫描，不做完整解析）"""
+        return len(QUESTION_START_PATTERN.findall(text))
+
+    def preamble(self, text: str, questions: Sequence[ParsedQuestion]) -> str:
+        """第一道题之前的卷头文字（试卷标题、考试说明等）"""
+        cleaned_text = self._preprocess_text(text)
+        if not questions:
+            return ""
+        pos = cleaned_text.find(questions[0].raw_text)
+        return cleaned_text[:pos].strip() if pos > 0 else ""
+
+    def _block_spans(
+        self,
+        cleaned_text: str,
+        blocks: Sequence["TextBlock"],
+        block_texts: List[str],
+    ) -> List[Tuple[int, int, "TextBlock"]]:
+        """文字块在预处理后全文中的位置"""
+        spans = []
+        cursor = 0
+        for block, block_text in zip(blocks, block_texts):
+            pos = cleaned_text.find(block_text, cursor)
+            if pos < 0:
+                continue
+            spans.append((pos, pos + len(block_text), block))
+            cursor = pos + len(block_text)
+        return spans
     
     def _preprocess_text(self, text: str) -> str:
         """预处理OCR文本"""
@@ -150,48 +243,52 @@ class QuestionParser(LoggerMixin):
         
         return text.strip()
     
-    def _segment_questions(self, text: str) -> List[str]:
-        """将文本分割为独立的题目段落"""
-        segments = []
-        
-        # 尝试按题目编号分割
-        question_splits = []
-        for pattern in self.question_number_patterns:
-            matches = list(re.finditer(pattern, text, re.IGNORECASE))
-            for match in matches:
-                question_splits.append((match.start(), match.group(0), match.group(1)))
-        
-        # 按位置排序
-        question_splits.sort(key=lambda x: x[0])
-        
-        if not question_splits:
-            # 没有找到明确的题目编号，按段落分割
-            paragraphs = [p.strip() for p in text.split('\n') if p.strip()]
-            return paragraphs[:5]  # 最多返回5个段落
-        
-        # 根据题目分割点提取内容
-        for i, (start_pos, marker, number) in enumerate(question_splits):
-            if i + 1 < len(question_splits):
-                end_pos = question_splits[i + 1][0]
-                segment = text[start_pos:end_pos].strip()
-            else:
-                segment = text[start_pos:].strip()
-            
-            if len(segment) > 10:  # 过滤太短的段落
-                segments.append(segment)
-        
-        return segments
+    def _iter_segments(
+        self, text: str, block_texts: Optional[List[str]] = None
+    ) -> Iterator[Tuple[str, int, Optional[re.Match]]]:
+        """将文本分割为独立的题目段落，逐段产出 (段落, 起始位置, 段首题号匹配)
+
+        没有题号的段落起始位置为 -1，题号匹配为 None。
+        """
+        previous = None
+        for match in self.question_marker_pattern.finditer(text):
+            if previous is not None:
+                segment = text[previous.start():match.start()].strip()
+                if len(segment) > 10:  # 过滤太短的段落
+                    yield segment, previous.start(), previous
+            previous = match
+
+        if previous is not None:
+            segment = text[previous.start():].strip()
+            if len(segment) > 10:
+                yield segment, previous.start(), previous
+            return
+
+        # 没有找到明确的题目编号：有版面分块时按文字块分割，否则按段落分割（最多5段）
+        if block_texts:
+            fallback = [t for t in block_texts if t]
+        else:
+            fallback = [p.strip() for p in text.split('\n') if p.strip()]
+        for segment in fallback[:5]:
+            yield segment, -1, None
     
-    def _parse_single_question(self, segment: str, default_number: int) -> Optional[ParsedQuestion]:
-        """解析单个题目"""
-        # 提取题目编号
-        question_number = self._extract_question_number(segment) or default_number
+    def _parse_single_question(
+        self, segment: str, default_number: int, marker: Optional[re.Match] = None
+    ) -> Optional[ParsedQuestion]:
+        """解析单个题目；marker 为段首的题号匹配"""
+        marker_length = 0
+        question_number = None
+        if marker is not None:
+            name = marker.lastgroup
+            marker_length = marker.end(name) - marker.start()
+            question_number = self._parse_question_number(marker.group(f"{name}_no"))
+        question_number = question_number or default_number
         
         # 识别题目类型
         question_type = self._identify_question_type(segment)
         
         # 提取题目文本（去掉编号部分）
-        question_text = self._extract_question_text(segment)
+        question_text = self._extract_question_text(segment, marker_length)
         
         # 识别答案区域
         answer_regions = self._identify_answer_regions(segment)
@@ -217,36 +314,27 @@ class QuestionParser(LoggerMixin):
             }
         )
     
-    def _extract_question_number(self, text: str) -> Optional[int]:
-        """提取题目编号"""
-        for pattern in self.question_number_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                number_str = match.group(1)
-                try:
-                    # 处理中文数字
-                    if number_str in ['一', '二', '三', '四', '五', '六', '七', '八', '九', '十']:
-                        chinese_numbers = {'一': 1, '二': 2, '三': 3, '四': 4, '五': 5,
-                                         '六': 6, '七': 7, '八': 8, '九': 9, '十': 10}
-                        return chinese_numbers.get(number_str)
-                    else:
-                        return int(number_str)
-                except ValueError:
-                    continue
-        return None
+    def _parse_question_number(self, number_str: str) -> Optional[int]:
+        """题号转为整数，支持阿拉伯数字和一到九十九的中文数字；选项字母等返回 None"""
+        try:
+            return int(number_str)
+        except ValueError:
+            pass
+        if '十' not in number_str:
+            return CHINESE_DIGITS.get(number_str)
+        tens, _, ones = number_str.partition('十')
+        tens_value = CHINESE_DIGITS.get(tens) if tens else 1
+        ones_value = CHINESE_DIGITS.get(ones) if ones else 0
+        if tens_value is None or ones_value is None:
+            return None
+        return tens_value * 10 + ones_value
     
     def _identify_question_type(self, text: str) -> QuestionType:
         """识别题目类型"""
-        text_lower = text.lower()
-        
         # 计算每种类型的匹配分数
         type_scores = {}
         for q_type, patterns in self.question_type_patterns.items():
-            score = 0
-            for pattern in patterns:
-                matches = len(re.findall(pattern, text, re.IGNORECASE))
-                score += matches
-            type_scores[q_type] = score
+            type_scores[q_type] = sum(len(pattern.findall(text)) for pattern in patterns)
         
         # 返回得分最高的类型
         if type_scores:
@@ -263,17 +351,14 @@ class QuestionParser(LoggerMixin):
         
         return QuestionType.UNKNOWN
     
-    def _extract_question_text(self, segment: str) -> str:
-        """提取题目文本（移除编号和答案部分）"""
-        text = segment
-        
+    def _extract_question_text(self, segment: str, marker_length: int = 0) -> str:
+        """提取题目文本（移除段首编号和答案部分）"""
         # 移除题目编号
-        for pattern in self.question_number_patterns:
-            text = re.sub(pattern, '', text, count=1)
+        text = segment[marker_length:]
         
         # 移除答案部分
         for pattern in self.answer_region_patterns:
-            text = re.sub(pattern, '', text, flags=re.IGNORECASE)
+            text = pattern.sub('', text)
         
         # 清理多余空白
         text = re.sub(r'\s+', ' ', text).strip()
@@ -289,8 +374,7 @@ class QuestionParser(LoggerMixin):
         regions = []
         
         for pattern in self.answer_region_patterns:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
+            for match in pattern.finditer(text):
                 start_pos = match.start(1)  # 答案内容的开始位置
                 end_pos = match.end(1)      # 答案内容的结束位置
                 content = match.group(1).strip()
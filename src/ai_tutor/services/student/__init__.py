@@ -5,6 +5,9 @@
 from .homework_service import HomeworkService
 from .student_service import StudentService
 from .progress_service import ProgressService, get_progress_service
+from .batch_grading import BatchGradingPipeline, close_batch_items, collect_batch_items
+from .grading_jobs import GradingJob, GradingJobManager, get_grading_job_manager
+from .idempotency import GradingIdempotency, get_grading_idempotency
 from .exceptions import (
     StudentServiceError,
     StudentNotFoundError,
@@ -19,6 +22,14 @@ __all__ = [
     "StudentService",
     "ProgressService",
     "get_progress_service",
+    "BatchGradingPipeline",
+    "close_batch_items",
+    "collect_batch_items",
+    "GradingJob",
+    "GradingJobManager",
+    "get_grading_job_manager",
+    "GradingIdempotency",
+    "get_grading_idempotency",
     "StudentServiceError",
     "StudentNotFoundError",
     "DuplicateStudentError",
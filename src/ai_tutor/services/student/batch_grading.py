@@ -0,0 +1,329 @@
+"""
+班级批量批改流水线
+
+老师一次上传全班作业时，逐张调用 /homework/grade 会让OCR（CPU）与LLM（等待网络）交替空闲。
+这里把批改拆成四个阶段，每个阶段有独立的并发数与有界队列：
+
+    解码（线程池） → OCR（进程池/线程池） → 构建提示词 → LLM批改（同时在线程池中做文本分析与题目解析）
+
+第k+1张的OCR与第k张的LLM调用同时进行；队列有界，慢阶段会反压上游，
+同时驻留内存的已解码图片不超过 解码并发 + 队列容量 + OCR并发 张。
+每张作业批改完成即产出结果（按完成顺序），最后产出整批的吞吐报告。
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, BinaryIO, Callable, Dict, List, Optional
+
+from PIL import Image
+from starlette.concurrency import run_in_threadpool
+
+from ...core.config import settings
+from ...core.logger import LoggerMixin
+from ...core.metrics import stage_timer
+from ...utils.uploads import decode_image, upload_size
+from ..ocr import OCRResult
+from ..ocr.preprocess import target_long_side
+from ..parsing.question_parser import ParsedQuestion
+from .homework_service import HomeworkService
+
+
+STAGES = ("decode", "ocr", "parse", "llm")  # parse阶段只构建提示词并启动后台解析
+
+ZIP_CONTENT_TYPES = ("application/zip", "application/x-zip-compressed")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+@dataclass
+class BatchItem:
+    """批次中的一张作业图片"""
+
+    index: int
+    filename: str
+    open: Callable[[], BinaryIO]
+    size: int = 0
+    source: Optional[BinaryIO] = None  # 批次持有的上传副本（同一zip内的条目共用一个）
+    error: Optional[Exception] = None
+    image: Optional[Image.Image] = None
+    ocr: Optional[OCRResult] = None
+    text_analysis: Dict[str, Any] = field(default_factory=dict)
+    parsed_questions: List[ParsedQuestion] = field(default_factory=list)
+    prompt: str = ""
+    analysis: Optional["asyncio.Task"] = None  # 线程池中的文本分析与题目解析
+    result: Optional[Dict[str, Any]] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    started_at: float = 0.0
+
+    @property
+    def student(self) -> str:
+        """按惯例作业图片以学生姓名或学号命名"""
+        return os.path.splitext(os.path.basename(self.filename))[0]
+
+
+def _invalid(index: int, filename: str, message: str) -> BatchItem:
+    return BatchItem(index=index, filename=filename, open=lambda: None, error=ValueError(message))
+
+
+def _owned_copy(upload) -> BinaryIO:
+    """把上传文件复制到批次自己持有的临时文件
+
+    请求处理函数返回StreamingResponse后FastAPI即关闭表单文件，而解码在流式响应体中才进行，
+    因此不能直接引用 upload.file。
+    """
+    copy = tempfile.TemporaryFile()
+    upload.file.seek(0)
+    shutil.copyfileobj(upload.file, copy)
+    copy.seek(0)
+    return copy
+
+
+def _zip_items(upload, start: int) -> List[BatchItem]:
+    """展开zip中的图片；按目录项声明的大小检查，不解压超限文件"""
+    source = _owned_copy(upload)
+    try:
+        archive = zipfile.ZipFile(source)
+    except zipfile.BadZipFile as e:
+        source.close()
+        return [_invalid(start, upload.filename or "archive.zip", f"压缩包损坏: {e}")]
+
+    items: List[BatchItem] = []
+    for info in archive.infolist():
+        name = info.filename
+        basename = os.path.basename(name)
+        if info.is_dir() or not basename or basename.startswith(".") or name.startswith("__MACOSX/"):
+            continue
+        if not basename.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        index = start + len(items)
+        if info.file_size > settings.MAX_FILE_SIZE:
+            items.append(_invalid(index, name, f"文件过大。最大支持 {settings.MAX_FILE_SIZE // (1024*1024)}MB"))
+            continue
+        items.append(
+            BatchItem(
+                index=index,
+                filename=name,
+                open=lambda info=info: archive.open(info),
+                size=info.file_size,
+                source=source,
+            )
+        )
+    if not items:
+        source.close()
+    return items
+
+
+def collect_batch_items(files: List[Any]) -> List[BatchItem]:
+    """把上传的图片与zip压缩包整理为批次条目；单个文件不合法只标记该条目失败
+
+    合法的上传在此复制为批次持有的临时文件，用完后调用 close_batch_items 释放。
+    """
+    items: List[BatchItem] = []
+    for upload in files:
+        filename = upload.filename or f"image_{len(items) + 1}"
+        if upload.content_type in ZIP_CONTENT_TYPES or filename.lower().endswith(".zip"):
+            items.extend(_zip_items(upload, len(items)))
+            continue
+
+        index = len(items)
+        if upload.content_type not in settings.ALLOWED_IMAGE_TYPES:
+            items.append(_invalid(index, filename, f"不支持的文件类型: {upload.content_type}"))
+            continue
+        size = upload_size(upload)
+        if size > settings.MAX_FILE_SIZE:
+            items.append(_invalid(index, filename, f"文件过大。最大支持 {settings.MAX_FILE_SIZE // (1024*1024)}MB"))
+            continue
+        source = _owned_copy(upload)
+        items.append(
+            BatchItem(index=index, filename=filename, open=lambda source=source: source, size=size, source=source)
+        )
+    return items
+
+
+def close_batch_items(items: List[BatchItem]) -> None:
+    """关闭批次持有的上传副本（流式响应结束或请求被拒绝时调用）"""
+    for source in {id(item.source): item.source for item in items if item.source is not None}.values():
+        source.close()
+
+
+class BatchGradingPipeline(LoggerMixin):
+    """分阶段流水线批改一批作业"""
+
+    def __init__(
+        self,
+        service: HomeworkService,
+        subject: str = "math",
+        concurrency: Optional[Dict[str, int]] = None,
+        queue_size: Optional[int] = None,
+    ):
+        self.service = service
+        self.subject = subject
+        self.concurrency = {
+            "decode": settings.BATCH_DECODE_CONCURRENCY,
+            "ocr": settings.BATCH_OCR_CONCURRENCY or settings.OCR_POOL_SIZE or os.cpu_count() or 1,
+            "parse": settings.BATCH_PARSE_CONCURRENCY,
+            "llm": settings.BATCH_LLM_CONCURRENCY,
+        }
+        self.concurrency.update(concurrency or {})
+        self.concurrency = {name: max(1, value) for name, value in self.concurrency.items()}
+        self.queue_size = max(1, queue_size or settings.BATCH_STAGE_QUEUE_SIZE)
+        self._busy: Dict[str, float] = {name: 0.0 for name in STAGES}
+        self._processed: Dict[str, int] = {name: 0 for name in STAGES}
+
+    # ---- 各阶段 ----
+
+    @staticmethod
+    def _open_and_decode(item: BatchItem) -> Image.Image:
+        fileobj = item.open()
+        try:
+            return decode_image(fileobj, target_long_side())
+        finally:
+            if isinstance(fileobj, zipfile.ZipExtFile):
+                fileobj.close()
+
+    async def _decode(self, item: BatchItem) -> None:
+        with stage_timer("decode"):
+            item.image = await run_in_threadpool(self._open_and_decode, item)
+
+    async def _ocr(self, item: BatchItem) -> None:
+        item.ocr = await self.service._extract_text(item.image)
+        item.image = None  # 识别完即释放像素数据
+
+    async def _parse(self, item: BatchItem) -> None:
+        item.prompt = self.service._build_grading_prompt(item.ocr.text, self.subject)
+        # 文本分析与题目解析不参与提示词：在线程池中与该张的LLM调用并行
+        item.analysis = asyncio.create_task(
+            self.service._analyze_text_in_executor(item.ocr.text, item.ocr.blocks)
+        )
+
+    async def _llm(self, item: BatchItem) -> None:
+        # 批量批改看重吞吐而非单张延迟，不做对冲请求
+        try:
+            llm_response = await self.service._review(
+                item.prompt, self.subject, hedge=False, caller="homework.grade_batch"
+            )
+        except BaseException:
+            item.analysis.cancel()
+            raise
+        item.text_analysis, item.parsed_questions = await item.analysis
+        parsed = self.service._parse_correction(llm_response, item.ocr.text)
+        item.result = self.service._build_result(
+            item.ocr.text,
+            parsed,
+            item.text_analysis,
+            item.parsed_questions,
+            time.perf_counter() - item.started_at,
+        )
+
+    # ---- 调度 ----
+
+    async def run(self, items: List[BatchItem]) -> AsyncIterator[Dict[str, Any]]:
+        """依次产出 {"event": "result", ...}（每张作业一条，按完成顺序）与最后的 {"event": "report", ...}"""
+        t0 = time.perf_counter()
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in STAGES]
+        done: asyncio.Queue = asyncio.Queue()
+        last = len(STAGES) - 1
+
+        async def feed() -> None:
+            for item in items:
+                await queues[0].put(item)
+            for _ in range(self.concurrency[STAGES[0]]):
+                await queues[0].put(None)
+
+        async def worker(position: int) -> None:
+            name = STAGES[position]
+            handler = getattr(self, f"_{name}")
+            while True:
+                item = await queues[position].get()
+                if item is None:
+                    return
+                if item.error is None:
+                    if position == 0:
+                        item.started_at = time.perf_counter()
+                    start = time.perf_counter()
+                    try:
+                        await handler(item)
+                    except Exception as e:
+                        item.error = e
+                        self.log_warning(
+                            "批量批改单张失败",
+                            filename=item.filename,
+                            stage=name,
+                            error_msg=str(e),
+                            error_type=type(e).__name__,
+                        )
+                    elapsed = time.perf_counter() - start
+                    item.timings[name] = round(elapsed, 3)
+                    self._busy[name] += elapsed
+                    self._processed[name] += 1
+                if item.error is not None or position == last:
+                    item.image = None
+                    await done.put(item)
+                else:
+                    await queues[position + 1].put(item)
+
+        async def stage(position: int) -> None:
+            name = STAGES[position]
+            await asyncio.gather(*(worker(position) for _ in range(self.concurrency[name])))
+            if position < last:
+                for _ in range(self.concurrency[STAGES[position + 1]]):
+                    await queues[position + 1].put(None)
+
+        self.log_event("开始批量批改", items=len(items), subject=self.subject, concurrency=self.concurrency)
+        tasks = [asyncio.create_task(feed())] + [asyncio.create_task(stage(i)) for i in range(len(STAGES))]
+        succeeded = 0
+        try:
+            for _ in range(len(items)):
+                item = await done.get()
+                if item.error is None:
+                    succeeded += 1
+                yield {"event": "result", "data": self._item_payload(item)}
+
+            report = self._report(len(items), succeeded, time.perf_counter() - t0)
+            self.log_event("批量批改完成", **{k: v for k, v in report.items() if not isinstance(v, dict)})
+            yield {"event": "report", "data": report}
+        finally:
+            # 客户端断开时停止剩余阶段
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _item_payload(self, item: BatchItem) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - item.started_at if item.started_at else 0.0
+        if item.error is not None:
+            result = self.service._build_error_result(item.ocr.text if item.ocr else "", item.error, elapsed)
+        else:
+            result = item.result
+        return {
+            "index": item.index,
+            "filename": item.filename,
+            "student": item.student,
+            "success": item.error is None,
+            "result": result,
+            "timings": item.timings,
+        }
+
+    def _report(self, total: int, succeeded: int, elapsed: float) -> Dict[str, Any]:
+        """吞吐报告：overlap 为各阶段忙碌时间之和与总耗时之比，大于1说明阶段之间有重叠"""
+        elapsed = max(elapsed, 1e-9)
+        return {
+            "total": total,
+            "succeeded": succeeded,
+            "failed": total - succeeded,
+            "elapsed": round(elapsed, 3),
+            "throughput_per_minute": round(total / elapsed * 60, 2),
+            "overlap": round(sum(self._busy.values()) / elapsed, 2),
+            "stages": {
+                name: {
+                    "concurrency": self.concurrency[name],
+                    "processed": self._processed[name],
+                    "busy_seconds": round(self._busy[name], 3),
+                    "avg_seconds": round(self._busy[name] / self._processed[name], 3) if self._processed[name] else 0.0,
+                    "utilization": round(self._busy[name] / (elapsed * self.concurrency[name]), 3),
+                }
+                for name in STAGES
+            },
+        }
@@ -0,0 +1,717 @@
+"""
+异步批改任务队列
+
+/homework/grade 在一次HTTP请求内跑完 OCR→LLM 全流程，耗时常达20–60秒，
+小程序端容易超时，uvicorn worker 也被长连接占满。这里把批改拆成“提交—排队—查询”：
+
+- 提交时只校验并保存图片，立即返回任务ID；
+- 常驻的异步worker从队列取任务，调用 HomeworkService.grade_homework 批改；
+- 任务状态沿用 HomeworkStatusEnum（PENDING → PROCESSING → COMPLETED / ERROR），
+  提交时带学生ID的任务同步写入 HomeworkSession；
+- 客户端轮询，或带 wait 参数长轮询获取结果。
+
+队列优先使用Redis（多个uvicorn进程共享），不可用时回退到进程内队列（重启会丢失排队中的任务）。
+取出任务时登记租约到期时间（可见性超时），处理期间定期续租；进程崩溃时租约过期，
+由回收任务放回队列。失败的任务按指数退避重试，超过最大尝试次数标记为ERROR。
+关闭时停止取新任务并等待处理中的任务完成，超过排空时限的任务放回队列交由其他进程继续。
+"""
+import asyncio
+import base64
+import json
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from io import BytesIO
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from ...core.config import settings
+from ...core.logger import LoggerMixin
+from ...core.metrics import stage_timer
+from ...models.homework import HomeworkStatusEnum
+
+
+FINISHED_STATUSES = (HomeworkStatusEnum.COMPLETED, HomeworkStatusEnum.ERROR)
+
+
+class GradingQueueFullError(Exception):
+    """排队中的任务过多"""
+
+
+class GradingFailedError(Exception):
+    """批改流程返回了错误结果"""
+
+
+@dataclass
+class GradingJob:
+    """一次异步批改任务"""
+
+    id: str
+    subject: str
+    provider: str
+    status: HomeworkStatusEnum = HomeworkStatusEnum.PENDING
+    attempts: int = 0
+    student_id: Optional[int] = None
+    session_id: Optional[int] = None  # 对应的 HomeworkSession.id
+    filename: Optional[str] = None
+    file_size: int = 0
+    result: Optional[Dict[str, Any]] = None
+    error_message: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    completed_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        data["status"] = self.status.value
+        return json.dumps(data, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "GradingJob":
+        data = json.loads(raw)
+        data["status"] = HomeworkStatusEnum(data["status"])
+        return cls(**data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """接口返回的任务视图"""
+        return {
+            "job_id": self.id,
+            "status": self.status.value,
+            "subject": self.subject,
+            "provider": self.provider,
+            "attempts": self.attempts,
+            "student_id": self.student_id,
+            "homework_session_id": self.session_id,
+            "filename": self.filename,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "completed_at": self.completed_at,
+            "error_message": self.error_message,
+            "result": self.result,
+        }
+
+
+class JobBackend(ABC, LoggerMixin):
+    """任务存储与队列后端"""
+
+    name: str = ""
+
+    @abstractmethod
+    async def save(self, job: GradingJob, ttl: int) -> None:
+        pass
+
+    @abstractmethod
+    async def load(self, job_id: str) -> Optional[GradingJob]:
+        pass
+
+    @abstractmethod
+    async def save_image(self, job_id: str, data: bytes, ttl: int) -> None:
+        pass
+
+    @abstractmethod
+    async def load_image(self, job_id: str) -> Optional[bytes]:
+        pass
+
+    @abstractmethod
+    async def delete_image(self, job_id: str) -> None:
+        pass
+
+    @abstractmethod
+    async def push(self, job_id: str) -> None:
+        """任务入队"""
+        pass
+
+    @abstractmethod
+    async def pop(self, lease: float) -> Optional[str]:
+        """取出一个任务并登记租约（lease秒后未确认则重新入队），队列为空返回None"""
+        pass
+
+    @abstractmethod
+    async def extend(self, job_id: str, lease: float) -> None:
+        """把租约到期时间改为 lease 秒之后（续租、延迟重试都用它）"""
+        pass
+
+    @abstractmethod
+    async def ack(self, job_id: str) -> None:
+        """确认任务处理完毕，删除租约"""
+        pass
+
+    @abstractmethod
+    async def requeue_expired(self) -> int:
+        """把租约已过期的任务放回队列，返回数量"""
+        pass
+
+    @abstractmethod
+    async def depth(self) -> Dict[str, int]:
+        """排队中与处理中的任务数"""
+        pass
+
+    async def stored_image_bytes(self) -> Optional[int]:
+        """本进程内暂存的图片总字节数；图片存放在进程外（如Redis）时返回None，不做限制"""
+        return None
+
+
+class MemoryJobBackend(JobBackend):
+    """进程内队列（Redis不可用时使用）"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._jobs: Dict[str, Tuple[float, str]] = {}
+        self._images: Dict[str, Tuple[float, bytes]] = {}
+        self._queue: Deque[str] = deque()
+        self._leases: Dict[str, float] = {}
+
+    async def save(self, job: GradingJob, ttl: int) -> None:
+        self._jobs[job.id] = (time.time() + ttl, job.to_json())
+
+    async def load(self, job_id: str) -> Optional[GradingJob]:
+        entry = self._jobs.get(job_id)
+        if entry is None or entry[0] < time.time():
+            return None
+        return GradingJob.from_json(entry[1])
+
+    async def save_image(self, job_id: str, data: bytes, ttl: int) -> None:
+        self._images[job_id] = (time.time() + ttl, data)
+
+    async def load_image(self, job_id: str) -> Optional[bytes]:
+        entry = self._images.get(job_id)
+        if entry is None or entry[0] < time.time():
+            return None
+        return entry[1]
+
+    async def delete_image(self, job_id: str) -> None:
+        self._images.pop(job_id, None)
+
+    async def push(self, job_id: str) -> None:
+        self._queue.append(job_id)
+
+    async def pop(self, lease: float) -> Optional[str]:
+        if not self._queue:
+            return None
+        job_id = self._queue.popleft()
+        self._leases[job_id] = time.time() + lease
+        return job_id
+
+    async def extend(self, job_id: str, lease: float) -> None:
+        if job_id in self._leases:
+            self._leases[job_id] = time.time() + lease
+
+    async def ack(self, job_id: str) -> None:
+        self._leases.pop(job_id, None)
+
+    async def requeue_expired(self) -> int:
+        now = time.time()
+        expired = [job_id for job_id, deadline in self._leases.items() if deadline <= now]
+        for job_id in expired:
+            del self._leases[job_id]
+            self._queue.append(job_id)
+        # 顺便清理过期的任务记录
+        for job_id in [k for k, (expires_at, _) in self._jobs.items() if expires_at < now]:
+            del self._jobs[job_id]
+        for job_id in [k for k, (expires_at, _) in self._images.items() if expires_at < now]:
+            del self._images[job_id]
+        return len(expired)
+
+    async def depth(self) -> Dict[str, int]:
+        return {"pending": len(self._queue), "in_flight": len(self._leases)}
+
+    async def stored_image_bytes(self) -> Optional[int]:
+        # 排队中与处理中任务的原始图片都驻留在本进程内存
+        return sum(len(data) for _, data in self._images.values())
+
+
+# 取任务与登记租约需要原子完成，否则进程在两步之间退出会丢任务；到期时间以Redis服务器时钟为准
+_POP_SCRIPT = """
+local job_id = redis.call('LPOP', KEYS[1])
+if job_id then
+  local t = redis.call('TIME')
+  redis.call('ZADD', KEYS[2], tonumber(t[1]) + tonumber(t[2]) / 1000000 + tonumber(ARGV[1]), job_id)
+end
+return job_id
+"""
+
+_EXTEND_SCRIPT = """
+local t = redis.call('TIME')
+return redis.call('ZADD', KEYS[1], 'XX', tonumber(t[1]) + tonumber(t[2]) / 1000000 + tonumber(ARGV[2]), ARGV[1])
+"""
+
+_REQUEUE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now, 'LIMIT', 0, 100)
+for _, job_id in ipairs(expired) do
+  redis.call('ZREM', KEYS[2], job_id)
+  redis.call('RPUSH', KEYS[1], job_id)
+end
+return #expired
+"""
+
+
+class RedisJobBackend(JobBackend):
+    """基于共享Redis的队列（同步客户端在线程池中调用）
+
+    - {prefix}queue：待处理任务ID列表
+    - {prefix}leases：处理中任务的租约到期时间（有序集合）
+    - {prefix}job:{id} / {prefix}image:{id}：任务记录与图片（base64，客户端按字符串解码）
+    """
+
+    name = "redis"
+
+    def __init__(self, client, prefix: str = "ai_tutor:grading_jobs:"):
+        self.client = client
+        self.prefix = prefix
+        self._queue_key = prefix + "queue"
+        self._leases_key = prefix + "leases"
+        self._pop_script = client.register_script(_POP_SCRIPT)
+        self._extend_script = client.register_script(_EXTEND_SCRIPT)
+        self._requeue_script = client.register_script(_REQUEUE_SCRIPT)
+
+    async def _call(self, fn: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: fn(*args, **kwargs))
+
+    async def save(self, job: GradingJob, ttl: int) -> None:
+        await self._call(self.client.set, f"{self.prefix}job:{job.id}", job.to_json(), ex=ttl)
+
+    async def load(self, job_id: str) -> Optional[GradingJob]:
+        raw = await self._call(self.client.get, f"{self.prefix}job:{job_id}")
+        return GradingJob.from_json(raw) if raw else None
+
+    async def save_image(self, job_id: str, data: bytes, ttl: int) -> None:
+        encoded = base64.b64encode(data).decode("ascii")
+        await self._call(self.client.set, f"{self.prefix}image:{job_id}", encoded, ex=ttl)
+
+    async def load_image(self, job_id: str) -> Optional[bytes]:
+        raw = await self._call(self.client.get, f"{self.prefix}image:{job_id}")
+        return base64.b64decode(raw) if raw else None
+
+    async def delete_image(self, job_id: str) -> None:
+        await self._call(self.client.delete, f"{self.prefix}image:{job_id}")
+
+    async def push(self, job_id: str) -> None:
+        await self._call(self.client.rpush, self._queue_key, job_id)
+
+    async def pop(self, lease: float) -> Optional[str]:
+        return await self._call(self._pop_script, keys=[self._queue_key, self._leases_key], args=[lease])
+
+    async def extend(self, job_id: str, lease: float) -> None:
+        await self._call(self._extend_script, keys=[self._leases_key], args=[job_id, lease])
+
+    async def ack(self, job_id: str) -> None:
+        await self._call(self.client.zrem, self._leases_key, job_id)
+
+    async def requeue_expired(self) -> int:
+        return int(await self._call(self._requeue_script, keys=[self._queue_key, self._leases_key]))
+
+    async def depth(self) -> Dict[str, int]:
+        def read() -> Dict[str, int]:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.llen(self._queue_key)
+            pipe.zcard(self._leases_key)
+            pending, in_flight = pipe.execute()
+            return {"pending": int(pending), "in_flight": int(in_flight)}
+
+        return await self._call(read)
+
+
+Grader = Callable[[GradingJob, Image.Image], Awaitable[Dict[str, Any]]]
+
+
+async def grade_with_homework_service(job: GradingJob, image: Image.Image) -> Dict[str, Any]:
+    """默认的批改函数：与 /homework/grade 相同的 OCR→LLM 流程"""
+    from ..llm import get_llm_service
+    from .homework_service import HomeworkService
+
+    service = HomeworkService(provider=job.provider, llm_service=get_llm_service(job.provider))
+    # 会话与题目由任务在完成时写入（见 _update_session），这里不传 student_id，避免重复落库
+    return await service.grade_homework(image=image, subject=job.subject)
+
+
+class GradingJobManager(LoggerMixin):
+    """异步批改任务：提交、查询与常驻worker"""
+
+    def __init__(
+        self,
+        backend: JobBackend,
+        grader: Optional[Grader] = None,
+        workers: int = 4,
+        max_attempts: int = 3,
+        visibility_timeout: float = 180.0,
+        retry_backoff: float = 2.0,
+        result_ttl: int = 24 * 3600,
+        max_pending: int = 1000,
+        max_image_bytes: int = 0,
+        poll_interval: float = 0.5,
+    ):
+        self.backend = backend
+        self.grader = grader or grade_with_homework_service
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.visibility_timeout = visibility_timeout
+        self.retry_backoff = retry_backoff
+        self.result_ttl = result_ttl
+        self.max_pending = max_pending
+        self.max_image_bytes = max_image_bytes  # 0表示不限制
+        self.poll_interval = poll_interval
+
+        self._tasks: List[asyncio.Task] = []
+        self._reaper: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._waiters: Dict[str, asyncio.Event] = {}
+        self._active = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.requeued = 0
+
+    # ---- 提交与查询 ----
+
+    async def submit(
+        self,
+        image_data: bytes,
+        subject: str = "math",
+        provider: str = "qwen",
+        student_id: Optional[int] = None,
+        filename: Optional[str] = None,
+    ) -> GradingJob:
+        """保存图片并入队，立即返回任务"""
+        depth = await self.backend.depth()
+        if depth["pending"] >= self.max_pending:
+            raise GradingQueueFullError(f"排队中的批改任务已达上限 {self.max_pending}")
+        if self.max_image_bytes > 0:
+            # 上传请求返回202后其读取预算即释放，暂存的图片需要单独计入内存上限
+            stored = await self.backend.stored_image_bytes()
+            if stored is not None and stored + len(image_data) > self.max_image_bytes:
+                raise GradingQueueFullError(
+                    f"暂存的作业图片已达上限 {self.max_image_bytes // (1024 * 1024)}MB"
+                )
+
+        job = GradingJob(
+            id=uuid.uuid4().hex,
+            subject=subject,
+            provider=provider,
+            student_id=student_id,
+            filename=filename,
+            file_size=len(image_data),
+        )
+        if student_id is not None:
+            job.session_id = await self._run_db(self._create_session, job)
+
+        await self.backend.save_image(job.id, image_data, self.result_ttl)
+        await self.backend.save(job, self.result_ttl)
+        await self.backend.push(job.id)
+        self._wakeup.set()
+        self.log_event("批改任务已提交", job_id=job.id, subject=subject, provider=provider, **depth)
+        return job
+
+    async def get(self, job_id: str) -> Optional[GradingJob]:
+        return await self.backend.load(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[GradingJob]:
+        """长轮询：等待任务结束或超时，返回最新的任务状态（任务不存在返回None）
+
+        本进程内完成的任务立即唤醒；其他进程完成的任务按轮询间隔发现。
+        """
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                job = await self.backend.load(job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job.finished or remaining <= 0:
+                    return job
+                event = self._waiters.setdefault(job_id, asyncio.Event())
+                try:
+                    await asyncio.wait_for(event.wait(), min(remaining, self.poll_interval * 2))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiters.pop(job_id, None)
+
+    # ---- worker ----
+
+    def start(self) -> None:
+        """启动worker与租约回收任务"""
+        if self._tasks:
+            return
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._reaper = asyncio.create_task(self._reap())
+        self.log_event("批改任务worker已启动", workers=self.workers, backend=self.backend.name)
+
+    async def shutdown(self, drain_timeout: Optional[float] = None) -> None:
+        """停止取新任务，等待处理中的任务完成；超时未完成的任务放回队列"""
+        if not self._tasks:
+            return
+        drain_timeout = settings.GRADING_JOB_DRAIN_TIMEOUT if drain_timeout is None else drain_timeout
+        self._stopping = True
+        self._wakeup.set()
+        self.log_event("批改任务worker排空中", active=self._active, drain_timeout=drain_timeout)
+
+        _, pending = await asyncio.wait(self._tasks, timeout=drain_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            self.log_warning("排空超时，未完成的批改任务已放回队列", interrupted=len(pending))
+
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+        self._tasks = []
+        self.log_event("批改任务worker已停止")
+
+    async def _worker(self, index: int) -> None:
+        while not self._stopping:
+            try:
+                job_id = await self.backend.pop(self.visibility_timeout)
+            except Exception as e:
+                self.log_error("批改任务出队失败", worker=index, error=str(e))
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            if job_id is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._active += 1
+            try:
+                await self._process(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 记录存储异常等：不确认租约，到期后由回收任务重新入队
+                self.log_error("批改任务处理异常", job_id=job_id, error=str(e), error_type=type(e).__name__)
+            finally:
+                self._active -= 1
+
+    async def _reap(self) -> None:
+        interval = min(self.visibility_timeout / 3, 5.0)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                count = await self.backend.requeue_expired()
+            except Exception as e:
+                self.log_warning("批改任务租约回收失败", error=str(e))
+                continue
+            if count:
+                self.requeued += count
+                self._wakeup.set()
+                self.log_warning("租约过期的批改任务已重新入队", count=count)
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            try:
+                await self.backend.extend(job_id, self.visibility_timeout)
+            except Exception as e:
+                self.log_warning("批改任务续租失败", job_id=job_id, error=str(e))
+
+    async def _process(self, job_id: str) -> None:
+        job = await self.backend.load(job_id)
+        if job is None or job.finished:
+            await self.backend.ack(job_id)
+            return
+        if job.attempts >= self.max_attempts:
+            await self._finish(job, HomeworkStatusEnum.ERROR, error=job.error_message or "超过最大尝试次数")
+            return
+
+        job.status = HomeworkStatusEnum.PROCESSING
+        job.attempts += 1
+        job.started_at = time.time()
+        await self.backend.save(job, self.result_ttl)
+        await self._sync_session(job)
+        self.log_event("开始处理批改任务", job_id=job.id, attempt=job.attempts)
+
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            data = await self.backend.load_image(job_id)
+            if data is None:
+                await self._finish(job, HomeworkStatusEnum.ERROR, error="作业图片已过期或丢失")
+                return
+            result = await self._grade(job, data)
+        except asyncio.CancelledError:
+            # 关闭时被中断：不计入尝试次数，立即放回队列
+            job.status = HomeworkStatusEnum.PENDING
+            job.attempts -= 1
+            await self.backend.save(job, self.result_ttl)
+            await self.backend.extend(job_id, 0)
+            raise
+        except Exception as e:
+            await self._fail(job, e)
+        else:
+            await self._finish(job, HomeworkStatusEnum.COMPLETED, result=result)
+        finally:
+            heartbeat.cancel()
+
+    async def _grade(self, job: GradingJob, data: bytes) -> Dict[str, Any]:
+        from ...utils.uploads import decode_image
+        from ..ocr.preprocess import target_long_side
+
+        loop = asyncio.get_running_loop()
+        with stage_timer("decode"):
+            image = await loop.run_in_executor(None, decode_image, BytesIO(data), target_long_side())
+        result = await self.grader(job, image)
+        correction = result.get("correction") or {}
+        if correction.get("error"):
+            raise GradingFailedError(correction.get("error_message") or "批改过程中发生未知错误")
+        return result
+
+    async def _fail(self, job: GradingJob, error: Exception) -> None:
+        job.error_message = str(error)
+        if job.attempts >= self.max_attempts:
+            self.log_error("批改任务失败", job_id=job.id, attempts=job.attempts, error_msg=str(error))
+            await self._finish(job, HomeworkStatusEnum.ERROR, error=str(error))
+            return
+
+        # 保留租约、推迟到期时间：到期后由回收任务重新入队，实现退避重试
+        delay = self.retry_backoff * (2 ** (job.attempts - 1))
+        job.status = HomeworkStatusEnum.PENDING
+        await self.backend.save(job, self.result_ttl)
+        await self.backend.extend(job.id, delay)
+        self.retried += 1
+        self.log_warning(
+            "批改任务失败，稍后重试",
+            job_id=job.id,
+            attempt=job.attempts,
+            retry_in=delay,
+            error_msg=str(error),
+        )
+
+    async def _finish(
+        self,
+        job: GradingJob,
+        status: HomeworkStatusEnum,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        job.status = status
+        job.result = result
+        job.error_message = error
+        job.completed_at = time.time()
+        await self.backend.save(job, self.result_ttl)
+        await self.backend.ack(job.id)
+        await self.backend.delete_image(job.id)
+        await self._sync_session(job)
+
+        if status == HomeworkStatusEnum.COMPLETED:
+            self.completed += 1
+        else:
+            self.failed += 1
+        event = self._waiters.get(job.id)
+        if event is not None:
+            event.set()
+        self.log_event(
+            "批改任务结束",
+            job_id=job.id,
+            status=status.value,
+            attempts=job.attempts,
+            elapsed=round(job.completed_at - job.created_at, 2),
+        )
+
+    # ---- HomeworkSession 同步 ----
+
+    async def _run_db(self, fn: Callable[[GradingJob], Any], job: GradingJob) -> Any:
+        """在线程池中执行数据库操作；失败只记录日志，任务状态以队列中的记录为准"""
+        loop = asyncio.get_running_loop()
+        try:
+            with stage_timer("persistence"):
+                return await loop.run_in_executor(None, fn, job)
+        except Exception as e:
+            self.log_warning("同步作业会话失败", job_id=job.id, student_id=job.student_id, error=str(e))
+            return None
+
+    async def _sync_session(self, job: GradingJob) -> None:
+        if job.session_id is not None:
+            await self._run_db(self._update_session, job)
+
+    @staticmethod
+    def _create_session(job: GradingJob) -> int:
+        from ...db.database import get_db_context
+        from ...models.homework import HomeworkSession, SubjectEnum
+
+        with get_db_context() as db:
+            session = HomeworkSession(
+                student_id=job.student_id,
+                title=job.filename,
+                subject=SubjectEnum(job.subject.upper()),
+                status=HomeworkStatusEnum.PENDING,
+                ai_provider=job.provider,
+            )
+            db.add(session)
+            db.commit()
+            return session.id
+
+    @staticmethod
+    def _update_session(job: GradingJob) -> None:
+        from datetime import datetime
+
+        from ...db.database import get_db_context
+        from ...models.homework import HomeworkSession
+        from .persistence import apply_result, insert_questions
+
+        with get_db_context() as db:
+            session = db.get(HomeworkSession, job.session_id)
+            if session is None:
+                return
+            session.status = job.status
+            session.error_message = job.error_message
+            if job.result is not None:
+                # 会话状态与全部题目在同一事务中写入
+                apply_result(session, job.result)
+                insert_questions(db, session.id, job.result.get("correction") or {})
+            if job.completed_at is not None:
+                session.completed_at = datetime.fromtimestamp(job.completed_at)
+            db.commit()
+
+    async def stats(self) -> Dict[str, Any]:
+        try:
+            depth = await self.backend.depth()
+        except Exception as e:
+            depth = {"error": str(e)}
+        return {
+            "backend": self.backend.name,
+            "workers": len(self._tasks),
+            "active": self._active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "requeued": self.requeued,
+            **depth,
+        }
+
+
+_grading_job_manager: Optional[GradingJobManager] = None
+
+
+def get_grading_job_manager() -> GradingJobManager:
+    """获取全局批改任务管理器（首次调用时按Redis可用性创建）"""
+    global _grading_job_manager
+    if _grading_job_manager is None:
+        from ...db.database import redis_client
+
+        backend: JobBackend = RedisJobBackend(redis_client) if redis_client is not None else MemoryJobBackend()
+        _grading_job_manager = GradingJobManager(
+            backend,
+            workers=settings.GRADING_JOB_WORKERS,
+            max_attempts=settings.GRADING_JOB_MAX_ATTEMPTS,
+            visibility_timeout=settings.GRADING_JOB_VISIBILITY_TIMEOUT,
+            retry_backoff=settings.GRADING_JOB_RETRY_BACKOFF,
+            result_ttl=settings.GRADING_JOB_RESULT_TTL,
+            max_pending=settings.GRADING_JOB_MAX_PENDING,
+            max_image_bytes=settings.GRADING_JOB_MEMORY_MAX_BYTES,
+        )
+    return _grading_job_manager
@@ -2,16 +2,26 @@
 作业批改核心服务
 """
 
+import asyncio
+import contextvars
+import functools
+import math
 import time
-from typing import Dict, Any, Optional
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator
 from PIL import Image
 from io import BytesIO
 
+from ...core.config import settings
 from ...core.logger import LoggerMixin
-from ..ocr import get_ocr_service
-from ..llm import get_llm_service
+from ...core.metrics import record_stage, stage_timer
+from ..ocr import OCRResult, TextBlock, get_ocr_service
+from ..llm import get_llm_service, LLMService
+from ..llm.json_stream import IncrementalJSONArrayParser
 from ..llm.prompts import MathGradingPrompts, PhysicsGradingPrompts, PromptVersion
 from ..parsing import QuestionParser, TextAnalyzer
+from ..parsing.question_parser import ParsedQuestion
+from .persistence import HomeworkRecord, get_homework_writer
 
 
 # 科目提示词映射
@@ -27,12 +37,33 @@ SUBJECT_CN_MAP = {
 }
 
 
+def _to_float(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value) if value is not None and value != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class ChunkOutcome:
+    """一个题目块的批改结果"""
+
+    index: int
+    chunk: List[ParsedQuestion]
+    questions: List[Dict[str, Any]]  # 已改回原题号；失败时为占位题目
+    correction: Dict[str, Any] = field(default_factory=dict)
+    response: str = ""
+    error: Optional[Exception] = None
+
+
 class HomeworkService(LoggerMixin):
     """将 OCR 与 LLM 串联的批改服务"""
 
-    def __init__(self, provider: str = "qwen"):
+    def __init__(self, provider: str = "qwen", llm_service: Optional[LLMService] = None):
         self.ocr = get_ocr_service()
-        self.llm = get_llm_service(provider)
+        self.llm = llm_service or get_llm_service(provider)
         self.provider = provider
         self.question_parser = QuestionParser()
         self.text_analyzer = TextAnalyzer()
@@ -42,117 +73,52 @@ class HomeworkService(LoggerMixin):
         image: Image.Image,
         subject: str = "math",
         student_answer_hint: Optional[str] = None,
+        student_id: Optional[int] = None,
+        title: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """端到端批改流程：OCR -> LLM评阅 -> 结构化结果"""
+        """端到端批改流程：OCR -> LLM评阅 -> 结构化结果
+
+        提供 student_id 时批改结果在后台写入作业会话与题目表。
+        """
         t0 = time.time()
+        ocr_text = ""
 
         try:
             self.log_event("开始作业批改", subject=subject, provider=self.provider)
 
             # 1) OCR文本提取
-            self.log_event("开始OCR文本提取")
-            ocr_text = await self.ocr.extract_text(image)
-            self.log_event(
-                "OCR文本提取完成",
-                text_length=len(ocr_text),
-                text_preview=ocr_text[:100],
-            )
+            ocr = await self._extract_text(image)
+            ocr_text = ocr.text
 
-            # 1.5) 文本分析和预处理
-            self.log_event("开始文本分析")
-            text_analysis = self.text_analyzer.extract_key_features(ocr_text)
-            self.log_event(
-                "文本分析完成",
-                **{
-                    k: v
-                    for k, v in text_analysis.items()
-                    if not isinstance(v, (list, dict))
-                },
-            )
+            # 2) 文本分析与题目解析在线程池中执行
+            analysis = asyncio.create_task(self._analyze_text_in_executor(ocr_text, ocr.blocks))
+            chunks = await self._plan_chunks(ocr_text, analysis)
 
-            # 1.6) 题目结构化解析
-            self.log_event("开始题目解析")
-            parsed_questions = self.question_parser.parse_questions(ocr_text)
-            self.log_event("题目解析完成", parsed_questions_count=len(parsed_questions))
-
-            # 2) 获取提示词模板并组织Prompt
-            subject_lower = subject.lower()
-            self.log_event("开始构建提示词", subject=subject_lower)
-            if subject_lower in SUBJECT_PROMPTS_MAP:
-                # 使用专门的科目提示词
-                prompt_provider = SUBJECT_PROMPTS_MAP[subject_lower]
-                prompt_template = prompt_provider.get_grading_prompt(PromptVersion.V1_0)
-                format_example = (
-                    prompt_provider.get_format_example()
-                    if hasattr(prompt_provider, "get_format_example")
-                    else ""
-                )
-                prompt = prompt_template.format(
-                    ocr_text=ocr_text, format_example=format_example
-                )
-                self.log_event(
-                    "使用专门提示词", prompt_provider=type(prompt_provider).__name__
+            if chunks:
+                # 3a) 长试卷按题分块并行批改，总耗时取决于最慢的一块
+                parsed, llm_response = await self._grade_chunks(
+                    ocr_text, chunks, subject, hedge=True, caller="homework.grade"
                 )
+                text_analysis, parsed_questions = analysis.result()
             else:
-                # 回退到通用提示词
-                subject_cn = SUBJECT_CN_MAP.get(subject_lower, subject)
-                prompt = f"""你是一个严格且有耐心的中学{subject_cn}老师，请对以下作业进行批改。
-要求：严格输出JSON格式的批改结果。
-作业OCR文本如下：
----
-{ocr_text}
----
-请直接返回JSON。"""
-                self.log_event("使用通用提示词", subject_cn=subject_cn)
-
-            self.log_event("提示词构建完成", prompt_length=len(prompt))
-
-            # 3) 调用LLM进行批改
-            self.log_event("开始LLM批改", provider=self.provider)
-            llm_response = await self.llm.generate(
-                prompt, max_tokens=1800, temperature=0.2
-            )
-            self.log_event("LLM批改完成", response_length=len(llm_response))
-
-            # 4) 使用增强的JSON解析方法
-            self.log_event("开始解析LLM响应")
-            parsed: Dict[str, Any] = self.llm.safe_json_parse(
-                llm_response,
-                fallback_parser=self._create_homework_fallback_parser(ocr_text),
-            )
-            self.log_event("LLM响应解析完成", parsed_type=type(parsed).__name__)
+                # 3b) 整卷一次批改；文本分析与题目解析不参与提示词，与LLM调用并行
+                prompt = self._build_grading_prompt(ocr_text, subject)
+                try:
+                    # 批改对延迟敏感：provider=auto 时允许对冲到次优服务商
+                    llm_response = await self._review(prompt, subject, hedge=True, caller="homework.grade")
+                except BaseException:
+                    analysis.cancel()
+                    raise
+                text_analysis, parsed_questions = await analysis
+
+                # 4) 使用增强的JSON解析方法
+                parsed = self._parse_correction(llm_response, ocr_text)
 
             elapsed = time.time() - t0
-            result = {
-                "provider": self.provider,
-                "ocr_text": ocr_text,
-                "correction": parsed,
-                "processing_time": round(elapsed, 2),
-                # 新增的结构化解析信息
-                "text_analysis": {
-                    "quality_score": text_analysis.get("ocr_confidence", 0.5),
-                    "complexity_score": text_analysis.get("complexity_score", 0.5),
-                    "subject_indicators": text_analysis.get("subject_indicators", []),
-                    "grade_level_estimate": text_analysis.get(
-                        "grade_level_estimate", "未知"
-                    ),
-                    "question_patterns": text_analysis.get("question_patterns", []),
-                    "mathematical_content": text_analysis.get(
-                        "mathematical_content", {}
-                    ),
-                },
-                "parsed_questions": [
-                    {
-                        "question_number": q.question_number,
-                        "question_text": q.question_text,
-                        "question_type": q.question_type.value,
-                        "student_answer": q.student_answer,
-                        "confidence": q.confidence,
-                        "answer_regions_count": len(q.answer_regions),
-                    }
-                    for q in parsed_questions
-                ],
-            }
+            result = self._build_result(
+                ocr_text, parsed, text_analysis, parsed_questions, elapsed
+            )
+            self._persist(student_id, subject, result, llm_response, title)
             self.log_event(
                 "批改完成",
                 provider=self.provider,
@@ -175,22 +141,529 @@ class HomeworkService(LoggerMixin):
             )
 
             # 返回错误信息而不是抛出异常，便于调试
-            return {
-                "provider": self.provider,
-                "ocr_text": getattr(locals(), "ocr_text", ""),
-                "correction": {
-                    "error": True,
-                    "error_message": str(e),
-                    "error_type": type(e).__name__,
-                    "questions": [],
-                    "overall_score": 0,
-                    "overall_suggestions": f"批改过程中发生错误: {str(e)}",
-                },
-                "processing_time": round(elapsed, 2),
-                "text_analysis": {},
-                "parsed_questions": [],
+            return self._build_error_result(ocr_text, e, elapsed)
+
+    async def grade_homework_stream(
+        self,
+        image: Image.Image,
+        subject: str = "math",
+        student_id: Optional[int] = None,
+        title: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """流式批改：每道题的批改结果一生成完就产出，最后产出总体结果
+
+        依次产出事件 {"event": "ocr" | "question" | "summary" | "error", "data": {...}}
+        """
+        t0 = time.time()
+        ocr_text = ""
+
+        try:
+            self.log_event("开始流式作业批改", subject=subject, provider=self.provider)
+
+            ocr = await self._extract_text(image)
+            ocr_text = ocr.text
+            yield {
+                "event": "ocr",
+                "data": {"ocr_text": ocr_text, "text_length": len(ocr_text)},
             }
 
+            analysis = asyncio.create_task(self._analyze_text_in_executor(ocr_text, ocr.blocks))
+            chunks = await self._plan_chunks(ocr_text, analysis)
+            if chunks:
+                # 分块批改：每块完成即产出该块的题目（按完成顺序），总体结果按原题序合并
+                tasks = self._start_chunks(
+                    ocr_text, chunks, subject, hedge=True, caller="homework.grade_stream"
+                )
+                try:
+                    for next_done in asyncio.as_completed(tasks):
+                        outcome = await next_done
+                        for question in outcome.questions:
+                            yield {"event": "question", "data": question}
+                finally:
+                    for task in tasks:
+                        task.cancel()
+                parsed, llm_response = self._merge_chunks([task.result() for task in tasks])
+                text_analysis, parsed_questions = analysis.result()
+                result = self._build_result(
+                    ocr_text, parsed, text_analysis, parsed_questions, time.time() - t0
+                )
+                self._persist(student_id, subject, result, llm_response, title)
+                yield {"event": "summary", "data": result}
+                return
+
+            prompt = self._build_grading_prompt(ocr_text, subject)
+            self.log_event("开始LLM流式批改", provider=self.provider)
+            stream_parser = IncrementalJSONArrayParser("questions")
+            llm_started = time.perf_counter()
+            try:
+                async for delta in self.llm.stream_generate(
+                    prompt,
+                    max_tokens=1800,
+                    temperature=0.2,
+                    caller="homework.grade_stream",
+                    tags=self._usage_tags(subject),
+                    response_format=self._response_format(),
+                ):
+                    for question in stream_parser.feed(delta):
+                        yield {"event": "question", "data": question}
+            except BaseException:
+                analysis.cancel()
+                raise
+            finally:
+                record_stage("llm", time.perf_counter() - llm_started)
+            text_analysis, parsed_questions = await analysis
+
+            llm_response = stream_parser.text.strip()
+            self.log_event(
+                "LLM流式批改完成",
+                response_length=len(llm_response),
+                questions_streamed=stream_parser.emitted,
+            )
+
+            parsed = self._parse_correction(llm_response, ocr_text)
+            elapsed = time.time() - t0
+            result = self._build_result(
+                ocr_text, parsed, text_analysis, parsed_questions, elapsed
+            )
+            self._persist(student_id, subject, result, llm_response, title)
+            yield {"event": "summary", "data": result}
+
+        except Exception as e:
+            elapsed = time.time() - t0
+            self.log_error(
+                "流式作业批改失败",
+                error_msg=str(e),
+                error_type=type(e).__name__,
+                subject=subject,
+                provider=self.provider,
+                processing_time=elapsed,
+            )
+            yield {"event": "error", "data": self._build_error_result(ocr_text, e, elapsed)}
+
+    async def _extract_text(self, image: Image.Image) -> OCRResult:
+        """OCR文本提取（分块识别时附带各文字块的位置）"""
+        self.log_event("开始OCR文本提取")
+        with stage_timer("ocr"):
+            ocr = await self.ocr.extract_result(image)
+        self.log_event(
+            "OCR文本提取完成",
+            text_length=len(ocr.text),
+            text_preview=ocr.text[:100],
+            blocks=len(ocr.blocks),
+        )
+        return ocr
+
+    async def _analyze_text_in_executor(
+        self, ocr_text: str, blocks: Optional[List[TextBlock]] = None
+    ) -> Tuple[Dict[str, Any], List[ParsedQuestion]]:
+        """在线程池中执行文本分析与题目解析（数十轮正则匹配），不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        # 复制上下文，使线程中记录的阶段耗时计入当前请求的 Server-Timing
+        call = functools.partial(contextvars.copy_context().run, self._analyze_text, ocr_text, blocks)
+        return await loop.run_in_executor(None, call)
+
+    def _analyze_text(
+        self, ocr_text: str, blocks: Optional[List[TextBlock]] = None
+    ) -> Tuple[Dict[str, Any], List[ParsedQuestion]]:
+        """文本特征分析与题目结构化解析"""
+        self.log_event("开始文本分析")
+        with stage_timer("text_analysis"):
+            text_analysis = self.text_analyzer.extract_key_features(ocr_text)
+        self.log_event(
+            "文本分析完成",
+            **{
+                k: v
+                for k, v in text_analysis.items()
+                if not isinstance(v, (list, dict))
+            },
+        )
+
+        self.log_event("开始题目解析")
+        with stage_timer("question_parsing"):
+            parsed_questions = self.question_parser.parse_questions(ocr_text, blocks=blocks)
+        self.log_event("题目解析完成", parsed_questions_count=len(parsed_questions))
+        return text_analysis, parsed_questions
+
+    async def _review(self, prompt: str, subject: str, hedge: bool, caller: str) -> str:
+        """调用LLM批改，返回原始响应文本"""
+        self.log_event("开始LLM批改", provider=self.provider)
+        with stage_timer("llm"):
+            llm_response = await self.llm.generate(
+                prompt,
+                max_tokens=1800,
+                temperature=0.2,
+                hedge=hedge,
+                caller=caller,
+                tags=self._usage_tags(subject),
+                response_format=self._response_format(),
+            )
+        self.log_event("LLM批改完成", response_length=len(llm_response))
+        return llm_response
+
+    async def _plan_chunks(
+        self, ocr_text: str, analysis: "asyncio.Task"
+    ) -> List[List[ParsedQuestion]]:
+        """决定是否分块批改，返回按原题序均分的题目块；不分块时返回空列表
+
+        先按题号做一次快速估计，题目明显不足时不等待完整解析，保持解析与LLM调用并行。
+        """
+        size = max(1, settings.GRADING_CHUNK_SIZE)
+        threshold = max(settings.GRADING_CHUNK_MIN_QUESTIONS, size + 1)
+        if (
+            not settings.GRADING_CHUNKED_ENABLED
+            or self.question_parser.estimate_question_count(ocr_text) < threshold
+        ):
+            return []
+
+        # 分块依赖题目切分结果（正则解析只需几十毫秒，远小于一次LLM调用）
+        _, parsed_questions = await analysis
+        total = len(parsed_questions)
+        if total < threshold:
+            return []
+        size = max(size, math.ceil(total / max(1, settings.GRADING_CHUNK_MAX_CHUNKS)))
+        count = math.ceil(total / size)
+        # 均分而不是按 size 截断，避免最后一块只剩一两题而其余块决定总耗时
+        base, extra = divmod(total, count)
+        chunks, start = [], 0
+        for i in range(count):
+            end = start + base + (1 if i < extra else 0)
+            chunks.append(parsed_questions[start:end])
+            start = end
+        self.log_event("长试卷分块批改", questions=total, chunks=count, sizes=[len(c) for c in chunks])
+        return chunks
+
+    def _start_chunks(
+        self,
+        ocr_text: str,
+        chunks: List[List[ParsedQuestion]],
+        subject: str,
+        hedge: bool,
+        caller: str,
+    ) -> List["asyncio.Task"]:
+        """为每个题目块构建提示词并发起批改"""
+        header = self.question_parser.preamble(ocr_text, chunks[0])[: settings.GRADING_CHUNK_HEADER_CHARS]
+        total = sum(len(chunk) for chunk in chunks)
+        return [
+            asyncio.create_task(
+                self._grade_chunk(index, header, chunk, total, ocr_text, subject, hedge, caller)
+            )
+            for index, chunk in enumerate(chunks)
+        ]
+
+    async def _grade_chunks(
+        self,
+        ocr_text: str,
+        chunks: List[List[ParsedQuestion]],
+        subject: str,
+        hedge: bool,
+        caller: str,
+    ) -> Tuple[Dict[str, Any], str]:
+        """并行批改全部题目块，返回合并后的批改结果与各块原始响应"""
+        tasks = self._start_chunks(ocr_text, chunks, subject, hedge, caller)
+        try:
+            outcomes = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return self._merge_chunks(outcomes)
+
+    async def _grade_chunk(
+        self,
+        index: int,
+        header: str,
+        chunk: List[ParsedQuestion],
+        total: int,
+        ocr_text: str,
+        subject: str,
+        hedge: bool,
+        caller: str,
+    ) -> ChunkOutcome:
+        """批改一个题目块；失败时以占位题目标记该块，不影响其他块"""
+        body = "\n".join(q.raw_text for q in chunk)
+        with stage_timer("prompt_build"):
+            prompt = self._render_grading_prompt(f"{header}\n{body}" if header else body, subject)
+        numbers = "、".join(str(q.question_number) for q in chunk)
+        prompt += (
+            f"\n\n说明：以上只是整份作业（共{total}题）中的第{numbers}题，卷头仅供参考。"
+            f"只批改这{len(chunk)}道题，question_number 使用原题号；"
+            f"overall_score、total_score、accuracy_rate 只统计这些题目。"
+        )
+        try:
+            llm_response = await self._review(prompt, subject, hedge=hedge, caller=caller)
+            correction = self._parse_correction(llm_response, body)
+        except Exception as e:
+            self.log_warning(
+                "分块批改失败",
+                chunk=index,
+                questions=numbers,
+                error_msg=str(e),
+                error_type=type(e).__name__,
+            )
+            return ChunkOutcome(index, chunk, self._failed_questions(chunk), error=e)
+        questions = [q for q in correction.get("questions") or [] if isinstance(q, dict)]
+        if not questions:
+            # 降级解析（如紧急文本提取）得不到任何题目：整块按失败处理，不能当作已批改
+            self.log_warning("分块批改结果中没有题目", chunk=index, questions=numbers)
+            error = ValueError(f"第{numbers}题的批改结果中没有题目")
+            return ChunkOutcome(index, chunk, self._failed_questions(chunk), error=error)
+        aligned = self._align_numbers(questions, chunk)
+        missing = len(aligned) - sum(1 for q in aligned if not q.get("grading_failed"))
+        if missing or len(questions) > len(chunk):
+            self.log_warning(
+                "分块批改结果与题目不一致",
+                chunk=index,
+                expected=len(chunk),
+                returned=len(questions),
+                missing=missing,
+            )
+        return ChunkOutcome(index, chunk, aligned, correction, llm_response)
+
+    @classmethod
+    def _align_numbers(cls, questions: List[Dict[str, Any]], chunk: List[ParsedQuestion]) -> List[Dict[str, Any]]:
+        """把模型返回的题目对齐到本块的原题号，按原题序返回且每题恰好一条
+
+        模型在块内常从1重新编号：块内序号（1..题数）映射回原题号；其他情况（重复、越界）
+        按位置改回原题号，超出本块题数的多余题目丢弃。模型漏掉的题目补上批改失败的占位题目。
+        """
+        expected = [q.question_number for q in chunk]
+        returned = [_to_float(q.get("question_number")) for q in questions]
+        unique = len(set(returned)) == len(returned)
+        if unique and set(returned) <= set(expected):
+            pass
+        elif unique and set(returned) <= set(range(1, len(expected) + 1)):
+            for question, relative in zip(questions, returned):
+                question["question_number"] = expected[int(relative) - 1]
+        else:
+            questions = questions[: len(expected)]
+            for position, question in enumerate(questions):
+                question["question_number"] = expected[position]
+        by_number = {_to_float(q["question_number"]): q for q in questions}
+        return [
+            by_number.get(_to_float(parsed.question_number)) or cls._failed_questions([parsed])[0]
+            for parsed in chunk
+        ]
+
+    @staticmethod
+    def _failed_questions(chunk: List[ParsedQuestion]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "question_number": q.question_number,
+                "question_text": q.question_text,
+                "student_answer": q.student_answer,
+                "is_correct": None,
+                "score": None,
+                "max_score": None,
+                "error_analysis": "该题批改失败，请重新提交",
+                "grading_failed": True,
+            }
+            for q in chunk
+        ]
+
+    def _merge_chunks(self, outcomes: List[ChunkOutcome]) -> Tuple[Dict[str, Any], str]:
+        """按块顺序合并批改结果；总分由各题得分重新计算，与各块完成顺序无关
+
+        有块批改失败或模型漏批题目时结果标记为 partial：overall_score 只反映已批改的题目，
+        failed_questions 为未批改的题数。
+        """
+        outcomes = sorted(outcomes, key=lambda o: o.index)
+        graded = [o for o in outcomes if o.error is None]
+        if not graded:
+            raise outcomes[0].error
+
+        questions = [q for o in outcomes for q in o.questions]
+        scored = [q for q in questions if not q.get("grading_failed")]
+        earned = sum(_to_float(q.get("score")) or 0.0 for q in scored)
+        possible = sum(_to_float(q.get("max_score")) or 0.0 for q in scored)
+        if possible > 0:
+            overall = round(earned / possible * 100, 1)
+        else:
+            # 题目未给出满分时按各块题数加权平均各块总体得分
+            weights = [(len(o.questions), _to_float(o.correction.get("overall_score")) or 0.0) for o in graded]
+            overall = round(sum(w * v for w, v in weights) / max(sum(w for w, _ in weights), 1), 1)
+        judged = [q for q in scored if isinstance(q.get("is_correct"), bool)]
+
+        def union(key: str) -> List[Any]:
+            merged: List[Any] = []
+            for o in graded:
+                value = o.correction.get(key) or []
+                for item in value if isinstance(value, list) else [value]:
+                    if item not in merged:
+                        merged.append(item)
+            return merged
+
+        suggestions = []
+        for o in graded:
+            text = o.correction.get("overall_suggestions")
+            if text:
+                first, last = o.chunk[0].question_number, o.chunk[-1].question_number
+                suggestions.append(f"第{first}-{last}题：{text}")
+
+        failed = len(outcomes) - len(graded)
+        failed_questions = len(questions) - len(scored)
+        merged = {
+            "questions": questions,
+            "overall_score": overall,
+            "total_score": 100.0,
+            "accuracy_rate": round(sum(q["is_correct"] for q in judged) / len(judged), 2) if judged else 0.0,
+            "overall_suggestions": "\n".join(suggestions),
+            "weak_knowledge_points": union("weak_knowledge_points"),
+            "study_recommendations": union("study_recommendations"),
+            "chunks": {"count": len(outcomes), "failed": failed},
+            "partial": bool(failed_questions),
+            "failed_questions": failed_questions,
+        }
+        if any(o.correction.get("parsing_fallback") for o in graded):
+            merged["parsing_fallback"] = True
+        if failed_questions:
+            merged["overall_suggestions"] = "\n".join(
+                [f"有{failed_questions}道题批改失败，得分只计入已批改的题目，请重新提交。"] + suggestions
+            )
+            self.log_warning(
+                "部分题目批改失败", chunks=len(outcomes), failed=failed, failed_questions=failed_questions
+            )
+        return merged, "\n\n".join(o.response for o in graded)
+
+    def _persist(
+        self,
+        student_id: Optional[int],
+        subject: str,
+        result: Dict[str, Any],
+        llm_response: str,
+        title: Optional[str],
+    ) -> None:
+        """把批改结果交给后台写入任务（不等待落库完成）"""
+        if student_id is None or not settings.HOMEWORK_PERSIST_ENABLED:
+            return
+        get_homework_writer().submit(
+            HomeworkRecord(
+                student_id=student_id,
+                subject=subject,
+                provider=self.provider,
+                result=result,
+                title=title,
+                ai_response=llm_response,
+            )
+        )
+
+    def _response_format(self) -> Optional[str]:
+        """开启结构化输出时要求服务商直接返回合法JSON，省去容错修复"""
+        return "json_object" if settings.LLM_GRADING_JSON_MODE else None
+
+    def _usage_tags(self, subject: str) -> Dict[str, str]:
+        """LLM用量统计标签：按科目与提示词版本区分批改开销"""
+        return {"subject": subject.lower(), "prompt_version": PromptVersion.V1_0.value}
+
+    def _build_grading_prompt(self, ocr_text: str, subject: str) -> str:
+        """根据科目选择提示词模板并填入OCR文本"""
+        with stage_timer("prompt_build"):
+            return self._render_grading_prompt(ocr_text, subject)
+
+    def _render_grading_prompt(self, ocr_text: str, subject: str) -> str:
+        subject_lower = subject.lower()
+        self.log_event("开始构建提示词", subject=subject_lower)
+        if subject_lower in SUBJECT_PROMPTS_MAP:
+            # 使用专门的科目提示词
+            prompt_provider = SUBJECT_PROMPTS_MAP[subject_lower]
+            prompt_template = prompt_provider.get_grading_prompt(PromptVersion.V1_0)
+            format_example = (
+                prompt_provider.get_format_example()
+                if hasattr(prompt_provider, "get_format_example")
+                else ""
+            )
+            prompt = prompt_template.format(
+                ocr_text=ocr_text, format_example=format_example
+            )
+            self.log_event(
+                "使用专门提示词", prompt_provider=type(prompt_provider).__name__
+            )
+        else:
+            # 回退到通用提示词
+            subject_cn = SUBJECT_CN_MAP.get(subject_lower, subject)
+            prompt = f"""你是一个严格且有耐心的中学{subject_cn}老师，请对以下作业进行批改。
+要求：严格输出JSON格式的批改结果。
+作业OCR文本如下：
+---
+{ocr_text}
+---
+请直接返回JSON。"""
+            self.log_event("使用通用提示词", subject_cn=subject_cn)
+
+        self.log_event("提示词构建完成", prompt_length=len(prompt))
+        return prompt
+
+    def _parse_correction(self, llm_response: str, ocr_text: str) -> Dict[str, Any]:
+        """容错解析LLM返回的批改JSON"""
+        self.log_event("开始解析LLM响应")
+        with stage_timer("json_repair"):
+            parsed: Dict[str, Any] = self.llm.safe_json_parse(
+                llm_response,
+                fallback_parser=self._create_homework_fallback_parser(ocr_text),
+            )
+        self.log_event("LLM响应解析完成", parsed_type=type(parsed).__name__)
+        return parsed
+
+    def _build_result(
+        self,
+        ocr_text: str,
+        parsed: Dict[str, Any],
+        text_analysis: Dict[str, Any],
+        parsed_questions: List[ParsedQuestion],
+        elapsed: float,
+    ) -> Dict[str, Any]:
+        """组装批改结果"""
+        return {
+            "provider": self.provider,
+            "ocr_text": ocr_text,
+            "correction": parsed,
+            "partial": bool(parsed.get("partial")),
+            "processing_time": round(elapsed, 2),
+            # 新增的结构化解析信息
+            "text_analysis": {
+                "quality_score": text_analysis.get("ocr_confidence", 0.5),
+                "complexity_score": text_analysis.get("complexity_score", 0.5),
+                "subject_indicators": text_analysis.get("subject_indicators", []),
+                "grade_level_estimate": text_analysis.get(
+                    "grade_level_estimate", "未知"
+                ),
+                "question_patterns": text_analysis.get("question_patterns", []),
+                "mathematical_content": text_analysis.get(
+                    "mathematical_content", {}
+                ),
+            },
+            "parsed_questions": [
+                {
+                    "question_number": q.question_number,
+                    "question_text": q.question_text,
+                    "question_type": q.question_type.value,
+                    "student_answer": q.student_answer,
+                    "confidence": q.confidence,
+                    "answer_regions_count": len(q.answer_regions),
+                }
+                for q in parsed_questions
+            ],
+        }
+
+    def _build_error_result(
+        self, ocr_text: str, error: Exception, elapsed: float
+    ) -> Dict[str, Any]:
+        """组装批改失败时的结果"""
+        return {
+            "provider": self.provider,
+            "ocr_text": ocr_text,
+            "correction": {
+                "error": True,
+                "error_message": str(error),
+                "error_type": type(error).__name__,
+                "questions": [],
+                "overall_score": 0,
+                "overall_suggestions": f"批改过程中发生错误: {str(error)}",
+            },
+            "processing_time": round(elapsed, 2),
+            "text_analysis": {},
+            "parsed_questions": [],
+        }
+
     def _create_homework_fallback_parser(self, ocr_text: str) -> callable:
         """创建作业批改的降级解析器"""
 
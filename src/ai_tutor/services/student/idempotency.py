@@ -0,0 +1,282 @@
+"""
+批改请求幂等（重复提交去重）
+
+移动端网络不稳定时学生会反复点“提交”，每次都重新跑一遍 OCR→LLM。
+/homework/grade 按“学生ID + 科目 + 图片内容哈希”（或客户端提供的 Idempotency-Key）去重：
+
+- 已批改完成：直接返回保存的批改结果，不再批改；
+- 正在批改：同一进程内的重复请求挂到进行中的批改任务上（SingleFlight），
+  其他进程通过Redis中的“批改中”标记发现并等待同一份结果；
+- 批改失败或只批改了部分题目（有块失败）不保存，重试时重新批改。
+
+同一个 Idempotency-Key 用于不同的图片或科目时返回冲突错误，而不是返回另一份作业的结果。
+记录优先存Redis（多个uvicorn进程共享），不可用时回退到进程内有界LRU。
+批改中标记带有效期，持有标记的进程崩溃后，标记过期即可由其他请求重新批改。
+"""
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from ...core.config import settings
+from ...core.logger import LoggerMixin
+from ...utils.singleflight import SingleFlight
+
+
+class IdempotencyConflictError(Exception):
+    """Idempotency-Key 已用于其他作业"""
+
+
+class IdempotencyInProgressError(Exception):
+    """其他进程仍在批改同一份作业，等待超时"""
+
+
+def content_fingerprint(digest: str, subject: str) -> str:
+    """作业指纹：图片内容哈希 + 科目"""
+    return hashlib.sha256(f"{subject.lower()}:{digest}".encode("utf-8")).hexdigest()
+
+
+def make_idempotency_key(
+    student_id: Optional[int], fingerprint: str, header_key: Optional[str] = None
+) -> Optional[str]:
+    """生成去重键；匿名请求只在显式提供 Idempotency-Key 时去重"""
+    scope = f"student:{student_id}" if student_id is not None else "anonymous"
+    if header_key:
+        return f"{scope}:key:{hashlib.sha256(header_key.encode('utf-8')).hexdigest()[:32]}"
+    if student_id is None:
+        return None
+    return f"{scope}:content:{fingerprint}"
+
+
+class IdempotencyBackend(ABC, LoggerMixin):
+    """幂等记录存储：{"status": "processing" | "completed", "fingerprint", "owner", "response"}"""
+
+    name: str = ""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    async def claim(self, key: str, record: Dict[str, Any], ttl: float) -> bool:
+        """键不存在时写入批改中标记，返回是否抢到"""
+        pass
+
+    @abstractmethod
+    async def put(self, key: str, record: Dict[str, Any], ttl: float) -> None:
+        pass
+
+    @abstractmethod
+    async def release(self, key: str, owner: str) -> None:
+        """删除自己持有的批改中标记"""
+        pass
+
+
+class MemoryIdempotencyBackend(IdempotencyBackend):
+    """进程内有界LRU（单进程部署或Redis不可用时使用）"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 2000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def _live(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, record = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        return record
+
+    def _set(self, key: str, record: Dict[str, Any], ttl: float) -> None:
+        self._entries[key] = (time.time() + ttl, record)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._live(key)
+
+    async def claim(self, key: str, record: Dict[str, Any], ttl: float) -> bool:
+        if self._live(key) is not None:
+            return False
+        self._set(key, record, ttl)
+        return True
+
+    async def put(self, key: str, record: Dict[str, Any], ttl: float) -> None:
+        self._set(key, record, ttl)
+
+    async def release(self, key: str, owner: str) -> None:
+        record = self._live(key)
+        if record is not None and record.get("owner") == owner:
+            del self._entries[key]
+
+
+# 只删除自己持有的批改中标记（标记过期后可能已被其他进程重新持有）
+_RELEASE_SCRIPT = """
+local raw = redis.call('GET', KEYS[1])
+if not raw then return 0 end
+local record = cjson.decode(raw)
+if record['status'] == 'processing' and record['owner'] == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisIdempotencyBackend(IdempotencyBackend):
+    """基于共享Redis的幂等记录（同步客户端在线程池中调用）"""
+
+    name = "redis"
+
+    def __init__(self, client, prefix: str = "ai_tutor:grade_idempotency:"):
+        self.client = client
+        self.prefix = prefix
+        self._release_script = client.register_script(_RELEASE_SCRIPT)
+
+    async def _call(self, fn: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: fn(*args, **kwargs))
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = await self._call(self.client.get, self.prefix + key)
+        return json.loads(raw) if raw else None
+
+    async def claim(self, key: str, record: Dict[str, Any], ttl: float) -> bool:
+        value = json.dumps(record, ensure_ascii=False)
+        return bool(await self._call(self.client.set, self.prefix + key, value, px=int(ttl * 1000), nx=True))
+
+    async def put(self, key: str, record: Dict[str, Any], ttl: float) -> None:
+        value = json.dumps(record, ensure_ascii=False)
+        await self._call(self.client.set, self.prefix + key, value, px=int(ttl * 1000))
+
+    async def release(self, key: str, owner: str) -> None:
+        await self._call(self._release_script, keys=[self.prefix + key], args=[owner])
+
+
+Producer = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+def is_storable(response: Dict[str, Any]) -> bool:
+    """只保存完整的批改结果：批改失败、部分块失败或有题目批改失败时不保存"""
+    if not response.get("success"):
+        return False
+    data = response.get("data") or {}
+    correction = data.get("correction") or {}
+    if data.get("partial") or correction.get("partial"):
+        return False
+    if (correction.get("chunks") or {}).get("failed"):
+        return False
+    questions = correction.get("questions") or []
+    return not any(isinstance(q, dict) and q.get("grading_failed") for q in questions)
+
+
+class GradingIdempotency(LoggerMixin):
+    """批改请求去重"""
+
+    def __init__(
+        self,
+        backend: IdempotencyBackend,
+        ttl: int = 24 * 3600,
+        lease: float = 300.0,
+        poll_interval: float = 0.5,
+    ):
+        self.backend = backend
+        self.ttl = ttl
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._flight = SingleFlight("homework_grade")
+        self.executed = 0  # 实际批改次数
+        self.replayed = 0  # 直接返回已保存结果的次数
+        self.attached = 0  # 挂到进行中批改上的次数
+
+    async def run(self, key: str, fingerprint: str, produce: Producer) -> Tuple[Dict[str, Any], bool]:
+        """返回 (响应内容, 是否为重复提交)
+
+        produce 返回接口的响应内容，完整的批改结果（见 is_storable）才保存，供之后的重复提交直接返回。
+        """
+        record = await self._lookup(key, fingerprint)
+        if record is not None and record["status"] == "completed":
+            self.replayed += 1
+            self.log_event("重复提交，返回已保存的批改结果", key=key)
+            return record["response"], True
+
+        attached = self._flight.running(key)
+        if attached:
+            self.attached += 1
+            self.log_event("重复提交，等待进行中的批改", key=key)
+        response, replayed = await self._flight.do(key, lambda: self._execute(key, fingerprint, produce))
+        return response, replayed or attached
+
+    async def _lookup(self, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        record = await self.backend.get(key)
+        if record is not None and record.get("fingerprint") != fingerprint:
+            raise IdempotencyConflictError("Idempotency-Key 已用于其他作业图片或科目")
+        return record
+
+    async def _execute(self, key: str, fingerprint: str, produce: Producer) -> Tuple[Dict[str, Any], bool]:
+        owner = uuid.uuid4().hex
+        marker = {"status": "processing", "fingerprint": fingerprint, "owner": owner, "created_at": time.time()}
+        deadline = time.monotonic() + self.lease
+        while not await self.backend.claim(key, marker, self.lease):
+            # 其他进程正在批改同一份作业：等待它的结果；标记过期或被释放后自己批改
+            record = await self._lookup(key, fingerprint)
+            if record is not None and record["status"] == "completed":
+                self.attached += 1
+                return record["response"], True
+            if time.monotonic() > deadline:
+                raise IdempotencyInProgressError("同一份作业正在批改中，请稍后查询")
+            await asyncio.sleep(self.poll_interval)
+
+        self.executed += 1
+        try:
+            response = await produce()
+        except BaseException:
+            await self.backend.release(key, owner)
+            raise
+        if is_storable(response):
+            await self.backend.put(
+                key,
+                {"status": "completed", "fingerprint": fingerprint, "owner": owner, "response": response},
+                self.ttl,
+            )
+        else:
+            await self.backend.release(key, owner)
+        return response, False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend.name,
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "attached": self.attached,
+            "inflight": self._flight.stats()["inflight"],
+        }
+
+
+_grading_idempotency: Optional[GradingIdempotency] = None
+
+
+def get_grading_idempotency() -> GradingIdempotency:
+    """获取全局批改去重器（首次调用时按Redis可用性创建）"""
+    global _grading_idempotency
+    if _grading_idempotency is None:
+        from ...db.database import redis_client
+
+        if redis_client is not None:
+            backend: IdempotencyBackend = RedisIdempotencyBackend(redis_client)
+        else:
+            backend = MemoryIdempotencyBackend(settings.GRADING_IDEMPOTENCY_MEMORY_MAX_ENTRIES)
+        _grading_idempotency = GradingIdempotency(
+            backend,
+            ttl=settings.GRADING_IDEMPOTENCY_TTL,
+            lease=settings.GRADING_IDEMPOTENCY_LEASE,
+        )
+    return _grading_idempotency
@@ -0,0 +1,264 @@
+"""
+批改结果落库
+
+批改完成后把作业会话与 correction["questions"] 中的每道题写入 homework_sessions / questions 表，
+供学习进度、学生统计与错误分析查询。
+
+- 一次事务写入：先插入会话取得ID，再用一条批量INSERT写入全部题目
+  （SQLAlchemy 2.0 的 insertmanyvalues 在 PostgreSQL 上合并为多行VALUES，一次往返）；
+- 不在请求的关键路径上：批改接口只把记录放入有界队列，由后台写入任务在线程池中执行，
+  队列满时丢弃并记录告警，不拖慢批改响应。
+
+LLM返回的题目字段类型并不可靠（分数可能是字符串、知识点可能是单个字符串），写入前统一规整。
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from ...core.config import settings
+from ...core.logger import LoggerMixin
+from ...core.metrics import stage_timer
+from ...models.homework import HomeworkSession, HomeworkStatusEnum, Question, SubjectEnum
+
+
+@dataclass
+class HomeworkRecord:
+    """一次批改的落库内容"""
+
+    student_id: int
+    subject: str
+    provider: str
+    result: Dict[str, Any]  # HomeworkService 返回的批改结果
+    title: Optional[str] = None
+    ai_response: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return float(value)
+    try:
+        return float(value) if value is not None and value != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _flag(value: Any) -> Optional[bool]:
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return bool(value)
+    normalized = str(value).strip().lower()
+    if normalized in ("true", "yes", "1", "正确", "对", "是"):
+        return True
+    if normalized in ("false", "no", "0", "错误", "错", "否"):
+        return False
+    return None
+
+
+def _items(value: Any) -> List[Any]:
+    if value is None or value == "":
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _difficulty(value: Any) -> Optional[int]:
+    number = _number(value)
+    return min(5, max(1, int(round(number)))) if number is not None else None
+
+
+def question_rows(session_id: int, correction: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """把批改结果中的题目转换为 questions 表的行"""
+    rows = []
+    for position, question in enumerate(correction.get("questions") or [], start=1):
+        if not isinstance(question, dict):
+            continue
+        number = _number(question.get("question_number"))
+        rows.append({
+            "homework_session_id": session_id,
+            "question_number": int(number) if number is not None else position,
+            "question_text": _text(question.get("question_text")),
+            "question_type": _text(question.get("question_type")),
+            "student_answer": _text(question.get("student_answer")),
+            "correct_answer": _text(question.get("correct_answer")),
+            "is_correct": _flag(question.get("is_correct")),
+            "score": _number(question.get("score")),
+            "max_score": _number(question.get("max_score")),
+            "error_analysis": _text(question.get("error_analysis")),
+            "solution_steps": _items(question.get("solution_steps")),
+            "knowledge_points": _items(question.get("knowledge_points")),
+            "difficulty_level": _difficulty(question.get("difficulty_level")),
+        })
+    return rows
+
+
+def apply_result(session: HomeworkSession, result: Dict[str, Any]) -> None:
+    """把批改结果写到会话对象上"""
+    correction = result.get("correction") or {}
+    session.ocr_text = result.get("ocr_text")
+    session.correction_result = correction
+    session.overall_score = _number(correction.get("overall_score"))
+    session.processing_time = _number(result.get("processing_time"))
+    if correction.get("error"):
+        session.status = HomeworkStatusEnum.ERROR
+        session.error_message = _text(correction.get("error_message"))
+    elif correction.get("partial"):
+        # 部分题目未批改：得分不完整，不计入成绩
+        session.status = HomeworkStatusEnum.ERROR
+        session.overall_score = None
+        session.error_message = f"{correction.get('failed_questions') or 0}道题批改失败，请重新提交"
+    else:
+        session.status = HomeworkStatusEnum.COMPLETED
+
+
+def insert_questions(db: Session, session_id: int, correction: Dict[str, Any]) -> int:
+    """批量插入题目，返回行数"""
+    rows = question_rows(session_id, correction)
+    if rows:
+        db.execute(insert(Question), rows)
+    return len(rows)
+
+
+def write_homework(db: Session, record: HomeworkRecord) -> int:
+    """在一个事务中写入作业会话与全部题目，返回会话ID"""
+    session = HomeworkSession(
+        student_id=record.student_id,
+        title=record.title,
+        subject=SubjectEnum(record.subject.upper()),
+        ai_provider=record.provider,
+        ai_response=record.ai_response,
+        completed_at=datetime.fromtimestamp(record.created_at),
+    )
+    apply_result(session, record.result)
+    try:
+        db.add(session)
+        db.flush()
+        insert_questions(db, session.id, record.result.get("correction") or {})
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return session.id
+
+
+class HomeworkWriter(LoggerMixin):
+    """后台批改结果写入任务"""
+
+    def __init__(self, max_pending: int = 1000, workers: int = 2):
+        self.max_pending = max_pending
+        self.workers = max(1, workers)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def submit(self, record: HomeworkRecord) -> bool:
+        """放入写入队列（非阻塞），写入任务未启动或队列已满时返回False"""
+        if self._queue is None:
+            self.dropped += 1
+            self.log_warning("批改结果写入任务未启动，丢弃记录", student_id=record.student_id)
+            return False
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            self.log_warning("批改结果写入队列已满，丢弃记录", student_id=record.student_id, pending=self.max_pending)
+            return False
+        return True
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """写完队列中剩余的记录后停止"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            self.log_warning("批改结果写入超时，剩余记录未落库", pending=self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def _run(self) -> None:
+        while True:
+            record = await self._queue.get()
+            try:
+                await self.write(record)
+            finally:
+                self._queue.task_done()
+
+    async def write(self, record: HomeworkRecord) -> Optional[int]:
+        """在线程池中写入一条批改记录，失败只记录日志"""
+        loop = asyncio.get_running_loop()
+        try:
+            with stage_timer("persistence"):
+                session_id = await loop.run_in_executor(None, self._write_sync, record)
+        except Exception as e:
+            self.failed += 1
+            self.log_error(
+                "批改结果写入失败",
+                student_id=record.student_id,
+                error_msg=str(e),
+                error_type=type(e).__name__,
+            )
+            return None
+        self.written += 1
+        self.log_event(
+            "批改结果已落库",
+            student_id=record.student_id,
+            homework_session_id=session_id,
+            questions=len((record.result.get("correction") or {}).get("questions") or []),
+        )
+        return session_id
+
+    @staticmethod
+    def _write_sync(record: HomeworkRecord) -> int:
+        from ...db.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            return write_homework(db, record)
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": bool(self._tasks),
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+
+_homework_writer: Optional[HomeworkWriter] = None
+
+
+def get_homework_writer() -> HomeworkWriter:
+    """获取全局批改结果写入任务"""
+    global _homework_writer
+    if _homework_writer is None:
+        _homework_writer = HomeworkWriter(
+            max_pending=settings.HOMEWORK_PERSIST_MAX_PENDING,
+            workers=settings.HOMEWORK_PERSIST_WORKERS,
+        )
+    return _homework_writer
@@ -27,6 +27,7 @@ from ...schemas.student_schemas import (
     StudentDetailResponse,
     HomeworkSubmission,
     HomeworkHistoryResponse,
+    student_list_adapter,
 )
 from .exceptions import (
     StudentNotFoundError,
@@ -320,7 +321,7 @@ class StudentService(LoggerMixin):
             )
 
             # 转换为响应模型
-            student_responses = [StudentResponse.model_validate(s) for s in students]
+            student_responses = student_list_adapter.validate_python(students, from_attributes=True)
 
             result = StudentListResponse.create(
                 students=student_responses,
@@ -374,7 +375,7 @@ class StudentService(LoggerMixin):
                 .all()
             )
 
-            result = [StudentResponse.model_validate(s) for s in students]
+            result = student_list_adapter.validate_python(students, from_attributes=True)
 
             self.log_event("搜索学生成功", keyword=keyword, count=len(result))
             return result
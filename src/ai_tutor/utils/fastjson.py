@@ -0,0 +1,81 @@
+"""
+JSON序列化与响应
+
+- FastJSONResponse：应用默认响应类，安装了 orjson（可选依赖 fastjson）时用它序列化，
+  未安装时回退到标准库 json；输出与 Starlette JSONResponse 相同（UTF-8、紧凑分隔符）；
+- model_response：用 pydantic-core 直接把响应模型序列化为JSON字节，
+  跳过 FastAPI 按 response_model 的二次校验与 jsonable_encoder 转换，用于列表等大响应；
+- PreSerialized：只读的热点数据启动时序列化一次，之后每次请求直接返回同一份字节，并支持 ETag/304。
+"""
+import hashlib
+import json
+from typing import Any, Mapping, Optional
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, TypeAdapter
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 未安装可选依赖时回退到标准库
+    orjson = None
+
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def _default(value: Any) -> Any:
+    """orjson/json 不认识的类型（pydantic模型、Decimal、集合等）交给 FastAPI 的编码器"""
+    return jsonable_encoder(value)
+
+
+def dumps(content: Any) -> bytes:
+    """序列化为UTF-8编码的紧凑JSON"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+        default=_default,
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson 序列化的JSON响应"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def model_response(
+    value: Any,
+    adapter: Optional[TypeAdapter] = None,
+    status_code: int = 200,
+    headers: Optional[Mapping[str, str]] = None,
+) -> Response:
+    """把响应模型（或 adapter 描述的模型列表）直接序列化为响应"""
+    if adapter is not None:
+        body = adapter.dump_json(value)
+    elif isinstance(value, BaseModel):
+        body = value.model_dump_json()
+    else:
+        body = dumps(value)
+    return Response(body, status_code=status_code, headers=headers, media_type=JSON_MEDIA_TYPE)
+
+
+class PreSerialized:
+    """预先序列化的只读JSON响应"""
+
+    def __init__(self, content: Any):
+        self.body = dumps(content)
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:16]}"'
+
+    def response(self, request: Optional[Request] = None) -> Response:
+        """返回缓存的字节；客户端带着相同 ETag 时返回304"""
+        headers = {"ETag": self.etag}
+        if request is not None and request.headers.get("if-none-match") == self.etag:
+            return Response(status_code=304, headers=headers)
+        return Response(self.body, headers=headers, media_type=JSON_MEDIA_TYPE)
@@ -0,0 +1,56 @@
+"""
+请求合并（single-flight）
+
+相同键的并发调用只执行一次，其余调用方等待同一个进行中的任务。
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """按键合并并发中的重复调用"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0  # 实际执行次数
+        self.collapsed = 0  # 被合并掉的调用次数
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """执行fn；若相同key已有任务在执行则直接等待其结果
+
+        任务独立于发起者运行，某个调用方被取消不会影响其他等待者。
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._finish(k, t))
+        else:
+            self.collapsed += 1
+        return await asyncio.shield(task)
+
+    def running(self, key: str) -> bool:
+        """相同key是否已有任务在执行"""
+        return key in self._inflight
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # 标记异常已被获取，避免所有等待者都已取消时产生告警
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """合并统计"""
+        total = self.calls + self.collapsed
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "collapsed": self.collapsed,
+            "collapse_rate": round(self.collapsed / total, 4) if total else 0.0,
+            "inflight": len(self._inflight),
+        }
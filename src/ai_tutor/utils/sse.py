@@ -0,0 +1,21 @@
+"""
+Server-Sent Events 工具函数
+"""
+from typing import Any, Dict, Optional
+
+from .fastjson import dumps
+
+# 关闭代理缓冲，保证增量数据即时送达客户端
+SSE_HEADERS: Dict[str, str] = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(data: Any, event: Optional[str] = None) -> str:
+    """将数据编码为一条SSE消息"""
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {dumps(data).decode('utf-8')}")
+    return "\n".join(lines) + "\n\n"
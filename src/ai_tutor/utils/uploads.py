@@ -0,0 +1,126 @@
+"""
+上传图片的校验与解码
+
+Starlette 解析 multipart 时把文件写入 SpooledTemporaryFile（超过1MB落盘），
+这里直接从该文件对象解码，不再把整个文件读进内存再包一层 BytesIO。
+JPEG 使用 draft 模式在解码阶段按 1/2、1/4、1/8 缩小到不低于OCR目标尺寸，
+手机拍摄的大图解码内存与耗时都显著降低。
+"""
+import hashlib
+import math
+from io import BytesIO
+from typing import BinaryIO, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+from starlette.concurrency import run_in_threadpool
+
+from ..core.config import settings
+from ..core.logger import get_logger
+from ..core.metrics import stage_timer
+from ..services.ocr.preprocess import target_long_side
+
+
+logger = get_logger(__name__)
+
+
+def decode_image(fileobj: BinaryIO, long_side: int) -> Image.Image:
+    """解码图片；JPEG按目标长边做降分辨率解码，并同步修正DPI信息"""
+    fileobj.seek(0)
+    image = Image.open(fileobj)
+    original_width = image.size[0]
+    if image.format == "JPEG" and max(image.size) > long_side:
+        ratio = long_side / max(image.size)
+        requested = (math.ceil(image.size[0] * ratio), math.ceil(image.size[1] * ratio))
+        image.draft(image.mode, requested)
+    image.load()
+
+    scale = original_width / image.size[0]
+    dpi = image.info.get("dpi")
+    if scale > 1 and dpi:
+        image.info["dpi"] = (dpi[0] / scale, dpi[1] / scale)
+    return image
+
+
+def upload_size(file: UploadFile) -> int:
+    if file.size is not None:
+        return file.size
+    file.file.seek(0, 2)
+    size = file.file.tell()
+    file.file.seek(0)
+    return size
+
+
+def file_digest(fileobj: BinaryIO) -> str:
+    """文件内容的SHA-256（分块读取，读完回到开头）"""
+    fileobj.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: fileobj.read(1024 * 1024), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def validate_upload(file: UploadFile) -> int:
+    """校验上传文件的类型与大小，返回文件字节数"""
+    if file.content_type not in settings.ALLOWED_IMAGE_TYPES:
+        logger.warning("不支持的文件类型", content_type=file.content_type)
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支持的文件类型: {file.content_type}。支持的类型: {settings.ALLOWED_IMAGE_TYPES}"
+        )
+
+    file_size = upload_size(file)
+    if file_size > settings.MAX_FILE_SIZE:
+        logger.warning("文件过大", file_size=file_size, max_size=settings.MAX_FILE_SIZE)
+        raise HTTPException(
+            status_code=400,
+            detail=f"文件过大。最大支持 {settings.MAX_FILE_SIZE // (1024*1024)}MB"
+        )
+    return file_size
+
+
+async def decode_upload(fileobj: BinaryIO, filename: Optional[str]) -> Image.Image:
+    """在线程池中解码已校验的上传图片，格式错误或损坏时返回400"""
+    try:
+        with stage_timer("decode"):
+            image = await run_in_threadpool(decode_image, fileobj, target_long_side())
+    except Exception as img_error:
+        logger.error("图片加载失败", filename=filename, error=str(img_error))
+        raise HTTPException(
+            status_code=400,
+            detail=f"图片格式错误或损坏: {str(img_error)}"
+        )
+
+    logger.info("图片加载成功", filename=filename, image_size=image.size, image_mode=image.mode)
+    return image
+
+
+async def read_upload_image(file: UploadFile) -> Tuple[Image.Image, int]:
+    """校验上传图片的类型与大小并解码，返回 (图片, 文件字节数)"""
+    file_size = validate_upload(file)
+    return await decode_upload(file.file, file.filename), file_size
+
+
+def read_verified_bytes(fileobj: BinaryIO) -> bytes:
+    """读取原始字节并校验图片结构（不解码像素）"""
+    fileobj.seek(0)
+    data = fileobj.read()
+    with Image.open(BytesIO(data)) as image:
+        image.verify()
+    return data
+
+
+async def read_upload_bytes(file: UploadFile) -> Tuple[bytes, int]:
+    """校验上传图片并返回原始字节，供异步任务稍后解码"""
+    file_size = validate_upload(file)
+
+    try:
+        data = await run_in_threadpool(read_verified_bytes, file.file)
+    except Exception as img_error:
+        logger.error("图片校验失败", filename=file.filename, error=str(img_error))
+        raise HTTPException(
+            status_code=400,
+            detail=f"图片格式错误或损坏: {str(img_error)}"
+        )
+    return data, file_size
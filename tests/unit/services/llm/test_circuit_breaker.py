@@ -0,0 +1,196 @@
+"""
+服务商熔断器单元测试
+"""
+
+import httpx
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+from ai_tutor.core.config import settings
+from ai_tutor.services.llm import QwenService, KimiService, RoutingLLMService, LatencyTracker
+from ai_tutor.services.llm.circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    CircuitState,
+    circuit_breakers,
+    counts_as_failure,
+)
+from ai_tutor.services.llm.exceptions import LLMAPIError, LLMRateLimitError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    fake = FakeClock()
+    with patch("ai_tutor.services.llm.circuit_breaker.time.monotonic", fake):
+        yield fake
+
+
+def ok_response(content="ok"):
+    return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+
+def counting_client(handler):
+    calls = []
+
+    def transport(request):
+        calls.append(request)
+        return handler(request)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(transport)), calls
+
+
+class TestCircuitBreaker:
+    """状态机测试"""
+
+    def test_opens_after_consecutive_failures(self, clock):
+        breaker = CircuitBreaker("qwen", "qwen-plus", failure_threshold=3, recovery_timeout=30)
+        for _ in range(2):
+            breaker.before_call()
+            breaker.record_failure(RuntimeError("boom"))
+        assert breaker.state == CircuitState.CLOSED
+
+        breaker.before_call()
+        breaker.record_failure(RuntimeError("boom"))
+        assert breaker.state == CircuitState.OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        assert breaker.total_rejected == 1
+
+    def test_success_resets_failure_count(self, clock):
+        breaker = CircuitBreaker("qwen", "qwen-plus", failure_threshold=2, recovery_timeout=30)
+        breaker.record_failure(RuntimeError("boom"))
+        breaker.record_success()
+        breaker.record_failure(RuntimeError("boom"))
+        assert breaker.state == CircuitState.CLOSED
+
+    def test_half_open_probe_closes_on_success(self, clock):
+        breaker = CircuitBreaker("qwen", "qwen-plus", failure_threshold=1, recovery_timeout=30)
+        breaker.record_failure(RuntimeError("boom"))
+        clock.now += 31
+        assert breaker.state == CircuitState.HALF_OPEN
+
+        breaker.before_call()
+        # 探测进行中，其余请求仍被拒绝
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        breaker.record_success()
+        assert breaker.state == CircuitState.CLOSED
+
+    def test_half_open_probe_failure_reopens(self, clock):
+        breaker = CircuitBreaker("qwen", "qwen-plus", failure_threshold=1, recovery_timeout=30)
+        breaker.record_failure(RuntimeError("boom"))
+        clock.now += 31
+        breaker.before_call()
+        breaker.record_failure(RuntimeError("still down"))
+        assert breaker.state == CircuitState.OPEN
+        assert breaker.times_opened == 2
+
+    def test_ignored_result_releases_probe_slot(self, clock):
+        breaker = CircuitBreaker("qwen", "qwen-plus", failure_threshold=1, recovery_timeout=30)
+        breaker.record_failure(RuntimeError("boom"))
+        clock.now += 31
+        breaker.before_call()
+        breaker.record_ignored()
+        assert breaker.allows_calls()
+
+    def test_failure_classification(self):
+        assert counts_as_failure(httpx.ReadTimeout("slow"))
+        assert counts_as_failure(LLMAPIError("down", status_code=503))
+        assert not counts_as_failure(LLMAPIError("bad request", status_code=400))
+        assert not counts_as_failure(LLMRateLimitError("slow down"))
+
+
+class TestServiceIntegration:
+    """服务调用接入熔断测试"""
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_fails_fast_without_request(self):
+        client, calls = counting_client(lambda request: httpx.Response(500, text="down"))
+        service = QwenService(api_key="k", base_url="http://llm.test", client=client)
+
+        with patch.object(settings, "LLM_BREAKER_FAILURE_THRESHOLD", 2):
+            for _ in range(2):
+                with pytest.raises(LLMAPIError):
+                    await service.generate("hi", cache=False, fallback=False)
+            with pytest.raises(CircuitOpenError):
+                await service.generate("hi", cache=False, fallback=False)
+
+        assert len(calls) == 2
+        assert circuit_breakers.get("qwen", "qwen-plus").state == CircuitState.OPEN
+
+    @pytest.mark.asyncio
+    async def test_client_errors_do_not_open_circuit(self):
+        client, _ = counting_client(lambda request: httpx.Response(400, text="bad"))
+        service = QwenService(api_key="k", base_url="http://llm.test", client=client)
+
+        with patch.object(settings, "LLM_BREAKER_FAILURE_THRESHOLD", 1):
+            for _ in range(3):
+                with pytest.raises(LLMAPIError):
+                    await service.generate("hi", cache=False, fallback=False)
+
+        assert circuit_breakers.get("qwen", "qwen-plus").state == CircuitState.CLOSED
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_routes_to_fallback_provider(self):
+        qwen_client, qwen_calls = counting_client(lambda request: ok_response("qwen"))
+        kimi_client, kimi_calls = counting_client(lambda request: ok_response("kimi"))
+        qwen = QwenService(api_key="k", base_url="http://qwen.test", client=qwen_client)
+        kimi = KimiService(api_key="k", base_url="http://kimi.test", client=kimi_client)
+
+        breaker = circuit_breakers.get("qwen", "qwen-plus")
+        breaker.failure_threshold = 1
+        breaker.record_failure(RuntimeError("boom"))
+
+        with patch("ai_tutor.services.llm.base.get_llm_service", return_value=kimi):
+            result = await qwen.generate("hi", cache=False, model="qwen-plus")
+
+        assert result == "kimi"
+        assert not qwen_calls
+        # 备用服务商使用自己的默认模型
+        assert b"moonshot-v1-8k" in kimi_calls[0].content
+
+    @pytest.mark.asyncio
+    async def test_router_skips_open_provider(self):
+        qwen_client, qwen_calls = counting_client(lambda request: ok_response("qwen"))
+        kimi_client, _ = counting_client(lambda request: ok_response("kimi"))
+        router = RoutingLLMService(
+            {
+                "qwen": QwenService(api_key="k", base_url="http://qwen.test", client=qwen_client),
+                "kimi": KimiService(api_key="k", base_url="http://kimi.test", client=kimi_client),
+            },
+            tracker=LatencyTracker(),
+        )
+        breaker = circuit_breakers.get("qwen", "qwen-plus")
+        breaker.failure_threshold = 1
+        breaker.record_failure(RuntimeError("boom"))
+
+        assert await router.generate("hi", cache=False) == "kimi"
+        assert not qwen_calls
+
+
+class TestHealthExposure:
+    """健康检查暴露熔断状态测试"""
+
+    def test_homework_health_reports_open_circuit(self):
+        from ai_tutor.main import app
+
+        breaker = circuit_breakers.get("qwen", "qwen-plus")
+        breaker.failure_threshold = 1
+        breaker.record_failure(RuntimeError("boom"))
+
+        with patch("ai_tutor.api.v1.homework.get_llm_service"):
+            response = TestClient(app).get("/api/v1/homework/health")
+
+        body = response.json()
+        assert body["status"] == "degraded"
+        assert body["services"]["ai_qwen"] == "circuit_open"
+        assert body["circuit_breakers"]["qwen/qwen-plus"]["state"] == "open"
@@ -0,0 +1,74 @@
+"""
+LLMClientPool 单元测试
+"""
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from ai_tutor.core.config import settings
+from ai_tutor.services.llm import get_llm_service, QwenService, KimiService
+from ai_tutor.services.llm.client_pool import LLMClientPool
+
+
+@pytest.fixture
+def pool():
+    return LLMClientPool()
+
+
+@pytest.fixture(autouse=True)
+def api_keys():
+    with patch.object(settings, "QWEN_API_KEY", "test-qwen"), patch.object(
+        settings, "KIMI_API_KEY", "test-kimi"
+    ):
+        yield
+
+
+class TestLLMClientPool:
+    """连接池测试"""
+
+    def test_client_is_shared_per_provider(self, pool):
+        """同一服务商复用同一个客户端"""
+        assert pool.get_client("qwen") is pool.get_client("QWEN")
+        assert pool.get_client("qwen") is not pool.get_client("kimi")
+
+    def test_services_reuse_pooled_client(self, pool):
+        """get_llm_service 注入共享客户端"""
+        first = get_llm_service("qwen", pool=pool)
+        second = get_llm_service("qwen", pool=pool)
+        kimi = get_llm_service("kimi", pool=pool)
+
+        assert isinstance(first, QwenService)
+        assert isinstance(kimi, KimiService)
+        assert first.client is second.client
+        assert first.client is pool.get_client("qwen")
+
+    @pytest.mark.asyncio
+    async def test_service_does_not_close_shared_client(self, pool):
+        """服务退出时不关闭共享客户端"""
+        async with get_llm_service("qwen", pool=pool) as service:
+            client = service.client
+        assert not client.is_closed
+        await pool.close()
+        assert client.is_closed
+
+    @pytest.mark.asyncio
+    async def test_start_prewarms_configured_providers(self, pool):
+        """启动时为已配置密钥的服务商预热连接"""
+        with patch.object(settings, "KIMI_API_KEY", ""), patch.object(
+            LLMClientPool, "_prewarm", new_callable=AsyncMock
+        ) as mock_prewarm:
+            await pool.start()
+
+        mock_prewarm.assert_awaited_once_with("qwen")
+        assert set(pool.stats()["providers"]) == {"qwen", "kimi"}
+        await pool.close()
+
+    def test_stats_structure(self, pool):
+        """统计信息包含限制与连接数"""
+        pool.get_client("qwen")
+        stats = pool.stats()
+
+        assert stats["limits"]["max_connections"] == settings.LLM_POOL_MAX_CONNECTIONS
+        qwen = stats["providers"]["qwen"]
+        assert qwen["requests_total"] == 0
+        assert qwen["connections"] == {"total": 0, "idle": 0, "active": 0}
@@ -0,0 +1,113 @@
+"""
+容错JSON解码单元测试
+"""
+
+import json
+
+import httpx
+import pytest
+
+from ai_tutor.services.llm import QwenService
+from ai_tutor.services.llm.json_repair import JSONRepairError, tolerant_json_decode
+from ai_tutor.services.llm.simulator import SimulatorConfig, create_simulator_app
+
+
+class TestTolerantDecode:
+    """容错解码测试"""
+
+    def test_well_formed_json_is_not_repaired(self):
+        result = tolerant_json_decode('{"questions": [], "overall_score": 90}')
+        assert result.value == {"questions": [], "overall_score": 90}
+        assert not result.repaired
+
+    @pytest.mark.parametrize(
+        "text, expected",
+        [
+            ('```json\n{"a": [1, 2,],}\n```', {"a": [1, 2]}),
+            ('好的：\n```json\n{"a": 1,}\n```', {"a": 1}),
+            ('```json\n{"a": "x```y", "b": 1}\n```', {"a": "x```y", "b": 1}),
+            ('批改结果[见下]：{"questions": [], "overall_score": 80}', {"questions": [], "overall_score": 80}),
+            ('```json\n[1, 2,]\n```', [1, 2]),
+            ('{"code": "```python\nprint(1)\n```", "ok": true}', {"code": "```python\nprint(1)\n```", "ok": True}),
+            ('以下是批改结果：\n{"a": 1}\n希望对你有帮助', {"a": 1}),
+            ("{'is_correct': True, 'error': None, 'ok': False}", {"is_correct": True, "error": None, "ok": False}),
+            ('{score: 5, max_score: 5}', {"score": 5, "max_score": 5}),
+            ('{"a": 1, // 注释\n "b": 2}', {"a": 1, "b": 2}),
+            ('{"text": "第一行\n第二行"}', {"text": "第一行\n第二行"}),
+            ('{"answer": "\\sqrt{2}"}', {"answer": "\\sqrt{2}"}),
+        ],
+    )
+    def test_common_llm_defects(self, text, expected):
+        result = tolerant_json_decode(text)
+        assert result.value == expected
+        assert result.repaired
+
+    def test_truncated_tail_is_closed(self):
+        text = '{"questions": [{"question_number": 1, "score": 5}, {"question_number": 2, "student_answer": "x = 3'
+        result = tolerant_json_decode(text)
+        assert result.truncated
+        assert result.value["questions"][0] == {"question_number": 1, "score": 5}
+        assert result.value["questions"][1]["student_answer"] == "x = 3"
+
+    def test_dangling_key_is_dropped(self):
+        assert tolerant_json_decode('{"a": 1, "b":').value == {"a": 1}
+
+    def test_no_json_raises(self):
+        with pytest.raises(JSONRepairError):
+            tolerant_json_decode("模型拒绝回答")
+        with pytest.raises(JSONRepairError):
+            tolerant_json_decode("[" * 10000)
+
+    def test_large_input_is_linear(self):
+        # 大量嵌套括号的畸形输入不应导致回溯爆炸
+        text = "{" * 5000 + '"a": [' * 100
+        result = tolerant_json_decode("x" + text[:800])
+        assert result.truncated
+
+
+class TestSafeJsonParse:
+    """safe_json_parse 集成测试"""
+
+    def setup_method(self):
+        self.service = QwenService(api_key="k", base_url="http://llm.test")
+
+    def test_repairs_before_falling_back(self):
+        parsed = self.service.safe_json_parse("```json\n{'questions': [], 'overall_score': 80,}\n```")
+        assert parsed == {"questions": [], "overall_score": 80}
+
+    def test_fallback_parser_used_when_no_json(self):
+        parsed = self.service.safe_json_parse("总分：80", fallback_parser=lambda text: {"fallback": True})
+        assert parsed == {"fallback": True}
+
+    def test_non_object_result_falls_back(self):
+        parsed = self.service.safe_json_parse("[1, 2]", fallback_parser=lambda text: {"fallback": True})
+        assert parsed == {"fallback": True}
+
+    def test_emergency_extraction(self):
+        parsed = self.service.safe_json_parse("总分: 75")
+        assert parsed["parsing_error"] is True
+        assert parsed["overall_score"] == 75.0
+
+
+class TestStructuredOutputMode:
+    """response_format=json_object 请求模式测试"""
+
+    def test_request_body_includes_response_format(self):
+        service = QwenService(api_key="k", base_url="http://llm.test")
+        data = service._build_request_data([], response_format="json_object")
+        assert data["response_format"] == {"type": "json_object"}
+        assert "response_format" not in service._build_request_data([])
+
+    @pytest.mark.asyncio
+    async def test_json_mode_skips_repair_against_simulator(self):
+        app = create_simulator_app(SimulatorConfig(latency="fixed:0", malformed_rate=1.0, seed=0))
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+        service = QwenService(api_key="k", base_url="http://sim/v1", client=client)
+        prompt = "请批改并按JSON返回questions：\n1. 1+1=2"
+
+        loose = await service.generate(prompt, cache=False)
+        strict = await service.generate(prompt, cache=False, response_format="json_object")
+
+        assert tolerant_json_decode(loose).repaired
+        assert not tolerant_json_decode(strict).repaired
+        assert json.loads(strict)["questions"]
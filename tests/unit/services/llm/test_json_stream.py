@@ -0,0 +1,51 @@
+"""
+IncrementalJSONArrayParser 单元测试
+"""
+
+import json
+
+from ai_tutor.services.llm.json_stream import IncrementalJSONArrayParser
+
+
+RESPONSE = {
+    "questions": [
+        {"question_number": 1, "is_correct": True, "solution_steps": ["x=1", "{不是括号}"]},
+        {"question_number": 2, "is_correct": False, "error_analysis": "引号\"与]"},
+    ],
+    "overall_score": 50,
+    "weak_knowledge_points": [{"name": "方程"}],
+}
+
+
+def feed_in_chunks(parser, text, size):
+    emitted = []
+    for i in range(0, len(text), size):
+        emitted.extend(parser.feed(text[i:i + size]))
+    return emitted
+
+
+class TestIncrementalJSONArrayParser:
+    """增量解析测试"""
+
+    def test_emits_each_question_once_complete(self):
+        text = "```json\n" + json.dumps(RESPONSE, ensure_ascii=False, indent=2) + "\n```"
+        for size in (1, 7, len(text)):
+            parser = IncrementalJSONArrayParser("questions")
+            emitted = feed_in_chunks(parser, text, size)
+
+            assert emitted == RESPONSE["questions"]
+            assert parser.text == text
+
+    def test_element_emitted_before_stream_ends(self):
+        parser = IncrementalJSONArrayParser("questions")
+        first = parser.feed('{"questions": [{"question_number": 1}, {"question_')
+
+        assert first == [{"question_number": 1}]
+        assert parser.feed('number": 2}], "overall_score": 1}') == [{"question_number": 2}]
+
+    def test_ignores_other_arrays_and_nested_keys(self):
+        parser = IncrementalJSONArrayParser("questions")
+        text = '{"meta": {"questions": [{"x": 1}]}, "tags": [{"y": 2}], "questions": []}'
+
+        assert parser.feed(text) == []
+        assert parser.emitted == 0
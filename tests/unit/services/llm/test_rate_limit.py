@@ -0,0 +1,202 @@
+"""
+LLM限流与自适应并发单元测试
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from ai_tutor.services.llm import QwenService
+from ai_tutor.services.llm.exceptions import LLMRateLimitError
+from ai_tutor.services.llm.rate_limit import (
+    TokenBucket,
+    ProviderRateLimiter,
+    AdaptiveConcurrencyLimiter,
+    estimate_tokens,
+    parse_retry_after,
+)
+
+
+class TestTokenBucket:
+    """令牌桶测试"""
+
+    def test_wait_time_when_exhausted(self):
+        bucket = TokenBucket(per_minute=60)
+        assert bucket.wait_time(60) == 0
+        bucket.take(60)
+        assert bucket.wait_time(1) == pytest.approx(1.0, abs=0.05)
+
+    def test_adjust_refunds_overestimate(self):
+        bucket = TokenBucket(per_minute=100)
+        bucket.take(80)
+        bucket.adjust(50)
+        assert bucket.level == pytest.approx(70, abs=1)
+
+
+class TestProviderRateLimiter:
+    """进程内限流器测试"""
+
+    @pytest.mark.asyncio
+    async def test_acquire_waits_when_rpm_exhausted(self):
+        limiter = ProviderRateLimiter("qwen", rpm=2, tpm=0)
+        with patch("ai_tutor.services.llm.rate_limit.asyncio.sleep", new_callable=AsyncMock) as sleep:
+            await limiter.acquire(10)
+            await limiter.acquire(10)
+            sleep.assert_not_awaited()
+
+            # 第三次请求需要等待；模拟时间流逝后放行
+            limiter._requests.level = 0
+            async def advance(seconds):
+                limiter._requests.level = 1
+            sleep.side_effect = advance
+            await limiter.acquire(10)
+
+        assert limiter.throttled == 1
+
+    @pytest.mark.asyncio
+    async def test_pause_blocks_until_retry_after(self):
+        limiter = ProviderRateLimiter("qwen", rpm=100, tpm=0)
+        await limiter.pause(30)
+        assert await limiter._try_acquire(1) == pytest.approx(30, abs=0.5)
+        assert limiter.stats()["paused_for"] > 29
+
+    @pytest.mark.asyncio
+    async def test_disabled_limiter_never_waits(self):
+        limiter = ProviderRateLimiter("qwen", rpm=0, tpm=0)
+        for _ in range(100):
+            await limiter.acquire(10**6)
+        assert limiter.throttled == 0
+
+    @pytest.mark.asyncio
+    async def test_disabled_limiter_still_honors_pause(self):
+        limiter = ProviderRateLimiter("qwen", rpm=0, tpm=0)
+        await limiter.pause(0.1)
+
+        start = time.perf_counter()
+        await limiter.acquire(1)
+
+        assert time.perf_counter() - start >= 0.09
+        assert limiter.throttled == 1
+
+    @pytest.mark.asyncio
+    async def test_disabled_limiter_honors_pause_from_other_process(self):
+        redis = MagicMock()
+        redis.pttl.side_effect = [100, -2]  # 其他进程写入的暂停还剩100ms，之后过期
+        limiter = ProviderRateLimiter("qwen", rpm=0, tpm=0, redis_client=redis)
+
+        await limiter.acquire(1)
+
+        assert limiter.throttled == 1
+        assert limiter.waited_seconds == pytest.approx(0.1)
+        redis.pttl.assert_called_with("ai_tutor:ratelimit:qwen:pause")
+
+
+class TestAdaptiveConcurrency:
+    """AIMD并发窗口测试"""
+
+    def test_additive_increase_and_multiplicative_decrease(self):
+        limiter = AdaptiveConcurrencyLimiter("qwen", initial=4, minimum=1, maximum=8)
+        for _ in range(20):
+            limiter.on_success(0.5)
+        grown = limiter.limit
+        assert grown > 4
+
+        limiter.on_throttle()
+        assert limiter.limit == pytest.approx(grown / 2)
+
+    def test_mixed_latency_without_errors_does_not_shrink(self):
+        # 短对话（约0.3秒）与长批改（约8秒）交替，没有任何错误或429
+        limiter = AdaptiveConcurrencyLimiter("qwen", initial=4, minimum=1, maximum=16)
+        for i in range(200):
+            limiter.on_success(0.3 if i % 3 else 8.0 + i % 5)
+
+        assert limiter.limit >= 4
+        assert limiter.stats()["failures"] == 0
+
+    @pytest.mark.asyncio
+    async def test_slot_caps_inflight(self):
+        limiter = AdaptiveConcurrencyLimiter("qwen", initial=2, minimum=1, maximum=2)
+        peak = 0
+
+        async def work():
+            nonlocal peak
+            async with limiter.slot():
+                peak = max(peak, limiter.inflight)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(work() for _ in range(6)))
+        assert peak == 2
+        assert limiter.inflight == 0
+
+
+class TestHelpers:
+    """辅助函数测试"""
+
+    def test_estimate_tokens(self):
+        assert estimate_tokens([{"role": "user", "content": "你好"}], 100) == 102
+
+    def test_parse_retry_after(self):
+        assert parse_retry_after("3") == 3.0
+        assert parse_retry_after(None) is None
+        assert parse_retry_after("garbage") is None
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+class TestChatRetryOn429:
+    """429 重试测试"""
+
+    @pytest.mark.asyncio
+    async def test_429_is_retried_after_pause(self):
+        responses = [
+            httpx.Response(429, headers={"Retry-After": "2"}, text="too many"),
+            httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}], "usage": {"total_tokens": 5}}),
+        ]
+        client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: responses.pop(0)))
+        service = QwenService(api_key="k", base_url="http://llm.test", client=client)
+        limiter = ProviderRateLimiter("qwen", rpm=0, tpm=0)
+        limiter.pause = AsyncMock()
+
+        with patch("ai_tutor.services.llm.base.get_rate_limiter", return_value=limiter):
+            result = await service.generate("hi", cache=False)
+
+        assert result == "ok"
+        limiter.pause.assert_awaited_once_with(2.0)
+
+    @pytest.mark.asyncio
+    async def test_429_waits_for_retry_after_with_limits_disabled(self):
+        responses = [
+            httpx.Response(429, headers={"Retry-After": "0.2"}, text="too many"),
+            httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}], "usage": {"total_tokens": 5}}),
+        ]
+        sent = []
+
+        def handler(request):
+            sent.append(time.perf_counter())
+            return responses.pop(0)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        service = QwenService(api_key="k", base_url="http://llm.test", client=client)
+        limiter = ProviderRateLimiter("qwen", rpm=0, tpm=0)
+
+        with patch("ai_tutor.services.llm.base.get_rate_limiter", return_value=limiter):
+            assert await service.generate("hi", cache=False) == "ok"
+
+        assert sent[1] - sent[0] >= 0.19
+
+    @pytest.mark.asyncio
+    async def test_429_raises_after_retries_exhausted(self):
+        client = httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: httpx.Response(429, text="slow down"))
+        )
+        service = QwenService(api_key="k", base_url="http://llm.test", client=client)
+        limiter = ProviderRateLimiter("qwen", rpm=0, tpm=0)
+        limiter.pause = AsyncMock()
+
+        with patch("ai_tutor.services.llm.base.get_rate_limiter", return_value=limiter):
+            with pytest.raises(LLMRateLimitError, match="HTTP 429"):
+                await service.generate("hi", cache=False)
+
+        assert limiter.pause.await_count == service.max_retries
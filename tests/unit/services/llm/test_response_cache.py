@@ -0,0 +1,145 @@
+"""
+LLM响应缓存单元测试
+"""
+
+import time
+import httpx
+import pytest
+from unittest.mock import patch, Mock
+
+from ai_tutor.services.llm import QwenService
+from ai_tutor.services.llm.cache import (
+    LLMResponseCache,
+    MemoryLRUTier,
+    DiskTier,
+)
+
+
+def make_service(counter: dict) -> QwenService:
+    """构造使用MockTransport的Qwen服务"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        counter["calls"] = counter.get("calls", 0) + 1
+        return httpx.Response(
+            200,
+            json={"choices": [{"message": {"content": f"reply-{counter['calls']}"}}]},
+        )
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return QwenService(api_key="test-key", base_url="http://llm.test", client=client)
+
+
+class TestMemoryLRUTier:
+    """内存LRU层测试"""
+
+    @pytest.mark.asyncio
+    async def test_evicts_least_recently_used(self):
+        tier = MemoryLRUTier(max_entries=2)
+        await tier.set("a", "1", ttl=60)
+        await tier.set("b", "2", ttl=60)
+        await tier.get("a")
+        await tier.set("c", "3", ttl=60)
+
+        assert await tier.get("a") == "1"
+        assert await tier.get("b") is None
+        assert len(tier) == 2
+
+    @pytest.mark.asyncio
+    async def test_expired_entry_is_miss(self):
+        tier = MemoryLRUTier(max_entries=2)
+        await tier.set("a", "1", ttl=60)
+        with patch("ai_tutor.services.llm.cache.time.time", return_value=time.time() + 120):
+            assert await tier.get("a") is None
+
+
+class TestLLMResponseCache:
+    """两级缓存测试"""
+
+    def test_key_depends_on_sampling_params(self):
+        base = {"model": "qwen-plus", "messages": [{"role": "user", "content": "hi"}], "temperature": 0.2}
+        assert LLMResponseCache.make_key("qwen", base) == LLMResponseCache.make_key("qwen", dict(base))
+        assert LLMResponseCache.make_key("qwen", base) != LLMResponseCache.make_key("kimi", base)
+        assert LLMResponseCache.make_key("qwen", base) != LLMResponseCache.make_key(
+            "qwen", {**base, "temperature": 0.1}
+        )
+
+    @pytest.mark.asyncio
+    async def test_disk_backend_hit_promotes_to_memory(self, tmp_path):
+        disk = DiskTier(str(tmp_path), max_entries=10)
+        await disk.set("k", "value", ttl=60)
+        cache = LLMResponseCache(MemoryLRUTier(10), disk, ttl=60)
+
+        assert await cache.get("k") == "value"
+        assert await cache.get("k") == "value"
+        assert await cache.get("missing") is None
+
+        stats = cache.stats()
+        assert stats["hits"] == {"memory": 1, "disk": 1}
+        assert stats["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_backend_errors_degrade_to_miss(self):
+        backend = Mock(name="redis")
+        backend.name = "redis"
+        backend.get.side_effect = ConnectionError("down")
+        cache = LLMResponseCache(MemoryLRUTier(10), backend, ttl=60)
+
+        assert await cache.get("k") is None
+        assert cache.stats()["errors"] == 1
+
+
+class TestChatCaching:
+    """LLMService.chat 缓存集成测试"""
+
+    @pytest.fixture(autouse=True)
+    def fresh_cache(self):
+        cache = LLMResponseCache(MemoryLRUTier(10), None, ttl=60)
+        with patch("ai_tutor.services.llm.base.get_llm_response_cache", return_value=cache):
+            yield cache
+
+    @pytest.mark.asyncio
+    async def test_deterministic_call_is_cached(self):
+        counter = {}
+        service = make_service(counter)
+
+        first = await service.generate("批改", temperature=0.2)
+        second = await service.generate("批改", temperature=0.2)
+
+        assert first == second == "reply-1"
+        assert counter["calls"] == 1
+
+    @pytest.mark.asyncio
+    async def test_high_temperature_and_opt_out_bypass_cache(self):
+        counter = {}
+        service = make_service(counter)
+
+        await service.generate("聊天", temperature=0.9)
+        await service.generate("聊天", temperature=0.9)
+        await service.generate("批改", temperature=0.2, cache=False)
+        await service.generate("批改", temperature=0.2, cache=False)
+
+        assert counter["calls"] == 4
+
+    @pytest.mark.asyncio
+    async def test_explicit_opt_in(self, fresh_cache):
+        counter = {}
+        service = make_service(counter)
+
+        await service.generate("知识点", cache=True)
+        await service.generate("知识点", cache=True)
+
+        assert counter["calls"] == 1
+        assert fresh_cache.stats()["hits"]["memory"] == 1
+
+    @pytest.mark.asyncio
+    async def test_repeated_knowledge_extraction_hits_cache(self, fresh_cache):
+        from ai_tutor.services.knowledge.math import MathKnowledgeExtractor
+
+        counter = {}
+        extractor = MathKnowledgeExtractor(make_service(counter))
+
+        await extractor.extract("解方程 x + 5 = 10")
+        await extractor.extract("解方程 x + 5 = 10")
+
+        assert counter["calls"] == 1
+        assert fresh_cache.stats()["hits"]["memory"] == 1
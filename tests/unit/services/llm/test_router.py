@@ -0,0 +1,149 @@
+"""
+多服务商路由与对冲请求单元测试
+"""
+
+import asyncio
+import pytest
+from unittest.mock import patch
+
+from ai_tutor.core.config import settings
+from ai_tutor.services.llm import LLMService, get_llm_service
+from ai_tutor.services.llm.router import LatencyTracker, RoutingLLMService
+
+
+class DelayedLLM(LLMService):
+    """按固定延迟返回的假服务"""
+
+    def __init__(self, name: str, delay: float, fail: bool = False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = 0
+        self.kwargs = None
+
+    async def chat(self, messages, **kwargs):
+        self.calls += 1
+        self.kwargs = kwargs
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise RuntimeError(f"{self.name} failed")
+        return self.name
+
+    async def generate(self, prompt, **kwargs):
+        return await self.chat([{"role": "user", "content": prompt}], **kwargs)
+
+
+def seed(tracker: LatencyTracker, provider: str, latency: float, n: int = 30, ok: bool = True):
+    for _ in range(n):
+        tracker.record(provider, latency, ok)
+
+
+class TestLatencyTracker:
+    """延迟跟踪测试"""
+
+    def test_rank_prefers_fast_healthy_provider(self):
+        tracker = LatencyTracker(window=50)
+        seed(tracker, "qwen", 2.0)
+        seed(tracker, "kimi", 1.0)
+        assert tracker.rank(["qwen", "kimi"]) == ["kimi", "qwen"]
+
+        seed(tracker, "kimi", 1.0, n=50, ok=False)
+        assert tracker.rank(["qwen", "kimi"]) == ["qwen", "kimi"]
+
+    def test_hedge_delay_uses_p95(self):
+        tracker = LatencyTracker(window=100)
+        assert tracker.hedge_delay("qwen") == settings.LLM_HEDGE_DEFAULT_DELAY
+
+        for i in range(1, 101):
+            tracker.record("qwen", i / 100, True)
+        assert tracker.hedge_delay("qwen") == pytest.approx(0.96)
+
+
+class TestRoutingLLMService:
+    """路由服务测试"""
+
+    @pytest.mark.asyncio
+    async def test_routes_to_fastest(self):
+        tracker = LatencyTracker()
+        seed(tracker, "qwen", 3.0)
+        seed(tracker, "kimi", 1.0)
+        qwen, kimi = DelayedLLM("qwen", 0), DelayedLLM("kimi", 0)
+        router = RoutingLLMService({"qwen": qwen, "kimi": kimi}, tracker)
+
+        assert await router.generate("hi") == "kimi"
+        assert qwen.calls == 0
+        assert router.last_decision.winner == "kimi"
+        assert router.last_decision.hedged is False
+
+    @pytest.mark.asyncio
+    async def test_hedge_fires_after_delay_and_cancels_loser(self):
+        tracker = LatencyTracker()
+        seed(tracker, "qwen", 0.01, n=100)
+        seed(tracker, "kimi", 0.05)
+        for _ in range(3):
+            tracker.record("qwen", 1.0, True)  # 慢尾部，供估算节省时间
+        slow_qwen, kimi = DelayedLLM("qwen", 1.0), DelayedLLM("kimi", 0.01)
+        router = RoutingLLMService({"qwen": slow_qwen, "kimi": kimi}, tracker)
+
+        with patch.object(settings, "LLM_HEDGE_MIN_DELAY", 0.01):
+            assert await router.generate("hi", hedge=True, model="qwen-max", temperature=0.2) == "kimi"
+        await asyncio.sleep(0)
+
+        decision = router.last_decision
+        assert decision.primary == "qwen"
+        assert decision.winner == "kimi"
+        assert decision.hedged is True
+        assert decision.hedge_saved > 0.5
+        assert slow_qwen.cancelled == 1
+        assert tracker.hedge_wins == 1
+        # 服务商专属的模型名不传给对冲方，通用参数照传
+        assert slow_qwen.kwargs["model"] == "qwen-max"
+        assert "model" not in kimi.kwargs
+        assert kimi.kwargs["temperature"] == 0.2
+        # 被取消的主请求不产生延迟样本
+        assert tracker.stats_for("qwen").count == 103
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_when_primary_is_fast(self):
+        tracker = LatencyTracker()
+        seed(tracker, "qwen", 0.5)
+        seed(tracker, "kimi", 0.6)
+        qwen, kimi = DelayedLLM("qwen", 0.001), DelayedLLM("kimi", 0.001)
+        router = RoutingLLMService({"qwen": qwen, "kimi": kimi}, tracker)
+
+        assert await router.generate("hi", hedge=True) == "qwen"
+        assert kimi.calls == 0
+        assert tracker.hedges_fired == 0
+
+    @pytest.mark.asyncio
+    async def test_primary_failure_falls_back_to_secondary(self):
+        tracker = LatencyTracker()
+        seed(tracker, "qwen", 0.1)
+        seed(tracker, "kimi", 0.2)
+        router = RoutingLLMService(
+            {"qwen": DelayedLLM("qwen", 0, fail=True), "kimi": DelayedLLM("kimi", 0)}, tracker
+        )
+
+        assert await router.generate("hi", hedge=True) == "kimi"
+
+    @pytest.mark.asyncio
+    async def test_both_failing_raises_primary_error(self):
+        tracker = LatencyTracker()
+        router = RoutingLLMService(
+            {"qwen": DelayedLLM("qwen", 0, fail=True), "kimi": DelayedLLM("kimi", 0, fail=True)}, tracker
+        )
+
+        with pytest.raises(RuntimeError, match="failed"):
+            await router.generate("hi", hedge=True)
+
+    def test_auto_provider_skips_unconfigured(self):
+        with patch.object(settings, "QWEN_API_KEY", "k"), patch.object(settings, "KIMI_API_KEY", ""):
+            service = get_llm_service("auto")
+
+        assert isinstance(service, RoutingLLMService)
+        assert list(service.services) == ["qwen"]
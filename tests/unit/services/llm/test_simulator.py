@@ -0,0 +1,105 @@
+"""
+离线LLM服务商模拟器单元测试
+"""
+
+import json
+import random
+
+import httpx
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from ai_tutor.services.llm import QwenService
+from ai_tutor.services.llm.exceptions import LLMAPIError, LLMRateLimitError
+from ai_tutor.services.llm.rate_limit import ProviderRateLimiter
+from ai_tutor.services.llm.simulator import (
+    LatencyModel,
+    SimulatorConfig,
+    build_grading_json,
+    create_simulator_app,
+)
+
+
+def simulated_service(**config) -> QwenService:
+    app = create_simulator_app(SimulatorConfig(latency="fixed:0", seed=1, **config))
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+    return QwenService(api_key="k", base_url="http://sim/v1", client=client)
+
+
+class TestLatencyModel:
+    """延迟分布测试"""
+
+    def test_parse_and_sample(self):
+        rng = random.Random(0)
+        assert LatencyModel("fixed:0.5").sample(rng) == 0.5
+        samples = [LatencyModel("uniform:0.1,0.2").sample(rng) for _ in range(50)]
+        assert all(0.1 <= s <= 0.2 for s in samples)
+        assert LatencyModel("lognormal:1.0,0.5").sample(rng) > 0
+
+    def test_invalid_spec(self):
+        with pytest.raises(ValueError):
+            LatencyModel("gamma:1,2")
+        with pytest.raises(ValueError):
+            LatencyModel("uniform:1")
+
+
+class TestSimulatorProtocol:
+    """通过真实服务类访问模拟器"""
+
+    @pytest.mark.asyncio
+    async def test_chat_completion_with_usage(self):
+        service = simulated_service()
+        reply = await service.generate("你好", cache=False)
+        assert reply == "模拟回复：你好"
+
+    @pytest.mark.asyncio
+    async def test_grading_prompt_returns_canned_json(self):
+        service = simulated_service()
+        prompt = "请批改以下作业，按JSON返回questions：\n1. 2+3=5\n2. 4×5=20\n3. 9-4=6"
+        parsed = json.loads(await service.generate(prompt, cache=False))
+        assert [q["question_number"] for q in parsed["questions"]] == [1, 2, 3]
+
+    @pytest.mark.asyncio
+    async def test_streaming_yields_deltas(self):
+        service = simulated_service(tokens_per_second=1000)
+        deltas = [d async for d in service.stream_chat([{"role": "user", "content": "流式测试"}])]
+        assert len(deltas) > 1
+        assert "".join(deltas) == "模拟回复：流式测试"
+
+    @pytest.mark.asyncio
+    async def test_error_injection(self):
+        service = simulated_service(error_rate=1.0, error_status=503)
+        with pytest.raises(LLMAPIError, match="HTTP 503"):
+            await service.generate("hi", cache=False, fallback=False)
+
+    @pytest.mark.asyncio
+    async def test_rate_limit_injection_sets_retry_after(self):
+        service = simulated_service(rate_limit_rate=1.0, retry_after=3)
+        limiter = ProviderRateLimiter("qwen", rpm=0, tpm=0)
+        limiter.pause = AsyncMock()
+        with patch("ai_tutor.services.llm.base.get_rate_limiter", return_value=limiter):
+            with pytest.raises(LLMRateLimitError):
+                await service.generate("hi", cache=False)
+        limiter.pause.assert_awaited_with(3.0)
+
+    @pytest.mark.asyncio
+    async def test_rpm_throttle_and_runtime_config(self):
+        app = create_simulator_app(SimulatorConfig(latency="fixed:0", rpm=2))
+        body = {"model": "m", "messages": [{"role": "user", "content": "hi"}]}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://sim") as client:
+            statuses = [(await client.post("/v1/chat/completions", json=body)).status_code for _ in range(3)]
+            assert statuses == [200, 200, 429]
+
+            await client.post("/_sim/config", json={"rpm": 0})
+            assert (await client.post("/v1/chat/completions", json=body)).status_code == 200
+            stats = (await client.get("/_sim/stats")).json()["stats"]
+            assert stats["rate_limited"] == 1
+
+            bad = await client.post("/_sim/config", json={"latency": "bogus"})
+            assert bad.status_code == 400
+
+
+def test_grading_json_question_count_override():
+    data = json.loads(build_grading_json("questions", 7, random.Random(0)))
+    assert len(data["questions"]) == 7
+    assert 0 <= data["overall_score"] <= 100
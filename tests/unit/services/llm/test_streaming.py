@@ -0,0 +1,172 @@
+"""
+LLM流式响应单元测试
+"""
+
+import json
+import httpx
+import pytest
+from unittest.mock import AsyncMock, patch
+from fastapi.testclient import TestClient
+
+from ai_tutor.main import app
+from ai_tutor.services.llm import QwenService, LLMService
+from ai_tutor.services.llm.exceptions import LLMRateLimitError
+from ai_tutor.services.llm.rate_limit import AdaptiveConcurrencyLimiter, ProviderRateLimiter
+from ai_tutor.services.llm.usage import UsageRecorder
+
+
+def sse_body(deltas, usage=None) -> bytes:
+    """构造OpenAI兼容的流式响应体"""
+    lines = []
+    for delta in deltas:
+        chunk = {"choices": [{"index": 0, "delta": {"content": delta}}]}
+        lines.append(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+    if usage:
+        lines.append(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n")
+    lines.append("data: [DONE]\n\n")
+    return "".join(lines).encode("utf-8")
+
+
+def make_service(handler) -> QwenService:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return QwenService(api_key="test-key", base_url="http://llm.test", client=client)
+
+
+class TestStreamChat:
+    """stream_chat 测试"""
+
+    @pytest.mark.asyncio
+    async def test_yields_deltas_and_sends_stream_flag(self):
+        seen = {}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            seen["body"] = json.loads(request.content)
+            return httpx.Response(200, content=sse_body(["你好", "，同学"], usage={"total_tokens": 7}))
+
+        service = make_service(handler)
+        deltas = [d async for d in service.stream_chat([{"role": "user", "content": "hi"}])]
+
+        assert deltas == ["你好", "，同学"]
+        assert seen["body"]["stream"] is True
+        assert seen["body"]["stream_options"] == {"include_usage": True}
+
+    @pytest.mark.asyncio
+    async def test_http_error_raises(self):
+        service = make_service(lambda request: httpx.Response(429, text="rate limited"))
+
+        with pytest.raises(Exception, match="HTTP 429"):
+            async for _ in service.stream_chat([{"role": "user", "content": "hi"}]):
+                pass
+
+
+class TestStreamAccounting:
+    """流式调用的并发名额与用量记录"""
+
+    def patched(self, limiter, concurrency, recorder):
+        return (
+            patch("ai_tutor.services.llm.base.get_rate_limiter", return_value=limiter),
+            patch("ai_tutor.services.llm.base.get_concurrency_limiter", return_value=concurrency),
+            patch("ai_tutor.services.llm.base.get_usage_recorder", return_value=recorder),
+        )
+
+    @pytest.mark.asyncio
+    async def test_completed_stream_holds_slot_and_corrects_usage(self):
+        concurrency = AdaptiveConcurrencyLimiter("qwen", initial=2, minimum=1, maximum=4)
+        limiter = ProviderRateLimiter("qwen", rpm=0, tpm=0)
+        limiter.record_usage = AsyncMock()
+        recorder = UsageRecorder()
+        service = make_service(lambda request: httpx.Response(200, content=sse_body(["a", "b"], {"total_tokens": 9})))
+
+        rate, slots, usage = self.patched(limiter, concurrency, recorder)
+        with rate, slots, usage:
+            inflight = [concurrency.inflight async for _ in service.stream_chat([{"role": "user", "content": "hi"}])]
+
+        assert inflight == [1, 1]
+        assert concurrency.inflight == 0
+        assert concurrency.stats()["successes"] == 1
+        assert limiter.record_usage.await_args.args[1] == 9
+        assert recorder.recent[-1].ok is True
+
+    @pytest.mark.asyncio
+    async def test_client_disconnect_is_recorded_as_not_ok(self):
+        concurrency = AdaptiveConcurrencyLimiter("qwen", initial=2, minimum=1, maximum=4)
+        limiter = ProviderRateLimiter("qwen", rpm=0, tpm=0)
+        recorder = UsageRecorder()
+        service = make_service(lambda request: httpx.Response(200, content=sse_body(["a", "b", "c"])))
+
+        rate, slots, usage = self.patched(limiter, concurrency, recorder)
+        with rate, slots, usage:
+            stream = service.stream_chat([{"role": "user", "content": "hi"}])
+            assert await stream.__anext__() == "a"
+            await stream.aclose()
+
+        assert concurrency.inflight == 0
+        assert concurrency.stats()["failures"] == 0
+        assert recorder.recent[-1].ok is False
+        assert recorder.recent[-1].stream is True
+
+    @pytest.mark.asyncio
+    async def test_rate_limited_stream_shrinks_window(self):
+        concurrency = AdaptiveConcurrencyLimiter("qwen", initial=4, minimum=1, maximum=4)
+        limiter = ProviderRateLimiter("qwen", rpm=0, tpm=0)
+        service = make_service(lambda request: httpx.Response(429, headers={"Retry-After": "3"}, text="slow"))
+
+        rate, slots, usage = self.patched(limiter, concurrency, UsageRecorder())
+        with rate, slots, usage:
+            with pytest.raises(LLMRateLimitError) as exc_info:
+                async for _ in service.stream_chat([{"role": "user", "content": "hi"}]):
+                    pass
+
+        assert exc_info.value.retry_after == 3.0
+        assert concurrency.limit == 2
+
+
+class FakeStreamingService(LLMService):
+    """只实现流式接口的假服务"""
+
+    async def chat(self, messages, **kwargs):
+        return "".join([d async for d in self.stream_chat(messages)])
+
+    async def generate(self, prompt, **kwargs):
+        return await self.chat([{"role": "user", "content": prompt}])
+
+    async def stream_chat(self, messages, **kwargs):
+        for delta in ["一", "二", "三"]:
+            yield delta
+
+
+class TestStreamingEndpoints:
+    """/ai/chat 与 /ai/generate 的SSE模式"""
+
+    def parse_events(self, text):
+        events = []
+        for block in text.strip().split("\n\n"):
+            event = {"event": "message"}
+            for line in block.split("\n"):
+                key, _, value = line.partition(": ")
+                event[key] = json.loads(value) if key == "data" else value
+            events.append(event)
+        return events
+
+    def test_chat_stream_relays_sse(self):
+        with patch("ai_tutor.api.v1.ai.get_llm_service", return_value=FakeStreamingService()):
+            client = TestClient(app)
+            response = client.post(
+                "/api/v1/ai/chat",
+                json={"messages": [{"role": "user", "content": "hi"}], "stream": True},
+            )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = self.parse_events(response.text)
+        assert [e["data"]["delta"] for e in events[:-1]] == ["一", "二", "三"]
+        assert events[-1]["event"] == "done"
+        assert events[-1]["data"]["response_length"] == 3
+
+    def test_generate_stream_relays_sse(self):
+        with patch("ai_tutor.api.v1.ai.get_llm_service", return_value=FakeStreamingService()):
+            client = TestClient(app)
+            response = client.post("/api/v1/ai/generate", json={"prompt": "hi", "stream": True})
+
+        events = self.parse_events(response.text)
+        assert "".join(e["data"]["delta"] for e in events if e["event"] == "message") == "一二三"
@@ -0,0 +1,173 @@
+"""
+LLM用量统计单元测试
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+
+from ai_tutor.services.llm import QwenService
+from ai_tutor.services.llm.rate_limit import ProviderRateLimiter
+from ai_tutor.services.llm.usage import (
+    UsageRecord,
+    UsageRecorder,
+    estimate_cost,
+    pop_usage_tags,
+    usage_tags,
+)
+
+
+class TestUsageTags:
+    """调用标签测试"""
+
+    def test_context_tags_merge_with_explicit_kwargs(self):
+        kwargs = {"caller": "homework.grade", "tags": {"subject": "math"}, "temperature": 0.2}
+        with usage_tags(student_id=42, subject="physics"):
+            tags = pop_usage_tags(kwargs)
+
+        assert tags == {"student_id": "42", "subject": "math", "caller": "homework.grade"}
+        assert kwargs == {"temperature": 0.2}
+
+    def test_context_is_restored(self):
+        with usage_tags(caller="outer"):
+            with usage_tags(caller="inner"):
+                assert pop_usage_tags({})["caller"] == "inner"
+            assert pop_usage_tags({})["caller"] == "outer"
+        assert pop_usage_tags({}) == {}
+
+
+class TestUsageRecorder:
+    """用量记录与汇总测试"""
+
+    def test_cost_uses_pricing_table(self):
+        assert estimate_cost("qwen-plus", 1000, 1000) == pytest.approx(0.0028)
+        assert estimate_cost("unknown-model", 1000, 1000) == 0.0
+
+    @pytest.mark.asyncio
+    async def test_memory_rollup_groups_by_caller_and_tags(self):
+        recorder = UsageRecorder()
+        usage = {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150}
+        recorder.record("qwen", "qwen-plus", usage, 1.2, {"caller": "homework.grade", "subject": "math"})
+        recorder.record("qwen", "qwen-plus", usage, 0.8, {"caller": "homework.grade", "subject": "physics"})
+        recorder.record("kimi", "moonshot-v1-8k", None, 0.3, {"caller": "api.ai.chat"}, ok=False)
+
+        await recorder.refresh()
+        report = recorder.report(group_by="caller")
+
+        assert report["backend"] == "memory"
+        assert report["totals"]["calls"] == 3
+        assert report["totals"]["errors"] == 1
+        top = report["groups"][0]
+        assert top["caller"] == "homework.grade"
+        assert top["total_tokens"] == 300
+        assert top["avg_latency_ms"] == 1000
+        assert {row["subject"] for row in recorder.report(group_by="subject")["groups"]} == {"math", "physics"}
+
+    @pytest.mark.asyncio
+    async def test_redis_stream_roundtrip(self):
+        stream = []
+        redis = MagicMock()
+        pipe = redis.pipeline.return_value
+        pipe.xadd.side_effect = lambda key, fields, **kw: stream.append((f"{len(stream) + 1}-0", fields))
+        redis.xrange.side_effect = lambda key, min, count: [
+            entry for entry in stream if entry[0] > min.lstrip("(")
+        ]
+
+        recorder = UsageRecorder(redis_client=redis)
+        recorder.record("qwen", "qwen-plus", {"total_tokens": 10}, 0.5, {"caller": "x", "subject": "math"})
+        await recorder.refresh()
+        await recorder.refresh()
+
+        assert pipe.xadd.call_args.kwargs["maxlen"] == recorder.maxlen
+        assert recorder.rollup.summary()["calls"] == 1
+        assert recorder.rollup.top("subject")[0]["subject"] == "math"
+
+    @pytest.mark.asyncio
+    async def test_concurrent_refresh_counts_stream_once(self):
+        stream = [("1-0", UsageRecord("qwen", "qwen-plus", 1, 2, 3, 40, caller="c").to_fields())]
+        redis = MagicMock()
+
+        def slow_xrange(key, min, count):
+            time.sleep(0.05)
+            return [entry for entry in stream if entry[0] > min.lstrip("(")]
+
+        redis.xrange.side_effect = slow_xrange
+        recorder = UsageRecorder(redis_client=redis)
+
+        # 接口手动刷新与定期汇总同时进行
+        await asyncio.gather(recorder.refresh(), recorder.refresh())
+
+        assert recorder.rollup.summary()["calls"] == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_records(self):
+        redis = MagicMock()
+        redis.pipeline.return_value.execute.side_effect = ConnectionError("down")
+        recorder = UsageRecorder(redis_client=redis)
+        recorder.record("qwen", "qwen-plus", None, 0.1)
+
+        assert await recorder.flush() == 0
+        assert recorder.report()["pending"] == 1
+
+    def test_record_fields_roundtrip(self):
+        record = UsageRecord("qwen", "qwen-plus", 1, 2, 3, 40, ok=False, caller="c", tags={"subject": "数学"})
+        assert UsageRecord.from_fields(record.to_fields()) == record
+
+
+class TestServiceRecording:
+    """服务调用写入用量测试"""
+
+    @pytest.mark.asyncio
+    async def test_chat_records_usage_with_caller(self):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(
+            200,
+            json={
+                "choices": [{"message": {"content": "ok"}}],
+                "usage": {"prompt_tokens": 12, "completion_tokens": 3, "total_tokens": 15},
+            },
+        )))
+        service = QwenService(api_key="k", base_url="http://llm.test", client=client)
+        recorder = UsageRecorder()
+
+        with patch("ai_tutor.services.llm.base.get_usage_recorder", return_value=recorder):
+            await service.generate("hi", cache=False, caller="api.ai.generate", tags={"subject": "math"})
+
+        record = recorder.recent[-1]
+        assert (record.caller, record.model, record.total_tokens) == ("api.ai.generate", "qwen-plus", 15)
+        assert record.tags == {"subject": "math"}
+        assert record.cost > 0
+
+    @pytest.mark.asyncio
+    async def test_rate_limited_attempt_is_recorded(self):
+        responses = [
+            httpx.Response(429, headers={"Retry-After": "1"}, text="too many"),
+            httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}], "usage": {"total_tokens": 5}}),
+        ]
+        client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: responses.pop(0)))
+        service = QwenService(api_key="k", base_url="http://llm.test", client=client)
+        limiter = ProviderRateLimiter("qwen", rpm=0, tpm=0)
+        limiter.pause = AsyncMock()
+        recorder = UsageRecorder()
+
+        with patch("ai_tutor.services.llm.base.get_rate_limiter", return_value=limiter), \
+                patch("ai_tutor.services.llm.base.get_usage_recorder", return_value=recorder):
+            await service.generate("hi", cache=False, caller="api.ai.generate")
+
+        assert [record.ok for record in recorder.recent] == [False, True]
+        assert recorder.recent[0].caller == "api.ai.generate"
+
+    def test_usage_endpoint(self):
+        from ai_tutor.main import app
+
+        recorder = UsageRecorder()
+        recorder.record("qwen", "qwen-plus", {"total_tokens": 20}, 0.2, {"caller": "api.ai.chat"})
+        with patch("ai_tutor.api.v1.ai.get_usage_recorder", return_value=recorder):
+            response = TestClient(app).get("/api/v1/ai/usage", params={"group_by": "model", "recent": 1})
+
+        data = response.json()["data"]
+        assert data["groups"][0]["model"] == "qwen/qwen-plus"
+        assert data["recent"][0]["caller"] == "api.ai.chat"
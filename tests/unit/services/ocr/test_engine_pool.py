@@ -0,0 +1,150 @@
+"""
+Tesseract常驻进程池单元测试
+
+测试环境没有安装 tesseract，worker 使用模块级的替身函数（fork 方式启动）。
+"""
+
+import os
+import signal
+
+import pytest
+from unittest.mock import patch
+from PIL import Image, ImageDraw
+
+from ai_tutor.core.config import settings
+from ai_tutor.services.ocr import PooledTesseractOCR, TesseractEnginePool, get_ocr_service
+
+
+_state = {}
+
+
+def fake_init(lang):
+    _state["lang"] = lang
+    _state["loads"] = _state.get("loads", 0) + 1
+
+
+def fake_recognize(mode, size, data, preprocess=False):
+    image = Image.frombytes(mode, size, data)
+    return f"{_state['lang']}:{image.mode}:{image.size[0]}x{image.size[1]}:{image.getpixel((0, 0))}"
+
+
+def fake_ping():
+    return {"pid": os.getpid(), "backend": "fake", "tasks": 0, "uptime": 0.0}
+
+
+def make_pool(**kwargs):
+    kwargs.setdefault("size", 2)
+    return TesseractEnginePool(
+        lang="chi_sim+eng",
+        start_method="fork",
+        initializer=fake_init,
+        task=fake_recognize,
+        ping=fake_ping,
+        **kwargs,
+    )
+
+
+class TestTesseractEnginePool:
+    @pytest.mark.asyncio
+    async def test_recognize_round_trip(self):
+        pool = make_pool()
+        try:
+            await pool.start()
+            text = await pool.recognize(Image.new("L", (40, 20), 128))
+            assert text == "chi_sim+eng:L:40x20:128"
+            assert pool.stats()["tasks"] == 1
+        finally:
+            await pool.shutdown()
+        assert not pool.started
+
+    @pytest.mark.asyncio
+    async def test_health_check_reports_workers(self):
+        pool = make_pool(size=1)
+        try:
+            await pool.start()
+            health = pool.last_health
+            assert health["status"] == "healthy"
+            assert health["workers"][0]["backend"] == "fake"
+            assert health["workers"][0]["pid"] != os.getpid()
+        finally:
+            await pool.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_restarts_after_worker_crash(self):
+        pool = make_pool(size=1)
+        try:
+            await pool.start()
+            pid = pool.last_health["workers"][0]["pid"]
+            os.kill(pid, signal.SIGKILL)
+
+            text = await pool.recognize(Image.new("RGB", (8, 8), "white"))
+
+            assert text == "chi_sim+eng:RGB:8x8:(255, 255, 255)"
+            assert pool.restarts == 1
+            assert pool.failures == 1
+            health = await pool.health_check()
+            assert health["workers"][0]["pid"] != pid
+        finally:
+            await pool.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_lazy_start_on_first_recognize(self):
+        pool = make_pool(size=1)
+        try:
+            assert not pool.started
+            await pool.recognize(Image.new("L", (4, 4), 0))
+            assert pool.started
+        finally:
+            await pool.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_warns_when_tesserocr_missing(self):
+        pool = make_pool(size=1)
+        try:
+            with patch("importlib.util.find_spec", return_value=None), \
+                    patch.object(pool, "log_warning") as log_warning:
+                await pool.start()
+            assert "tesserocr" in log_warning.call_args.args[0]
+        finally:
+            await pool.shutdown()
+
+
+class TestPooledTesseractOCR:
+    def test_factory_selects_pooled_engine(self):
+        with patch.object(settings, "OCR_ENGINE", "tesseract_pool"):
+            service = get_ocr_service()
+        assert isinstance(service, PooledTesseractOCR)
+
+    @pytest.mark.asyncio
+    async def test_extract_text_uses_pool(self):
+        pool = make_pool(size=1)
+        try:
+            service = PooledTesseractOCR(pool=pool)
+            with patch.object(settings, "OCR_LAYOUT_TILING", False):
+                text = await service.extract_text(Image.new("L", (60, 30), 255))
+            # 灰度降采样在主进程完成，二值化交给worker
+            assert text == "chi_sim+eng:L:60x30:255"
+        finally:
+            await pool.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_tiles_are_recognized_in_workers(self):
+        page = Image.new("L", (400, 600), 255)
+        draw = ImageDraw.Draw(page)
+        for top in (40, 300):
+            for line in range(4):
+                draw.rectangle([30, top + line * 30, 370, top + line * 30 + 14], fill=0)
+
+        pool = make_pool(size=2)
+        try:
+            # 整页二值化与纠偏在worker中执行，主进程只做灰度降采样与版面切分
+            with patch("ai_tutor.services.ocr.base.preprocess_page", side_effect=AssertionError("主进程预处理")):
+                result = await PooledTesseractOCR(pool=pool).extract_result(page)
+        finally:
+            await pool.shutdown()
+
+        assert len(result.blocks) == 2
+        assert result.blocks[0].bbox[1] < result.blocks[1].bbox[1]
+        for block in result.blocks:
+            assert result.text[block.start:block.end] == block.text
+        assert pool.tasks == 2
@@ -0,0 +1,105 @@
+"""
+版面切分与分块识别单元测试
+"""
+
+import time
+
+import numpy as np
+import pytest
+from unittest.mock import patch
+from PIL import Image, ImageDraw
+
+from ai_tutor.services.ocr import TesseractOCR
+from ai_tutor.services.ocr.layout import TextBlock, find_blocks, stitch_blocks
+from ai_tutor.services.parsing import QuestionParser
+
+
+def make_binary(bands, width=600, height=900, lines=4, line_gap=30):
+    """在给定纵坐标处画若干组文字行，返回文字为0的二值图"""
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    for top in bands:
+        for line in range(lines):
+            y = top + line * line_gap
+            draw.rectangle([40, y, width - 60, y + 14], fill=0)
+    return np.asarray(image)
+
+
+class TestFindBlocks:
+    def test_splits_on_wide_gaps_in_reading_order(self):
+        blocks = find_blocks(make_binary([50, 300, 600]))
+
+        assert [b.index for b in blocks] == [0, 1, 2]
+        tops = [b.bbox[1] for b in blocks]
+        assert tops == sorted(tops)
+        assert all(b.bbox[0] == 32 and b.bbox[2] == 549 for b in blocks)
+
+    def test_line_spacing_does_not_split(self):
+        assert len(find_blocks(make_binary([50], lines=10))) == 1
+
+    def test_short_bands_are_merged(self):
+        binary = make_binary([50, 300], lines=1)
+        assert len(find_blocks(binary, min_height=80)) == 1
+
+    def test_tile_count_is_capped(self):
+        binary = make_binary([20, 160, 300, 440, 580, 720], lines=3, height=900)
+        assert len(find_blocks(binary, min_height=40)) == 6
+        assert len(find_blocks(binary, min_height=40, max_tiles=3)) == 3
+
+    def test_blank_page_has_no_blocks(self):
+        assert find_blocks(np.full((100, 100), 255, dtype=np.uint8)) == []
+
+
+def test_stitch_records_offsets_and_skips_empty_blocks():
+    blocks = [TextBlock(i, (0, i * 10, 10, i * 10 + 5)) for i in range(3)]
+    text, stitched = stitch_blocks(blocks, ["1. 第一题 \n", "  ", "2. 第二题"])
+
+    assert text == "1. 第一题\n\n2. 第二题"
+    assert [b.bbox for b in stitched] == [blocks[0].bbox, blocks[2].bbox]
+    assert [text[b.start:b.end] for b in stitched] == ["1. 第一题", "2. 第二题"]
+
+
+class TestTiledTesseract:
+    @pytest.mark.asyncio
+    async def test_tiles_run_in_parallel(self):
+        page = Image.fromarray(make_binary([50, 300, 600]))
+        calls = []
+
+        def slow_tesseract(tile):
+            calls.append(tile.size)
+            time.sleep(0.2)
+            return f"{len(calls)}. 第{len(calls)}题 答：{len(calls)}"
+
+        ocr = TesseractOCR()
+        with patch.object(ocr, "_tesseract", side_effect=slow_tesseract):
+            started = time.perf_counter()
+            result = await ocr.extract_result(page)
+            elapsed = time.perf_counter() - started
+
+        assert len(calls) == 3
+        assert elapsed < 0.5
+        assert len(result.blocks) == 3
+        assert result.text.count("\n\n") == 2
+
+
+class TestQuestionParserBlocks:
+    def test_questions_are_mapped_to_blocks(self):
+        blocks = [
+            TextBlock(0, (10, 20, 500, 120)),
+            TextBlock(1, (10, 200, 500, 320)),
+        ]
+        text, blocks = stitch_blocks(blocks, ["1. 计算 3+4 的值 答：7", "2. 解方程 x+1=2 答：x=1"])
+
+        questions = QuestionParser().parse_questions(text, blocks=blocks)
+
+        assert [q.metadata["block_index"] for q in questions] == [0, 1]
+        assert questions[1].metadata["bbox"] == [10, 200, 500, 320]
+
+    def test_blocks_segment_unnumbered_text(self):
+        blocks = [TextBlock(0, (0, 0, 10, 10)), TextBlock(1, (0, 20, 10, 30))]
+        text, blocks = stitch_blocks(blocks, ["计算 3+4 的值 答：7", "解方程 x+1=2 答：x=1"])
+
+        questions = QuestionParser().parse_questions(text, blocks=blocks)
+
+        assert len(questions) == 2
+        assert questions[1].student_answer == "x=1"
@@ -0,0 +1,192 @@
+"""
+OCR结果缓存单元测试
+"""
+
+import random
+from io import BytesIO
+
+import pytest
+from unittest.mock import patch
+from PIL import Image, ImageDraw
+
+from ai_tutor.core.config import settings
+from ai_tutor.services.ocr import OCRService
+from ai_tutor.services.ocr import cache as cache_module
+from ai_tutor.services.ocr.cache import (
+    OCRResult,
+    OCRResultCache,
+    PerceptualIndex,
+    compute_signature,
+    hamming_distance,
+)
+from ai_tutor.services.llm.cache import DiskTier, MemoryLRUTier
+
+
+def make_page(seed: int, size=(800, 1100)) -> Image.Image:
+    """生成一张类似文字行的测试页面"""
+    rnd = random.Random(seed)
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for line in range(30):
+        y = 40 + line * 34
+        x = 40
+        while x < size[0] - 60:
+            width = rnd.randint(10, 60)
+            draw.rectangle([x, y, x + width, y + 18], fill="black")
+            x += width + rnd.randint(8, 20)
+    return image
+
+
+def answered_page(seed: int) -> Image.Image:
+    """同一份练习卷（make_page(1)）上写了不同手写答案的一页"""
+    page = make_page(1)
+    rnd = random.Random(seed)
+    draw = ImageDraw.Draw(page)
+    for line in range(0, 30, 3):
+        x, y = rnd.randint(300, 600), 60 + line * 34
+        for _ in range(rnd.randint(2, 5)):
+            draw.line([(x + rnd.randint(0, 40), y + rnd.randint(0, 12)) for _ in range(4)], fill="black", width=3)
+            x += 45
+    return page
+
+
+def reencode(image: Image.Image, quality: int = 60) -> Image.Image:
+    buffer = BytesIO()
+    image.save(buffer, "JPEG", quality=quality)
+    return Image.open(BytesIO(buffer.getvalue()))
+
+
+class CountingOCR(OCRService):
+    engine_name = "fake"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def _recognize(self, image):
+        self.calls += 1
+        return f"第{self.calls}次识别"
+
+
+class TestPerceptualIndex:
+    def test_reencoded_and_cropped_copies_match(self):
+        page = make_page(1)
+        index = PerceptualIndex(100)
+        index.add("page", compute_signature(page))
+
+        for variant in (reencode(page), page.crop((10, 12, 790, 1088)), page.resize((600, 825))):
+            match = index.nearest(compute_signature(variant))
+            assert match is not None and match[0] == "page"
+
+    def test_different_pages_do_not_match(self):
+        index = PerceptualIndex(100)
+        index.add("page", compute_signature(make_page(1)))
+        for seed in range(2, 12):
+            assert index.nearest(compute_signature(make_page(seed))) is None
+
+    def test_blank_images_are_not_indexed(self):
+        index = PerceptualIndex(100)
+        index.add("white", compute_signature(Image.new("RGB", (100, 100), "white")))
+        assert len(index) == 0
+        assert index.nearest(compute_signature(Image.new("RGB", (100, 100), "black"))) is None
+
+    def test_eviction_removes_buckets(self):
+        index = PerceptualIndex(2)
+        signatures = [compute_signature(make_page(seed)) for seed in range(3)]
+        for seed, signature in enumerate(signatures):
+            index.add(f"page{seed}", signature)
+        assert len(index) == 2
+        assert index.nearest(signatures[0]) is None
+        assert index.nearest(signatures[2])[0] == "page2"
+        assert hamming_distance(signatures[2].fine, signatures[2].fine) == 0
+
+
+class TestOCRResultCache:
+    @pytest.mark.asyncio
+    async def test_exact_and_near_hits(self):
+        cache = OCRResultCache(MemoryLRUTier(10), None, PerceptualIndex(10))
+        page = make_page(3)
+        await cache.set("a", OCRResult(text="题目", confidence=91.5), compute_signature(page))
+
+        exact = await cache.get("a")
+        near = await cache.get("b", compute_signature(reencode(page)))
+        miss = await cache.get("c", compute_signature(make_page(4)))
+
+        assert exact.text == "题目" and exact.confidence == 91.5
+        assert near.text == "题目"
+        assert miss is None
+        stats = cache.stats()
+        assert stats["hits"] == {"exact": 1, "near": 1}
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == pytest.approx(2 / 3, abs=1e-4)
+
+    @pytest.mark.asyncio
+    async def test_disk_backend_survives_new_instance(self, tmp_path):
+        first = OCRResultCache(MemoryLRUTier(10), DiskTier(str(tmp_path), 10))
+        await first.set("key", OCRResult(text="持久化"))
+
+        second = OCRResultCache(MemoryLRUTier(10), DiskTier(str(tmp_path), 10))
+        result = await second.get("key")
+        assert result.text == "持久化"
+        assert second.stats()["hits"]["exact"] == 1
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch, tmp_path):
+    """按当前配置重新创建全局OCR结果缓存（磁盘层放在临时目录）"""
+    monkeypatch.setattr(cache_module, "_ocr_result_cache", None)
+    monkeypatch.setattr(settings, "OCR_CACHE_DIR", str(tmp_path))
+    yield
+    cache_module._ocr_result_cache = None
+
+
+class TestExtractTextCaching:
+    @pytest.mark.asyncio
+    async def test_resubmitted_photo_is_not_recognized_again(self, fresh_cache):
+        ocr = CountingOCR()
+        page = make_page(5)
+
+        first = await ocr.extract_text(page)
+        again = await ocr.extract_text(page.copy())
+        other = await ocr.extract_text(make_page(6))
+
+        assert first == again == "第1次识别"
+        assert other == "第2次识别"
+        assert ocr.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_reencoded_photo_hits_when_near_duplicates_enabled(self, fresh_cache, monkeypatch):
+        monkeypatch.setattr(settings, "OCR_CACHE_NEAR_DUPLICATES", True)
+        ocr = CountingOCR()
+        page = make_page(8)
+
+        first = await ocr.extract_text(page)
+        reencoded = await ocr.extract_text(reencode(page))
+
+        assert first == reencoded == "第1次识别"
+        assert ocr.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_same_worksheet_with_different_answers_misses(self, fresh_cache):
+        # 感知哈希分不出手写答案的差异，所以近似命中默认关闭
+        first_student, second_student = answered_page(1), answered_page(3)
+        index = PerceptualIndex(10)
+        index.add("first", compute_signature(first_student))
+        assert index.nearest(compute_signature(second_student)) is not None
+
+        ocr = CountingOCR()
+        first = await ocr.extract_text(first_student)
+        second = await ocr.extract_text(second_student)
+
+        assert first == "第1次识别"
+        assert second == "第2次识别"
+        assert ocr.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_cache_can_be_disabled(self):
+        ocr = CountingOCR()
+        page = make_page(7)
+        with patch.object(settings, "OCR_CACHE_ENABLED", False):
+            await ocr.extract_text(page)
+            await ocr.extract_text(page)
+        assert ocr.calls == 2
+        assert (await ocr.extract_text(page)) == "第3次识别"
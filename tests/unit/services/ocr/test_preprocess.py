@@ -0,0 +1,123 @@
+"""
+OCR图片预处理单元测试
+"""
+
+import random
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from ai_tutor.services.ocr.preprocess import (
+    binarize,
+    deskew,
+    downscale_to_dpi,
+    estimate_dpi,
+    estimate_skew,
+    max_long_side,
+    preprocess_page,
+    sauvola_threshold,
+    to_grayscale,
+)
+
+
+def make_page(size=(1240, 1754), seed=0, ink=(40, 40, 40)) -> Image.Image:
+    """A4@150DPI的类文字页面"""
+    rnd = random.Random(seed)
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for line in range(size[1] // 40 - 2):
+        y = 50 + line * 40
+        x = 50
+        while x < size[0] - 100:
+            width = rnd.randint(10, 45)
+            draw.rectangle([x, y, x + width, y + 14], fill=ink)
+            x += width + rnd.randint(6, 16)
+    return image
+
+
+class TestSauvola:
+    def test_matches_direct_window_statistics(self):
+        gray = (np.random.default_rng(1).random((30, 40)) * 255).astype(np.uint8)
+        window, radius = 7, 3
+        padded = np.pad(gray.astype(np.float64), radius, mode="edge")
+        expected = np.empty(gray.shape)
+        for i in range(gray.shape[0]):
+            for j in range(gray.shape[1]):
+                block = padded[i:i + window, j:j + window]
+                expected[i, j] = block.mean() * (1 + 0.2 * (block.std() / 128 - 1))
+
+        assert np.abs(sauvola_threshold(gray, window) - expected).max() < 1e-3
+
+    def test_separates_text_under_uneven_lighting(self):
+        page = np.asarray(make_page(seed=1).convert("L")).astype(np.float64)
+        # 左暗右亮的光照渐变，全局阈值无法同时分开两侧
+        lighting = np.linspace(0.45, 1.0, page.shape[1])[None, :]
+        gray = (page * lighting).astype(np.uint8)
+        truth = np.asarray(make_page(seed=1).convert("L")) < 128
+
+        binary = binarize(gray, window=31)
+
+        ink = binary == 0
+        recall = (ink & truth).sum() / truth.sum()
+        false_ink = (ink & ~truth).sum() / (~truth).sum()
+        assert recall > 0.9
+        assert false_ink < 0.02
+
+
+class TestDeskew:
+    @pytest.mark.parametrize("angle", [-3.0, 0.0, 2.0])
+    def test_estimates_and_corrects_rotation(self, angle):
+        page = make_page(seed=2).convert("L").rotate(angle, expand=True, fillcolor=255)
+        binary = binarize(np.asarray(page))
+
+        assert estimate_skew(binary) == pytest.approx(-angle, abs=0.2)
+        corrected, _ = deskew(binary)
+        assert abs(estimate_skew(np.asarray(corrected))) <= 0.2
+
+    def test_blank_page_has_no_skew(self):
+        assert estimate_skew(np.full((100, 100), 255, dtype=np.uint8)) == 0.0
+
+
+class TestDownscale:
+    def test_uses_embedded_dpi(self):
+        image = Image.new("L", (2400, 3000), 255)
+        image.info["dpi"] = (600, 600)
+        assert estimate_dpi(image) == 600
+        assert downscale_to_dpi(image, 300).size == (1200, 1500)
+
+    def test_phone_photo_is_reduced_to_a4_at_target_dpi(self):
+        photo = Image.new("L", (4000, 6000), 255)
+        reduced = downscale_to_dpi(photo, 300)
+        assert max(reduced.size) == pytest.approx(300 * 11.69, rel=0.01)
+
+    def test_camera_jpeg_tagged_72_dpi_is_reduced(self):
+        buffer = BytesIO()
+        Image.new("RGB", (4032, 3024), "white").save(buffer, "JPEG", dpi=(72, 72))
+        photo = Image.open(BytesIO(buffer.getvalue()))
+        assert photo.info["dpi"] == (72, 72)
+
+        reduced = downscale_to_dpi(photo.convert("L"), 300)
+        assert estimate_dpi(photo) == pytest.approx(4032 / 11.69)
+        assert max(reduced.size) == pytest.approx(300 * 11.69, rel=0.01)
+
+    def test_implausible_page_size_ignores_dpi_tag(self):
+        image = Image.new("L", (12000, 9000), 255)
+        image.info["dpi"] = (150, 150)  # 折算为80英寸
+
+        assert max(downscale_to_dpi(image, 300).size) <= max_long_side(300)
+
+    def test_small_images_are_not_upscaled(self):
+        image = Image.new("L", (800, 600), 255)
+        assert downscale_to_dpi(image, 300) is image
+
+    def test_transparent_background_becomes_white(self):
+        image = Image.new("RGBA", (10, 10), (0, 0, 0, 0))
+        assert to_grayscale(image).getpixel((5, 5)) == 255
+
+
+def test_preprocess_page_returns_binary_grayscale():
+    result = preprocess_page(make_page(seed=3))
+    assert result.mode == "L"
+    assert set(np.unique(np.asarray(result))) <= {0, 255}
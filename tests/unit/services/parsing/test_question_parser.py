@@ -0,0 +1,95 @@
+"""
+题目解析器单元测试
+"""
+
+import random
+import re
+
+import pytest
+
+from ai_tutor.services.parsing import QuestionParser
+from ai_tutor.services.parsing.question_parser import QUESTION_MARKERS
+
+
+def split_per_pattern(text):
+    """逐个题号模式 finditer 后合并切分点（单次扫描切分器的参照实现）"""
+    starts = sorted(
+        match.start()
+        for _, pattern, _ in QUESTION_MARKERS
+        for match in re.finditer(pattern, text, re.IGNORECASE)
+    )
+    segments = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else len(text)
+        segment = text[start:end].strip()
+        if len(segment) > 10:
+            segments.append(segment)
+    return segments
+
+
+WORKSHEET = """
+数学期中练习 第一部分
+1. 计算 25 + 37 = ? 学生答：62
+2. 解方程 3x - 6 = 15，求 x 的值。 答：x = 7
+（3）下列哪个是正确的？ A. 2+2=5 B. 3×4=12 C. 5÷2=3 答案：B
+第十二题 证明：三角形内角和为180度。
+题目13. 圆的半径 r = 5cm，求周长 学生答：31cm
+"""
+
+
+class TestSegmenter:
+    def test_matches_per_pattern_segmentation(self):
+        parser = QuestionParser()
+        random.seed(7)
+        alphabet = "1234567890.。、,()（）第题道目一二三四五六十ABCDabcd 计算求答案：=+?"
+        texts = [parser._preprocess_text(WORKSHEET)] + [
+            "1. " + "".join(random.choice(alphabet) for _ in range(random.randint(0, 80))) for _ in range(2000)
+        ]
+
+        for text in texts:
+            segments = [segment for segment, _, _ in parser._iter_segments(text)]
+            assert segments == split_per_pattern(text), text
+
+    def test_multi_digit_numbers_split_once(self):
+        questions = QuestionParser().parse_questions("12. 计算 3+4 的值是多少 13. 计算 5+6 的值是多少")
+
+        assert [q.question_number for q in questions] == [12, 13]
+
+    def test_number_and_text_come_from_the_leading_marker(self):
+        questions = QuestionParser().parse_questions(WORKSHEET)
+        by_number = {q.question_number: q for q in questions}
+
+        assert by_number[12].question_text.startswith("证明")
+        assert by_number[2].question_text.startswith("解方程 3x - 6 = 15")
+        assert by_number[13].question_text.startswith("圆的半径")
+
+    def test_unnumbered_text_falls_back_to_paragraphs(self):
+        questions = QuestionParser().parse_questions("请计算三加四的结果并写出过程")
+
+        assert [q.question_number for q in questions] == [1]
+
+
+class TestIterQuestions:
+    def test_yields_same_questions_as_parse_questions(self):
+        parser = QuestionParser()
+
+        assert list(parser.iter_questions(WORKSHEET)) == parser.parse_questions(WORKSHEET)
+
+    def test_is_lazy(self):
+        parser = QuestionParser()
+        text = "".join(f"{i}. 计算 {i} + {i} 的值 答：{2 * i} " for i in range(1, 5001))
+
+        questions = parser.iter_questions(text)
+        first = next(questions)
+
+        assert first.question_number == 1
+        assert first.student_answer == "2"
+        assert next(questions).question_number == 2
+
+
+@pytest.mark.parametrize(
+    "number_str, expected",
+    [("7", 7), ("十", 10), ("十二", 12), ("二十", 20), ("三十五", 35), ("B", None), ("十十", None)],
+)
+def test_parse_question_number(number_str, expected):
+    assert QuestionParser()._parse_question_number(number_str) == expected
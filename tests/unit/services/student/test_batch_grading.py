@@ -0,0 +1,175 @@
+"""
+班级批量批改流水线测试
+"""
+
+import asyncio
+import json
+import time
+import zipfile
+from io import BytesIO
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+from starlette.datastructures import Headers, UploadFile
+
+from ai_tutor.api.v1 import homework as homework_api
+from ai_tutor.services.llm import LLMService
+from ai_tutor.services.ocr import OCRResult
+from ai_tutor.services.student.batch_grading import BatchGradingPipeline, collect_batch_items
+from ai_tutor.services.student.homework_service import HomeworkService
+
+
+CORRECTION = {"questions": [], "overall_score": 90, "overall_suggestions": "很好"}
+
+
+class SlowLLM(LLMService):
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = []
+
+    async def chat(self, messages, **kwargs):
+        self.calls.append(kwargs)
+        await asyncio.sleep(self.delay)
+        return json.dumps(CORRECTION, ensure_ascii=False)
+
+    async def generate(self, prompt, **kwargs):
+        return await self.chat([{"role": "user", "content": prompt}], **kwargs)
+
+    async def stream_chat(self, messages, **kwargs):
+        yield await self.chat(messages, **kwargs)
+
+
+def make_service(llm: LLMService, ocr_delay: float) -> HomeworkService:
+    async def extract_result(image):
+        await asyncio.sleep(ocr_delay)
+        return OCRResult(text="1. 计算 3+4 答：7")
+
+    with patch("ai_tutor.services.student.homework_service.get_ocr_service") as mock_ocr:
+        mock_ocr.return_value.extract_result = AsyncMock(side_effect=extract_result)
+        return HomeworkService(provider="qwen", llm_service=llm)
+
+
+def png_bytes() -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", (60, 40), "white").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def upload(filename: str, data: bytes, content_type: str = "image/png") -> UploadFile:
+    return UploadFile(
+        file=BytesIO(data), filename=filename, size=len(data), headers=Headers({"content-type": content_type})
+    )
+
+
+async def collect(pipeline, items):
+    return [event async for event in pipeline.run(items)]
+
+
+class TestBatchGradingPipeline:
+    @pytest.mark.asyncio
+    async def test_ocr_and_llm_stages_overlap(self):
+        llm = SlowLLM(delay=0.1)
+        service = make_service(llm, ocr_delay=0.05)
+        items = collect_batch_items([upload(f"学生{i}.png", png_bytes()) for i in range(6)])
+        pipeline = BatchGradingPipeline(service, concurrency={"ocr": 1, "llm": 4})
+
+        start = time.perf_counter()
+        events = await collect(pipeline, items)
+        elapsed = time.perf_counter() - start
+
+        results = [e["data"] for e in events if e["event"] == "result"]
+        report = events[-1]
+        assert report["event"] == "report"
+        assert sorted(r["student"] for r in results) == [f"学生{i}" for i in range(6)]
+        assert all(r["success"] and r["result"]["correction"] == CORRECTION for r in results)
+        # 串行需要 6 × (0.05 + 0.1) = 0.9 秒；流水线约为 6 × 0.05 + 0.1
+        assert elapsed < 0.7
+        assert report["data"]["succeeded"] == 6
+        assert report["data"]["overlap"] > 1
+        assert report["data"]["stages"]["ocr"]["processed"] == 6
+        assert all(call["hedge"] is False for call in llm.calls)
+
+    @pytest.mark.asyncio
+    async def test_bad_items_fail_individually(self):
+        service = make_service(SlowLLM(delay=0), ocr_delay=0)
+        items = collect_batch_items([
+            upload("a.png", png_bytes()),
+            upload("b.png", b"not an image"),
+            upload("c.gif", b"GIF89a", content_type="image/gif"),
+        ])
+
+        events = await collect(BatchGradingPipeline(service), items)
+
+        results = {e["data"]["filename"]: e["data"] for e in events if e["event"] == "result"}
+        assert results["a.png"]["success"] is True
+        assert results["b.png"]["success"] is False
+        assert "decode" in results["b.png"]["timings"]
+        assert results["c.gif"]["success"] is False
+        assert results["c.gif"]["result"]["correction"]["error"] is True
+        assert events[-1]["data"]["failed"] == 2
+
+
+class TestCollectBatchItems:
+    def test_zip_is_expanded_to_images(self):
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr("三班/张三.png", png_bytes())
+            archive.writestr("三班/李四.PNG", png_bytes())
+            archive.writestr("三班/名单.txt", "张三\n李四")
+            archive.writestr("__MACOSX/三班/._张三.png", b"junk")
+
+        items = collect_batch_items([upload("class.zip", buffer.getvalue(), "application/zip")])
+
+        assert [item.student for item in items] == ["张三", "李四"]
+        assert all(item.error is None for item in items)
+        with items[1].open() as member:
+            assert Image.open(member).size == (60, 40)
+
+    def test_corrupt_zip_becomes_failed_item(self):
+        items = collect_batch_items([upload("class.zip", b"PK broken", "application/zip")])
+
+        assert len(items) == 1
+        assert items[0].error is not None
+
+
+class TestBatchEndpoint:
+    def parse_events(self, body: str):
+        events = []
+        for block in body.strip().split("\n\n"):
+            fields = dict(line.split(": ", 1) for line in block.split("\n"))
+            events.append((fields["event"], json.loads(fields["data"])))
+        return events
+
+    def test_multipart_uploads_are_decoded_after_handler_returns(self, monkeypatch):
+        llm = SlowLLM(delay=0)
+        service = make_service(llm, ocr_delay=0)
+        monkeypatch.setattr(homework_api, "get_llm_service", lambda provider, pool=None: llm)
+        monkeypatch.setattr(homework_api, "HomeworkService", lambda **kwargs: service)
+        app = FastAPI()
+        app.include_router(homework_api.router, prefix="/homework")
+
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr("三班/张三.png", png_bytes())
+            archive.writestr("三班/李四.png", png_bytes())
+
+        # 表单文件在处理函数返回后即被关闭，解码发生在流式响应体中
+        response = TestClient(app).post(
+            "/homework/grade/batch",
+            files=[
+                ("files", ("王五.png", png_bytes(), "image/png")),
+                ("files", ("class.zip", buffer.getvalue(), "application/zip")),
+            ],
+            data={"subject": "math"},
+        )
+
+        assert response.status_code == 200
+        events = self.parse_events(response.text)
+        results = {data["student"]: data for event, data in events if event == "result"}
+        assert sorted(results) == ["张三", "李四", "王五"]
+        assert all(data["success"] for data in results.values()), results
+        assert events[-1][0] == "report"
+        assert events[-1][1]["succeeded"] == 3
@@ -0,0 +1,216 @@
+"""
+异步批改任务队列测试
+"""
+
+import asyncio
+from io import BytesIO
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from PIL import Image
+
+from ai_tutor.api.v1 import homework as homework_api
+from ai_tutor.models.homework import HomeworkStatusEnum
+from ai_tutor.services.student import grading_jobs
+from ai_tutor.services.student.grading_jobs import GradingJobManager, MemoryJobBackend
+
+
+def png_bytes() -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", (64, 48), "white").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def ok_result(text: str = "1+1=2") -> dict:
+    return {"ocr_text": text, "correction": {"questions": [], "overall_score": 100}, "processing_time": 0.01}
+
+
+def make_manager(grader, **kwargs) -> GradingJobManager:
+    options = dict(workers=2, max_attempts=3, visibility_timeout=1.0, retry_backoff=0.01, poll_interval=0.02)
+    options.update(kwargs)
+    return GradingJobManager(MemoryJobBackend(), grader=grader, **options)
+
+
+class TestGradingJobManager:
+    @pytest.mark.asyncio
+    async def test_job_completes_and_long_poll_returns_result(self):
+        seen = []
+
+        async def grader(job, image):
+            seen.append((job.subject, image.size))
+            return ok_result()
+
+        manager = make_manager(grader)
+        manager.start()
+        try:
+            job = await manager.submit(png_bytes(), subject="physics")
+            assert job.status == HomeworkStatusEnum.PENDING
+
+            done = await manager.wait(job.id, timeout=2)
+        finally:
+            await manager.shutdown(drain_timeout=1)
+
+        assert done.status == HomeworkStatusEnum.COMPLETED
+        assert done.attempts == 1
+        assert done.result["ocr_text"] == "1+1=2"
+        assert seen == [("physics", (64, 48))]
+        assert await manager.backend.load_image(job.id) is None
+        assert (await manager.backend.depth()) == {"pending": 0, "in_flight": 0}
+
+    @pytest.mark.asyncio
+    async def test_failed_attempt_is_retried(self):
+        calls = 0
+
+        async def grader(job, image):
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                return {"correction": {"error": True, "error_message": "上游超时"}}
+            return ok_result()
+
+        manager = make_manager(grader, visibility_timeout=0.15)
+        manager.start()
+        try:
+            job = await manager.submit(png_bytes())
+            done = await manager.wait(job.id, timeout=3)
+        finally:
+            await manager.shutdown(drain_timeout=1)
+
+        assert done.status == HomeworkStatusEnum.COMPLETED
+        assert done.attempts == 2
+        assert manager.retried == 1
+
+    @pytest.mark.asyncio
+    async def test_job_errors_after_max_attempts(self):
+        async def grader(job, image):
+            raise RuntimeError("模型不可用")
+
+        manager = make_manager(grader, max_attempts=2, visibility_timeout=0.15)
+        manager.start()
+        try:
+            job = await manager.submit(png_bytes())
+            done = await manager.wait(job.id, timeout=3)
+        finally:
+            await manager.shutdown(drain_timeout=1)
+
+        assert done.status == HomeworkStatusEnum.ERROR
+        assert done.attempts == 2
+        assert "模型不可用" in done.error_message
+
+    @pytest.mark.asyncio
+    async def test_expired_lease_is_requeued(self):
+        backend = MemoryJobBackend()
+        await backend.push("job-1")
+        assert await backend.pop(lease=0.01) == "job-1"
+        assert await backend.pop(lease=0.01) is None
+
+        await asyncio.sleep(0.02)
+        assert await backend.requeue_expired() == 1
+        assert await backend.pop(lease=10) == "job-1"
+
+    @pytest.mark.asyncio
+    async def test_shutdown_requeues_unfinished_job(self):
+        started = asyncio.Event()
+
+        async def grader(job, image):
+            started.set()
+            await asyncio.sleep(10)
+            return ok_result()
+
+        manager = make_manager(grader, workers=1)
+        manager.start()
+        job = await manager.submit(png_bytes())
+        await asyncio.wait_for(started.wait(), 2)
+        await manager.shutdown(drain_timeout=0.05)
+
+        interrupted = await manager.get(job.id)
+        assert interrupted.status == HomeworkStatusEnum.PENDING
+        assert interrupted.attempts == 0
+        assert await manager.backend.requeue_expired() == 1
+        assert await manager.backend.load_image(job.id) is not None
+
+    @pytest.mark.asyncio
+    async def test_queue_limit(self):
+        manager = make_manager(lambda job, image: None, max_pending=1)
+        await manager.submit(png_bytes())
+        with pytest.raises(grading_jobs.GradingQueueFullError):
+            await manager.submit(png_bytes())
+
+    @pytest.mark.asyncio
+    async def test_memory_backend_limits_stored_image_bytes(self):
+        image = png_bytes()
+        manager = make_manager(lambda job, image: None, max_image_bytes=len(image) * 2)
+        first = await manager.submit(image)
+        await manager.submit(image)
+        with pytest.raises(grading_jobs.GradingQueueFullError):
+            await manager.submit(image)
+
+        # 任务结束后图片即删除，释放的字节可以再次受理
+        await manager.backend.delete_image(first.id)
+        await manager.submit(image)
+
+
+class TestGradingJobAPI:
+    @pytest.mark.asyncio
+    async def test_submit_and_poll(self, monkeypatch):
+        async def grader(job, image):
+            return ok_result("作业文本")
+
+        manager = make_manager(grader)
+        monkeypatch.setattr(homework_api, "get_grading_job_manager", lambda: manager)
+        app = FastAPI()
+        app.include_router(homework_api.router, prefix="/homework")
+
+        manager.start()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.post(
+                    "/homework/jobs",
+                    files={"file": ("hw.png", png_bytes(), "image/png")},
+                    data={"subject": "math"},
+                )
+                assert response.status_code == 202
+                job_id = response.json()["data"]["job_id"]
+
+                polled = await client.get(f"/homework/jobs/{job_id}", params={"wait": 2})
+                missing = await client.get("/homework/jobs/unknown")
+        finally:
+            await manager.shutdown(drain_timeout=1)
+
+        data = polled.json()["data"]
+        assert data["status"] == "completed"
+        assert data["result"]["ocr_text"] == "作业文本"
+        assert missing.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_corrupt_image_is_rejected_at_submission(self, monkeypatch):
+        manager = make_manager(lambda job, image: None)
+        monkeypatch.setattr(homework_api, "get_grading_job_manager", lambda: manager)
+        app = FastAPI()
+        app.include_router(homework_api.router, prefix="/homework")
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(
+                "/homework/jobs", files={"file": ("hw.png", b"not an image", "image/png")}
+            )
+
+        assert response.status_code == 400
+        assert (await manager.backend.depth())["pending"] == 0
+
+    @pytest.mark.asyncio
+    async def test_submit_returns_503_when_image_bytes_exceeded(self, monkeypatch):
+        manager = make_manager(lambda job, image: None, max_image_bytes=1)
+        monkeypatch.setattr(homework_api, "get_grading_job_manager", lambda: manager)
+        app = FastAPI()
+        app.include_router(homework_api.router, prefix="/homework")
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/homework/jobs", files={"file": ("hw.png", png_bytes(), "image/png")})
+
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
+        assert (await manager.backend.depth())["pending"] == 0
@@ -0,0 +1,313 @@
+"""
+HomeworkService 单元测试
+"""
+
+import asyncio
+import json
+import re
+import time
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from PIL import Image
+
+from ai_tutor.services.llm import LLMService
+from ai_tutor.services.ocr import OCRResult
+from ai_tutor.services.student.homework_service import HomeworkService
+
+
+CORRECTION = {
+    "questions": [
+        {"question_number": 1, "is_correct": True, "score": 5, "max_score": 5},
+        {"question_number": 2, "is_correct": False, "score": 0, "max_score": 5},
+    ],
+    "overall_score": 50,
+    "overall_suggestions": "注意移项变号",
+}
+
+
+class FakeLLM(LLMService):
+    """按固定分片流式输出批改JSON的假LLM"""
+
+    def __init__(self, response: str, chunk_size: int = 5):
+        self.response = response
+        self.chunk_size = chunk_size
+        self.calls = []
+
+    async def chat(self, messages, **kwargs):
+        self.calls.append((messages, kwargs))
+        return self.response
+
+    async def generate(self, prompt, **kwargs):
+        return await self.chat([{"role": "user", "content": prompt}], **kwargs)
+
+    async def stream_chat(self, messages, **kwargs):
+        self.calls.append((messages, kwargs))
+        for i in range(0, len(self.response), self.chunk_size):
+            yield self.response[i:i + self.chunk_size]
+
+
+@pytest.fixture
+def image():
+    return Image.new("RGB", (40, 40), "white")
+
+
+def make_service(llm: LLMService, ocr_text: str = "1. 解方程 x+1=2 答：x=1\n2. 计算 3+4 答：8") -> HomeworkService:
+    with patch("ai_tutor.services.student.homework_service.get_ocr_service") as mock_ocr:
+        mock_ocr.return_value.extract_result = AsyncMock(return_value=OCRResult(text=ocr_text))
+        return HomeworkService(provider="qwen", llm_service=llm)
+
+
+class TestGradeHomework:
+    """批改流程测试"""
+
+    @pytest.mark.asyncio
+    async def test_grade_homework_returns_structured_result(self, image):
+        llm = FakeLLM(json.dumps(CORRECTION, ensure_ascii=False))
+        service = make_service(llm)
+
+        result = await service.grade_homework(image, subject="math")
+
+        assert result["correction"] == CORRECTION
+        assert result["ocr_text"].startswith("1.")
+        assert len(result["parsed_questions"]) >= 1
+        assert llm.calls[0][1]["temperature"] == 0.2
+
+    @pytest.mark.asyncio
+    async def test_grade_homework_error_keeps_ocr_text(self, image):
+        llm = Mock(spec=LLMService)
+        llm.generate = AsyncMock(side_effect=RuntimeError("upstream down"))
+        service = make_service(llm, ocr_text="1. 计算 1+1")
+
+        result = await service.grade_homework(image)
+
+        assert result["correction"]["error"] is True
+        assert result["correction"]["error_type"] == "RuntimeError"
+        assert result["ocr_text"] == "1. 计算 1+1"
+
+    @pytest.mark.asyncio
+    async def test_parsing_runs_off_loop_concurrently_with_llm(self, image):
+        events = []
+        llm = FakeLLM(json.dumps(CORRECTION, ensure_ascii=False))
+        original_chat = llm.chat
+
+        async def chat(messages, **kwargs):
+            events.append("llm_start")
+            await asyncio.sleep(0.05)
+            return await original_chat(messages, **kwargs)
+
+        llm.chat = chat
+        service = make_service(llm)
+        original_parse = service.question_parser.parse_questions
+
+        def slow_parse(text, blocks=None):
+            time.sleep(0.1)  # 模拟耗时的正则解析，会阻塞所在线程
+            events.append("parse_done")
+            return original_parse(text, blocks=blocks)
+
+        service.question_parser.parse_questions = slow_parse
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        result = await service.grade_homework(image)
+        ticking.cancel()
+
+        assert events == ["llm_start", "parse_done"]
+        assert result["correction"] == CORRECTION
+        assert len(result["parsed_questions"]) >= 1
+        # 解析期间事件循环仍在运行
+        assert ticks >= 5
+
+    @pytest.mark.asyncio
+    async def test_result_is_queued_for_persistence_with_student_id(self, image):
+        service = make_service(FakeLLM(json.dumps(CORRECTION, ensure_ascii=False)))
+        writer = Mock()
+
+        with patch("ai_tutor.services.student.homework_service.get_homework_writer", return_value=writer):
+            await service.grade_homework(image)
+            writer.submit.assert_not_called()
+
+            await service.grade_homework(image, student_id=3, title="hw.jpg")
+
+        record = writer.submit.call_args.args[0]
+        assert record.student_id == 3
+        assert record.title == "hw.jpg"
+        assert record.result["correction"] == CORRECTION
+        assert json.loads(record.ai_response) == CORRECTION
+
+
+LONG_SHEET = "期中测验 数学 每题5分\n" + "\n".join(f"{i}. 计算 {i}+{i} 答：{2 * i}" for i in range(1, 13))
+
+
+class ChunkLLM(LLMService):
+    """按提示词中的题目逐题批改的假LLM：块内从1编号，第一块最慢，偶数题判错"""
+
+    def __init__(self, delay: float = 0.1, fail_on: int = 0, drop: int = 0, extra_on: int = 0, garbled_on: int = 0):
+        self.delay = delay
+        self.fail_on = fail_on
+        self.drop = drop  # 漏批的题号
+        self.extra_on = extra_on  # 该块多返回一道题
+        self.garbled_on = garbled_on  # 该块返回无法解析的文本
+        self.prompts = []
+
+    async def chat(self, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        self.prompts.append(prompt)
+        numbers = [int(n) for n in re.findall(r"^(\d+)\. 计算", prompt, re.MULTILINE)]
+        await asyncio.sleep(self.delay * (2 if numbers[0] == 1 else 1))
+        if self.fail_on in numbers:
+            raise RuntimeError("chunk failed")
+        if self.garbled_on in numbers:
+            return "抱歉，这几道题我无法批改。"
+        questions = [
+            {"question_number": i + 1, "is_correct": n % 2 == 1, "score": 5 if n % 2 else 0, "max_score": 5}
+            for i, n in enumerate(numbers)
+            if n != self.drop
+        ]
+        if self.extra_on in numbers:
+            questions.append({"question_number": 1, "is_correct": True, "score": 5, "max_score": 5})
+        return json.dumps({
+            "questions": questions,
+            "overall_score": 50,
+            "overall_suggestions": "注意计算",
+            "weak_knowledge_points": ["加法", f"第{numbers[0]}组"],
+        }, ensure_ascii=False)
+
+    async def generate(self, prompt, **kwargs):
+        return await self.chat([{"role": "user", "content": prompt}], **kwargs)
+
+
+class TestChunkedGrading:
+    """长试卷分块并行批改测试"""
+
+    @pytest.mark.asyncio
+    async def test_chunks_run_concurrently_and_merge_in_question_order(self, image):
+        llm = ChunkLLM(delay=0.1)
+        service = make_service(llm, ocr_text=LONG_SHEET)
+
+        start = time.perf_counter()
+        result = await service.grade_homework(image)
+        elapsed = time.perf_counter() - start
+
+        correction = result["correction"]
+        # 12题按每块不超过5题均分为3块（4/4/4），每块都带卷头
+        assert len(llm.prompts) == 3
+        assert all("期中测验 数学 每题5分" in prompt for prompt in llm.prompts)
+        # 总耗时取决于最慢的一块（0.2s），而不是三块之和（0.4s）
+        assert elapsed < 0.35
+        assert [q["question_number"] for q in correction["questions"]] == list(range(1, 13))
+        assert correction["overall_score"] == 50.0
+        assert correction["accuracy_rate"] == 0.5
+        assert correction["weak_knowledge_points"] == ["加法", "第1组", "第5组", "第9组"]
+        assert correction["overall_suggestions"].splitlines()[0] == "第1-4题：注意计算"
+        assert correction["chunks"] == {"count": 3, "failed": 0}
+        assert result["partial"] is False
+        assert len(result["parsed_questions"]) == 12
+
+    @pytest.mark.asyncio
+    async def test_failed_chunk_is_marked_without_failing_the_sheet(self, image):
+        service = make_service(ChunkLLM(delay=0.01, fail_on=5), ocr_text=LONG_SHEET)
+
+        result = await service.grade_homework(image)
+        correction = result["correction"]
+
+        failed = [q["question_number"] for q in correction["questions"] if q.get("grading_failed")]
+        assert failed == [5, 6, 7, 8]
+        assert correction["chunks"] == {"count": 3, "failed": 1}
+        assert correction["overall_score"] == 50.0
+        # 得分不完整：在结果顶层标出
+        assert result["partial"] is True
+        assert correction["partial"] is True
+        assert correction["failed_questions"] == 4
+        assert correction["overall_suggestions"].startswith("有4道题批改失败")
+
+    @pytest.mark.asyncio
+    async def test_question_missing_from_chunk_reply_is_marked_failed(self, image):
+        service = make_service(ChunkLLM(delay=0.01, drop=6), ocr_text=LONG_SHEET)
+
+        correction = (await service.grade_homework(image))["correction"]
+
+        assert [q["question_number"] for q in correction["questions"]] == list(range(1, 13))
+        assert [q["question_number"] for q in correction["questions"] if q.get("grading_failed")] == [6]
+        assert correction["chunks"] == {"count": 3, "failed": 0}
+        assert correction["partial"] is True
+        assert correction["failed_questions"] == 1
+
+    @pytest.mark.asyncio
+    async def test_extra_questions_in_chunk_reply_are_dropped(self, image):
+        service = make_service(ChunkLLM(delay=0.01, extra_on=5), ocr_text=LONG_SHEET)
+
+        correction = (await service.grade_homework(image))["correction"]
+
+        assert [q["question_number"] for q in correction["questions"]] == list(range(1, 13))
+        assert correction["partial"] is False
+
+    @pytest.mark.asyncio
+    async def test_chunk_without_questions_counts_as_failed(self, image):
+        service = make_service(ChunkLLM(delay=0.01, garbled_on=9), ocr_text=LONG_SHEET)
+
+        correction = (await service.grade_homework(image))["correction"]
+
+        failed = [q["question_number"] for q in correction["questions"] if q.get("grading_failed")]
+        assert failed == [9, 10, 11, 12]
+        assert correction["chunks"] == {"count": 3, "failed": 1}
+        assert correction["partial"] is True
+
+    @pytest.mark.asyncio
+    async def test_short_sheet_is_graded_in_one_call(self, image):
+        llm = ChunkLLM(delay=0.0)
+        service = make_service(llm, ocr_text="1. 计算 1+1 答：2\n2. 计算 2+2 答：4")
+
+        await service.grade_homework(image)
+
+        assert len(llm.prompts) == 1
+
+    @pytest.mark.asyncio
+    async def test_stream_emits_each_chunk_as_it_completes(self, image):
+        service = make_service(ChunkLLM(delay=0.02), ocr_text=LONG_SHEET)
+
+        events = [e async for e in service.grade_homework_stream(image)]
+
+        streamed = [e["data"]["question_number"] for e in events if e["event"] == "question"]
+        # 第一块最慢，最后产出；总体结果仍按原题序
+        assert streamed[-4:] == [1, 2, 3, 4]
+        assert sorted(streamed) == list(range(1, 13))
+        summary = events[-1]["data"]["correction"]
+        assert [q["question_number"] for q in summary["questions"]] == list(range(1, 13))
+
+
+class TestGradeHomeworkStream:
+    """流式批改测试"""
+
+    @pytest.mark.asyncio
+    async def test_stream_emits_questions_then_summary(self, image):
+        llm = FakeLLM(json.dumps(CORRECTION, ensure_ascii=False), chunk_size=3)
+        service = make_service(llm)
+
+        events = [e async for e in service.grade_homework_stream(image, subject="math")]
+
+        assert [e["event"] for e in events] == ["ocr", "question", "question", "summary"]
+        assert [e["data"] for e in events[1:3]] == CORRECTION["questions"]
+        assert events[-1]["data"]["correction"] == CORRECTION
+
+    @pytest.mark.asyncio
+    async def test_stream_reports_error_event(self, image):
+        llm = FakeLLM("")
+
+        async def broken_stream(*args, **kwargs):
+            raise RuntimeError("boom")
+            yield  # pragma: no cover
+
+        llm.stream_chat = broken_stream
+        service = make_service(llm)
+
+        events = [e async for e in service.grade_homework_stream(image)]
+
+        assert events[-1]["event"] == "error"
+        assert events[-1]["data"]["correction"]["error_message"] == "boom"
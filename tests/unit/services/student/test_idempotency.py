@@ -0,0 +1,237 @@
+"""
+批改请求去重测试
+"""
+
+import asyncio
+from io import BytesIO
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from PIL import Image
+from starlette.datastructures import Headers, UploadFile
+
+from ai_tutor.api.v1 import homework as homework_api
+from ai_tutor.services.student.idempotency import (
+    GradingIdempotency,
+    IdempotencyConflictError,
+    MemoryIdempotencyBackend,
+    content_fingerprint,
+    make_idempotency_key,
+)
+
+
+def png_bytes(color: str = "white") -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", (64, 48), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class TestIdempotencyKey:
+    def test_key_is_scoped_by_student(self):
+        fingerprint = content_fingerprint("abc", "math")
+
+        assert make_idempotency_key(1, fingerprint) != make_idempotency_key(2, fingerprint)
+        assert make_idempotency_key(1, fingerprint, "tap-1") != make_idempotency_key(2, fingerprint, "tap-1")
+        assert content_fingerprint("abc", "physics") != fingerprint
+
+    def test_anonymous_requests_need_an_explicit_key(self):
+        fingerprint = content_fingerprint("abc", "math")
+
+        assert make_idempotency_key(None, fingerprint) is None
+        assert make_idempotency_key(None, fingerprint, "tap-1").startswith("anonymous:key:")
+
+
+class TestGradingIdempotency:
+    @pytest.mark.asyncio
+    async def test_completed_result_is_replayed(self):
+        idempotency = GradingIdempotency(MemoryIdempotencyBackend())
+        calls = 0
+
+        async def grade():
+            nonlocal calls
+            calls += 1
+            return {"success": True, "data": {"score": 90}}
+
+        first = await idempotency.run("k", "fp", grade)
+        second = await idempotency.run("k", "fp", grade)
+
+        assert first == ({"success": True, "data": {"score": 90}}, False)
+        assert second == ({"success": True, "data": {"score": 90}}, True)
+        assert calls == 1
+        assert idempotency.stats()["replayed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_duplicates_attach_to_the_running_grading(self):
+        idempotency = GradingIdempotency(MemoryIdempotencyBackend())
+        calls = 0
+
+        async def grade():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {"success": True}
+
+        results = await asyncio.gather(*(idempotency.run("k", "fp", grade) for _ in range(3)))
+
+        assert calls == 1
+        assert sorted(replayed for _, replayed in results) == [False, True, True]
+        assert idempotency.stats()["attached"] == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_grading_is_not_stored(self):
+        idempotency = GradingIdempotency(MemoryIdempotencyBackend())
+        responses = [{"success": False}, {"success": True}]
+
+        async def grade():
+            return responses.pop(0)
+
+        assert (await idempotency.run("k", "fp", grade))[0] == {"success": False}
+        assert (await idempotency.run("k", "fp", grade)) == ({"success": True}, False)
+
+    @pytest.mark.asyncio
+    async def test_partial_grading_is_not_stored(self):
+        idempotency = GradingIdempotency(MemoryIdempotencyBackend())
+        partial = {
+            "success": True,
+            "data": {
+                "correction": {
+                    "questions": [{"question_number": 1, "score": 5}, {"question_number": 2, "grading_failed": True}],
+                    "chunks": {"count": 2, "failed": 1},
+                }
+            },
+        }
+        complete = {"success": True, "data": {"correction": {"questions": [{"question_number": 1, "score": 5}]}}}
+        responses = [partial, complete]
+
+        async def grade():
+            return responses.pop(0)
+
+        assert await idempotency.run("k", "fp", grade) == (partial, False)
+        # 按提示重新提交时重新批改，而不是返回同一份不完整的结果
+        assert await idempotency.run("k", "fp", grade) == (complete, False)
+        assert await idempotency.run("k", "fp", grade) == (complete, True)
+
+    @pytest.mark.asyncio
+    async def test_exception_releases_the_marker(self):
+        idempotency = GradingIdempotency(MemoryIdempotencyBackend())
+
+        async def boom():
+            raise RuntimeError("upstream down")
+
+        with pytest.raises(RuntimeError):
+            await idempotency.run("k", "fp", boom)
+        assert await idempotency.backend.get("k") is None
+
+    @pytest.mark.asyncio
+    async def test_key_reused_for_other_content_conflicts(self):
+        idempotency = GradingIdempotency(MemoryIdempotencyBackend())
+
+        async def grade():
+            return {"success": True}
+
+        await idempotency.run("k", "fp-1", grade)
+        with pytest.raises(IdempotencyConflictError):
+            await idempotency.run("k", "fp-2", grade)
+
+    @pytest.mark.asyncio
+    async def test_waits_for_marker_held_by_another_process(self):
+        backend = MemoryIdempotencyBackend()
+        idempotency = GradingIdempotency(backend, poll_interval=0.01)
+        await backend.claim("k", {"status": "processing", "fingerprint": "fp", "owner": "other"}, 5)
+
+        async def other_process_finishes():
+            await asyncio.sleep(0.03)
+            await backend.put("k", {"status": "completed", "fingerprint": "fp", "response": {"success": True}}, 60)
+
+        async def grade():
+            raise AssertionError("不应重新批改")
+
+        finisher = asyncio.create_task(other_process_finishes())
+        result = await idempotency.run("k", "fp", grade)
+        await finisher
+
+        assert result == ({"success": True}, True)
+
+
+class TestGradeEndpoint:
+    @pytest.mark.asyncio
+    async def test_resubmission_returns_stored_result(self, monkeypatch):
+        idempotency = GradingIdempotency(MemoryIdempotencyBackend())
+        calls = []
+
+        async def fake_grade(source, filename, file_size, subject, provider, student_id, pool):
+            calls.append((filename, subject, student_id))
+            return {"success": True, "data": {"correction": {"overall_score": 80}}, "message": "作业批改完成"}
+
+        monkeypatch.setattr(homework_api, "get_grading_idempotency", lambda: idempotency)
+        monkeypatch.setattr(homework_api, "_grade_upload", fake_grade)
+        app = FastAPI()
+        app.include_router(homework_api.router, prefix="/homework")
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def submit(data, color="white", headers=None):
+                return await client.post(
+                    "/homework/grade",
+                    files={"file": ("hw.png", png_bytes(color), "image/png")},
+                    data=data,
+                    headers=headers,
+                )
+
+            first = await submit({"student_id": "7"})
+            again = await submit({"student_id": "7"})
+            other_student = await submit({"student_id": "8"})
+            other_subject = await submit({"student_id": "7", "subject": "physics"})
+            keyed = await submit({}, headers={"Idempotency-Key": "tap-1"})
+            keyed_again = await submit({}, headers={"Idempotency-Key": "tap-1"})
+            conflict = await submit({}, color="black", headers={"Idempotency-Key": "tap-1"})
+
+        assert first.status_code == 200 and "Idempotent-Replayed" not in first.headers
+        assert again.status_code == 200 and again.headers["Idempotent-Replayed"] == "true"
+        assert again.json() == first.json()
+        assert other_student.headers.get("Idempotent-Replayed") is None
+        assert other_subject.headers.get("Idempotent-Replayed") is None
+        assert keyed_again.headers["Idempotent-Replayed"] == "true"
+        assert conflict.status_code == 422
+        assert len(calls) == 4
+
+    @pytest.mark.asyncio
+    async def test_shared_grading_survives_first_client_disconnect(self, monkeypatch):
+        idempotency = GradingIdempotency(MemoryIdempotencyBackend())
+        gate = asyncio.Event()
+        image = png_bytes()
+
+        async def fake_grade(source, filename, file_size, subject, provider, student_id, pool):
+            await gate.wait()
+            source.seek(0)
+            return {"success": True, "data": {"size": len(source.read())}, "message": "作业批改完成"}
+
+        monkeypatch.setattr(homework_api, "get_grading_idempotency", lambda: idempotency)
+        monkeypatch.setattr(homework_api, "_grade_upload", fake_grade)
+
+        def submit(upload):
+            return asyncio.create_task(homework_api.grade_homework(
+                file=upload, subject="math", provider="qwen", student_id=7, idempotency_key=None, pool=None
+            ))
+
+        uploads = [
+            UploadFile(file=BytesIO(image), filename="hw.png", size=len(image),
+                       headers=Headers({"content-type": "image/png"}))
+            for _ in range(2)
+        ]
+        first = submit(uploads[0])
+        await asyncio.sleep(0.01)
+        second = submit(uploads[1])
+        await asyncio.sleep(0.01)
+
+        # 第一个客户端断开：请求被取消，FastAPI 关闭其上传文件
+        first.cancel()
+        uploads[0].file.close()
+        gate.set()
+        response = await second
+
+        assert response.status_code == 200
+        assert response.headers["Idempotent-Replayed"] == "true"
+        assert b'"size":%d' % len(image) in response.body.replace(b" ", b"")
+        assert idempotency.executed == 1
@@ -0,0 +1,138 @@
+"""
+批改结果落库测试（SQLite内存库）
+"""
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from ai_tutor.db import database
+from ai_tutor.db.database import Base
+from ai_tutor.models import homework, student  # noqa: F401  注册表结构
+from ai_tutor.models.homework import HomeworkSession, HomeworkStatusEnum, Question
+from ai_tutor.services.student import persistence
+from ai_tutor.services.student.persistence import (
+    HomeworkRecord,
+    HomeworkWriter,
+    question_rows,
+    write_homework,
+)
+
+
+def make_result(count: int = 3) -> dict:
+    return {
+        "ocr_text": "1. 2x+3=7",
+        "processing_time": 12.5,
+        "correction": {
+            "overall_score": "85",
+            "questions": [
+                {
+                    "question_number": i + 1,
+                    "question_text": f"第{i + 1}题",
+                    "student_answer": "x=2",
+                    "correct_answer": "x=2",
+                    "is_correct": i % 2 == 0,
+                    "score": 5 if i % 2 == 0 else 0,
+                    "max_score": 5,
+                    "knowledge_points": ["一元一次方程"],
+                    "difficulty_level": 3,
+                }
+                for i in range(count)
+            ],
+        },
+    }
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+
+class TestQuestionRows:
+    def test_llm_values_are_normalized(self):
+        rows = question_rows(7, {"questions": [
+            {"score": "3.5", "is_correct": "正确", "knowledge_points": "因式分解", "difficulty_level": 9},
+            {"question_number": "x", "is_correct": 0, "solution_steps": None, "score": "满分"},
+            "不是对象",
+        ]})
+
+        assert len(rows) == 2
+        assert rows[0]["homework_session_id"] == 7
+        assert rows[0]["question_number"] == 1
+        assert rows[0]["score"] == 3.5
+        assert rows[0]["is_correct"] is True
+        assert rows[0]["knowledge_points"] == ["因式分解"]
+        assert rows[0]["difficulty_level"] == 5
+        assert rows[1]["question_number"] == 2
+        assert rows[1]["is_correct"] is False
+        assert rows[1]["solution_steps"] == []
+        assert rows[1]["score"] is None
+
+
+class TestWriteHomework:
+    def test_session_and_questions_written_together(self, session_factory):
+        db = session_factory()
+        record = HomeworkRecord(student_id=1, subject="math", provider="qwen", result=make_result(50))
+
+        session_id = write_homework(db, record)
+        db.close()
+
+        db = session_factory()
+        session = db.get(HomeworkSession, session_id)
+        assert session.status == HomeworkStatusEnum.COMPLETED
+        assert session.overall_score == 85
+        assert session.completed_at is not None
+        count = db.scalar(select(func.count(Question.id)).where(Question.homework_session_id == session_id))
+        assert count == 50
+        correct = db.scalar(select(func.count(Question.id)).where(Question.is_correct.is_(True)))
+        assert correct == 25
+
+    def test_partial_grading_is_not_recorded_as_complete(self, session_factory):
+        db = session_factory()
+        result = make_result(4)
+        result["correction"].update(partial=True, failed_questions=2)
+        session_id = write_homework(db, HomeworkRecord(student_id=1, subject="math", provider="qwen", result=result))
+        db.close()
+
+        db = session_factory()
+        session = db.get(HomeworkSession, session_id)
+        assert session.status == HomeworkStatusEnum.ERROR
+        assert session.overall_score is None
+        assert session.error_message == "2道题批改失败，请重新提交"
+
+    def test_failure_rolls_back_session(self, session_factory, monkeypatch):
+        def broken_insert(db, session_id, correction):
+            raise RuntimeError("磁盘已满")
+
+        monkeypatch.setattr(persistence, "insert_questions", broken_insert)
+        db = session_factory()
+        record = HomeworkRecord(student_id=1, subject="math", provider="qwen", result=make_result())
+
+        with pytest.raises(RuntimeError):
+            write_homework(db, record)
+
+        assert db.scalar(select(func.count(HomeworkSession.id))) == 0
+
+
+class TestHomeworkWriter:
+    @pytest.mark.asyncio
+    async def test_background_writer_drains_on_stop(self, session_factory, monkeypatch):
+        monkeypatch.setattr(database, "SessionLocal", session_factory)
+        writer = HomeworkWriter(max_pending=10)
+
+        assert writer.submit(HomeworkRecord(1, "math", "qwen", make_result())) is False  # 未启动
+
+        writer.start()
+        assert writer.submit(HomeworkRecord(1, "math", "qwen", make_result(4)))
+        assert writer.submit(HomeworkRecord(2, "unknown-subject", "qwen", make_result()))
+        await writer.stop()
+
+        assert writer.stats() == {"running": False, "pending": 0, "written": 1, "failed": 1, "dropped": 1}
+        db = session_factory()
+        assert db.scalar(select(func.count(Question.id))) == 4
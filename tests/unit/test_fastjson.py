@@ -0,0 +1,108 @@
+"""
+JSON序列化与响应工具测试
+"""
+
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from ai_tutor.schemas.student_schemas import StudentListResponse, StudentResponse, student_list_adapter
+from ai_tutor.utils import fastjson
+from ai_tutor.utils.fastjson import FastJSONResponse, PreSerialized, dumps, model_response
+
+
+class Row:
+    """模拟ORM对象"""
+
+    def __init__(self, i: int):
+        self.id = i
+        self.name = f"学生{i:04d}"
+        self.grade = "初一"
+        self.class_name = "1班"
+        self.student_id = f"S{i:04d}"
+        self.phone = None
+        self.email = None
+        self.parent_phone = None
+        self.preferred_subjects = ["math"]
+        self.learning_style = None
+        self.is_active = True
+        self.created_at = datetime(2025, 3, 1, 8, 30, i % 60)
+        self.updated_at = datetime(2025, 3, 2, 9, 0, 0, 123456)
+
+
+PAYLOAD = {
+    "name": "张三",
+    "score": 92.5,
+    "when": datetime(2025, 3, 1, 8, 30),
+    "amount": Decimal("1.5"),
+    "tags": {"math"},
+    "nested": [{"ok": True, "none": None}],
+    1: "非字符串键",
+}
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps_matches_stdlib_json_output(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(fastjson, "orjson", None)
+    elif fastjson.orjson is None:
+        pytest.skip("未安装orjson")
+
+    body = dumps(PAYLOAD)
+
+    assert json.loads(body) == {
+        "name": "张三",
+        "score": 92.5,
+        "when": "2025-03-01T08:30:00",
+        "amount": 1.5,
+        "tags": ["math"],
+        "nested": [{"ok": True, "none": None}],
+        "1": "非字符串键",
+    }
+    assert "张三".encode("utf-8") in body
+    assert b", " not in body
+
+
+def test_bulk_validation_matches_per_row_validation():
+    rows = [Row(i) for i in range(1, 50)]
+
+    bulk = student_list_adapter.validate_python(rows, from_attributes=True)
+
+    assert bulk == [StudentResponse.model_validate(row) for row in rows]
+    assert json.loads(student_list_adapter.dump_json(bulk)) == [s.model_dump(mode="json") for s in bulk]
+
+
+@pytest.mark.asyncio
+async def test_responses_through_app():
+    cached = PreSerialized({"data": ["math", "physics"]})
+    students = StudentListResponse(students=student_list_adapter.validate_python([Row(1)], from_attributes=True))
+    app = FastAPI(default_response_class=FastJSONResponse)
+
+    @app.get("/plain")
+    async def plain():
+        return {"name": "张三", "when": datetime(2025, 3, 1)}
+
+    @app.get("/cached")
+    async def cached_route(request: Request):
+        return cached.response(request)
+
+    @app.get("/students", response_model=StudentListResponse)
+    async def student_list():
+        return model_response(students)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        plain_response = await client.get("/plain")
+        first = await client.get("/cached")
+        revalidated = await client.get("/cached", headers={"If-None-Match": first.headers["ETag"]})
+        listed = await client.get("/students")
+
+    assert plain_response.headers["content-type"] == "application/json"
+    assert plain_response.json() == {"name": "张三", "when": "2025-03-01T00:00:00"}
+    assert first.json() == {"data": ["math", "physics"]}
+    assert revalidated.status_code == 304 and revalidated.content == b""
+    assert listed.json() == students.model_dump(mode="json")
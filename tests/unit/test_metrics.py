@@ -0,0 +1,98 @@
+"""
+指标导出与 Server-Timing 测试
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from ai_tutor.api.middleware.server_timing import ServerTimingMiddleware
+from ai_tutor.core.metrics import (
+    REQUEST_SECONDS,
+    STAGE_SECONDS,
+    MetricsRegistry,
+    server_timing_header,
+    stage_timer,
+)
+
+
+class TestRegistry:
+    def test_histogram_renders_cumulative_buckets(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("demo_seconds", "示例", ["stage"], buckets=(0.1, 1.0))
+        histogram.observe(0.05, stage="ocr")
+        histogram.observe(0.5, stage="ocr")
+        histogram.observe(3.0, stage="ocr")
+
+        lines = registry.render().splitlines()
+
+        assert "# TYPE demo_seconds histogram" in lines
+        assert 'demo_seconds_bucket{stage="ocr",le="0.1"} 1' in lines
+        assert 'demo_seconds_bucket{stage="ocr",le="1"} 2' in lines
+        assert 'demo_seconds_bucket{stage="ocr",le="+Inf"} 3' in lines
+        assert 'demo_seconds_sum{stage="ocr"} 3.55' in lines
+        assert 'demo_seconds_count{stage="ocr"} 3' in lines
+
+    def test_counter_and_label_validation(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("demo_retries", "示例", ["provider"])
+        counter.inc(provider="qwen")
+        counter.inc(2, provider="qwen")
+
+        assert 'demo_retries_total{provider="qwen"} 3' in registry.render()
+        with pytest.raises(ValueError):
+            counter.inc(model="x")
+        with pytest.raises(ValueError):
+            registry.counter("demo_retries", "重复")
+
+    def test_server_timing_header_merges_repeated_stages(self):
+        header = server_timing_header([("ocr", 0.1), ("llm", 1.5), ("ocr", 0.2)], total=2.0)
+        assert header == 'ocr;dur=300.0;desc="x2", llm;dur=1500.0, total;dur=2000.0'
+
+
+class TestServerTimingMiddleware:
+    @pytest.mark.asyncio
+    async def test_stage_timings_reach_response_header_and_histograms(self):
+        app = FastAPI()
+
+        def parse_in_thread():
+            with stage_timer("question_parsing"):
+                return 1
+
+        @app.get("/items/{item_id}")
+        async def read_item(item_id: int):
+            with stage_timer("ocr"):
+                await asyncio.sleep(0.01)
+            # 子任务共享请求的计时列表
+            await asyncio.create_task(asyncio.to_thread(parse_in_thread))
+            return {"id": item_id}
+
+        app.add_middleware(ServerTimingMiddleware)
+        before = REQUEST_SECONDS.count(method="GET", route="/items/{item_id}", status="200")
+        ocr_before = STAGE_SECONDS.count(stage="ocr")
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/items/7")
+            missing = await client.get("/nowhere")
+
+        timing = response.headers["server-timing"]
+        assert timing.startswith("ocr;dur=")
+        assert "question_parsing;dur=" in timing
+        assert "total;dur=" in timing
+        assert missing.status_code == 404
+        assert REQUEST_SECONDS.count(method="GET", route="/items/{item_id}", status="200") == before + 1
+        assert REQUEST_SECONDS.count(method="GET", route="unmatched", status="404") >= 1
+        assert STAGE_SECONDS.count(stage="ocr") == ocr_before + 1
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_exposes_prometheus_text(async_client):
+    response = await async_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE ai_tutor_stage_duration_seconds histogram" in response.text
+    assert "# TYPE ai_tutor_llm_retries counter" in response.text
@@ -0,0 +1,139 @@
+"""
+请求合并（SingleFlight）单元测试
+"""
+
+import asyncio
+import httpx
+import pytest
+from unittest.mock import patch
+from PIL import Image
+
+from ai_tutor.utils.singleflight import SingleFlight
+from ai_tutor.services.llm import QwenService
+from ai_tutor.services.llm.cache import LLMResponseCache, MemoryLRUTier
+from ai_tutor.services.ocr import OCRService
+
+
+class TestSingleFlight:
+    """SingleFlight 核心行为"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight("test")
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "done"
+
+        results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+
+        assert results == ["done"] * 5
+        assert calls == 1
+        assert flight.stats()["collapsed"] == 4
+        assert flight.stats()["inflight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_exception_propagates_to_all_waiters(self):
+        flight = SingleFlight("test")
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            *(flight.do("k", fail) for _ in range(3)), return_exceptions=True
+        )
+
+        assert all(isinstance(r, ValueError) for r in results)
+        assert flight.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_cancelled_leader_does_not_cancel_followers(self):
+        flight = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return 42
+
+        leader = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await follower == 42
+
+    @pytest.mark.asyncio
+    async def test_sequential_calls_are_not_collapsed(self):
+        flight = SingleFlight("test")
+
+        async def work():
+            return 1
+
+        await flight.do("k", work)
+        await flight.do("k", work)
+
+        assert flight.calls == 2
+        assert flight.collapsed == 0
+
+
+class TestLLMCoalescing:
+    """LLM请求合并"""
+
+    @pytest.mark.asyncio
+    async def test_identical_concurrent_chats_hit_provider_once(self):
+        calls = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.02)
+            return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        service = QwenService(api_key="k", base_url="http://llm.test", client=client)
+        cache = LLMResponseCache(MemoryLRUTier(10), None, ttl=60)
+
+        with patch("ai_tutor.services.llm.base.get_llm_response_cache", return_value=cache), patch(
+            "ai_tutor.services.llm.base.llm_single_flight", SingleFlight("llm")
+        ) as flight:
+            results = await asyncio.gather(
+                *(service.generate("同一道题", temperature=0.2) for _ in range(10))
+            )
+
+        assert results == ["ok"] * 10
+        assert calls == 1
+        assert flight.collapsed == 9
+
+
+class CountingOCR(OCRService):
+    """统计识别次数的假OCR"""
+
+    engine_name = "fake"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def _recognize(self, image):
+        self.calls += 1
+        await asyncio.sleep(0.02)
+        return "识别结果"
+
+
+class TestOCRCoalescing:
+    """OCR请求合并"""
+
+    @pytest.mark.asyncio
+    async def test_same_pixels_recognized_once(self):
+        ocr = CountingOCR()
+        images = [Image.new("RGB", (32, 32), "white") for _ in range(4)]
+
+        with patch("ai_tutor.services.ocr.base.ocr_single_flight", SingleFlight("ocr")):
+            results = await asyncio.gather(*(ocr.extract_text(img) for img in images))
+            await ocr.extract_text(Image.new("RGB", (32, 32), "black"))
+
+        assert results == ["识别结果"] * 4
+        assert ocr.calls == 2
@@ -0,0 +1,163 @@
+"""
+上传大小限制、在途字节预算与图片解码测试
+"""
+
+import asyncio
+from io import BytesIO
+
+import httpx
+import pytest
+from unittest.mock import patch
+from fastapi import FastAPI, File, UploadFile
+from PIL import Image
+
+from ai_tutor.core.config import settings
+from ai_tutor.api.middleware.upload_limit import UploadBudget, UploadLimitMiddleware
+from ai_tutor.utils.uploads import decode_image, read_upload_image
+
+
+def jpeg_bytes(size=(3000, 4000), dpi=(600, 600)) -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", size, "white").save(buffer, "JPEG", dpi=dpi)
+    return buffer.getvalue()
+
+
+def make_app(budget: UploadBudget, max_request_size: int = 1024 * 1024, gate: asyncio.Event = None):
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        if gate is not None:
+            await gate.wait()
+        image, size = await read_upload_image(file)
+        return {"size": list(image.size), "bytes": size}
+
+    app.add_middleware(UploadLimitMiddleware, max_request_size=max_request_size, budget=budget, retry_after=3)
+    return app
+
+
+def client(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+class TestUploadLimitMiddleware:
+    @pytest.mark.asyncio
+    async def test_declared_oversize_is_rejected_before_reading_body(self):
+        budget = UploadBudget(10 * 1024 * 1024)
+        async with client(make_app(budget, max_request_size=1000)) as c:
+            response = await c.post("/upload", files={"file": ("a.jpg", b"x" * 5000, "image/jpeg")})
+
+        assert response.status_code == 413
+        assert budget.stats()["in_flight_bytes"] == 0
+
+    @pytest.mark.asyncio
+    async def test_streamed_oversize_is_cut_off(self):
+        body = b"--b\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.jpg\"\r\n" \
+               b"Content-Type: image/jpeg\r\n\r\n" + b"x" * 5000 + b"\r\n--b--\r\n"
+
+        async def chunks():
+            for i in range(0, len(body), 512):
+                yield body[i:i + 512]
+
+        budget = UploadBudget(10 * 1024 * 1024)
+        async with client(make_app(budget, max_request_size=1000)) as c:
+            response = await c.post(
+                "/upload", content=chunks(), headers={"Content-Type": "multipart/form-data; boundary=b"}
+            )
+
+        assert response.status_code == 413
+        assert budget.stats()["in_flight_bytes"] == 0
+
+    @pytest.mark.asyncio
+    async def test_budget_exhaustion_returns_503_with_retry_after(self):
+        data = jpeg_bytes((200, 200))
+        budget = UploadBudget(len(data) + 1000)
+        gate = asyncio.Event()
+        async with client(make_app(budget, gate=gate)) as c:
+            files = {"file": ("a.jpg", data, "image/jpeg")}
+            first = asyncio.create_task(c.post("/upload", files=files))
+            while budget.stats()["in_flight_requests"] == 0:
+                await asyncio.sleep(0.01)
+
+            rejected = await c.post("/upload", files=files)
+            gate.set()
+            accepted = await first
+
+        assert rejected.status_code == 503
+        assert rejected.headers["retry-after"] == "3"
+        assert accepted.status_code == 200
+        assert budget.stats() == {
+            "max_bytes": len(data) + 1000,
+            "in_flight_bytes": 0,
+            "in_flight_requests": 0,
+            "rejected": 1,
+        }
+
+    @pytest.mark.asyncio
+    async def test_path_limit_allows_larger_batch_uploads(self):
+        app = FastAPI()
+        seen = {}
+
+        @app.post("/batch")
+        async def batch(file: UploadFile = File(...)):
+            seen.update(budget.stats())
+            return {"ok": True}
+
+        budget = UploadBudget(10 * 1024 * 1024)
+        app.add_middleware(
+            UploadLimitMiddleware, max_request_size=1000, budget=budget, path_limits={"/batch": 100_000}
+        )
+        async with client(app) as c:
+            accepted = await c.post("/batch", files={"file": ("a.zip", b"x" * 5000, "application/zip")})
+            rejected = await c.post("/batch", files={"file": ("a.zip", b"x" * 200_000, "application/zip")})
+
+        assert accepted.status_code == 200
+        assert rejected.status_code == 413
+        # 批量请求的预留字节封顶为单张上传上限
+        assert seen["in_flight_bytes"] == 1000
+
+    @pytest.mark.asyncio
+    async def test_non_multipart_requests_pass_through(self):
+        app = FastAPI()
+
+        @app.post("/json")
+        async def echo(payload: dict):
+            return payload
+
+        app.add_middleware(UploadLimitMiddleware, max_request_size=10, budget=UploadBudget(10))
+        async with client(app) as c:
+            response = await c.post("/json", json={"text": "x" * 100})
+        assert response.status_code == 200
+
+
+class TestReadUploadImage:
+    @pytest.mark.asyncio
+    async def test_rejects_wrong_type_and_corrupt_image(self):
+        async with client(make_app(UploadBudget(10 * 1024 * 1024))) as c:
+            wrong_type = await c.post("/upload", files={"file": ("a.txt", b"hello", "text/plain")})
+            corrupt = await c.post("/upload", files={"file": ("a.jpg", b"not an image", "image/jpeg")})
+        assert wrong_type.status_code == 400
+        assert corrupt.status_code == 400
+        assert "图片格式错误" in corrupt.json()["detail"]
+
+    @pytest.mark.asyncio
+    async def test_large_jpeg_is_decoded_at_reduced_resolution(self):
+        data = jpeg_bytes((3000, 4000))
+        # 100DPI下A4长边约1169像素，JPEG最多缩小到1/2
+        with patch.object(settings, "OCR_TARGET_DPI", 100):
+            async with client(make_app(UploadBudget(10 * 1024 * 1024))) as c:
+                response = await c.post("/upload", files={"file": ("a.jpg", data, "image/jpeg")})
+
+        assert response.status_code == 200
+        assert response.json() == {"size": [1500, 2000], "bytes": len(data)}
+
+
+def test_draft_decode_keeps_target_size_and_scales_dpi():
+    image = decode_image(BytesIO(jpeg_bytes((3000, 4000))), long_side=900)
+    # JPEG按2的幂缩小且不低于目标尺寸
+    assert image.size == (750, 1000)
+    assert image.info["dpi"] == pytest.approx((150, 150))
+
+    png = BytesIO()
+    Image.new("L", (1200, 800), 255).save(png, "PNG")
+    assert decode_image(png, long_side=600).size == (1200, 800)